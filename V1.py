@@ -1,17 +1,33 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
 import math
 
+from nucleo_renta import impuesto_241_uvt
+from reglas_tributarias import obtener_paquete
+
+# tkinter se importa al crear la ventana: importar este módulo (p. ej. para
+# usar las fórmulas en lotes o en el benchmark) no carga la interfaz.
+tk = ttk = messagebox = None
+
+
+def cargar_tkinter():
+    """Importa tkinter en las variables globales del módulo (una sola vez)."""
+    global tk, ttk, messagebox
+    if tk is None:
+        import tkinter as tk
+        from tkinter import ttk, messagebox
+    return tk
+
+
 class CalculadoraRenta:
     """Mini-Aplicación de Simulación de Renta de Trabajo en Colombia usando Tkinter."""
 
-    def __init__(self, master):
+    def __init__(self, master, reglas=None):
+        cargar_tkinter()
         self.master = master
         master.title("Simulador de Renta (Trabajo) 🇨🇴")
         master.resizable(False, False)
 
-        # Constante Dura
-        self.UVT = 49799
+        # Paquete de reglas del año gravable: UVT, tabla del Art. 241, topes y porcentajes
+        self.reglas = obtener_paquete(reglas)
 
         self.style = ttk.Style()
         self.style.configure('TLabel', font=('Helvetica', 10))
@@ -96,27 +112,8 @@ class CalculadoraRenta:
         return f"$ {value:,.0f}".replace(",", "_").replace(".", ",").replace("_", ".") # Formato colombiano
 
     def calcular_impuesto_241(self, base_gravable_uvt):
-        """Aplica la Tabla de Tarifas Progresivas del Art. 241 E.T."""
-        if base_gravable_uvt <= 1090:
-            return 0
-        elif base_gravable_uvt <= 1630:
-            exceso = base_gravable_uvt - 1090
-            return (exceso * 0.19)
-        elif base_gravable_uvt <= 4190:
-            exceso = base_gravable_uvt - 1630
-            return (103 + exceso * 0.28)
-        elif base_gravable_uvt <= 8670:
-            exceso = base_gravable_uvt - 4190
-            return (828 + exceso * 0.33)
-        elif base_gravable_uvt <= 18970:
-            exceso = base_gravable_uvt - 8670
-            return (2270 + exceso * 0.35)
-        elif base_gravable_uvt <= 32370:
-            exceso = base_gravable_uvt - 18970
-            return (5890 + exceso * 0.37)
-        else: # Mayor a 32370
-            exceso = base_gravable_uvt - 32370
-            return (10954 + exceso * 0.39)
+        """Aplica la Tabla de Tarifas Progresivas del Art. 241 E.T. (Impuesto en UVT)."""
+        return impuesto_241_uvt(base_gravable_uvt, self.reglas)
 
     def calcular(self):
         try:
@@ -140,8 +137,8 @@ class CalculadoraRenta:
         # 2. MÓDULO DE DEPURACIÓN (Art. 336 E.T.)
 
         DeduccionesOblig = AportesObligatorios
-        Tope40 = IngresosBrutos * 0.40
-        TopeUVT = self.UVT * 1340 # Tope general de 1340 UVT
+        Tope40 = IngresosBrutos * self.reglas.porcentaje_limite_general
+        TopeUVT = self.reglas.uvt * self.reglas.limite_general_uvt # Tope general (1340 UVT)
         
         # Las deducciones permitidas se limitan al menor de los topes
         DeduccionesPermitidas = min(DeduccionesOblig, Tope40, TopeUVT)
@@ -151,13 +148,13 @@ class CalculadoraRenta:
 
         # 3. MÓDULO DE CÁLCULO DEL IMPUESTO (Art. 241 E.T.)
         
-        BaseGravable_UVT = BaseGravable / self.UVT
+        BaseGravable_UVT = BaseGravable / self.reglas.uvt
         
         # Impuesto Bruto en UVT (aplicando la tabla)
         ImpuestoBruto_UVT = self.calcular_impuesto_241(BaseGravable_UVT)
         
         # Impuesto Bruto en pesos
-        ImpuestoBruto_Pesos = ImpuestoBruto_UVT * self.UVT
+        ImpuestoBruto_Pesos = ImpuestoBruto_UVT * self.reglas.uvt
         
         # Impuesto Neto (lo que debe pagar antes de anticipos)
         ImpuestoNetoActual = ImpuestoBruto_Pesos - TotalRetenciones
@@ -168,13 +165,8 @@ class CalculadoraRenta:
         
         # 4. MÓDULO DE ANTICIPO (Art. 807 E.T.)
 
-        # Definir Porcentaje basado en Anio_Declaracion
-        if Anio_Declaracion == "1":
-            Porcentaje = 0.25
-        elif Anio_Declaracion == "2":
-            Porcentaje = 0.50
-        else: # "3+"
-            Porcentaje = 0.75
+        # Definir Porcentaje basado en Anio_Declaracion ("1", "2" o "3+")
+        Porcentaje = self.reglas.porcentaje_anticipo({"1": 1, "2": 2}.get(Anio_Declaracion, 3))
 
         # Método 1: Impuesto Actual
         Anticipo_Metodo1 = max(0, (ImpuestoBruto_Pesos * Porcentaje) - TotalRetenciones)
@@ -200,7 +192,7 @@ class CalculadoraRenta:
         self.anticipo_final_label.config(text=self.format_currency(round(Anticipo_Final)))
 
 if __name__ == "__main__":
-    root = tk.Tk()
+    root = cargar_tkinter().Tk()
     app = CalculadoraRenta(root)
     root.mainloop()
 
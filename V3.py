@@ -1,21 +1,44 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
 import math
 
+from nucleo_renta import impuesto_241_uvt
+from reglas_tributarias import obtener_paquete
+
+# tkinter se importa al crear la ventana: importar este módulo (p. ej. para
+# usar las fórmulas en lotes o en el benchmark) no carga la interfaz.
+tk = ttk = messagebox = None
+
+
+def cargar_tkinter():
+    """Importa tkinter en las variables globales del módulo (una sola vez)."""
+    global tk, ttk, messagebox
+    if tk is None:
+        import tkinter as tk
+        from tkinter import ttk, messagebox
+    return tk
+
+
 class CalculadoraRenta:
     """Mini-Aplicación de Simulación de Renta de Trabajo en Colombia usando Tkinter.
     
-    NOTA IMPORTANTE: Se asume la UVT de $49.799 (Año 2024) y se aplica la 
-    Renta Exenta Laboral del 25% de forma automática (Art. 206, Num. 10 E.T.).
+    NOTA IMPORTANTE: La UVT, la tabla del Art. 241, los topes y los porcentajes
+    vienen del paquete de reglas del año gravable (por defecto 2024) y se aplica
+    la Renta Exenta Laboral del 25% de forma automática (Art. 206, Num. 10 E.T.).
     """
 
-    def __init__(self, master):
+    def __init__(self, master, usar_tablas_consulta=False, recalculo_en_vivo=False, reglas=None):
+        cargar_tkinter()
         self.master = master
         master.title("Simulador de Renta Laboral 🇨🇴")
         master.resizable(False, False)
 
-        # Constante UVT para el año de declaración (2024 para declarar en 2025)
-        self.UVT = 49799
+        # Paquete de reglas del año gravable (2024 para declarar en 2025)
+        self.reglas = obtener_paquete(reglas)
+
+        # Modo opcional: impuesto del Art. 241 precalculado por UVT entera
+        self.tabla_241 = None
+        if usar_tablas_consulta:
+            from tablas_consulta import crear_tabla_impuesto_241
+            self.tabla_241 = crear_tabla_impuesto_241(self.calcular_impuesto_241_formula)
 
         self.style = ttk.Style()
         self.style.configure('TLabel', font=('Helvetica', 10))
@@ -53,6 +76,13 @@ class CalculadoraRenta:
 
         # Configuración de la Interfaz
         self.create_widgets()
+
+        # Modo opcional: recalcular mientras el usuario escribe (sin esperar el botón)
+        self._recalculo_pendiente = None
+        if recalculo_en_vivo:
+            for variable in (self.ingresos_brutos, self.aportes_obligatorios, self.total_retenciones,
+                             self.impuesto_neto_anterior, self.otras_deducciones, self.anio_declaracion):
+                variable.trace_add('write', self.programar_recalculo)
         
     def show_help(self, step):
         """Actualiza el panel de ayuda con la información del paso actual."""
@@ -115,7 +145,11 @@ class CalculadoraRenta:
 
         # Botón de Cálculo
         self.calc_button = ttk.Button(main_frame, text="Calcular Impuesto y Anticipo", command=self.calcular, style='TButton')
-        self.calc_button.grid(row=6, column=0, columnspan=2, pady=15)
+        self.calc_button.grid(row=6, column=0, pady=15)
+
+        # Botón de Liquidación por Lote (hoja de empleados en segundo plano)
+        self.lote_button = ttk.Button(main_frame, text="Liquidación por Lote...", command=self.abrir_lote)
+        self.lote_button.grid(row=6, column=1, pady=15)
         
         # --- Panel de Instrucciones Dinámicas ---
         help_frame = ttk.LabelFrame(main_frame, text="Instrucciones y Ejemplo", padding="10 10 10 10")
@@ -162,31 +196,33 @@ class CalculadoraRenta:
         return f"$ {formatted}"
 
     def calcular_impuesto_241(self, base_gravable_uvt):
+        """Impuesto en UVT del Art. 241 E.T., desde la tabla precalculada si está activa."""
+        if self.tabla_241 is not None:
+            return self.tabla_241.consultar(base_gravable_uvt)
+        return self.calcular_impuesto_241_formula(base_gravable_uvt)
+
+    def calcular_impuesto_241_formula(self, base_gravable_uvt):
         """Aplica la Tabla de Tarifas Progresivas del Art. 241 E.T. (Impuesto en UVT)."""
         base_gravable_uvt = math.floor(base_gravable_uvt) # La base gravable se redondea al entero inferior
+        return impuesto_241_uvt(base_gravable_uvt, self.reglas)
+
+    def abrir_lote(self):
+        """Abre la pantalla de liquidación por lote (pantalla_lote.py)."""
+        from pantalla_lote import PantallaLote
+        return PantallaLote(self.master)
+
+    def programar_recalculo(self, *args):
+        """Agrupa las pulsaciones: recalcula 250 ms después de la última edición."""
+        if self._recalculo_pendiente is not None:
+            self.master.after_cancel(self._recalculo_pendiente)
+        self._recalculo_pendiente = self.master.after(250, self._recalcular_en_vivo)
+
+    def _recalcular_en_vivo(self):
+        self._recalculo_pendiente = None
+        self.calcular(silencioso=True)
 
-        if base_gravable_uvt <= 1090:
-            return 0.0
-        elif base_gravable_uvt <= 1630:
-            exceso = base_gravable_uvt - 1090
-            return (exceso * 0.19)
-        elif base_gravable_uvt <= 4190:
-            exceso = base_gravable_uvt - 1630
-            return (103 + exceso * 0.28)
-        elif base_gravable_uvt <= 8670:
-            exceso = base_gravable_uvt - 4190
-            return (828 + exceso * 0.33)
-        elif base_gravable_uvt <= 18970:
-            exceso = base_gravable_uvt - 8670
-            return (2270 + exceso * 0.35)
-        elif base_gravable_uvt <= 32370:
-            exceso = base_gravable_uvt - 18970
-            return (5890 + exceso * 0.37)
-        else: # Mayor a 32370
-            exceso = base_gravable_uvt - 32370
-            return (10954 + exceso * 0.39)
-
-    def calcular(self):
+    def calcular(self, silencioso=False):
+        # silencioso=True (recálculo en vivo): un campo a medio escribir no muestra errores
         try:
             # 1. Lectura y validación de Entradas (usando snake_case)
             ingresos_brutos = self.ingresos_brutos.get()
@@ -204,9 +240,13 @@ class CalculadoraRenta:
                 raise ValueError("Los aportes obligatorios no pueden superar los ingresos brutos.")
 
         except ValueError as e:
+            if silencioso:
+                return
             messagebox.showerror("Error de Entrada", f"Asegúrese de ingresar números válidos. {e}")
             return
         except Exception as e:
+            if silencioso:
+                return
             messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
             return
 
@@ -216,16 +256,16 @@ class CalculadoraRenta:
         renta_liquida_ordinaria = max(0, ingresos_brutos - aportes_obligatorios)
 
         # 2.1. Renta Exenta Laboral (25% sobre la Renta Líquida)
-        # Límite: 2400 UVT anuales (2400 * 49799 = $119,517,600)
-        renta_exenta_25_pct = renta_liquida_ordinaria * 0.25
-        renta_exenta_25_pct = min(renta_exenta_25_pct, 2400 * self.UVT)
+        # Límite anual en UVT del paquete (790 UVT en 2024)
+        renta_exenta_25_pct = renta_liquida_ordinaria * self.reglas.porcentaje_renta_exenta_25
+        renta_exenta_25_pct = min(renta_exenta_25_pct, self.reglas.limite_renta_exenta_25_uvt * self.reglas.uvt)
 
         # Total de Rentas Exentas y Deducciones (sujetas a límite)
         total_exenciones_deducciones = renta_exenta_25_pct + otras_deducciones
         
         # 2.2. Límite del 40% (Tope General)
-        tope_40_pct = renta_liquida_ordinaria * 0.40
-        tope_1340_uvt = self.UVT * 1340 
+        tope_40_pct = renta_liquida_ordinaria * self.reglas.porcentaje_limite_general
+        tope_1340_uvt = self.reglas.uvt * self.reglas.limite_general_uvt
 
         # Las deducciones permitidas se limitan al menor de los topes
         limite_deducciones = min(tope_40_pct, tope_1340_uvt)
@@ -238,26 +278,21 @@ class CalculadoraRenta:
 
         # 3. MÓDULO DE CÁLCULO DEL IMPUESTO (Art. 241 E.T.)
         
-        base_gravable_uvt = base_gravable / self.UVT
+        base_gravable_uvt = base_gravable / self.reglas.uvt
         
         # Impuesto Bruto en UVT (aplicando la tabla)
         impuesto_bruto_uvt = self.calcular_impuesto_241(base_gravable_uvt)
         
         # Impuesto Bruto en pesos
-        impuesto_bruto_pesos = impuesto_bruto_uvt * self.UVT
+        impuesto_bruto_pesos = impuesto_bruto_uvt * self.reglas.uvt
         
         # Impuesto Neto (lo que debe pagar antes de anticipos)
         impuesto_neto_actual = max(0, impuesto_bruto_pesos - total_retenciones)
         
         # 4. MÓDULO DE ANTICIPO (Art. 807 E.T.)
 
-        # Definir Porcentaje basado en Anio_Declaracion
-        if anio_declaracion == "1":
-            porcentaje = 0.25
-        elif anio_declaracion == "2":
-            porcentaje = 0.50
-        else: # "3+"
-            porcentaje = 0.75
+        # Definir Porcentaje basado en Anio_Declaracion ("1", "2" o "3+")
+        porcentaje = self.reglas.porcentaje_anticipo({"1": 1, "2": 2}.get(anio_declaracion, 3))
 
         # Método 1: Impuesto Actual
         anticipo_metodo1 = max(0, (impuesto_bruto_pesos * porcentaje) - total_retenciones)
@@ -287,6 +322,6 @@ class CalculadoraRenta:
         self.anticipo_final_label.config(text=self.format_currency(round(anticipo_final)))
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = CalculadoraRenta(root)
+    root = cargar_tkinter().Tk()
+    app = CalculadoraRenta(root, recalculo_en_vivo=True)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""
+LIQUIDACIÓN EN PESOS ENTEROS (ARITMÉTICA EXACTA)
+Personas Naturales Residentes Fiscales - Colombia
+
+Modo de cálculo sobre pesos enteros (arreglos int64) con reglas de
+redondeo explícitas, en lugar de floats binarios que cada motor redondea
+en un lugar distinto:
+
+- Las entradas se llevan a pesos enteros (mitad alejándose de cero).
+- Los límites en UVT se convierten a pesos una sola vez (UVT × pesos).
+- Cada porcentaje es una fracción exacta (19% = 19/100) y cada producto
+  por porcentaje se redondea al peso una sola vez, mitad alejándose de
+  cero: la tarifa del Art. 241 se aplica sobre el exceso en pesos, y el
+  promedio del anticipo (Art. 807) se divide entre 2 en la misma fracción.
+- Con `formulario=True`, cada casilla del formulario 210 se aproxima al
+  múltiplo de mil más cercano (Art. 577 E.T.) en el momento en que se
+  produce, y los pasos siguientes usan el valor aproximado, como en la
+  declaración. Los valores de hoja de trabajo (REDONDEO_CASILLAS = 1) no
+  se aproximan.
+
+`liquidar_decimal` es la misma liquidación con decimal.Decimal, fila a
+fila, como referencia: ambos dan exactamente los mismos pesos.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+import motor_vectorizado as motor
+from reglas_tributarias import cargar_paquete, obtener_paquete
+
+# Múltiplo al que se aproxima cada resultado con formulario=True
+REDONDEO_CASILLAS = {clave: 1000 for clave in motor.COLUMNAS_RESULTADO
+                     if clave not in ('base_gravable_uvt', 'es_saldo_favor')}
+for _clave in ('base_renta_exenta_25', 'suma_rentas_deducciones', 'limite_maximo_depuracion',
+               'anticipo_metodo1', 'anticipo_metodo2'):
+    REDONDEO_CASILLAS[_clave] = 1    # hoja de trabajo, no es casilla del formulario
+
+
+def _fraccion(valor):
+    """Fracción exacta del valor decimal escrito (0.19 -> 19/100, no el binario)."""
+    return Fraction(str(valor))
+
+
+def _pesos_de_fraccion(fraccion):
+    """Redondea una fracción al peso, mitad alejándose de cero."""
+    entero = (abs(fraccion.numerator) * 2 + fraccion.denominator) // (2 * fraccion.denominator)
+    return entero if fraccion >= 0 else -entero
+
+
+@lru_cache(maxsize=None)
+def _constantes(paquete):
+    """Límites en pesos enteros y porcentajes como fracciones de un paquete."""
+    uvt = paquete.uvt
+
+    def pesos(cantidad_uvt):
+        return _pesos_de_fraccion(_fraccion(cantidad_uvt) * uvt)
+
+    return {
+        'limites_cesantias': np.array([pesos(l) for l in paquete.limites_cesantias_uvt], dtype=np.int64),
+        'porcentajes_cesantias': tuple(_fraccion(p) for p in paquete.porcentajes_cesantias),
+        'limites_241': np.array([pesos(l) for l in paquete.limites_241_uvt], dtype=np.int64),
+        'inicio_241': tuple(pesos(i) for i in paquete.inicio_241_uvt),
+        'tarifas_241': tuple(_fraccion(t) for t in paquete.tarifas_241),
+        'base_241': tuple(pesos(b) for b in paquete.impuesto_base_241_uvt),
+        'por_dependiente': pesos(paquete.deduccion_por_dependiente_uvt),
+        'limite_dependientes': pesos(paquete.limite_dependientes_uvt),
+        'limite_medicina': pesos(paquete.limite_medicina_prepagada_uvt),
+        'limite_intereses': pesos(paquete.limite_intereses_vivienda_uvt),
+        'limite_renta_exenta_25': pesos(paquete.limite_renta_exenta_25_uvt),
+        'limite_pension_afc': pesos(paquete.limite_pension_afc_uvt),
+        'limite_general': pesos(paquete.limite_general_uvt),
+        'limite_factura': pesos(paquete.limite_factura_electronica_uvt),
+        'renta_exenta_25': _fraccion(paquete.porcentaje_renta_exenta_25),
+        'pension_afc': _fraccion(paquete.porcentaje_pension_afc),
+        'limite_general_pct': _fraccion(paquete.porcentaje_limite_general),
+        'factura': _fraccion(paquete.porcentaje_factura_electronica),
+        'gmf': _fraccion(paquete.porcentaje_gmf),
+        'anticipo': tuple(_fraccion(p) for p in paquete.porcentajes_anticipo),
+    }
+
+
+# --- OPERACIONES SOBRE ARREGLOS INT64 ---
+
+def a_pesos(valores):
+    """Convierte valores (floats o enteros) a pesos int64, mitad alejándose de cero."""
+    valores = np.asarray(valores)
+    if np.issubdtype(valores.dtype, np.integer):
+        return valores.astype(np.int64)
+    valores = valores.astype(np.float64)
+    entero = np.trunc(valores)
+    # valores - entero es exacto en binario: no hay doble redondeo
+    return (entero + np.where(np.abs(valores - entero) >= 0.5, np.sign(valores), 0.0)).astype(np.int64)
+
+
+def _dividir(numerador, denominador):
+    """numerador / denominador (denominador > 0) al entero, mitad alejándose de cero."""
+    cociente = (np.abs(numerador) * 2 + denominador) // (2 * denominador)
+    return np.where(numerador < 0, -cociente, cociente)
+
+
+def _porcentaje(valores, fraccion):
+    """valores × fracción redondeado al peso."""
+    return _dividir(valores * fraccion.numerator, fraccion.denominator)
+
+
+def _aproximar(valores, multiplo):
+    if multiplo == 1:
+        return valores
+    return _dividir(valores, multiplo) * multiplo
+
+
+def calcular_impuesto_renta_enteros(columnas, reglas=None, formulario=False):
+    """
+    Liquidación completa en pesos enteros para un lote. Mismas entradas y
+    claves de resultado que `calcular_impuesto_renta_lote`; los valores en
+    pesos son int64, `es_saldo_favor` es bool y `base_gravable_uvt` float.
+    """
+    n = motor._numero_filas(columnas) if columnas else 0
+    d = {}
+    for concepto in motor.CONCEPTOS_ENTRADA:
+        if concepto in columnas:
+            d[concepto] = a_pesos(columnas[concepto])
+        else:
+            d[concepto] = np.full(n, motor.VALORES_POR_DEFECTO[concepto], dtype=np.int64)
+
+    if reglas is None and 'ano_gravable' in columnas:
+        anos = np.asarray(columnas['ano_gravable']).astype(np.int64)
+        unicos = np.unique(anos)
+        if len(unicos) > 1:
+            resultados = {}
+            for ano in unicos:
+                indices = np.flatnonzero(anos == ano)
+                parcial = _liquidar({c: v[indices] for c, v in d.items()}, cargar_paquete(int(ano)), formulario)
+                for clave, valores in parcial.items():
+                    if clave not in resultados:
+                        resultados[clave] = np.empty(n, dtype=valores.dtype)
+                    resultados[clave][indices] = valores
+            return resultados
+        if len(unicos) == 1:
+            reglas = cargar_paquete(int(unicos[0]))
+
+    return _liquidar(d, obtener_paquete(reglas), formulario)
+
+
+def _liquidar(d, paquete, formulario):
+    k = _constantes(paquete)
+    redondeo = REDONDEO_CASILLAS if formulario else {}
+    resultados = {}
+
+    def casilla(clave, valores):
+        valores = _aproximar(valores, redondeo.get(clave, 1))
+        resultados[clave] = valores
+        return valores
+
+    # 1-3. INGRESOS, INCR E INGRESO NETO
+    ingresos_totales = casilla('ingresos_totales', d['salarios'] + d['cesantias'] +
+                               d['prestaciones_sociales'] + d['otros_pagos_laborales'])
+    incr_total = casilla('incr_total', d['incr_salud'] + d['incr_pensiones'])
+    ingreso_neto = casilla('ingreso_neto', ingresos_totales - incr_total)
+
+    # 4. CESANTÍAS EXENTAS (Art. 206 numeral 4): límites en pesos, inclusivos por arriba
+    rango = np.searchsorted(k['limites_cesantias'], d['ingreso_mensual_promedio'], side='left')
+    exentas = np.zeros_like(d['cesantias'])
+    for i, fraccion in enumerate(k['porcentajes_cesantias']):
+        en_rango = rango == i
+        if fraccion and en_rango.any():
+            exentas[en_rango] = _porcentaje(d['cesantias'][en_rango], fraccion)
+    cesantias_exentas = casilla('cesantias_exentas', np.where(d['ingreso_mensual_promedio'] == 0, 0, exentas))
+
+    # 5. DEDUCCIONES
+    deduccion_dependientes = casilla('deduccion_dependientes', np.minimum(
+        d['num_dependientes'] * k['por_dependiente'], k['limite_dependientes']))
+    deduccion_medicina = casilla('deduccion_medicina', np.minimum(d['medicina_prepagada'], k['limite_medicina']))
+    deduccion_intereses = casilla('deduccion_intereses', np.minimum(d['intereses_vivienda'], k['limite_intereses']))
+    deducciones_totales = casilla('deducciones_totales',
+                                  deduccion_dependientes + deduccion_medicina + deduccion_intereses)
+
+    # 6. RENTA EXENTA 25%
+    base_renta_exenta_25 = casilla('base_renta_exenta_25', np.maximum(
+        ingresos_totales - incr_total - cesantias_exentas - deducciones_totales, 0))
+    renta_exenta_25 = casilla('renta_exenta_25', np.minimum(
+        _porcentaje(base_renta_exenta_25, k['renta_exenta_25']), k['limite_renta_exenta_25']))
+
+    # 7. PENSIÓN VOLUNTARIA + AFC
+    pension_afc_limitada = casilla('pension_afc_limitada', np.minimum(np.minimum(
+        d['pension_voluntaria'] + d['afc'], _porcentaje(ingresos_totales, k['pension_afc'])),
+        k['limite_pension_afc']))
+    rentas_exentas_totales = casilla('rentas_exentas_totales',
+                                     cesantias_exentas + renta_exenta_25 + pension_afc_limitada)
+
+    # 8. LÍMITE DEL 40% - ARTÍCULO 336
+    suma_rentas_deducciones = casilla('suma_rentas_deducciones', rentas_exentas_totales + deducciones_totales)
+    limite_maximo_depuracion = casilla('limite_maximo_depuracion', np.minimum(
+        _porcentaje(ingreso_neto, k['limite_general_pct']), k['limite_general']))
+    depuracion_final = casilla('depuracion_final', np.minimum(suma_rentas_deducciones, limite_maximo_depuracion))
+
+    # 9-11. RENTA LÍQUIDA, FACTURA ELECTRÓNICA Y GMF
+    beneficio_factura = casilla('beneficio_factura', np.minimum(
+        _porcentaje(d['compras_factura_electronica'], k['factura']), k['limite_factura']))
+    beneficio_gmf = casilla('beneficio_gmf', _porcentaje(d['gmf'], k['gmf']))
+    renta_liquida = ingreso_neto - depuracion_final - beneficio_factura - beneficio_gmf
+
+    # 12. BASE GRAVABLE
+    base_gravable = casilla('base_gravable', np.maximum(renta_liquida, 0))
+    resultados['base_gravable_uvt'] = base_gravable / paquete.uvt
+
+    # 13. TABLA ARTÍCULO 241: tarifa sobre el exceso en pesos + impuesto acumulado
+    rango = np.searchsorted(k['limites_241'], base_gravable, side='left')
+    impuesto = np.zeros_like(base_gravable)
+    for i, (inicio, tarifa, acumulado) in enumerate(zip(k['inicio_241'], k['tarifas_241'], k['base_241'])):
+        en_rango = rango == i
+        if tarifa and en_rango.any():
+            impuesto[en_rango] = _porcentaje(base_gravable[en_rango] - inicio, tarifa) + acumulado
+    impuesto_neto = casilla('impuesto_neto', impuesto)
+
+    # 14. ANTICIPO (Artículo 807)
+    uno, dos, tres_o_mas = k['anticipo']
+    anos = d['num_anos_declarando']
+    anticipo_metodo1 = np.zeros_like(impuesto_neto)
+    promedio_por_porcentaje = np.zeros_like(impuesto_neto)
+    suma_impuestos = impuesto_neto + d['impuesto_neto_anterior']
+    for fraccion, filas in ((uno, anos == 1), (dos, anos == 2), (tres_o_mas, (anos != 1) & (anos != 2))):
+        if filas.any():
+            anticipo_metodo1[filas] = _porcentaje(impuesto_neto[filas], fraccion)
+            promedio_por_porcentaje[filas] = _porcentaje(suma_impuestos[filas], fraccion / 2)
+    anticipo_metodo1 = casilla('anticipo_metodo1', np.maximum(anticipo_metodo1 - d['retenciones'], 0))
+    anticipo_metodo2 = casilla('anticipo_metodo2', np.where(
+        d['impuesto_neto_anterior'] > 0,
+        np.maximum(promedio_por_porcentaje - d['retenciones'], 0),
+        anticipo_metodo1))
+    anticipo_definitivo = casilla('anticipo_definitivo', np.minimum(anticipo_metodo1, anticipo_metodo2))
+
+    # 15. LIQUIDACIÓN FINAL
+    saldo_sin_anticipo = casilla('saldo_sin_anticipo', impuesto_neto - d['retenciones'] -
+                                 d['saldo_favor_anterior'] - d['anticipo_anterior'])
+    liquidacion_final = saldo_sin_anticipo + anticipo_definitivo
+    resultados['es_saldo_favor'] = liquidacion_final < 0
+    casilla('valor_final', np.abs(liquidacion_final))
+
+    return {clave: resultados[clave] for clave in motor.COLUMNAS_RESULTADO}
+
+
+# --- REFERENCIA CON decimal.Decimal ---
+
+_UNO = Decimal(1)
+
+
+def _decimal_pesos(valor, multiplo=1):
+    if multiplo == 1:
+        return valor.quantize(_UNO, rounding=ROUND_HALF_UP)
+    return (valor / multiplo).quantize(_UNO, rounding=ROUND_HALF_UP) * multiplo
+
+
+def _decimal(fraccion):
+    return Decimal(fraccion.numerator) / Decimal(fraccion.denominator)
+
+
+def liquidar_decimal(datos, reglas=None, formulario=False):
+    """
+    Misma liquidación que `calcular_impuesto_renta_enteros` para un
+    contribuyente, con decimal.Decimal. Retorna pesos como int.
+    """
+    paquete = obtener_paquete(reglas)
+    k = _constantes(paquete)
+    redondeo = REDONDEO_CASILLAS if formulario else {}
+    d = {concepto: _decimal_pesos(Decimal(datos.get(concepto, motor.VALORES_POR_DEFECTO[concepto])))
+         for concepto in motor.CONCEPTOS_ENTRADA}
+    r = {}
+
+    def casilla(clave, valor):
+        r[clave] = _decimal_pesos(valor, redondeo.get(clave, 1))
+        return r[clave]
+
+    def porcentaje(valor, fraccion):
+        return _decimal_pesos(valor * _decimal(fraccion))
+
+    ingresos_totales = casilla('ingresos_totales', d['salarios'] + d['cesantias'] +
+                               d['prestaciones_sociales'] + d['otros_pagos_laborales'])
+    incr_total = casilla('incr_total', d['incr_salud'] + d['incr_pensiones'])
+    ingreso_neto = casilla('ingreso_neto', ingresos_totales - incr_total)
+
+    exentas = Decimal(0)
+    if d['ingreso_mensual_promedio'] != 0:
+        rango = int(np.searchsorted(k['limites_cesantias'], int(d['ingreso_mensual_promedio']), side='left'))
+        exentas = porcentaje(d['cesantias'], k['porcentajes_cesantias'][rango])
+    cesantias_exentas = casilla('cesantias_exentas', exentas)
+
+    deduccion_dependientes = casilla('deduccion_dependientes', min(
+        d['num_dependientes'] * k['por_dependiente'], Decimal(k['limite_dependientes'])))
+    deduccion_medicina = casilla('deduccion_medicina', min(d['medicina_prepagada'], Decimal(k['limite_medicina'])))
+    deduccion_intereses = casilla('deduccion_intereses', min(d['intereses_vivienda'], Decimal(k['limite_intereses'])))
+    deducciones_totales = casilla('deducciones_totales',
+                                  deduccion_dependientes + deduccion_medicina + deduccion_intereses)
+
+    base_renta_exenta_25 = casilla('base_renta_exenta_25', max(
+        ingresos_totales - incr_total - cesantias_exentas - deducciones_totales, Decimal(0)))
+    renta_exenta_25 = casilla('renta_exenta_25', min(
+        porcentaje(base_renta_exenta_25, k['renta_exenta_25']), Decimal(k['limite_renta_exenta_25'])))
+
+    pension_afc_limitada = casilla('pension_afc_limitada', min(
+        d['pension_voluntaria'] + d['afc'], porcentaje(ingresos_totales, k['pension_afc']),
+        Decimal(k['limite_pension_afc'])))
+    rentas_exentas_totales = casilla('rentas_exentas_totales',
+                                     cesantias_exentas + renta_exenta_25 + pension_afc_limitada)
+
+    suma_rentas_deducciones = casilla('suma_rentas_deducciones', rentas_exentas_totales + deducciones_totales)
+    limite_maximo_depuracion = casilla('limite_maximo_depuracion', min(
+        porcentaje(ingreso_neto, k['limite_general_pct']), Decimal(k['limite_general'])))
+    depuracion_final = casilla('depuracion_final', min(suma_rentas_deducciones, limite_maximo_depuracion))
+
+    beneficio_factura = casilla('beneficio_factura', min(
+        porcentaje(d['compras_factura_electronica'], k['factura']), Decimal(k['limite_factura'])))
+    beneficio_gmf = casilla('beneficio_gmf', porcentaje(d['gmf'], k['gmf']))
+    renta_liquida = ingreso_neto - depuracion_final - beneficio_factura - beneficio_gmf
+
+    base_gravable = casilla('base_gravable', max(renta_liquida, Decimal(0)))
+
+    rango = int(np.searchsorted(k['limites_241'], int(base_gravable), side='left'))
+    impuesto = Decimal(0)
+    if k['tarifas_241'][rango]:
+        impuesto = (porcentaje(base_gravable - k['inicio_241'][rango], k['tarifas_241'][rango])
+                    + k['base_241'][rango])
+    impuesto_neto = casilla('impuesto_neto', impuesto)
+
+    anos = d['num_anos_declarando']
+    fraccion = k['anticipo'][0 if anos == 1 else 1 if anos == 2 else 2]
+    anticipo_metodo1 = casilla('anticipo_metodo1', max(
+        porcentaje(impuesto_neto, fraccion) - d['retenciones'], Decimal(0)))
+    if d['impuesto_neto_anterior'] > 0:
+        metodo2 = max(porcentaje(impuesto_neto + d['impuesto_neto_anterior'], fraccion / 2) - d['retenciones'],
+                      Decimal(0))
+    else:
+        metodo2 = anticipo_metodo1
+    anticipo_metodo2 = casilla('anticipo_metodo2', metodo2)
+    anticipo_definitivo = casilla('anticipo_definitivo', min(anticipo_metodo1, anticipo_metodo2))
+
+    saldo_sin_anticipo = casilla('saldo_sin_anticipo', impuesto_neto - d['retenciones'] -
+                                 d['saldo_favor_anterior'] - d['anticipo_anterior'])
+    liquidacion_final = saldo_sin_anticipo + anticipo_definitivo
+    casilla('valor_final', abs(liquidacion_final))
+
+    resultados = {clave: int(valor) for clave, valor in r.items()}
+    resultados['base_gravable_uvt'] = float(base_gravable / paquete.uvt)
+    resultados['es_saldo_favor'] = liquidacion_final < 0
+    return {clave: resultados[clave] for clave in motor.COLUMNAS_RESULTADO}
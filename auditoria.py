@@ -0,0 +1,260 @@
+"""
+TRAZA DE AUDITORÍA DE LA LIQUIDACIÓN
+Personas Naturales Residentes Fiscales - Colombia
+
+Registro legible por máquina de por qué cada declaración dio lo que dio:
+qué límite fue el que topó cada valor (40% del ingreso neto o 1.340 UVT
+del Art. 336, 790 UVT de la renta exenta del 25%, 30% o 3.800 UVT de
+pensión voluntaria/AFC, 384 UVT de dependientes, ...), en qué rango del
+Art. 241 quedó la base, qué rango de la tabla de cesantías aplicó y qué
+método de anticipo se usó.
+
+La traza es columnar y compacta: por contribuyente, una máscara de bits
+con los límites que toparon (uint16), el rango del Art. 241, el de
+cesantías y el método de anticipo (int8), en lugar de texto. Los valores
+intermedios son las columnas de resultado del motor (las mismas del CSV
+de lote_renta); `TrazaAuditoria(valores=True)` los guarda también.
+
+Como el perfilado, la traza se activa por proceso y está apagada por
+defecto:
+
+    python lote_renta.py entrada.csv -o resultados.csv --auditoria traza.npz
+    traza = auditoria.cargar('traza.npz')
+    auditoria.explicar(traza, 0)
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+
+import motor_vectorizado as motor
+from reglas_tributarias import cargar_paquete, obtener_paquete
+
+# Límites que pueden topar un valor de la depuración, en el orden de los bits
+LIMITES = (
+    ('dependientes', "Deducción por dependientes topada en {limite_dependientes_uvt:g} UVT"),
+    ('medicina_prepagada', "Medicina prepagada topada en {limite_medicina_prepagada_uvt:g} UVT"),
+    ('intereses_vivienda', "Intereses de vivienda topados en {limite_intereses_vivienda_uvt:g} UVT"),
+    ('renta_exenta_25', "Renta exenta del {porcentaje_renta_exenta_25:.0%} topada en "
+                        "{limite_renta_exenta_25_uvt:g} UVT"),
+    ('pension_afc_porcentaje', "Pensión voluntaria + AFC topada en el {porcentaje_pension_afc:.0%} "
+                               "del ingreso"),
+    ('pension_afc_uvt', "Pensión voluntaria + AFC topada en {limite_pension_afc_uvt:g} UVT"),
+    ('limite_336_porcentaje', "Rentas exentas y deducciones topadas en el "
+                              "{porcentaje_limite_general:.0%} del ingreso neto (Art. 336)"),
+    ('limite_336_uvt', "Rentas exentas y deducciones topadas en {limite_general_uvt:g} UVT (Art. 336)"),
+    ('factura_electronica', "Beneficio de factura electrónica topado en "
+                            "{limite_factura_electronica_uvt:g} UVT"),
+    ('renta_liquida_negativa', "Renta líquida negativa: base gravable en cero"),
+    ('anticipo_cubierto', "Las retenciones cubren el anticipo: anticipo en cero"),
+)
+BITS = {nombre: 1 << i for i, (nombre, _) in enumerate(LIMITES)}
+
+# Columnas de la traza (además de los valores, si se guardan)
+COLUMNAS_TRAZA = ('fila', 'nit', 'ano_gravable', 'limites', 'rango_241', 'rango_cesantias',
+                  'metodo_anticipo')
+
+_activa = None
+
+
+def codigos_lote(columnas, resultados, reglas=None):
+    """
+    Códigos de auditoría de un lote ya liquidado con `columnas` y
+    `resultados` (salida de calcular_impuesto_renta_lote). Con la columna
+    `ano_gravable` y sin `reglas`, cada fila usa el paquete de su año.
+
+    Retorna {'limites': uint16 (bits de BITS), 'rango_241': int8 (índice
+    en la tabla), 'rango_cesantias': int8 (-1 sin ingreso promedio),
+    'metodo_anticipo': int8 (1 o 2)}.
+    """
+    n = len(resultados['impuesto_neto'])
+    d = {concepto: np.asarray(columnas[concepto], dtype=np.float64) if concepto in columnas
+         else np.full(n, float(motor.VALORES_POR_DEFECTO[concepto]))
+         for concepto in motor.CONCEPTOS_ENTRADA}
+
+    if reglas is None and 'ano_gravable' in columnas:
+        anos = np.asarray(columnas['ano_gravable']).astype(np.int64)
+        unicos = np.unique(anos)
+        if len(unicos) > 1:
+            codigos = {'limites': np.empty(n, dtype=np.uint16), 'rango_241': np.empty(n, dtype=np.int8),
+                       'rango_cesantias': np.empty(n, dtype=np.int8),
+                       'metodo_anticipo': np.empty(n, dtype=np.int8)}
+            for ano in unicos:
+                indices = np.flatnonzero(anos == ano)
+                parcial = _codigos({c: v[indices] for c, v in d.items()},
+                                   {c: v[indices] for c, v in resultados.items()},
+                                   cargar_paquete(int(ano)))
+                for clave, valores in parcial.items():
+                    codigos[clave][indices] = valores
+            return codigos
+        if len(unicos) == 1:
+            reglas = cargar_paquete(int(unicos[0]))
+
+    return _codigos(d, resultados, obtener_paquete(reglas))
+
+
+def _codigos(d, r, paquete):
+    uvt = paquete.uvt
+    limites = np.zeros(len(r['impuesto_neto']), dtype=np.uint16)
+
+    def marcar(nombre, condicion):
+        limites[condicion] |= BITS[nombre]
+
+    # Un límite "topa" cuando el valor sin límite lo supera
+    marcar('dependientes', d['num_dependientes'] * (paquete.deduccion_por_dependiente_uvt * uvt) >
+           paquete.limite_dependientes_uvt * uvt)
+    marcar('medicina_prepagada', d['medicina_prepagada'] > paquete.limite_medicina_prepagada_uvt * uvt)
+    marcar('intereses_vivienda', d['intereses_vivienda'] > paquete.limite_intereses_vivienda_uvt * uvt)
+    marcar('renta_exenta_25', r['base_renta_exenta_25'] * paquete.porcentaje_renta_exenta_25 >
+           paquete.limite_renta_exenta_25_uvt * uvt)
+
+    aportes = d['pension_voluntaria'] + d['afc']
+    tope_porcentaje = r['ingresos_totales'] * paquete.porcentaje_pension_afc
+    tope_uvt = paquete.limite_pension_afc_uvt * uvt
+    topado = aportes > np.minimum(tope_porcentaje, tope_uvt)
+    marcar('pension_afc_porcentaje', topado & (tope_porcentaje <= tope_uvt))
+    marcar('pension_afc_uvt', topado & (tope_porcentaje > tope_uvt))
+
+    tope_porcentaje = r['ingreso_neto'] * paquete.porcentaje_limite_general
+    tope_uvt = paquete.limite_general_uvt * uvt
+    topado = r['suma_rentas_deducciones'] > r['limite_maximo_depuracion']
+    marcar('limite_336_porcentaje', topado & (tope_porcentaje <= tope_uvt))
+    marcar('limite_336_uvt', topado & (tope_porcentaje > tope_uvt))
+
+    marcar('factura_electronica', d['compras_factura_electronica'] * paquete.porcentaje_factura_electronica >
+           paquete.limite_factura_electronica_uvt * uvt)
+    renta_liquida = r['ingreso_neto'] - r['depuracion_final'] - r['beneficio_factura'] - r['beneficio_gmf']
+    marcar('renta_liquida_negativa', renta_liquida < 0)
+    marcar('anticipo_cubierto', (r['anticipo_definitivo'] == 0) & (r['impuesto_neto'] > 0))
+
+    rango_cesantias = np.searchsorted(paquete.limites_cesantias_uvt, d['ingreso_mensual_promedio'] / uvt,
+                                      side='left')
+    return {
+        'limites': limites,
+        'rango_241': np.searchsorted(paquete.limites_241_uvt, r['base_gravable_uvt'],
+                                     side='left').astype(np.int8),
+        'rango_cesantias': np.where(d['ingreso_mensual_promedio'] == 0, -1, rango_cesantias).astype(np.int8),
+        'metodo_anticipo': np.where(r['anticipo_metodo2'] < r['anticipo_metodo1'], 2, 1).astype(np.int8),
+    }
+
+
+class TrazaAuditoria:
+    """Traza de un lote, acumulada por bloques en el orden de la entrada."""
+
+    def __init__(self, valores=False):
+        self.valores = valores
+        self.bloques = []
+
+    def agregar(self, inicio, nits, columnas, resultados):
+        """
+        Agrega un bloque liquidado; `inicio` es el número de su primera fila
+        (desde 1), o un arreglo con el número de cada fila si el bloque no es
+        consecutivo (filas rechazadas por la validación).
+        """
+        n = len(resultados['impuesto_neto'])
+        bloque = codigos_lote(columnas, resultados)
+        if np.ndim(inicio):
+            bloque['fila'] = np.asarray(inicio, dtype=np.int64)
+        else:
+            bloque['fila'] = np.arange(inicio, inicio + n, dtype=np.int64)
+        bloque['nit'] = np.asarray(nits, dtype=str)
+        bloque['ano_gravable'] = np.asarray(columnas['ano_gravable'], dtype=np.int16)
+        if self.valores:
+            bloque.update((clave, np.asarray(resultados[clave])) for clave in motor.COLUMNAS_RESULTADO)
+        self.bloques.append(bloque)
+
+    def combinar(self, bloques):
+        """Agrega los bloques de la traza de otro proceso."""
+        self.bloques.extend(bloques)
+
+    def columnas(self):
+        """{columna: arreglo} con todos los bloques concatenados."""
+        if not self.bloques:
+            return {}
+        return {clave: np.concatenate([bloque[clave] for bloque in self.bloques])
+                for clave in self.bloques[0]}
+
+    def guardar(self, ruta):
+        """Guarda la traza como columnas comprimidas en un archivo .npz."""
+        np.savez_compressed(ruta, **self.columnas())
+
+
+def cargar(ruta):
+    """Lee una traza guardada: {columna: arreglo}."""
+    with np.load(ruta) as archivo:
+        return {clave: archivo[clave] for clave in archivo.files}
+
+
+def nombres_limites(mascara):
+    """Nombres de los límites marcados en una máscara de bits."""
+    return [nombre for nombre, _ in LIMITES if int(mascara) & BITS[nombre]]
+
+
+def explicar(traza, i, reglas=None):
+    """
+    Diccionario legible de la fila `i` de una traza (columnas o archivo
+    cargado): límites que toparon con su descripción, rangos aplicados y,
+    si la traza los tiene, los valores intermedios.
+    """
+    paquete = obtener_paquete(reglas if reglas is not None else int(traza['ano_gravable'][i]))
+    rango_241 = int(traza['rango_241'][i])
+    rango_cesantias = int(traza['rango_cesantias'][i])
+    descripciones = dict(LIMITES)
+    valores_paquete = vars(paquete)
+    explicacion = {
+        'fila': int(traza['fila'][i]),
+        'nit': str(traza['nit'][i]),
+        'ano_gravable': paquete.ano_gravable,
+        'limites': {nombre: descripciones[nombre].format(**valores_paquete)
+                    for nombre in nombres_limites(traza['limites'][i])},
+        'rango_241': {'desde_uvt': paquete.inicio_241_uvt[rango_241], 'tarifa': paquete.tarifas_241[rango_241]},
+        'porcentaje_cesantias_exento': (None if rango_cesantias < 0
+                                        else paquete.porcentajes_cesantias[rango_cesantias]),
+        'metodo_anticipo': int(traza['metodo_anticipo'][i]),
+    }
+    if 'impuesto_neto' in traza:
+        explicacion['valores'] = {clave: traza[clave][i].item() for clave in motor.COLUMNAS_RESULTADO}
+    return explicacion
+
+
+# --- TRAZA ACTIVA ---
+
+def activar(traza=None):
+    """Activa la traza en este proceso y retorna la traza que acumula."""
+    global _activa
+    _activa = traza if traza is not None else TrazaAuditoria()
+    return _activa
+
+
+def desactivar():
+    global _activa
+    traza, _activa = _activa, None
+    return traza
+
+
+def activa():
+    return _activa
+
+
+@contextmanager
+def auditando(traza=None):
+    anterior = _activa
+    traza = activar(traza)
+    try:
+        yield traza
+    finally:
+        if anterior is not None:
+            activar(anterior)
+        else:
+            desactivar()
+
+
+def auditar(datos, reglas=None):
+    """Liquidación de un contribuyente con su explicación (ver `explicar`)."""
+    columnas = {concepto: np.array([float(datos.get(concepto, motor.VALORES_POR_DEFECTO[concepto]))])
+                for concepto in motor.CONCEPTOS_ENTRADA}
+    paquete = obtener_paquete(reglas)
+    columnas['ano_gravable'] = np.array([paquete.ano_gravable])
+    traza = TrazaAuditoria(valores=True)
+    traza.agregar(1, [datos.get('nit', '')], columnas, motor.calcular_impuesto_renta_lote(columnas, paquete))
+    return explicar(traza.columnas(), 0, paquete)
@@ -0,0 +1,441 @@
+"""
+BENCHMARK DE LOS MOTORES DE LIQUIDACIÓN
+Personas Naturales Residentes Fiscales - Colombia
+
+Mide, sobre una población sintética determinística (poblacion_sintetica.py),
+la latencia por declaración, el rendimiento por lote y la memoria pico de
+cada implementación y modo de ejecución:
+
+- nucleo_renta.py (claude-5.py)  calcular_impuesto_renta (escalar, con y sin tablas)
+- V1.py / V3.py  CalculadoraRenta.calcular (escalar, sin ventana Tk)
+- CODYGOPY.txt  calculadora_renta_laboral_final (entradas simuladas)
+- motor vectorizado, registros columnares y modo paralelo de lote_renta
+- aritmetica_entera.py  pesos enteros (lote) y su referencia decimal.Decimal
+
+También mide el tiempo de importación en frío de los módulos que cargan
+los procesos de lote y el servicio HTTP. Los resultados se guardan en JSON
+y se comparan contra una línea base guardada para señalar regresiones.
+
+Uso:
+    python benchmark_motores.py -o resultado.json
+    python benchmark_motores.py --comparar benchmarks/linea_base.json
+    python benchmark_motores.py --guardar-linea-base
+"""
+
+import argparse
+import builtins
+import csv
+import gc
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import aritmetica_entera
+import lote_renta
+import motor_vectorizado as motor
+import nucleo_renta
+import poblacion_sintetica
+import registros
+import tablas_consulta
+from reglas_tributarias import obtener_paquete
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+RUTA_LINEA_BASE = os.path.join(CARPETA, 'benchmarks', 'linea_base.json')
+TOLERANCIA_POR_DEFECTO = 0.25
+
+# Los motores escalares lentos se miden sobre una muestra de la población
+MAX_FILAS_ESCALAR = 20000
+MUESTRAS_LATENCIA = 2000
+
+
+# --- CARGA DE LOS SCRIPTS ORIGINALES ---
+
+def cargar_script(nombre_archivo, nombre_modulo):
+    """Carga un script del repositorio que no es importable por nombre."""
+    ruta = os.path.join(CARPETA, nombre_archivo)
+    especificacion = importlib.util.spec_from_file_location(nombre_modulo, ruta)
+    modulo = importlib.util.module_from_spec(especificacion)
+    especificacion.loader.exec_module(modulo)
+    return modulo
+
+
+def cargar_codygopy():
+    """CODYGOPY.txt no tiene extensión .py: se ejecuta sin __main__ y se toman sus definiciones."""
+    with open(os.path.join(CARPETA, 'CODYGOPY.txt'), encoding='utf-8') as archivo:
+        fuente = archivo.read()
+    espacio = {'__name__': 'codygopy', '__builtins__': builtins}
+    exec(compile(fuente, 'CODYGOPY.txt', 'exec'), espacio)
+    espacio['limpiar_consola'] = lambda: None
+    espacio['print'] = lambda *args, **kwargs: None
+    return espacio
+
+
+class _Valor:
+    """Sustituto de tk.DoubleVar / tk.StringVar."""
+    __slots__ = ('valor',)
+
+    def __init__(self, valor=0.0):
+        self.valor = valor
+
+    def get(self):
+        return self.valor
+
+
+class _Etiqueta:
+    """Sustituto de ttk.Label que conserva el último texto."""
+    __slots__ = ('texto',)
+
+    def config(self, text='', **opciones):
+        self.texto = text
+
+
+# --- ADAPTADORES ---
+
+def _ingresos_brutos(datos):
+    return (datos['salarios'] + datos['cesantias'] +
+            datos['prestaciones_sociales'] + datos['otros_pagos_laborales'])
+
+
+def _anio_declaracion(datos):
+    return str(int(datos['num_anos_declarando'])) if datos['num_anos_declarando'] < 3 else '3+'
+
+
+def crear_adaptador_tk(modulo, usar_tablas=False):
+    """Retorna liquidar(datos) que ejecuta CalculadoraRenta.calcular sin ventana."""
+    clase = modulo.CalculadoraRenta
+    calculadora = clase.__new__(clase)
+    calculadora.reglas = obtener_paquete()
+    calculadora.tabla_241 = None
+    if usar_tablas:
+        calculadora.tabla_241 = tablas_consulta.crear_tabla_impuesto_241(
+            calculadora.calcular_impuesto_241_formula)
+    for nombre in ('ingresos_brutos', 'aportes_obligatorios', 'total_retenciones',
+                   'impuesto_neto_anterior', 'otras_deducciones', 'anio_declaracion'):
+        setattr(calculadora, nombre, _Valor())
+    for nombre in ('impuesto_bruto_label', 'saldo_final_label', 'anticipo_final_label'):
+        setattr(calculadora, nombre, _Etiqueta())
+
+    def liquidar(datos):
+        calculadora.ingresos_brutos.valor = _ingresos_brutos(datos)
+        calculadora.aportes_obligatorios.valor = datos['incr_salud'] + datos['incr_pensiones']
+        calculadora.total_retenciones.valor = datos['retenciones']
+        calculadora.impuesto_neto_anterior.valor = datos['impuesto_neto_anterior']
+        calculadora.otras_deducciones.valor = (datos['intereses_vivienda'] + datos['medicina_prepagada'] +
+                                               datos['pension_voluntaria'] + datos['afc'])
+        calculadora.anio_declaracion.valor = _anio_declaracion(datos)
+        calculadora.calcular()
+        return calculadora.saldo_final_label.texto
+
+    return liquidar
+
+
+# Orden en que calculadora_renta_laboral_final pide los datos
+ORDEN_CODYGOPY = (
+    'nombre', 'nit', 'salarios', 'cesantias', 'prestaciones_sociales', 'otros_pagos_laborales',
+    'incr_salud', 'incr_pensiones', 'num_dependientes', 'intereses_vivienda', 'medicina_prepagada',
+    'pension_voluntaria', 'afc', 'compras_factura_electronica', 'gmf', 'ingreso_mensual_promedio',
+    'impuesto_neto_anterior', 'saldo_favor_anterior', 'retenciones', 'anticipo_anterior',
+    'num_anos_declarando',
+)
+
+
+def crear_adaptador_codygopy():
+    espacio = cargar_codygopy()
+    respuestas = []
+
+    def responder(prompt=''):
+        return respuestas.pop()
+
+    espacio['input'] = responder
+
+    def liquidar(datos):
+        respuestas[:] = [str(datos[c]) if c in ('nombre', 'nit') else str(int(datos[c]))
+                         for c in reversed(ORDEN_CODYGOPY)]
+        return espacio['calculadora_renta_laboral_final']()
+
+    return liquidar
+
+
+def construir_motores_escalares():
+    """{nombre: liquidar(datos)} para cada motor escalar disponible."""
+    tabla_cesantias = tablas_consulta.crear_tabla_cesantias()
+    motores = {
+        'claude-5/escalar': nucleo_renta.calcular_impuesto_renta,
+        'claude-5/escalar+tablas': lambda datos: nucleo_renta.calcular_impuesto_renta(datos, tabla_cesantias),
+        'CODYGOPY/escalar': crear_adaptador_codygopy(),
+        'decimal/escalar': aritmetica_entera.liquidar_decimal,
+    }
+    # V1 y V3 importan tkinter solo al crear la ventana
+    v1 = cargar_script('V1.py', 'calculadora_v1')
+    v3 = cargar_script('V3.py', 'calculadora_v3')
+    motores['V1/escalar'] = crear_adaptador_tk(v1)
+    motores['V3/escalar'] = crear_adaptador_tk(v3)
+    motores['V3/escalar+tablas'] = crear_adaptador_tk(v3, usar_tablas=True)
+    return motores
+
+
+# --- MEDICIONES ---
+
+def _memoria_pico(funcion):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _cronometrar(funcion):
+    gc.collect()
+    inicio = time.perf_counter()
+    funcion()
+    return time.perf_counter() - inicio
+
+
+def medir_escalar(liquidar, declaraciones):
+    muestra = declaraciones[:MUESTRAS_LATENCIA]
+    latencias = []
+    for datos in muestra:
+        inicio = time.perf_counter()
+        liquidar(datos)
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+
+    filas = declaraciones[:MAX_FILAS_ESCALAR]
+
+    def lote():
+        for datos in filas:
+            liquidar(datos)
+
+    def lote_muestra():
+        for datos in muestra:
+            liquidar(datos)
+
+    segundos = _cronometrar(lote)
+    return {
+        'latencia_p50_us': statistics.median(latencias) * 1e6,
+        'latencia_p99_us': latencias[int(0.99 * (len(latencias) - 1))] * 1e6,
+        'declaraciones_por_segundo': len(filas) / segundos,
+        'memoria_pico_bytes': _memoria_pico(lote_muestra),
+        'filas': len(filas),
+    }
+
+
+def medir_lote(liquidar_lote, entrada, n, liquidar_uno=None):
+    resultado = {}
+    if liquidar_uno is not None:
+        latencias = []
+        for _ in range(200):
+            inicio = time.perf_counter()
+            liquidar_uno()
+            latencias.append(time.perf_counter() - inicio)
+        latencias.sort()
+        resultado['latencia_p50_us'] = statistics.median(latencias) * 1e6
+        resultado['latencia_p99_us'] = latencias[int(0.99 * (len(latencias) - 1))] * 1e6
+    segundos = _cronometrar(lambda: liquidar_lote(entrada))
+    resultado['declaraciones_por_segundo'] = n / segundos
+    resultado['memoria_pico_bytes'] = _memoria_pico(lambda: liquidar_lote(entrada))
+    resultado['filas'] = n
+    return resultado
+
+
+# Módulos cuyo tiempo de importación en frío se mide en un proceso nuevo
+MODULOS_IMPORTACION = ('nucleo_renta', 'reglas_tributarias', 'motor_vectorizado', 'lote_renta',
+                       'servicio_http', 'V3')
+
+
+def medir_importacion(modulo, repeticiones=5):
+    """Mediana del tiempo de `import modulo` en un intérprete nuevo (ms)."""
+    codigo = (f"import time; inicio = time.perf_counter(); import {modulo}; "
+              f"print(time.perf_counter() - inicio)")
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', codigo], cwd=CARPETA, check=True,
+                                capture_output=True, text=True).stdout
+        tiempos.append(float(salida) * 1000)
+    return {'importacion_ms': statistics.median(tiempos)}
+
+
+def _filas_csv(declaraciones):
+    """Filas en formato tabla (encabezados = claves del motor) para lote_renta."""
+    claves = ['nit', 'nombre', *motor.CONCEPTOS_ENTRADA]
+    yield claves
+    for datos in declaraciones:
+        yield [datos[c] for c in claves]
+
+
+def ejecutar(n=200000, semilla=2024, procesos=None, solo=None):
+    """Ejecuta el benchmark y retorna el diccionario de resultados."""
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla)
+    declaraciones = poblacion_sintetica.generar_declaraciones(min(n, MAX_FILAS_ESCALAR), semilla)
+    procesos = procesos or os.cpu_count() or 1
+    resultados = {}
+
+    def incluir(nombre):
+        return not solo or any(parte in nombre for parte in solo)
+
+    for nombre, liquidar in construir_motores_escalares().items():
+        if incluir(nombre):
+            print(f"  midiendo {nombre}...", file=sys.stderr)
+            resultados[nombre] = medir_escalar(liquidar, declaraciones)
+
+    entrada_motor = {c: columnas[c] for c in motor.CONCEPTOS_ENTRADA}
+    una_fila = {c: valores[:1] for c, valores in entrada_motor.items()}
+    if incluir('vectorizado/lote'):
+        print("  midiendo vectorizado/lote...", file=sys.stderr)
+        resultados['vectorizado/lote'] = medir_lote(
+            motor.calcular_impuesto_renta_lote, entrada_motor, n,
+            lambda: motor.calcular_impuesto_renta_lote(una_fila))
+
+    if incluir('enteros/lote'):
+        print("  midiendo enteros/lote...", file=sys.stderr)
+        resultados['enteros/lote'] = medir_lote(
+            aritmetica_entera.calcular_impuesto_renta_enteros, entrada_motor, n,
+            lambda: aritmetica_entera.calcular_impuesto_renta_enteros(una_fila))
+
+    if incluir('registros/lote'):
+        print("  midiendo registros/lote...", file=sys.stderr)
+        todas = poblacion_sintetica.generar_declaraciones(n, semilla)
+        resultados['registros/lote'] = medir_lote(
+            lambda filas: registros.liquidar_tabla(registros.TablaDeclaraciones.desde_registros(filas)),
+            todas, n)
+        del todas
+
+    for nombre, cantidad in (('lote_renta/serie', 1), ('lote_renta/paralelo', procesos)):
+        if incluir(nombre):
+            print(f"  midiendo {nombre} ({cantidad} procesos)...", file=sys.stderr)
+            filas = list(_filas_csv(declaraciones))
+            resultados[nombre] = medir_lote(
+                lambda f, c=cantidad: lote_renta.procesar(iter(f), io.StringIO(), procesos=c),
+                filas, len(filas) - 1)
+
+    for modulo in MODULOS_IMPORTACION:
+        nombre = f"importacion/{modulo}"
+        if incluir(nombre):
+            print(f"  midiendo {nombre}...", file=sys.stderr)
+            resultados[nombre] = medir_importacion(modulo)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'nucleos': os.cpu_count(),
+        'n': n,
+        'semilla': semilla,
+        'resultados': resultados,
+    }
+
+
+def diferencia_poblacion(actual, base):
+    """Texto con lo que cambia entre las poblaciones de dos reportes, o None si es la misma."""
+    cambios = [f"{clave}={base.get(clave)} en la base y {actual[clave]} ahora"
+               for clave in ('n', 'semilla') if base.get(clave) != actual[clave]]
+    return ', '.join(cambios) or None
+
+
+def comparar(actual, base, tolerancia=TOLERANCIA_POR_DEFECTO):
+    """
+    Lista de regresiones: rendimiento por debajo de la base, o latencia p50
+    y memoria por encima, en más de `tolerancia` (fracción).
+
+    Solo compara mediciones de la misma población: el rendimiento de los
+    lotes y la memoria pico dependen de `n` (y la mezcla de la semilla).
+    """
+    diferencia = diferencia_poblacion(actual, base)
+    if diferencia:
+        raise ValueError(f"No se puede comparar con la línea base: {diferencia}")
+    regresiones = []
+    for nombre, medidas in actual['resultados'].items():
+        referencia = base.get('resultados', {}).get(nombre)
+        if not referencia:
+            continue
+        for metrica, valor in medidas.items():
+            # El p99 de una sola corrida es demasiado ruidoso para comparar
+            if metrica in ('filas', 'latencia_p99_us') or metrica not in referencia:
+                continue
+            anterior = referencia[metrica]
+            if metrica == 'declaraciones_por_segundo':
+                empeora = valor < anterior * (1 - tolerancia)
+            else:
+                empeora = valor > anterior * (1 + tolerancia)
+            if empeora:
+                cambio = (valor - anterior) / anterior * 100 if anterior else float('inf')
+                regresiones.append(f"{nombre} {metrica}: {anterior:,.1f} -> {valor:,.1f} ({cambio:+.0f}%)")
+    return regresiones
+
+
+def imprimir_tabla(reporte, destino=sys.stdout):
+    escritor = csv.writer(destino, delimiter='\t')
+    escritor.writerow(['motor/modo', 'p50 (us)', 'p99 (us)', 'decl/s', 'memoria pico (KB)'])
+    importaciones = []
+    for nombre, m in reporte['resultados'].items():
+        if 'importacion_ms' in m:
+            importaciones.append([nombre.split('/', 1)[1], f"{m['importacion_ms']:.1f}"])
+            continue
+        escritor.writerow([
+            nombre,
+            f"{m['latencia_p50_us']:.1f}" if 'latencia_p50_us' in m else '-',
+            f"{m['latencia_p99_us']:.1f}" if 'latencia_p99_us' in m else '-',
+            f"{m['declaraciones_por_segundo']:,.0f}",
+            f"{m['memoria_pico_bytes'] / 1024:,.0f}",
+        ])
+    if importaciones:
+        escritor.writerow([])
+        escritor.writerow(['módulo', 'importación (ms)'])
+        escritor.writerows(importaciones)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de liquidación.")
+    parser.add_argument('-n', type=int, default=200000, help="Tamaño de la población (por defecto %(default)s)")
+    parser.add_argument('--semilla', type=int, default=2024)
+    parser.add_argument('-p', '--procesos', type=int, default=0, help="Procesos del modo paralelo (0 = todos)")
+    parser.add_argument('--solo', nargs='*', help="Medir solo los motores cuyo nombre contenga estos textos")
+    parser.add_argument('-o', '--salida', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--comparar', nargs='?', const=RUTA_LINEA_BASE, help="Línea base JSON contra la cual comparar")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_POR_DEFECTO)
+    parser.add_argument('--guardar-linea-base', action='store_true', help=f"Guardar en {RUTA_LINEA_BASE}")
+    args = parser.parse_args(argv)
+
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        # Antes de medir: con otra población la comparación no tiene sentido
+        diferencia = diferencia_poblacion({'n': args.n, 'semilla': args.semilla}, base)
+        if diferencia:
+            parser.error(f"{args.comparar}: {diferencia}; use -n {base.get('n')} --semilla {base.get('semilla')}")
+
+    reporte = ejecutar(args.n, args.semilla, args.procesos or None, args.solo)
+    imprimir_tabla(reporte)
+
+    destinos = [args.salida] if args.salida else []
+    if args.guardar_linea_base:
+        os.makedirs(os.path.dirname(RUTA_LINEA_BASE), exist_ok=True)
+        destinos.append(RUTA_LINEA_BASE)
+    for destino in destinos:
+        with open(destino, 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+            archivo.write('\n')
+
+    if base is not None:
+        regresiones = comparar(reporte, base, args.tolerancia)
+        if regresiones:
+            print("\nREGRESIONES:")
+            for linea in regresiones:
+                print(f"  - {linea}")
+            sys.exit(1)
+        print("\nSin regresiones frente a la línea base.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+CACHÉ PERSISTENTE DE RESULTADOS (SQLite)
+Personas Naturales Residentes Fiscales - Colombia
+
+Guarda el resultado de cada contribuyente bajo una clave que depende solo
+de sus entradas normalizadas (los 19 conceptos de "ESTRUCTURA DATOS DE
+ENTRADA.xlsx" en el orden de CONCEPTOS_ENTRADA, sin importar el orden ni
+los nombres de las columnas del archivo), de la versión del paquete de
+reglas de su año y de la versión de la lógica de liquidación
+(motor.VERSION_MOTOR). Al volver a correr una población después de corregir
+algunas filas, solo se liquidan las filas cuya clave no está en la caché.
+
+La clave se calcula sobre las celdas tal como se leyeron, antes de
+convertirlas a número: en una nueva corrida las filas que no cambiaron no
+se convierten ni se liquidan. Escribir el mismo valor de otra forma
+("1000" y "1.000") solo produce un fallo de caché, nunca un resultado
+equivocado.
+
+El valor guardado son las celdas de resultado de lote_renta ya
+formateadas (las 26 de COLUMNAS_RESULTADO separadas por comas). Si el
+formato cambia, VERSION_FORMATO cambia todas las claves.
+
+Uso:
+    python lote_renta.py entrada.csv -o resultados.csv --cache resultados.sqlite
+    python cache_resultados.py resultados.sqlite --purgar-dias 120 --max-filas 5000000
+"""
+
+import argparse
+import hashlib
+import sqlite3
+import time
+
+import motor_vectorizado as motor
+from reglas_tributarias import cargar_paquete
+
+VERSION_FORMATO = 1
+BYTES_CLAVE = 16
+# Claves por consulta IN (...): el límite de parámetros de SQLite anteriores a 3.32
+CLAVES_POR_CONSULTA = 999
+# Una entrada encontrada se marca como usada de nuevo solo si la marca tiene
+# más de un día: las corridas repetidas el mismo día no escriben en la caché.
+SEGUNDOS_RENOVACION = 86400
+
+
+def claves_de_registros(registros, anos):
+    """
+    Clave de caché (16 bytes, BLAKE2b) de cada registro {concepto: celda}
+    (el formato de `registros_desde_filas`), con el año gravable ya
+    resuelto de cada uno en `anos`.
+    """
+    prefijos = {}
+    blake2b = hashlib.blake2b
+    conceptos = motor.CONCEPTOS_ENTRADA
+    claves = []
+    for registro, ano in zip(registros, anos):
+        prefijo = prefijos.get(ano)
+        if prefijo is None:
+            prefijo = prefijos[ano] = f"{VERSION_FORMATO}|{motor.VERSION_MOTOR}|{cargar_paquete(ano).version}|".encode()
+        # repr de la lista: distingue celdas vacías, ausentes, textos y números
+        texto = repr([registro.get(concepto) for concepto in conceptos])
+        claves.append(blake2b(prefijo + texto.encode(), digest_size=BYTES_CLAVE).digest())
+    return claves
+
+
+class CacheResultados:
+    """Caché de resultados en un archivo SQLite local."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute("PRAGMA cache_size=-65536")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS resultados ("
+            " clave BLOB PRIMARY KEY, valor TEXT NOT NULL, usado INTEGER NOT NULL"
+            ") WITHOUT ROWID")
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS resultados_usado ON resultados (usado)")
+        self.conexion.commit()
+        self.consultas = 0
+        self.aciertos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    def cerrar(self):
+        self.conexion.commit()
+        self.conexion.close()
+
+    @property
+    def tasa_aciertos(self):
+        return self.aciertos / self.consultas if self.consultas else 0.0
+
+    def buscar(self, claves):
+        """
+        {clave: valor} de las claves que están en la caché. Marca las
+        encontradas como usadas ahora (para la purga por antigüedad).
+        """
+        encontrados = {}
+        viejas = []
+        ahora = int(time.time())
+        renovar = ahora - SEGUNDOS_RENOVACION
+        unicas = sorted(set(claves))       # en orden de la tabla: menos páginas distintas
+        for i in range(0, len(unicas), CLAVES_POR_CONSULTA):
+            parte = unicas[i:i + CLAVES_POR_CONSULTA]
+            marcadores = ','.join('?' * len(parte))
+            for clave, valor, usado in self.conexion.execute(
+                    f"SELECT clave, valor, usado FROM resultados WHERE clave IN ({marcadores})", parte):
+                encontrados[clave] = valor
+                if usado < renovar:
+                    viejas.append(clave)
+        if viejas:
+            self.conexion.executemany("UPDATE resultados SET usado = ? WHERE clave = ?",
+                                      ((ahora, clave) for clave in viejas))
+            self.conexion.commit()
+        self.consultas += len(claves)
+        self.aciertos += sum(1 for clave in claves if clave in encontrados)
+        return encontrados
+
+    def guardar(self, pares):
+        """Inserta o reemplaza (clave, valor) en bloque."""
+        ahora = int(time.time())
+        # En orden de clave las inserciones tocan páginas vecinas del árbol
+        self.conexion.executemany(
+            "INSERT INTO resultados (clave, valor, usado) VALUES (?, ?, ?) "
+            "ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor, usado = excluded.usado",
+            ((clave, valor, ahora) for clave, valor in sorted(pares)))
+        self.conexion.commit()
+
+    def __len__(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+
+    def purgar(self, max_dias=None, max_filas=None):
+        """
+        Elimina las entradas sin usar hace más de `max_dias` y, si quedan más
+        de `max_filas`, las menos usadas recientemente. Retorna cuántas eliminó.
+        """
+        eliminadas = 0
+        if max_dias is not None:
+            limite = int(time.time() - max_dias * 86400)
+            eliminadas += self.conexion.execute("DELETE FROM resultados WHERE usado < ?", (limite,)).rowcount
+        if max_filas is not None:
+            sobrantes = len(self) - max_filas
+            if sobrantes > 0:
+                eliminadas += self.conexion.execute(
+                    "DELETE FROM resultados WHERE clave IN "
+                    "(SELECT clave FROM resultados ORDER BY usado LIMIT ?)", (sobrantes,)).rowcount
+        self.conexion.commit()
+        return eliminadas
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(description="Mantenimiento de la caché de resultados.")
+    parser.add_argument('ruta', help="Archivo SQLite de la caché")
+    parser.add_argument('--purgar-dias', type=float, help="Eliminar entradas sin usar hace más de estos días")
+    parser.add_argument('--max-filas', type=int, help="Dejar a lo sumo estas entradas (las más recientes)")
+    parser.add_argument('--compactar', action='store_true', help="Recuperar el espacio libre del archivo (VACUUM)")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    with CacheResultados(args.ruta) as cache:
+        eliminadas = cache.purgar(args.purgar_dias, args.max_filas)
+        if args.compactar:
+            cache.conexion.execute("VACUUM")
+        print(f"Entradas eliminadas: {eliminadas}. Entradas en caché: {len(cache)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""
+AGREGACIÓN DE CERTIFICADOS DE INGRESOS Y RETENCIONES (FORMULARIO 220)
+Personas Naturales Residentes Fiscales - Colombia
+
+Un contribuyente con varios empleadores en el año recibe un certificado
+de ingresos y retenciones de cada uno. Esta etapa lee los certificados de
+las exportaciones de nómina (CSV, XLSX o JSON, un certificado por fila u
+objeto), los agrupa por (NIT, año gravable) y entrega un registro por
+contribuyente con los conceptos del motor:
+
+- Suma de los valores certificados: salarios, cesantías, prestaciones
+  sociales, otros pagos, aportes obligatorios a salud y pensiones (INCR),
+  pensión voluntaria, AFC y retenciones.
+- ingreso_mensual_promedio (Art. 206 num. 4): promedio de los últimos
+  seis meses de vinculación laboral. El salario de cada certificado se
+  reparte por días entre los meses de su período (PERIODO DESDE / PERIODO
+  HASTA; sin período, el año completo) y se acumula por mes junto con la
+  fracción del mes trabajada. Al final se toman los seis últimos meses con
+  trabajo del contribuyente (todos sus empleadores) y se divide su salario
+  por los meses trabajados en ellos: quien trabajó de enero a junio
+  promedia esos meses y quien entró en octubre, sus tres meses. Si el
+  certificado trae el ingreso mensual promedio, ese valor cuenta por cada
+  mes que cubre el certificado.
+- Los demás conceptos (dependientes, intereses de vivienda, datos del año
+  anterior, ...) son del contribuyente y no del certificado: se toma el
+  primer valor no vacío.
+
+La agregación es por tabla hash con memoria acotada: cuando hay más de
+`max_en_memoria` contribuyentes distintos, los acumulados parciales se
+vuelcan a PARTICIONES archivos temporales según el hash del NIT, y al
+final cada partición se agrega por separado (volviéndola a particionar,
+con otro hash por nivel, si todavía no cabe; pasados MAX_NIVELES niveles
+se agrega en memoria). Sin volcados los registros salen en el orden en
+que aparece cada contribuyente; con volcados, en el de las particiones.
+
+Uso:
+    python certificados.py nomina_empresa1.csv nomina_empresa2.json -o contribuyentes.csv
+    python lote_renta.py certificados.csv -o resultados.csv --certificados
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from array import array
+from calendar import monthrange
+from datetime import date, datetime
+from functools import lru_cache
+
+import motor_vectorizado as motor
+from historial import normalizar_nit
+from lote_renta import clave_de_concepto, convertir_valor, leer_filas, normalizar_concepto
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO
+
+# Contribuyentes distintos en memoria antes de volcar a disco (~800 bytes cada uno)
+MAX_EN_MEMORIA_POR_DEFECTO = 250000
+PARTICIONES = 64
+# Niveles de re-partición; más abajo la partición se agrega en memoria
+MAX_NIVELES = 8
+
+# Casillas del formulario 220 -> claves del motor (además de las de lote_renta)
+CONCEPTOS_CERTIFICADO = {
+    'PAGOS POR SALARIOS O EMOLUMENTOS ECLESIASTICOS': 'salarios',
+    'PAGOS POR SALARIOS': 'salarios',
+    'CESANTIAS E INTERESES DE CESANTIAS EFECTIVAMENTE PAGADAS AL EMPLEADO': 'cesantias',
+    'CESANTIAS CONSIGNADAS AL FONDO DE CESANTIAS': 'cesantias',
+    'PAGOS POR PRESTACIONES SOCIALES': 'prestaciones_sociales',
+    'OTROS PAGOS': 'otros_pagos_laborales',
+    'APORTES OBLIGATORIOS POR SALUD A CARGO DEL TRABAJADOR': 'incr_salud',
+    'APORTES OBLIGATORIOS A FONDOS DE PENSIONES Y SOLIDARIDAD PENSIONAL A CARGO DEL TRABAJADOR':
+        'incr_pensiones',
+    'APORTES VOLUNTARIOS A FONDOS DE PENSIONES': 'pension_voluntaria',
+    'APORTES A CUENTAS AFC': 'afc',
+    'VALOR DE LA RETENCION EN LA FUENTE POR INGRESOS LABORALES': 'retenciones',
+    'NIT DEL EMPLEADOR': 'nit_empleador',
+    'NIT EMPLEADOR': 'nit_empleador',
+    'PERIODO DESDE': 'periodo_desde',
+    'PERIODO DE LA CERTIFICACION DESDE': 'periodo_desde',
+    'PERIODO HASTA': 'periodo_hasta',
+    'PERIODO DE LA CERTIFICACION HASTA': 'periodo_hasta',
+}
+CAMPOS_CERTIFICADO = ('nit_empleador', 'periodo_desde', 'periodo_hasta')
+
+# Conceptos que se suman entre certificados
+CONCEPTOS_SUMADOS = ('salarios', 'cesantias', 'prestaciones_sociales', 'otros_pagos_laborales',
+                     'incr_salud', 'incr_pensiones', 'pension_voluntaria', 'afc', 'retenciones')
+# Conceptos del contribuyente: primer valor no vacío
+CONCEPTOS_UNICOS = tuple(concepto for concepto in motor.CONCEPTOS_ENTRADA
+                         if concepto not in CONCEPTOS_SUMADOS and concepto != 'ingreso_mensual_promedio')
+
+MESES = 12
+# Meses de vinculación que promedia el Art. 206 num. 4
+MESES_PROMEDIO = 6
+
+# Posiciones del acumulado (array('d')) de cada contribuyente. Hasta
+# _FIN_SUMAS los valores se suman; después, NaN es "sin valor". Por mes se
+# suman el salario y la fracción del mes trabajada (de todos los empleadores).
+_SALARIO_MES = tuple(f'salario_mes_{mes}' for mes in range(1, MESES + 1))
+_TRABAJO_MES = tuple(f'trabajo_mes_{mes}' for mes in range(1, MESES + 1))
+_CAMPOS = ('num_certificados', *CONCEPTOS_SUMADOS, *_SALARIO_MES, *_TRABAJO_MES, *CONCEPTOS_UNICOS)
+_POSICION = {campo: i for i, campo in enumerate(_CAMPOS)}
+_INICIO_SALARIO_MES = _POSICION[_SALARIO_MES[0]]
+_INICIO_TRABAJO_MES = _POSICION[_TRABAJO_MES[0]]
+_FIN_SUMAS = _POSICION[_TRABAJO_MES[-1]] + 1
+_VACIO = array('d', [0.0] * _FIN_SUMAS + [math.nan] * len(CONCEPTOS_UNICOS))
+# Conceptos que se copian del certificado al acumulado
+_COPIADOS = {concepto: _POSICION[concepto] for concepto in (*CONCEPTOS_SUMADOS, *CONCEPTOS_UNICOS)}
+
+COLUMNAS_SALIDA = ('nit', 'nombre', 'ano_gravable', 'num_certificados', *motor.CONCEPTOS_ENTRADA)
+
+
+@lru_cache(maxsize=1024)
+def clave_de_columna(texto):
+    """Clave de un encabezado de certificado, o None si no aplica."""
+    if texto is None:
+        return None
+    clave = CONCEPTOS_CERTIFICADO.get(normalizar_concepto(texto))
+    if clave:
+        return clave
+    clave = str(texto).strip().lower()
+    if clave in CAMPOS_CERTIFICADO:
+        return clave
+    return clave_de_concepto(texto)
+
+
+# --- LECTURA ---
+
+def leer_certificados(ruta):
+    """
+    Genera los certificados de un archivo como diccionarios {clave: celda}:
+    CSV o XLSX con encabezados, JSON Lines (.jsonl/.ndjson) o un arreglo
+    JSON de objetos (.json, leído por partes).
+    """
+    nombre = str(ruta).lower()
+    if nombre.endswith(('.jsonl', '.ndjson')):
+        return _leer_json_lineas(ruta)
+    if nombre.endswith('.json'):
+        return _leer_json_arreglo(ruta)
+    return _leer_tabla(leer_filas(ruta))
+
+
+def _leer_tabla(filas):
+    filas = iter(filas)
+    encabezados = next(filas, None)
+    if encabezados is None:
+        return
+    mapa = [(i, clave_de_columna(celda)) for i, celda in enumerate(encabezados)]
+    mapa = [(i, clave) for i, clave in mapa if clave]
+    for fila in filas:
+        if all(celda is None or str(celda).strip() == '' for celda in fila):
+            continue
+        yield {clave: fila[i] if i < len(fila) else None for i, clave in mapa}
+
+
+def _objeto_a_certificado(objeto):
+    certificado = {}
+    for nombre, valor in objeto.items():
+        clave = clave_de_columna(nombre)
+        if clave:
+            certificado[clave] = valor
+    return certificado
+
+
+def _leer_json_lineas(ruta):
+    with open(ruta, encoding='utf-8-sig') as archivo:
+        for linea in archivo:
+            if linea.strip():
+                yield _objeto_a_certificado(json.loads(linea))
+
+
+def _leer_json_arreglo(ruta, tamano_lectura=1 << 20):
+    """Objetos de un arreglo JSON de nivel superior, sin cargar el archivo completo."""
+    decodificador = json.JSONDecoder()
+    with open(ruta, encoding='utf-8-sig') as archivo:
+        texto = archivo.read(tamano_lectura).lstrip()
+        if not texto.startswith('['):
+            raise ValueError(f"{ruta}: se esperaba un arreglo JSON de certificados")
+        posicion = 1
+        while True:
+            while posicion < len(texto) and texto[posicion] in ' \t\r\n,':
+                posicion += 1
+            if posicion < len(texto) and texto[posicion] == ']':
+                return
+            try:
+                objeto, fin = decodificador.raw_decode(texto, posicion)
+            except json.JSONDecodeError:
+                # Objeto incompleto: leer otra parte del archivo
+                mas = archivo.read(tamano_lectura)
+                if not mas:
+                    raise
+                texto = texto[posicion:] + mas
+                posicion = 0
+                continue
+            yield _objeto_a_certificado(objeto)
+            posicion = fin
+            if posicion > tamano_lectura:
+                texto = texto[posicion:]
+                posicion = 0
+
+
+# --- PERÍODOS ---
+
+def convertir_fecha(valor):
+    """Fecha de una celda (date, 'AAAA-MM-DD', 'DD/MM/AAAA' o 'AAAAMMDD'); None si está vacía."""
+    if valor is None or isinstance(valor, date):
+        return valor.date() if isinstance(valor, datetime) else valor
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    try:
+        return datetime.fromisoformat(texto).date()     # AAAA-MM-DD[THH:MM:SS] y AAAAMMDD
+    except ValueError:
+        pass
+    for formato in ('%d/%m/%Y', '%d-%m-%Y', '%Y%m%d'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"fecha no reconocida: {valor!r}")
+
+
+def reparto_mensual(desde, hasta, ano):
+    """
+    Por cada mes de `ano`: (fracción de los días del período [desde, hasta]
+    que cae en el mes, fracción del mes cubierta por el período). Sin
+    fechas, el año completo.
+    """
+    desde = desde or date(ano, 1, 1)
+    hasta = hasta or date(ano, 12, 31)
+    if hasta < desde:
+        raise ValueError(f"período invertido: {desde} a {hasta}")
+    dias_periodo = (hasta - desde).days + 1
+    reparto = []
+    for mes in range(1, MESES + 1):
+        dias_mes = monthrange(ano, mes)[1]
+        dias_comunes = (min(hasta, date(ano, mes, dias_mes)) - max(desde, date(ano, mes, 1))).days + 1
+        if dias_comunes <= 0:
+            reparto.append((0.0, 0.0))
+        else:
+            reparto.append((dias_comunes / dias_periodo, dias_comunes / dias_mes))
+    return reparto
+
+
+def promedio_ultimos_meses(salarios, trabajo, meses=MESES_PROMEDIO):
+    """
+    Ingreso mensual promedio de los últimos `meses` meses con trabajo:
+    `salarios` y `trabajo` son, por mes del año, el salario y la fracción
+    del mes trabajada (con varios empleadores simultáneos, hasta 1).
+    """
+    con_trabajo = [mes for mes in range(len(trabajo)) if trabajo[mes] > 0][-meses:]
+    meses_trabajados = sum(min(trabajo[mes], 1.0) for mes in con_trabajo)
+    if not meses_trabajados:
+        return 0.0
+    return sum(salarios[mes] for mes in con_trabajo) / meses_trabajados
+
+
+# --- AGREGACIÓN ---
+
+class AgregadorCertificados:
+    """Agrupa certificados por (NIT, año gravable) con memoria acotada."""
+
+    def __init__(self, ano_gravable=ANO_GRAVABLE_POR_DEFECTO, max_en_memoria=MAX_EN_MEMORIA_POR_DEFECTO,
+                 directorio=None):
+        self.ano_gravable = ano_gravable
+        self.max_en_memoria = max_en_memoria
+        self.directorio = directorio
+        self.certificados = 0
+        self.sin_nit = 0
+        self.contribuyentes = 0
+        self.volcados = 0
+
+    def agregar(self, certificados):
+        """Genera un registro {clave: valor} por contribuyente (ver COLUMNAS_SALIDA)."""
+        temporal = tempfile.mkdtemp(prefix='certificados_', dir=self.directorio)
+        try:
+            for (nit, ano), nombre, acumulado in self._agregar(self._parciales(certificados), temporal, 0):
+                self.contribuyentes += 1
+                yield _registro(nit, ano, nombre, acumulado)
+        finally:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    def _parciales(self, certificados):
+        """(clave, nombre, acumulado) de cada certificado."""
+        for numero, certificado in enumerate(certificados, start=1):
+            self.certificados += 1
+            nit = normalizar_nit(certificado.get('nit'))
+            if not nit:
+                self.sin_nit += 1
+                continue
+            try:
+                yield self._parcial(nit, certificado)
+            except ValueError as e:
+                raise ValueError(f"Certificado {numero}: {e}") from None
+
+    def _parcial(self, nit, certificado):
+        desde = convertir_fecha(certificado.get('periodo_desde'))
+        hasta = convertir_fecha(certificado.get('periodo_hasta'))
+        ano = _numero(certificado.get('ano_gravable'), 'ano_gravable')
+        if ano is None:
+            ano = hasta.year if hasta else self.ano_gravable
+        ano = int(ano)
+
+        acumulado = array('d', _VACIO)
+        acumulado[0] = 1.0
+        for concepto, celda in certificado.items():
+            i = _COPIADOS.get(concepto)
+            if i is not None and celda is not None and celda != '':
+                valor = _numero(celda, concepto)
+                if valor is not None:
+                    acumulado[i] = valor
+        promedio = _numero(certificado.get('ingreso_mensual_promedio'), 'ingreso_mensual_promedio')
+        salarios = acumulado[_POSICION['salarios']]
+        for mes, (parte, cobertura) in enumerate(reparto_mensual(desde, hasta, ano)):
+            acumulado[_INICIO_SALARIO_MES + mes] = promedio * cobertura if promedio is not None else salarios * parte
+            acumulado[_INICIO_TRABAJO_MES + mes] = cobertura
+        return (nit, ano), certificado.get('nombre') or '', acumulado
+
+    def _agregar(self, parciales, temporal, nivel):
+        tabla = {}
+        particiones = None
+        for clave, nombre, acumulado in parciales:
+            actual = tabla.get(clave)
+            if actual is None:
+                tabla[clave] = [nombre, acumulado]
+                if len(tabla) >= self.max_en_memoria and nivel < MAX_NIVELES:
+                    if particiones is None:
+                        particiones = _Particiones(temporal, nivel)
+                    particiones.volcar(tabla)
+                    self.volcados += 1
+                    tabla = {}
+            else:
+                _combinar(actual, nombre, acumulado)
+
+        if particiones is None:
+            for clave, (nombre, acumulado) in tabla.items():
+                yield clave, nombre, acumulado
+            return
+        particiones.volcar(tabla)
+        del tabla
+        for parte in particiones.leer():
+            yield from self._agregar(parte, temporal, nivel + 1)
+
+
+def _numero(celda, concepto):
+    try:
+        return convertir_valor(celda)
+    except ValueError:
+        raise ValueError(f"valor no numérico en '{concepto}': {celda!r}") from None
+
+
+def _combinar(actual, nombre, acumulado):
+    """Suma `acumulado` a `actual` ([nombre, acumulado]) en su lugar."""
+    if not actual[0]:
+        actual[0] = nombre
+    destino = actual[1]
+    for i in range(_FIN_SUMAS):
+        destino[i] += acumulado[i]
+    for i in range(_FIN_SUMAS, len(_CAMPOS)):
+        if math.isnan(destino[i]):
+            destino[i] = acumulado[i]
+
+
+def _registro(nit, ano, nombre, acumulado):
+    registro = {'nit': nit, 'nombre': nombre, 'ano_gravable': ano,
+                'num_certificados': int(acumulado[0])}
+    for concepto in motor.CONCEPTOS_ENTRADA:
+        if concepto == 'ingreso_mensual_promedio':
+            registro[concepto] = promedio_ultimos_meses(
+                acumulado[_INICIO_SALARIO_MES:_INICIO_SALARIO_MES + MESES],
+                acumulado[_INICIO_TRABAJO_MES:_INICIO_TRABAJO_MES + MESES])
+        else:
+            valor = acumulado[_POSICION[concepto]]
+            registro[concepto] = None if math.isnan(valor) else valor
+    return registro
+
+
+class _Particiones:
+    """Archivos temporales con los acumulados parciales, por hash de la clave."""
+
+    def __init__(self, temporal, nivel):
+        self.nivel = nivel
+        self.persona = f"particion{nivel}".encode()
+        self.rutas = [os.path.join(temporal, f"n{nivel}_p{i}.pkl") for i in range(PARTICIONES)]
+        self.archivos = [open(ruta, 'wb') for ruta in self.rutas]
+
+    def _particion(self, clave):
+        # BLAKE2b personalizado con el nivel: claves que cayeron juntas en un
+        # nivel se separan en el siguiente (con CRC32, que es afín, no se separan)
+        resumen = hashlib.blake2b(f"{clave[0]}|{clave[1]}".encode(), digest_size=8, person=self.persona)
+        return int.from_bytes(resumen.digest(), 'little') % PARTICIONES
+
+    def volcar(self, tabla):
+        partes = [[] for _ in range(PARTICIONES)]
+        for clave, (nombre, acumulado) in tabla.items():
+            partes[self._particion(clave)].append((clave, nombre, acumulado))
+        for archivo, parte in zip(self.archivos, partes):
+            if parte:
+                pickle.dump(parte, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def leer(self):
+        """Genera, por partición, un iterador de sus parciales (y borra el archivo al terminarla)."""
+        for archivo in self.archivos:
+            archivo.close()
+        for ruta in self.rutas:
+            yield _leer_particion(ruta)
+            os.remove(ruta)
+
+
+def _leer_particion(ruta):
+    with open(ruta, 'rb') as archivo:
+        while True:
+            try:
+                parte = pickle.load(archivo)
+            except EOFError:
+                return
+            yield from parte
+
+
+# --- SALIDA ---
+
+def filas_de_registros(registros):
+    """Encabezados (COLUMNAS_SALIDA) y filas de los registros: la entrada de lote_renta."""
+    yield list(COLUMNAS_SALIDA)
+    for registro in registros:
+        yield [registro[columna] for columna in COLUMNAS_SALIDA]
+
+
+def datos_de_registro(registro):
+    """Diccionario `datos` completo (con VALORES_POR_DEFECTO) para `calcular_impuesto_renta`."""
+    datos = {'nombre': registro['nombre'], 'nit': registro['nit']}
+    for concepto in motor.CONCEPTOS_ENTRADA:
+        valor = registro.get(concepto)
+        datos[concepto] = motor.VALORES_POR_DEFECTO[concepto] if valor is None else valor
+    return datos
+
+
+def leer_y_agregar(rutas, agregador):
+    """Registros por contribuyente de los certificados de varios archivos."""
+    def certificados():
+        for ruta in rutas:
+            yield from leer_certificados(ruta)
+    return agregador.agregar(certificados())
+
+
+def imprimir_estadisticas(agregador, destino=sys.stderr):
+    print(f"Certificados: {agregador.certificados} ({agregador.sin_nit} sin NIT, omitidos); "
+          f"contribuyentes: {agregador.contribuyentes}; volcados a disco: {agregador.volcados}",
+          file=destino)
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        description="Agrega certificados de ingresos y retenciones en un registro por contribuyente.")
+    parser.add_argument('entradas', nargs='+', help="Exportaciones de nómina (CSV, XLSX, JSON o JSON Lines)")
+    parser.add_argument('-o', '--salida', help="CSV de contribuyentes (por defecto, la salida estándar)")
+    parser.add_argument('--ano', type=int, default=ANO_GRAVABLE_POR_DEFECTO,
+                        help="Año gravable de los certificados sin año ni período (por defecto %(default)s)")
+    parser.add_argument('--max-en-memoria', type=int, default=MAX_EN_MEMORIA_POR_DEFECTO,
+                        help="Contribuyentes en memoria antes de volcar a disco (por defecto %(default)s)")
+    parser.add_argument('--temporal', help="Directorio de los archivos de volcado")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    agregador = AgregadorCertificados(args.ano, args.max_en_memoria, args.temporal)
+    filas = filas_de_registros(leer_y_agregar(args.entradas, agregador))
+    if args.salida:
+        with open(args.salida, 'w', newline='', encoding='utf-8') as salida:
+            csv.writer(salida).writerows(filas)
+    else:
+        csv.writer(sys.stdout).writerows(filas)
+    imprimir_estadisticas(agregador)
+
+
+if __name__ == "__main__":
+    main()
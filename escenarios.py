@@ -0,0 +1,164 @@
+"""
+ESCENARIOS "QUÉ PASA SI" Y APORTE ÓPTIMO A PENSIÓN VOLUNTARIA / AFC
+Personas Naturales Residentes Fiscales - Colombia
+
+- barrido: liquida un contribuyente sobre una malla de valores de una o dos
+  entradas en una sola llamada al motor vectorizado.
+- aporte_optimo / aporte_optimo_lote: aporte adicional a pensión voluntaria
+  o AFC que minimiza el impuesto, calculado de forma analítica.
+
+Como función del aporte adicional `x`, el impuesto es lineal por tramos:
+cada peso aportado reduce la base gravable en un peso hasta que se agota el
+límite de pensión/AFC (30% del ingreso o 3.800 UVT) o el límite general del
+Art. 336 (40% o 1.340 UVT), y el impuesto baja a la tarifa marginal del
+rango del Art. 241 en que esté la base. Los puntos de quiebre salen
+directamente de esos límites, sin recorrer valores.
+"""
+
+import math
+
+import numpy as np
+
+import motor_vectorizado as motor
+from reglas_tributarias import obtener_paquete
+
+CONCEPTOS_APORTE = ('pension_voluntaria', 'afc')
+
+
+def barrido(datos, variables, reglas=None):
+    """
+    Liquida `datos` para cada combinación de valores de `variables`
+    ({concepto: valores}, uno o dos conceptos de CONCEPTOS_ENTRADA).
+
+    Retorna {clave de resultado: arreglo} con forma (len(v1),) o
+    (len(v1), len(v2)); el elemento [i, j] corresponde a v1[i] y v2[j].
+    """
+    if not 1 <= len(variables) <= 2:
+        raise ValueError("El barrido admite una o dos variables.")
+    for concepto in variables:
+        if concepto not in motor.CONCEPTOS_ENTRADA:
+            raise ValueError(f"Concepto desconocido: {concepto}")
+
+    ejes = [np.asarray(valores, dtype=np.float64) for valores in variables.values()]
+    malla = np.meshgrid(*ejes, indexing='ij')
+    forma = malla[0].shape
+    n = malla[0].size
+
+    columnas = {concepto: np.full(n, float(datos.get(concepto, motor.VALORES_POR_DEFECTO[concepto])))
+                for concepto in motor.CONCEPTOS_ENTRADA}
+    for concepto, valores in zip(variables, malla):
+        columnas[concepto] = valores.ravel()
+
+    resultados = motor.calcular_impuesto_renta_lote(columnas, reglas)
+    return {clave: valores.reshape(forma) for clave, valores in resultados.items()}
+
+
+def _margen_aporte(resultados, columnas, paquete):
+    """
+    Aporte adicional máximo que todavía reduce la base gravable (antes del
+    piso de cero) y base gravable antes del piso.
+    """
+    uvt = paquete.uvt
+    limite_pension_afc = np.minimum(resultados['ingresos_totales'] * paquete.porcentaje_pension_afc,
+                                    paquete.limite_pension_afc_uvt * uvt)
+    aportes = sum(np.asarray(columnas.get(concepto, 0.0), dtype=np.float64) for concepto in CONCEPTOS_APORTE)
+    margen_pension_afc = np.maximum(limite_pension_afc - aportes, 0.0)
+    margen_limite_general = np.maximum(resultados['limite_maximo_depuracion'] -
+                                       resultados['suma_rentas_deducciones'], 0.0)
+    renta_liquida = (resultados['ingreso_neto'] - resultados['depuracion_final'] -
+                     resultados['beneficio_factura'] - resultados['beneficio_gmf'])
+    return np.minimum(margen_pension_afc, margen_limite_general), renta_liquida
+
+
+def _inicio_tarifa_minima(paquete, tasa_minima):
+    """Inicio (UVT) del primer rango del Art. 241 con tarifa >= tasa_minima (o > 0)."""
+    for inicio, tarifa in zip(paquete.inicio_241_uvt, paquete.tarifas_241):
+        if tarifa > 0 and tarifa >= tasa_minima:
+            return inicio
+    return math.inf
+
+
+def aporte_optimo_lote(columnas, tasa_minima=0.0, reglas=None):
+    """
+    Aporte adicional óptimo a pensión voluntaria/AFC para un lote.
+
+    Es el menor aporte a partir del cual un peso más ya no reduce el
+    impuesto con una tarifa marginal de al menos `tasa_minima` (con 0, el
+    menor aporte que alcanza el impuesto mínimo posible).
+    Retorna {'aporte_optimo', 'impuesto_actual', 'impuesto_optimo', 'ahorro',
+    'tasa_marginal'} como arreglos; `tasa_marginal` es la del primer peso.
+    """
+    paquete = obtener_paquete(reglas)
+    resultados = motor.calcular_impuesto_renta_lote(columnas, paquete)
+
+    margen, renta_liquida = _margen_aporte(resultados, columnas, paquete)
+    base_objetivo = _inicio_tarifa_minima(paquete, tasa_minima) * paquete.uvt
+    aporte = np.clip(renta_liquida - base_objetivo, 0.0, margen)
+
+    impuesto_actual = resultados['impuesto_neto']
+    base_optima = np.maximum(renta_liquida - aporte, 0.0)
+    impuesto_optimo = motor.aplicar_tabla_articulo_241_lote(base_optima / paquete.uvt, paquete)
+
+    # Tarifa del rango en que está la base, si el primer peso aún reduce la base
+    rango = np.searchsorted(paquete.limites_241_uvt, resultados['base_gravable_uvt'], side='left')
+    tasa_marginal = np.where((margen > 0) & (renta_liquida > 0), np.asarray(paquete.tarifas_241)[rango], 0.0)
+
+    return {
+        'aporte_optimo': aporte,
+        'impuesto_actual': impuesto_actual,
+        'impuesto_optimo': impuesto_optimo,
+        'ahorro': impuesto_actual - impuesto_optimo,
+        'tasa_marginal': tasa_marginal,
+    }
+
+
+def _una_fila(datos):
+    return {concepto: np.array([float(datos.get(concepto, motor.VALORES_POR_DEFECTO[concepto]))])
+            for concepto in motor.CONCEPTOS_ENTRADA}
+
+
+def curva_tasa_marginal(datos, reglas=None):
+    """
+    Tarifa marginal del impuesto frente al aporte adicional a pensión/AFC
+    como lista de tramos (desde, hasta, tarifa), en pesos de aporte. El
+    último tramo es (x, inf, 0.0): desde ahí aportar más no reduce el impuesto.
+    El impuesto acumulado de cada rango del Art. 241 está redondeado a UVT
+    enteras, así que al cruzar un límite puede haber un salto de centésimas
+    de UVT que la tarifa marginal no refleja.
+    """
+    paquete = obtener_paquete(reglas)
+    uvt = paquete.uvt
+    columnas = _una_fila(datos)
+    resultados = motor.calcular_impuesto_renta_lote(columnas, paquete)
+    margen, renta_liquida = _margen_aporte(resultados, columnas, paquete)
+    margen, renta_liquida = float(margen[0]), float(renta_liquida[0])
+
+    # Quiebres: cruces de la base con los límites del Art. 241 y fin del margen
+    fin = max(min(margen, renta_liquida), 0.0)
+    quiebres = sorted({0.0, fin, *(renta_liquida - limite * uvt for limite in paquete.limites_241_uvt
+                                   if 0 < renta_liquida - limite * uvt < fin)})
+
+    tramos = []
+    for desde, hasta in zip(quiebres, quiebres[1:]):
+        base_uvt = (renta_liquida - (desde + hasta) / 2) / uvt
+        tarifa = paquete.tarifas_241[int(np.searchsorted(paquete.limites_241_uvt, base_uvt, side='left'))]
+        if tramos and tramos[-1][2] == tarifa:
+            tramos[-1] = (tramos[-1][0], hasta, tarifa)
+        else:
+            tramos.append((desde, hasta, tarifa))
+    if tramos and tramos[-1][2] == 0.0:
+        tramos[-1] = (tramos[-1][0], math.inf, 0.0)
+    else:
+        tramos.append((fin, math.inf, 0.0))
+    return tramos
+
+
+def aporte_optimo(datos, tasa_minima=0.0, reglas=None):
+    """
+    Aporte óptimo de un contribuyente (ver aporte_optimo_lote) con su curva
+    de tarifa marginal.
+    """
+    resultado = {clave: valores[0].item()
+                 for clave, valores in aporte_optimo_lote(_una_fila(datos), tasa_minima, reglas).items()}
+    resultado['curva'] = curva_tasa_marginal(datos, reglas)
+    return resultado
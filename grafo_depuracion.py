@@ -0,0 +1,303 @@
+"""
+GRAFO INCREMENTAL DE LA DEPURACIÓN
+Personas Naturales Residentes Fiscales - Colombia
+
+La depuración de `calcular_impuesto_renta` (nucleo_renta.py) modelada
+como un grafo de pasos con nombre: INCR → ingreso neto → cesantías exentas
+→ deducciones → renta exenta 25% → límite 40%/1340 UVT → factura/GMF →
+base → Art. 241 → anticipo → saldo. Los pasos con reglas (límites, tablas,
+porcentajes) llaman a las funciones del núcleo, así que el grafo y la
+liquidación completa dan los mismos valores.
+
+Cada paso declara sus dependencias con los nombres de sus parámetros. Un
+CasoDepuracion guarda los valores intermedios; al cambiar una entrada solo
+se vuelven a evaluar los pasos que dependen de ella, y la propagación se
+detiene en los pasos cuyo valor no cambió.
+
+    caso = CasoDepuracion(datos)
+    caso.resultados()                           # liquidación completa
+    caso.actualizar(medicina_prepagada=9_000_000)
+    caso.resultados()                           # solo los pasos afectados
+"""
+
+import inspect
+
+import motor_vectorizado as motor
+import nucleo_renta
+from reglas_tributarias import obtener_paquete
+
+_SIN_VALOR = object()
+
+
+class Grafo:
+    """
+    Pasos de un cálculo en orden topológico. Cada paso es una función
+    `f(paquete, dep1, dep2, ...)`; los nombres de los parámetros después del
+    paquete son las entradas u otros pasos de los que depende.
+    """
+
+    def __init__(self, entradas):
+        self.entradas = tuple(entradas)
+        self.pasos = {}         # nombre -> (función, dependencias)
+        self.dependientes = {nombre: [] for nombre in self.entradas}
+
+    def paso(self, funcion):
+        """Decorador: registra la función como paso (sin el '_' inicial)."""
+        nombre = funcion.__name__.lstrip('_')
+        dependencias = tuple(inspect.signature(funcion).parameters)[1:]
+        for dependencia in dependencias:
+            if dependencia not in self.dependientes:
+                raise ValueError(f"El paso '{nombre}' depende de '{dependencia}', que no está definido antes.")
+            self.dependientes[dependencia].append(nombre)
+        self.pasos[nombre] = (funcion, dependencias)
+        self.dependientes[nombre] = []
+        return funcion
+
+    def aguas_abajo(self, nombre):
+        """Conjunto de pasos que dependen directa o indirectamente de `nombre`."""
+        pendientes, vistos = [nombre], set()
+        while pendientes:
+            for dependiente in self.dependientes[pendientes.pop()]:
+                if dependiente not in vistos:
+                    vistos.add(dependiente)
+                    pendientes.append(dependiente)
+        return vistos
+
+
+DEPURACION = Grafo(motor.CONCEPTOS_ENTRADA)
+
+
+# 1. INGRESOS TOTALES
+@DEPURACION.paso
+def _ingresos_totales(p, salarios, cesantias, prestaciones_sociales, otros_pagos_laborales):
+    return salarios + cesantias + prestaciones_sociales + otros_pagos_laborales
+
+
+# 2. INGRESOS NO CONSTITUTIVOS DE RENTA (INCR)
+@DEPURACION.paso
+def _incr_total(p, incr_salud, incr_pensiones):
+    return incr_salud + incr_pensiones
+
+
+# 3. INGRESO NETO
+@DEPURACION.paso
+def _ingreso_neto(p, ingresos_totales, incr_total):
+    return ingresos_totales - incr_total
+
+
+# 4. CESANTÍAS EXENTAS (Art. 206 numeral 4)
+@DEPURACION.paso
+def _cesantias_exentas(p, cesantias, ingreso_mensual_promedio):
+    return nucleo_renta.calcular_cesantias_exentas(cesantias, ingreso_mensual_promedio, p)
+
+
+# 5. DEDUCCIONES
+@DEPURACION.paso
+def _deduccion_dependientes(p, num_dependientes):
+    return nucleo_renta.calcular_deduccion_dependientes(num_dependientes, p)
+
+
+@DEPURACION.paso
+def _deduccion_medicina(p, medicina_prepagada):
+    return nucleo_renta.calcular_deduccion_medicina(medicina_prepagada, p)
+
+
+@DEPURACION.paso
+def _deduccion_intereses(p, intereses_vivienda):
+    return nucleo_renta.calcular_deduccion_intereses(intereses_vivienda, p)
+
+
+@DEPURACION.paso
+def _deducciones_totales(p, deduccion_dependientes, deduccion_medicina, deduccion_intereses):
+    return deduccion_dependientes + deduccion_medicina + deduccion_intereses
+
+
+# 6. RENTA EXENTA 25%
+@DEPURACION.paso
+def _base_renta_exenta_25(p, ingresos_totales, incr_total, cesantias_exentas, deducciones_totales):
+    return max(ingresos_totales - incr_total - cesantias_exentas - deducciones_totales, 0)
+
+
+@DEPURACION.paso
+def _renta_exenta_25(p, base_renta_exenta_25):
+    return nucleo_renta.calcular_renta_exenta_25(base_renta_exenta_25, p)
+
+
+# 7. OTRAS RENTAS EXENTAS (pensión voluntaria + AFC)
+@DEPURACION.paso
+def _pension_afc_limitada(p, pension_voluntaria, afc, ingresos_totales):
+    return nucleo_renta.calcular_pension_afc_limitada(pension_voluntaria, afc, ingresos_totales, p)
+
+
+@DEPURACION.paso
+def _rentas_exentas_totales(p, cesantias_exentas, renta_exenta_25, pension_afc_limitada):
+    return cesantias_exentas + renta_exenta_25 + pension_afc_limitada
+
+
+# 8. LÍMITE DEL 40% - ARTÍCULO 336
+@DEPURACION.paso
+def _suma_rentas_deducciones(p, rentas_exentas_totales, deducciones_totales):
+    return rentas_exentas_totales + deducciones_totales
+
+
+@DEPURACION.paso
+def _limite_maximo_depuracion(p, ingreso_neto):
+    return nucleo_renta.calcular_limite_depuracion(ingreso_neto, p)
+
+
+@DEPURACION.paso
+def _depuracion_final(p, suma_rentas_deducciones, limite_maximo_depuracion):
+    return min(suma_rentas_deducciones, limite_maximo_depuracion)
+
+
+# 10-11. BENEFICIOS FACTURA ELECTRÓNICA Y GMF
+@DEPURACION.paso
+def _beneficio_factura(p, compras_factura_electronica):
+    return nucleo_renta.calcular_beneficio_factura(compras_factura_electronica, p)
+
+
+@DEPURACION.paso
+def _beneficio_gmf(p, gmf):
+    return nucleo_renta.calcular_beneficio_gmf(gmf, p)
+
+
+# 9-12. RENTA LÍQUIDA Y BASE GRAVABLE
+@DEPURACION.paso
+def _base_gravable(p, ingreso_neto, depuracion_final, beneficio_factura, beneficio_gmf):
+    renta_liquida = ingreso_neto - depuracion_final
+    renta_liquida -= beneficio_factura
+    renta_liquida -= beneficio_gmf
+    return max(renta_liquida, 0)
+
+
+@DEPURACION.paso
+def _base_gravable_uvt(p, base_gravable):
+    return base_gravable / p.uvt
+
+
+# 13. TABLA ARTÍCULO 241
+@DEPURACION.paso
+def _impuesto_neto(p, base_gravable_uvt):
+    return nucleo_renta.aplicar_tabla_articulo_241(base_gravable_uvt, p)
+
+
+# 14. ANTICIPO (Artículo 807): (método 1, método 2, definitivo)
+@DEPURACION.paso
+def _anticipo(p, impuesto_neto, impuesto_neto_anterior, retenciones, num_anos_declarando):
+    return nucleo_renta.calcular_anticipo(impuesto_neto, impuesto_neto_anterior, retenciones,
+                                          num_anos_declarando, p)
+
+
+@DEPURACION.paso
+def _anticipo_metodo1(p, anticipo):
+    return anticipo[0]
+
+
+@DEPURACION.paso
+def _anticipo_metodo2(p, anticipo):
+    return anticipo[1]
+
+
+@DEPURACION.paso
+def _anticipo_definitivo(p, anticipo):
+    return anticipo[2]
+
+
+# 15. LIQUIDACIÓN FINAL
+@DEPURACION.paso
+def _saldo_sin_anticipo(p, impuesto_neto, retenciones, saldo_favor_anterior, anticipo_anterior):
+    return impuesto_neto - retenciones - saldo_favor_anterior - anticipo_anterior
+
+
+@DEPURACION.paso
+def _liquidacion_final(p, saldo_sin_anticipo, anticipo_definitivo):
+    return saldo_sin_anticipo + anticipo_definitivo
+
+
+@DEPURACION.paso
+def _es_saldo_favor(p, liquidacion_final):
+    return liquidacion_final < 0
+
+
+@DEPURACION.paso
+def _valor_final(p, liquidacion_final):
+    return abs(liquidacion_final)
+
+
+class CasoDepuracion:
+    """
+    Un caso abierto: entradas, valores intermedios en caché y los pasos
+    pendientes de recalcular.
+    """
+
+    __slots__ = ('grafo', 'paquete', 'valores', 'evaluaciones', '_sucios')
+
+    def __init__(self, datos=None, reglas=None, grafo=DEPURACION):
+        self.grafo = grafo
+        self.paquete = obtener_paquete(reglas)
+        self.valores = {entrada: motor.VALORES_POR_DEFECTO.get(entrada, 0) for entrada in grafo.entradas}
+        self.valores.update((nombre, _SIN_VALOR) for nombre in grafo.pasos)
+        self.evaluaciones = 0
+        self._sucios = set(grafo.pasos)
+        if datos:
+            self.actualizar({clave: datos[clave] for clave in grafo.entradas if clave in datos})
+
+    def actualizar(self, cambios=None, **valores):
+        """Cambia una o varias entradas y marca como pendientes sus dependientes."""
+        if cambios:
+            valores = {**cambios, **valores}
+        dependientes = self.grafo.dependientes
+        for entrada, valor in valores.items():
+            if entrada not in self.grafo.entradas:
+                raise KeyError(entrada)
+            if self.valores[entrada] != valor:
+                self.valores[entrada] = valor
+                self._sucios.update(dependientes[entrada])
+
+    def cambiar_reglas(self, reglas):
+        """Cambia el paquete de reglas (año gravable): todos los pasos quedan pendientes."""
+        paquete = obtener_paquete(reglas)
+        if paquete is not self.paquete:
+            self.paquete = paquete
+            self._sucios.update(self.grafo.pasos)
+
+    @property
+    def pendientes(self):
+        return set(self._sucios)
+
+    def recalcular(self):
+        """Evalúa los pasos pendientes en orden y retorna los nombres de los que cambiaron."""
+        sucios = self._sucios
+        if not sucios:
+            return []
+        valores, paquete, dependientes = self.valores, self.paquete, self.grafo.dependientes
+        cambiados = []
+        for nombre, (funcion, dependencias) in self.grafo.pasos.items():
+            if nombre not in sucios:
+                continue
+            sucios.discard(nombre)
+            nuevo = funcion(paquete, *[valores[d] for d in dependencias])
+            self.evaluaciones += 1
+            if nuevo != valores[nombre]:
+                valores[nombre] = nuevo
+                cambiados.append(nombre)
+                sucios.update(dependientes[nombre])
+            if not sucios:
+                break
+        return cambiados
+
+    def __getitem__(self, nombre):
+        if self._sucios:
+            self.recalcular()
+        return self.valores[nombre]
+
+    def resultados(self):
+        """Diccionario con las claves de `calcular_impuesto_renta`."""
+        if self._sucios:
+            self.recalcular()
+        return {clave: self.valores[clave] for clave in motor.COLUMNAS_RESULTADO}
+
+
+def liquidar(datos, reglas=None):
+    """Liquidación completa (sin caché entre llamadas) con el grafo."""
+    return CasoDepuracion(datos, reglas).resultados()
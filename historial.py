@@ -0,0 +1,214 @@
+"""
+HISTORIAL DE DECLARACIONES POR NIT Y AÑO GRAVABLE
+Personas Naturales Residentes Fiscales - Colombia
+
+Almacén local (SQLite) de las liquidaciones pasadas, indexado por
+(NIT, año gravable). Cada corrida de lote_renta con --historial:
+
+1. Completa, para cada contribuyente con NIT, los conceptos que llegaron
+   vacíos a partir de su declaración del año anterior:
+   - impuesto_neto_anterior   impuesto neto de renta del año anterior
+   - saldo_favor_anterior     saldo a favor del año anterior (se supone
+                              que no se pidió en devolución ni compensación)
+   - anticipo_anterior        anticipo liquidado el año anterior para este año
+   - num_anos_declarando      1 + años anteriores con declaración en el historial
+   Las celdas que traen valor no se tocan.
+2. Guarda los resultados de la corrida como la declaración de ese año.
+
+La consulta es un solo JOIN por bloque entre una tabla temporal con los
+(NIT, año) del bloque y el historial, sobre la llave primaria (nit, ano).
+
+Uso:
+    python lote_renta.py entrada.csv -o resultados.csv --historial historial.sqlite
+    python historial.py historial.sqlite --importar resultados_2023.csv
+    python historial.py historial.sqlite --nit 900123456
+"""
+
+import argparse
+import csv
+import io
+import sqlite3
+
+import motor_vectorizado as motor
+
+# Conceptos de entrada que se completan con el historial
+CONCEPTOS_HISTORIAL = ('impuesto_neto_anterior', 'saldo_favor_anterior', 'anticipo_anterior',
+                       'num_anos_declarando')
+
+
+# Separadores habituales en un NIT escrito: "900.123.456-7"
+_SEPARADORES_NIT = str.maketrans('', '', '.-, ')
+
+
+def normalizar_nit(nit):
+    """NIT como texto sin puntos, guiones ni espacios ('' si no hay)."""
+    if nit is None:
+        return ''
+    if isinstance(nit, float) and nit.is_integer():
+        nit = int(nit)
+    texto = str(nit)
+    if texto.isalnum():
+        return texto
+    texto = texto.translate(_SEPARADORES_NIT)
+    if texto.isalnum():
+        return texto
+    return ''.join(c for c in texto if c.isalnum())
+
+
+def normalizar_nits(nits):
+    """
+    `normalizar_nit` de una lista de celdas. Cuando todas son texto, los
+    separadores se quitan con un solo translate sobre el bloque unido, sin
+    recorrerlo fila a fila en Python.
+    """
+    try:
+        # Una sola pasada en C: cada celda es alfanumérica o vacía ('' ya está normalizado)
+        if ''.join(nits).isalnum():
+            return list(nits)
+        unidos = '\n'.join(nits)
+    except TypeError:       # NIT numérico (XLSX) o vacío
+        if set(map(type, nits)) == {int} and min(nits) >= 0:
+            return list(map(str, nits))
+        return list(map(normalizar_nit, nits))
+    textos = unidos.translate(_SEPARADORES_NIT).split('\n')
+    if len(textos) != len(nits):        # una celda traía saltos de línea
+        return list(map(normalizar_nit, nits))
+    if all(map(str.isalnum, textos)):
+        return textos
+    return [texto if texto.isalnum() else normalizar_nit(texto) for texto in textos]
+
+
+def _vacia(celda):
+    return celda is None or (isinstance(celda, str) and not celda.strip())
+
+
+class HistorialDeclaraciones:
+    """Declaraciones pasadas en un archivo SQLite local."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS declaraciones ("
+            " nit TEXT NOT NULL, ano INTEGER NOT NULL,"
+            " impuesto_neto REAL NOT NULL, saldo_favor REAL NOT NULL, anticipo_siguiente REAL NOT NULL,"
+            " PRIMARY KEY (nit, ano)) WITHOUT ROWID")
+        self.conexion.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS consulta ("
+            " posicion INTEGER PRIMARY KEY, nit TEXT NOT NULL, ano INTEGER NOT NULL)")
+        self.conexion.commit()
+        self.completados = 0
+        self.guardados = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    def cerrar(self):
+        self.conexion.commit()
+        self.conexion.close()
+
+    def completar(self, registros, anos):
+        """
+        Completa en su lugar los CONCEPTOS_HISTORIAL vacíos de `registros`
+        ({concepto: celda}) con el historial; `anos` es el año gravable de
+        cada registro. Retorna cuántos registros encontró en el historial.
+        """
+        consulta = [(posicion, normalizar_nit(registro.get('nit')), ano)
+                    for posicion, (registro, ano) in enumerate(zip(registros, anos))
+                    if any(_vacia(registro.get(concepto)) for concepto in CONCEPTOS_HISTORIAL)]
+        consulta = [fila for fila in consulta if fila[1]]
+        if not consulta:
+            return 0
+
+        self.conexion.execute("DELETE FROM consulta")
+        self.conexion.executemany("INSERT INTO consulta VALUES (?, ?, ?)", consulta)
+        encontrados = 0
+        for posicion, impuesto, saldo, anticipo, anos_previos in self.conexion.execute(
+                "SELECT c.posicion, h.impuesto_neto, h.saldo_favor, h.anticipo_siguiente,"
+                " (SELECT COUNT(*) FROM declaraciones p WHERE p.nit = c.nit AND p.ano < c.ano)"
+                " FROM consulta c LEFT JOIN declaraciones h ON h.nit = c.nit AND h.ano = c.ano - 1"):
+            registro = registros[posicion]
+            valores = {'num_anos_declarando': anos_previos + 1}
+            if impuesto is not None:
+                valores.update(impuesto_neto_anterior=impuesto, saldo_favor_anterior=saldo,
+                               anticipo_anterior=anticipo)
+            if anos_previos:
+                encontrados += 1
+            for concepto, valor in valores.items():
+                if _vacia(registro.get(concepto)):
+                    registro[concepto] = valor
+        self.completados += encontrados
+        return encontrados
+
+    def guardar(self, filas):
+        """Inserta o reemplaza (nit, ano, impuesto_neto, saldo_favor, anticipo_siguiente)."""
+        filas = [fila for fila in filas if fila[0]]
+        self.conexion.executemany(
+            "INSERT INTO declaraciones VALUES (?, ?, ?, ?, ?) ON CONFLICT (nit, ano) DO UPDATE SET"
+            " impuesto_neto = excluded.impuesto_neto, saldo_favor = excluded.saldo_favor,"
+            " anticipo_siguiente = excluded.anticipo_siguiente", filas)
+        self.conexion.commit()
+        self.guardados += len(filas)
+
+    def registrar_csv(self, texto):
+        """Guarda las filas de un texto CSV con las columnas de salida de lote_renta (sin encabezado)."""
+        self.guardar(filas_de_resultados(csv.reader(io.StringIO(texto))))
+
+    def declaraciones(self, nit):
+        """Declaraciones guardadas de un NIT, de la más antigua a la más reciente."""
+        cursor = self.conexion.execute(
+            "SELECT ano, impuesto_neto, saldo_favor, anticipo_siguiente FROM declaraciones"
+            " WHERE nit = ? ORDER BY ano", (normalizar_nit(nit),))
+        return [dict(zip(('ano_gravable', 'impuesto_neto', 'saldo_favor', 'anticipo_siguiente'), fila))
+                for fila in cursor]
+
+
+# Posición de cada columna en las filas de salida de lote_renta
+_COLUMNAS_SALIDA = ('nit', 'nombre', 'ano_gravable', *motor.COLUMNAS_RESULTADO)
+_NIT, _ANO, _IMPUESTO, _ANTICIPO, _SALDO_FAVOR, _VALOR = (
+    _COLUMNAS_SALIDA.index(clave) for clave in
+    ('nit', 'ano_gravable', 'impuesto_neto', 'anticipo_definitivo', 'es_saldo_favor', 'valor_final'))
+
+
+def filas_de_resultados(filas):
+    """
+    Filas del historial a partir de filas de salida de lote_renta (listas
+    de celdas). Se omiten las filas sin NIT y la de encabezados.
+    """
+    for fila in filas:
+        nit = normalizar_nit(fila[_NIT])
+        if not nit or fila[_ANO] == 'ano_gravable':
+            continue
+        saldo_favor = float(fila[_VALOR]) if fila[_SALDO_FAVOR] == 'SI' else 0.0
+        yield nit, int(fila[_ANO]), float(fila[_IMPUESTO]), saldo_favor, float(fila[_ANTICIPO])
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(description="Historial de declaraciones por NIT y año gravable.")
+    parser.add_argument('ruta', help="Archivo SQLite del historial")
+    parser.add_argument('--importar', nargs='+', default=[],
+                        help="CSV de resultados de lote_renta de años anteriores")
+    parser.add_argument('--nit', help="Mostrar las declaraciones guardadas de un NIT")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    with HistorialDeclaraciones(args.ruta) as historial:
+        for ruta in args.importar:
+            with open(ruta, newline='', encoding='utf-8') as archivo:
+                historial.guardar(filas_de_resultados(csv.reader(archivo)))
+            print(f"{ruta}: {historial.guardados} declaraciones guardadas")
+            historial.guardados = 0
+        if args.nit:
+            for declaracion in historial.declaraciones(args.nit):
+                print(declaracion)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+LIQUIDACIÓN DESDE UN NODO PYTHON SCRIPT DE KNIME (TABLAS ARROW)
+Personas Naturales Residentes Fiscales - Colombia
+
+Punto de entrada para que el flujo "WORK FLOW DEFINITIVO SUBCEDULA RENTAS
+DE TRABAJO.knwf" haga la liquidación con el motor vectorizado: el nodo
+Python Script recibe la tabla del Table Creator como tabla de pyarrow (o
+DataFrame de pandas) y devuelve la misma tabla con las 26 columnas de
+COLUMNAS_RESULTADO agregadas.
+
+Los encabezados se reconocen igual que en lote_renta (conceptos de la
+plantilla de Excel o claves del motor). Las columnas numéricas pasan al
+motor sin conversión fila a fila: una columna double sin nulos y en un solo
+bloque se lee como arreglo de numpy sin copia, las enteras se convierten a
+double con pyarrow.compute y los nulos toman VALORES_POR_DEFECTO. Las
+columnas de resultado vuelven a Arrow también sin copia (salvo
+es_saldo_favor, que es booleana). Solo las columnas de texto ("$
+80.845.738") se convierten celda por celda con `convertir_valor`.
+
+En el nodo Python Script (API knime.scripting.io):
+
+    import knime.scripting.io as knio
+    import knime_nodo
+
+    tabla = knio.input_tables[0].to_pyarrow()
+    knio.output_tables[0] = knio.Table.from_pyarrow(knime_nodo.liquidar_tabla(tabla))
+
+Para tablas que no caben en memoria, por lotes de filas:
+
+    salida = knio.BatchOutputTable.create()
+    for lote in knime_nodo.liquidar_lotes(knio.input_tables[0].batches()):
+        salida.append(lote)
+    knio.output_tables[0] = salida
+
+Fuera de KNIME, sobre archivos Arrow IPC (Feather) o Parquet:
+    python knime_nodo.py entrada.parquet salida.parquet
+"""
+
+import argparse
+
+import numpy as np
+
+import motor_vectorizado as motor
+import perfilado
+from lote_renta import clave_de_concepto, convertir_valor
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO
+
+
+def _importar_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+    except ImportError:
+        raise ImportError("Para liquidar tablas Arrow instale pyarrow (pip install pyarrow).") from None
+    return pyarrow
+
+
+def _tipo_de_tabla(tabla):
+    """'arrow' (Table o RecordBatch de pyarrow), 'pandas' (DataFrame) o 'columnas' (dict)."""
+    if isinstance(tabla, dict):
+        return 'columnas'
+    modulo = type(tabla).__module__
+    if modulo.startswith('pyarrow'):
+        return 'arrow'
+    if modulo.startswith('pandas'):
+        return 'pandas'
+    raise TypeError(f"Tabla no soportada: {type(tabla).__name__} "
+                    "(se espera pyarrow.Table, pyarrow.RecordBatch, pandas.DataFrame o dict)")
+
+
+def _nombres_columnas(tabla, tipo):
+    if tipo == 'arrow':
+        return list(tabla.schema.names)
+    return list(tabla.keys()) if tipo == 'columnas' else list(tabla.columns)
+
+
+def _columna(tabla, tipo, nombre):
+    if tipo == 'arrow':
+        return tabla.column(tabla.schema.get_field_index(nombre))
+    return tabla[nombre]
+
+
+def _numero_filas(tabla, tipo):
+    if tipo == 'arrow':
+        return tabla.num_rows
+    if tipo == 'pandas':
+        return len(tabla.index)
+    return len(next(iter(tabla.values()))) if tabla else 0
+
+
+def _desde_texto(valores, concepto, por_defecto):
+    """Columna de texto convertida celda por celda (con el error de lote_renta)."""
+    resultado = np.empty(len(valores), dtype=np.float64)
+    for numero, celda in enumerate(valores):
+        try:
+            valor = convertir_valor(celda)
+        except ValueError:
+            raise ValueError(f"Contribuyente {numero + 1}: valor no numérico en "
+                             f"'{concepto}': {celda!r}") from None
+        resultado[numero] = por_defecto if valor is None else valor
+    return resultado
+
+
+def _desde_arrow(columna, concepto, por_defecto):
+    pa = _importar_pyarrow()
+    pc = pa.compute
+    if pa.types.is_string(columna.type) or pa.types.is_large_string(columna.type):
+        return _desde_texto(columna.to_pylist(), concepto, por_defecto)
+    if not pa.types.is_float64(columna.type):
+        columna = pc.cast(columna, pa.float64())
+    if columna.null_count:
+        columna = pc.fill_null(columna, por_defecto)
+    if isinstance(columna, pa.ChunkedArray):
+        columna = columna.chunk(0) if columna.num_chunks == 1 else columna.combine_chunks()
+    # Sin nulos y en un solo bloque: vista de solo lectura sobre el búfer de Arrow
+    return columna.to_numpy(zero_copy_only=False)
+
+
+def _desde_pandas(serie, concepto, por_defecto):
+    if serie.dtype == object or str(serie.dtype) in ('string', 'str'):
+        return _desde_texto(serie.tolist(), concepto, por_defecto)
+    return serie.to_numpy(dtype=np.float64, na_value=por_defecto)
+
+
+def columnas_de_tabla(tabla, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+    """
+    Columnas del motor ({concepto: arreglo float64}, más `ano_gravable`) de
+    una tabla de pyarrow, un DataFrame de pandas o un dict {encabezado:
+    arreglo}. Los conceptos ausentes los completa el motor con
+    VALORES_POR_DEFECTO; sin columna de año gravable se usa `ano_gravable`.
+    """
+    tipo = _tipo_de_tabla(tabla)
+    n = _numero_filas(tabla, tipo)
+    columnas = {}
+    for nombre in _nombres_columnas(tabla, tipo):
+        clave = clave_de_concepto(nombre)
+        if clave not in motor.CONCEPTOS_ENTRADA and clave != 'ano_gravable':
+            continue
+        if clave in columnas:
+            raise ValueError(f"La columna '{nombre}' repite el concepto '{clave}'")
+        por_defecto = float(motor.VALORES_POR_DEFECTO.get(clave, ano_gravable))
+        columna = _columna(tabla, tipo, nombre)
+        if tipo == 'arrow':
+            columnas[clave] = _desde_arrow(columna, clave, por_defecto)
+        elif tipo == 'pandas':
+            columnas[clave] = _desde_pandas(columna, clave, por_defecto)
+        elif isinstance(columna, np.ndarray) and columna.dtype.kind in 'biuf':
+            columnas[clave] = np.asarray(columna, dtype=np.float64)
+        else:
+            columnas[clave] = _desde_texto(list(columna), clave, por_defecto)
+    if 'ano_gravable' in columnas:
+        columnas['ano_gravable'] = columnas['ano_gravable'].astype(np.int64)
+    else:
+        columnas['ano_gravable'] = np.full(n, ano_gravable, dtype=np.int64)
+    if not any(concepto in columnas for concepto in motor.CONCEPTOS_ENTRADA):
+        # El motor necesita al menos una columna para conocer el tamaño del lote
+        columnas['salarios'] = np.zeros(n)
+    return columnas
+
+
+def liquidar_tabla(tabla, ano_gravable=ANO_GRAVABLE_POR_DEFECTO, solo_resultados=False):
+    """
+    Liquida todos los contribuyentes de `tabla` (pyarrow.Table o
+    RecordBatch, pandas.DataFrame o dict de columnas) y retorna una tabla
+    del mismo tipo con las columnas de la entrada seguidas de las de
+    COLUMNAS_RESULTADO (solo estas últimas con `solo_resultados`). Una
+    columna de entrada con el nombre de un resultado se reemplaza.
+    """
+    tipo = _tipo_de_tabla(tabla)
+    marcar = perfilado.cronometro(_numero_filas(tabla, tipo))
+    columnas = columnas_de_tabla(tabla, ano_gravable)
+    if marcar:
+        marcar('knime.columnas')
+    resultados = motor.calcular_impuesto_renta_lote(columnas)
+    if marcar:
+        marcar('knime.motor')
+    salida = _tabla_de_resultados(tabla, tipo, resultados, solo_resultados)
+    if marcar:
+        marcar('knime.tabla')
+    return salida
+
+
+def _tabla_de_resultados(tabla, tipo, resultados, solo_resultados):
+    conservadas = [] if solo_resultados else [nombre for nombre in _nombres_columnas(tabla, tipo)
+                                              if nombre not in resultados]
+    if tipo == 'arrow':
+        pa = _importar_pyarrow()
+        nombres = conservadas + list(motor.COLUMNAS_RESULTADO)
+        arreglos = [_columna(tabla, tipo, nombre) for nombre in conservadas]
+        arreglos += [pa.array(resultados[clave]) for clave in motor.COLUMNAS_RESULTADO]
+        if isinstance(tabla, pa.RecordBatch):
+            return pa.RecordBatch.from_arrays(arreglos, names=nombres)
+        return pa.Table.from_arrays(arreglos, names=nombres)
+    if tipo == 'pandas':
+        salida = tabla[conservadas].copy(deep=False)
+        for clave in motor.COLUMNAS_RESULTADO:
+            salida[clave] = resultados[clave]
+        return salida
+    salida = {nombre: tabla[nombre] for nombre in conservadas}
+    salida.update((clave, resultados[clave]) for clave in motor.COLUMNAS_RESULTADO)
+    return salida
+
+
+def liquidar_lotes(lotes, ano_gravable=ANO_GRAVABLE_POR_DEFECTO, solo_resultados=False):
+    """Liquida una secuencia de lotes (p. ej. los RecordBatch de KNIME) de uno en uno."""
+    for lote in lotes:
+        if hasattr(lote, 'to_pyarrow'):         # lote de knime.scripting.io
+            lote = lote.to_pyarrow()
+        yield liquidar_tabla(lote, ano_gravable, solo_resultados)
+
+
+# --- ARCHIVOS ARROW / PARQUET ---
+
+def _es_parquet(ruta):
+    return str(ruta).lower().endswith(('.parquet', '.pq'))
+
+
+def leer_tabla(ruta):
+    """Lee una tabla Arrow IPC (Feather) o Parquet con pyarrow."""
+    pa = _importar_pyarrow()
+    if _es_parquet(ruta):
+        import pyarrow.parquet
+        return pyarrow.parquet.read_table(ruta)
+    import pyarrow.feather
+    return pa.feather.read_table(ruta, memory_map=True)
+
+
+def escribir_tabla(tabla, ruta):
+    pa = _importar_pyarrow()
+    if _es_parquet(ruta):
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(tabla, ruta)
+    else:
+        import pyarrow.feather
+        pa.feather.write_feather(tabla, ruta)
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        description="Liquida una tabla Arrow (Feather) o Parquet como lo haría el nodo de KNIME.")
+    parser.add_argument('entrada', help="Archivo .arrow/.feather o .parquet")
+    parser.add_argument('salida', help="Archivo de salida (.arrow/.feather o .parquet)")
+    parser.add_argument('--ano-gravable', type=int, default=ANO_GRAVABLE_POR_DEFECTO,
+                        help="Año gravable de las filas sin columna ANO GRAVABLE")
+    parser.add_argument('--solo-resultados', action='store_true',
+                        help="No copiar las columnas de entrada a la salida")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    tabla = liquidar_tabla(leer_tabla(args.entrada), args.ano_gravable, args.solo_resultados)
+    escribir_tabla(tabla, args.salida)
+    print(f"{tabla.num_rows} contribuyentes liquidados -> {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
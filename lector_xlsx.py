@@ -0,0 +1,553 @@
+"""
+LECTOR XLSX POR FLUJO CON MEMORIA ACOTADA
+Personas Naturales Residentes Fiscales - Colombia
+
+Lee la hoja de un libro .xlsx ("ESTRUCTURA DATOS DE ENTRADA.xlsx",
+"ARCHIVO ESTRUCTURA RENTA TABLE CREATOR.xlsx" o una exportación grande)
+sin cargarla como árbol: el XML de la hoja se descomprime del zip por
+trozos y pasa por un analizador incremental (`XMLPullParser`); cada fila
+se convierte al cerrarse y se descarta, así que en memoria solo hay un
+trozo y una fila.
+
+- Cadenas compartidas (xl/sharedStrings.xml): se leen por flujo una vez;
+  las primeras MAX_CADENAS_EN_MEMORIA quedan en una lista y las demás en
+  un archivo temporal con sus posiciones, leídas bajo demanda con caché.
+- Tipos de celda como `openpyxl` en modo `read_only, data_only`: número
+  (int o float), texto, booleano, error, fecha según el formato del
+  estilo (fechas 1900 o 1904) y fórmulas con su último valor calculado.
+- `leer_filas` genera tuplas como `iter_rows(values_only=True)`;
+  `leer_bloques` mapea los encabezados (SALARIOS, INCR PENSIONES, GMF...)
+  a las claves del motor una sola vez y entrega bloques de columnas
+  float64 listos para `motor_vectorizado.calcular_impuesto_renta_lote`.
+
+Uso:
+    python lector_xlsx.py entrada.xlsx -o entrada.csv
+    python lector_xlsx.py libro.xlsx --hoja "Hoja1" > hoja.csv
+"""
+
+import argparse
+import csv
+import posixpath
+import re
+import sys
+import tempfile
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from datetime import datetime, time as hora, timedelta
+from functools import lru_cache
+from operator import itemgetter
+
+import numpy as np
+
+import motor_vectorizado as motor
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO
+
+TAMANO_LECTURA = 1 << 16                 # bytes de XML por lectura del zip
+MAX_CADENAS_EN_MEMORIA = 1 << 17         # cadenas compartidas fuera del disco
+TAMANO_CACHE_CADENAS = 1 << 14
+TAMANO_BLOQUE_POR_DEFECTO = 10000
+
+EPOCA_1900 = datetime(1899, 12, 30)
+EPOCA_1904 = datetime(1904, 1, 1)
+SEGUNDOS_POR_DIA = 86400
+
+# Formatos de número predefinidos de Excel que son fechas u horas
+FORMATOS_FECHA_PREDEFINIDOS = frozenset([*range(14, 23), 45, 46, 47])
+FORMATOS_DURACION_PREDEFINIDOS = frozenset([46])
+
+# Texto de formato entre comillas y corchetes que no son duraciones ([h], [mm], [ss])
+_FORMATO_LITERAL = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_FORMATO_FECHA = re.compile(r'(?<![_\\])[dmhysDMHYS]')
+_FORMATO_DURACION = re.compile(r'\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?')
+
+
+# --- ESTRUCTURA DEL LIBRO ---
+
+def _local(nombre):
+    """Nombre de una etiqueta o atributo sin el espacio de nombres ('{...}sheet' -> 'sheet')."""
+    return nombre.rpartition('}')[2]
+
+
+def _espacio(elemento):
+    """Espacio de nombres de un elemento en la forma de ElementTree ('{...}' o '')."""
+    return elemento.tag[:elemento.tag.rfind('}') + 1]
+
+
+def _leer_xml(libro, nombre):
+    try:
+        return ET.fromstring(libro.read(nombre))
+    except KeyError:
+        return None
+
+
+def _hijos(raiz, nombre):
+    return [elemento for elemento in raiz.iter() if _local(elemento.tag) == nombre]
+
+
+def es_xlsx(ruta):
+    return str(ruta).lower().endswith(('.xlsx', '.xlsm'))
+
+
+def _ruta_hoja(libro, hoja=0):
+    """Nombre del XML de la hoja dentro del zip (por nombre o por posición)."""
+    raiz = _leer_xml(libro, 'xl/workbook.xml')
+    if raiz is None:
+        raise ValueError("El archivo no es un libro de Excel (falta xl/workbook.xml)")
+    hojas = _hijos(raiz, 'sheet')
+    if not hojas:
+        raise ValueError("El libro no tiene hojas")
+    if isinstance(hoja, int):
+        if not -len(hojas) <= hoja < len(hojas):
+            raise ValueError(f"El libro tiene {len(hojas)} hojas; no existe la hoja {hoja}")
+        elegida = hojas[hoja]
+    else:
+        elegida = next((h for h in hojas if h.get('name') == hoja), None)
+        if elegida is None:
+            nombres = ', '.join(h.get('name', '') for h in hojas)
+            raise ValueError(f"El libro no tiene la hoja '{hoja}' (hojas: {nombres})")
+    identificador = next((valor for clave, valor in elegida.attrib.items() if _local(clave) == 'id'), None)
+
+    relaciones = _leer_xml(libro, 'xl/_rels/workbook.xml.rels')
+    for relacion in _hijos(relaciones, 'Relationship') if relaciones is not None else ():
+        if relacion.get('Id') == identificador:
+            destino = relacion.get('Target')
+            if destino.startswith('/'):
+                return destino.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', destino))
+    # Libros sin relaciones: el nombre convencional
+    posicion = hojas.index(elegida) + 1
+    return f'xl/worksheets/sheet{posicion}.xml'
+
+
+def _es_1904(libro):
+    raiz = _leer_xml(libro, 'xl/workbook.xml')
+    propiedades = _hijos(raiz, 'workbookPr') if raiz is not None else []
+    return bool(propiedades) and propiedades[0].get('date1904') in ('1', 'true')
+
+
+def es_formato_fecha(codigo):
+    """True si el código de formato de número muestra una fecha u hora."""
+    codigo = _FORMATO_LITERAL.sub('', codigo.split(';')[0])
+    return _FORMATO_FECHA.search(codigo) is not None
+
+
+def _estilos_fecha(libro):
+    """(estilos con formato de fecha, estilos con formato de duración), por índice de cellXfs."""
+    raiz = _leer_xml(libro, 'xl/styles.xml')
+    if raiz is None:
+        return frozenset(), frozenset()
+    propios = {int(formato.get('numFmtId')): formato.get('formatCode', '')
+               for formato in _hijos(raiz, 'numFmt')}
+
+    fechas, duraciones = set(), set()
+    for celdas in _hijos(raiz, 'cellXfs')[:1]:
+        xfs = [xf for xf in celdas if _local(xf.tag) == 'xf']
+        for indice, xf in enumerate(xfs):
+            formato = int(xf.get('numFmtId', 0))
+            if formato in propios:
+                if es_formato_fecha(propios[formato]):
+                    fechas.add(str(indice))
+                    if _FORMATO_DURACION.search(propios[formato].split(';')[0]):
+                        duraciones.add(str(indice))
+            elif formato in FORMATOS_FECHA_PREDEFINIDOS:
+                fechas.add(str(indice))
+                if formato in FORMATOS_DURACION_PREDEFINIDOS:
+                    duraciones.add(str(indice))
+    return frozenset(fechas), frozenset(duraciones)
+
+
+# --- LECTURA POR FLUJO ---
+
+def _eventos(archivo, eventos=('start', 'end')):
+    """Genera los eventos de `XMLPullParser` de un XML leído por trozos."""
+    analizador = ET.XMLPullParser(eventos)
+    for datos in iter(lambda: archivo.read(TAMANO_LECTURA), b''):
+        analizador.feed(datos)
+        yield from analizador.read_events()
+    analizador.close()
+    yield from analizador.read_events()
+
+
+def _texto(elemento, espacio):
+    """
+    Texto de un <si> o <is>: su <t> o los <t> de sus tramos <r> (sin la
+    guía fonética <rPh>), como `Text.content` de openpyxl.
+    """
+    etiqueta_t, etiqueta_r = espacio + 't', espacio + 'r'
+    partes = []
+    for hijo in elemento:
+        if hijo.tag == etiqueta_t:
+            partes.append(hijo.text or '')
+        elif hijo.tag == etiqueta_r:
+            t = hijo.find(etiqueta_t)
+            if t is not None:
+                partes.append(t.text or '')
+    return ''.join(partes)
+
+
+class CadenasCompartidas:
+    """
+    Tabla de xl/sharedStrings.xml con memoria acotada: las primeras
+    `max_en_memoria` cadenas en una lista y las demás en un archivo
+    temporal (texto UTF-8 y posiciones), con una caché LRU.
+    """
+
+    def __init__(self, libro, nombre='xl/sharedStrings.xml', max_en_memoria=MAX_CADENAS_EN_MEMORIA):
+        self.en_memoria = []
+        self.en_disco = 0
+        self._datos = self._posiciones = None
+        if nombre not in libro.namelist():
+            return
+        self._leer_disco = lru_cache(maxsize=TAMANO_CACHE_CADENAS)(self._leer_disco)
+        with libro.open(nombre) as archivo:
+            raiz = etiqueta_si = espacio = None
+            for evento, elemento in _eventos(archivo):
+                if raiz is None:
+                    raiz, espacio = elemento, _espacio(elemento)
+                    etiqueta_si = espacio + 'si'
+                elif evento == 'end' and elemento.tag == etiqueta_si:
+                    self._agregar(_texto(elemento, espacio), max_en_memoria)
+                    raiz.clear()
+        if self._datos is not None:
+            self._posiciones.extend([self._datos.tell()])
+            self._posiciones.tofile(self._indice)
+            self._datos.flush()
+            self._posiciones = None
+
+    def _agregar(self, cadena, max_en_memoria):
+        if len(self.en_memoria) < max_en_memoria:
+            self.en_memoria.append(cadena)
+            return
+        if self._datos is None:
+            self._datos = tempfile.TemporaryFile()
+            self._indice = tempfile.TemporaryFile()
+            self._posiciones = array('q')
+        self._posiciones.append(self._datos.tell())
+        self._datos.write(cadena.encode('utf-8'))
+        if len(self._posiciones) >= 1 << 16:
+            self._posiciones.tofile(self._indice)
+            del self._posiciones[:]
+        self.en_disco += 1
+
+    def _leer_disco(self, posicion):
+        self._indice.seek(posicion * 8)
+        inicio, fin = array('q', self._indice.read(16))
+        self._datos.seek(inicio)
+        return self._datos.read(fin - inicio).decode('utf-8')
+
+    def __len__(self):
+        return len(self.en_memoria) + self.en_disco
+
+    def __getitem__(self, indice):
+        if indice < len(self.en_memoria):
+            return self.en_memoria[indice]
+        if not indice - len(self.en_memoria) < self.en_disco:
+            raise IndexError(f"Cadena compartida {indice} fuera de la tabla ({len(self)})")
+        return self._leer_disco(indice - len(self.en_memoria))
+
+    def cerrar(self):
+        if self._datos is not None:
+            self._datos.close()
+            self._indice.close()
+            self._datos = None
+
+
+@lru_cache(maxsize=None)
+def indice_columna(letras):
+    """'A' -> 0, 'Z' -> 25, 'AA' -> 26."""
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+
+def _numero(texto):
+    if '.' in texto or 'E' in texto or 'e' in texto:
+        return float(texto)
+    return int(texto)
+
+
+def desde_serial_excel(serial, epoca=EPOCA_1900, duracion=False):
+    """Fecha de un serial de Excel (como openpyxl.utils.datetime.from_excel)."""
+    if duracion:
+        delta = timedelta(days=serial)
+        if delta.microseconds:
+            delta = timedelta(seconds=delta.total_seconds() // 1, microseconds=round(delta.microseconds, -3))
+        return delta
+    dia, fraccion = divmod(serial, 1)
+    diferencia = timedelta(milliseconds=round(fraccion * SEGUNDOS_POR_DIA * 1000))
+    if 0 <= serial < 1 and diferencia.days == 0:
+        segundos = diferencia.seconds
+        return hora(segundos // 3600, segundos // 60 % 60, segundos % 60, diferencia.microseconds)
+    if 0 < serial < 60 and epoca == EPOCA_1900:
+        dia += 1                # 1900 no fue bisiesto (herencia de Lotus 1-2-3)
+    return epoca + timedelta(days=dia) + diferencia
+
+
+def _valor_celda(celda, espacio, cadenas, fechas, duraciones, epoca):
+    """Valor de un elemento <c> con los tipos de openpyxl (data_only)."""
+    tipo = celda.get('t', 'n')
+    if tipo == 'inlineStr':
+        en_linea = celda.find(espacio + 'is')
+        return None if en_linea is None else _texto(en_linea, espacio)
+    valor = celda.findtext(espacio + 'v') or None
+    if valor is None:
+        return None
+    if tipo == 'n':
+        valor = int(valor) if valor.isdigit() else _numero(valor)
+        estilo = celda.get('s')
+        if estilo in fechas:
+            return desde_serial_excel(valor, epoca, estilo in duraciones)
+        return valor
+    if tipo == 's':
+        return cadenas[int(valor)]
+    if tipo == 'b':
+        return bool(int(valor))
+    if tipo == 'd':
+        return datetime.fromisoformat(valor.strip().rstrip('Z'))
+    return valor            # str (fórmula de texto) o e (error)
+
+
+def _filas_de_hoja(archivo, cadenas, fechas, duraciones, epoca):
+    """Genera (número de fila, lista de valores por columna) de cada fila de la hoja."""
+    espacio = etiqueta_fila = etiqueta_celda = datos = None
+    posiciones = {}
+    numero = 0
+    for evento, elemento in _eventos(archivo):
+        if espacio is None:
+            espacio = _espacio(elemento)
+            etiqueta_fila, etiqueta_celda = espacio + 'row', espacio + 'c'
+            etiqueta_datos, etiqueta_valor = espacio + 'sheetData', espacio + 'v'
+        if evento == 'start':
+            if elemento.tag == etiqueta_datos:
+                datos = elemento
+            continue
+        if elemento.tag != etiqueta_fila:
+            continue
+        referencia = elemento.get('r')
+        numero = int(referencia) if referencia else numero + 1
+        fila = []
+        for celda in elemento:
+            if celda.tag != etiqueta_celda:
+                continue
+            tipo = celda.get('t')
+            if tipo is None or tipo == 'n':     # caso común, sin llamar a _valor_celda
+                valor = celda.findtext(etiqueta_valor) or None
+                if valor is not None:
+                    valor = int(valor) if valor.isdigit() else _numero(valor)
+                    estilo = celda.get('s')
+                    if estilo in fechas:
+                        valor = desde_serial_excel(valor, epoca, estilo in duraciones)
+            else:
+                valor = _valor_celda(celda, espacio, cadenas, fechas, duraciones, epoca)
+            referencia = celda.get('r')
+            if referencia:
+                letras = referencia.rstrip('0123456789')
+                columna = posiciones.get(letras)
+                if columna is None:
+                    columna = posiciones[letras] = indice_columna(letras)
+            else:
+                columna = len(fila)
+            if columna == len(fila):
+                fila.append(valor)
+            elif columna > len(fila):
+                fila.extend([None] * (columna - len(fila)))
+                fila.append(valor)
+            else:
+                fila[columna] = valor
+        # La fila ya convertida no se conserva en el árbol
+        if datos is not None:
+            datos.clear()
+        else:
+            elemento.clear()
+        yield numero, fila
+
+
+def _dimension(libro, nombre):
+    with libro.open(nombre) as archivo:
+        for evento, elemento in _eventos(archivo, ('start',)):
+            etiqueta = _local(elemento.tag)
+            if etiqueta == 'dimension':
+                referencia = elemento.get('ref', '')
+                break
+            if etiqueta == 'sheetData':
+                return None
+        else:
+            return None
+    ultima = referencia.split(':')[-1].replace('$', '')
+    letras = ultima.rstrip('0123456789')
+    if not letras or letras == ultima:
+        return None
+    return int(ultima[len(letras):]), indice_columna(letras) + 1
+
+
+def dimension(ruta, hoja=0):
+    """(filas, columnas) de la referencia <dimension> de la hoja, o None si no la trae."""
+    with zipfile.ZipFile(ruta) as libro:
+        return _dimension(libro, _ruta_hoja(libro, hoja))
+
+
+def leer_filas(ruta, hoja=0):
+    """
+    Genera las filas de una hoja (la primera por defecto) como tuplas de
+    valores, igual que `iter_rows(values_only=True)` de openpyxl: todas
+    del ancho de la hoja y con las filas intermedias vacías en None.
+    """
+    with zipfile.ZipFile(ruta) as libro:
+        nombre = _ruta_hoja(libro, hoja)
+        fechas, duraciones = _estilos_fecha(libro)
+        epoca = EPOCA_1904 if _es_1904(libro) else EPOCA_1900
+        ancho = (_dimension(libro, nombre) or (0, 0))[1]
+        vacia = (None,) * ancho
+        cadenas = CadenasCompartidas(libro)
+        try:
+            with libro.open(nombre) as archivo:
+                anterior = 0
+                for numero, fila in _filas_de_hoja(archivo, cadenas, fechas, duraciones, epoca):
+                    for _ in range(numero - anterior - 1):
+                        yield vacia
+                    anterior = numero
+                    if len(fila) < ancho:
+                        fila.extend(vacia[len(fila):])
+                    yield tuple(fila)
+        finally:
+            cadenas.cerrar()
+
+
+# --- BLOQUES TIPADOS PARA EL MOTOR ---
+
+def _fila_vacia(fila):
+    return all(celda is None or str(celda).strip() == '' for celda in fila)
+
+
+def _columna_float(celdas, por_defecto, inicio, concepto):
+    """Arreglo float64 de una columna cruda; las celdas vacías valen `por_defecto`."""
+    try:
+        valores = np.array(celdas, dtype=np.float64)      # None -> NaN
+    except (TypeError, ValueError):
+        from lote_renta import convertir_valor
+
+        valores = np.empty(len(celdas))
+        for posicion, celda in enumerate(celdas):
+            try:
+                valor = convertir_valor(celda)
+            except (TypeError, ValueError):
+                raise ValueError(f"Contribuyente {inicio + posicion}: valor no numérico en "
+                                 f"'{concepto}': {celda!r}") from None
+            valores[posicion] = np.nan if valor is None else valor
+        vacias = np.isnan(valores)
+    else:
+        vacias = np.isnan(valores)
+        for posicion in np.flatnonzero(vacias).tolist():
+            if celdas[posicion] is not None:    # 'nan' escrito en la celda no es un valor
+                raise ValueError(f"Contribuyente {inicio + posicion}: valor no numérico en "
+                                 f"'{concepto}': {celdas[posicion]!r}")
+    valores[vacias] = por_defecto
+    return valores
+
+
+def _bloque_tipado(inicio, filas, indices, ano_gravable):
+    crudas = dict(zip(indices, zip(*map(itemgetter(*indices.values()), filas))))
+    n = len(filas)
+    nits = crudas.get('nit', ('',) * n)
+    nombres = crudas.get('nombre', ('',) * n)
+    identificacion = [(nit or '', nombre or '') for nit, nombre in zip(nits, nombres)]
+    columnas = {}
+    if 'ano_gravable' in crudas:
+        anos = _columna_float(crudas['ano_gravable'], ano_gravable, inicio, 'ano_gravable')
+        columnas['ano_gravable'] = anos.astype(np.int64)
+    else:
+        columnas['ano_gravable'] = np.full(n, ano_gravable, dtype=np.int64)
+    for concepto in motor.CONCEPTOS_ENTRADA:
+        por_defecto = motor.VALORES_POR_DEFECTO[concepto]
+        if concepto in crudas:
+            columnas[concepto] = _columna_float(crudas[concepto], por_defecto, inicio, concepto)
+        else:
+            columnas[concepto] = np.full(n, por_defecto, dtype=np.float64)
+    return inicio, identificacion, columnas
+
+
+def leer_bloques(ruta, tamano_bloque=TAMANO_BLOQUE_POR_DEFECTO, ano_gravable=ANO_GRAVABLE_POR_DEFECTO, hoja=0):
+    """
+    Genera (número del primer contribuyente, identificacion, columnas) por
+    bloque, como `lote_renta.columnas_de_bloque` pero con columnas numpy
+    (`ano_gravable` int64 y los conceptos del motor float64). En formato
+    tabla los encabezados se mapean una vez y cada columna se convierte de
+    un solo paso; la plantilla concepto/valor (un contribuyente por
+    columna) pasa por `lote_renta.registros_desde_filas`.
+    """
+    import lote_renta
+
+    filas = leer_filas(ruta, hoja)
+    encabezados = next((f for f in filas if not _fila_vacia(f)), None)
+    if encabezados is None:
+        return
+    indices = {}
+    for posicion, celda in enumerate(encabezados):
+        clave = lote_renta.clave_de_concepto(celda)
+        if clave and clave not in indices:
+            indices[clave] = posicion
+
+    if len(indices) < 2:
+        registros = lote_renta.registros_desde_filas([encabezados, *filas])
+        for bloque in lote_renta.agrupar_en_bloques(registros, tamano_bloque):
+            identificacion, columnas = lote_renta.columnas_de_bloque(bloque, ano_gravable)
+            yield bloque[0], identificacion, {
+                clave: np.asarray(valores, dtype=np.int64 if clave == 'ano_gravable' else np.float64)
+                for clave, valores in columnas.items()}
+        return
+
+    ancho = max(indices.values()) + 1
+    relleno = (None,) * ancho
+    inicio = 1
+    bloque = []
+    for fila in filas:
+        if _fila_vacia(fila):
+            continue
+        bloque.append(fila if len(fila) >= ancho else fila + relleno[len(fila):])
+        if len(bloque) >= tamano_bloque:
+            yield _bloque_tipado(inicio, bloque, indices, ano_gravable)
+            inicio += len(bloque)
+            bloque = []
+    if bloque:
+        yield _bloque_tipado(inicio, bloque, indices, ano_gravable)
+
+
+# --- LÍNEA DE COMANDOS ---
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        description="Convierte una hoja de un libro XLSX a CSV leyendo el XML por flujo.")
+    parser.add_argument('entrada', help="Libro .xlsx o .xlsm")
+    parser.add_argument('-o', '--salida', help="Archivo CSV de salida (por defecto la salida estándar)")
+    parser.add_argument('--hoja', default='0',
+                        help="Nombre o posición (desde 0) de la hoja (por defecto la primera)")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    hoja = int(args.hoja) if args.hoja.lstrip('-').isdigit() else args.hoja
+    inicio = time.perf_counter()
+    salida = open(args.salida, 'w', newline='', encoding='utf-8') if args.salida else sys.stdout
+    filas = 0
+    try:
+        escritor = csv.writer(salida)
+        for fila in leer_filas(args.entrada, hoja):
+            escritor.writerow(fila)
+            filas += 1
+    except (OSError, ValueError, zipfile.BadZipFile) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        if args.salida:
+            salida.close()
+    segundos = time.perf_counter() - inicio
+    print(f"Filas: {filas} en {segundos:.2f} s ({filas / max(segundos, 1e-9):,.0f} filas/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
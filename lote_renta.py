@@ -0,0 +1,793 @@
+"""
+LIQUIDACIÓN POR LOTES SIN INTERACCIÓN - IMPUESTO DE RENTA
+Personas Naturales Residentes Fiscales - Colombia
+
+Lee contribuyentes desde CSV o XLSX con los conceptos de
+"ESTRUCTURA DATOS DE ENTRADA.xlsx" (SALARIOS, CESANTIAS PAGADAS O
+CONSIGNADAS AL FONDO, ..., NUMERO DE AÑOS QUE LLEVA DECLARANDO), los
+liquida por bloques con el motor vectorizado y escribe una fila de
+resultados por contribuyente.
+
+Formatos de entrada aceptados:
+- Tabla: la primera fila trae los conceptos como encabezados y cada fila
+  siguiente es un contribuyente. Se procesa fila a fila con memoria acotada.
+- Concepto/valor: la primera columna trae los conceptos y cada columna
+  siguiente es un contribuyente (el formato de la plantilla de Excel).
+
+Uso:
+    python lote_renta.py entrada.csv -o resultados.csv
+    python lote_renta.py entrada.xlsx --tamano-bloque 50000 > resultados.csv
+    python lote_renta.py entrada.csv -o resultados.csv --procesos 8
+    python lote_renta.py entrada.csv -o resultados.csv --perfil-json perfil.json
+    python lote_renta.py entrada.csv -o resultados.csv --auditoria traza.npz
+    python lote_renta.py entrada.csv -o resultados.csv --cache resultados.sqlite
+    python lote_renta.py entrada.csv -o resultados.csv --historial historial.sqlite
+    python lote_renta.py certificados.csv -o resultados.csv --certificados
+    python lote_renta.py entrada.csv -o resultados.csv --validacion errores.csv
+"""
+
+import argparse
+import csv
+import io
+import math
+import os
+import sys
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import auditoria
+import cache_resultados
+import historial as historial_declaraciones
+import lector_xlsx
+import motor_vectorizado as motor
+import perfilado
+import validacion
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO, anos_disponibles
+
+TAMANO_BLOQUE_POR_DEFECTO = 10000
+
+# Conceptos de la plantilla de Excel -> claves del motor
+CONCEPTOS_PLANTILLA = {
+    'NOMBRES Y APELLIDO DEL CONTRIBUYENTE': 'nombre',
+    'NUMERO DE IDENTIFICACION TRIBUTARIA': 'nit',
+    'SALARIOS': 'salarios',
+    'CESANTIAS PAGADAS O CONSIGNADAS AL FONDO': 'cesantias',
+    'PRESTACIONES SOCIALES': 'prestaciones_sociales',
+    'OTROS PAGOS LABORALES': 'otros_pagos_laborales',
+    'INGRESO MENSUAL PROMEDIO DE LOS ULTIMOS SEIS MESES': 'ingreso_mensual_promedio',
+    'INCRGO SALUD': 'incr_salud',
+    'INCR SALUD': 'incr_salud',
+    'INCR PENSIONES': 'incr_pensiones',
+    'RENTAS EXENTA PENSION VOLUNTARIA': 'pension_voluntaria',
+    'RENTA EXENTA AFC': 'afc',
+    'NUMERO DE DEPENDIENTES DEL EMPLEADO': 'num_dependientes',
+    'DEDUCCION INTERESES VIVIENDA': 'intereses_vivienda',
+    'DEDUCCION MEDICINA PREPAGADA': 'medicina_prepagada',
+    'VALOR COMPRAS CON FACTURA ELECTRONICA': 'compras_factura_electronica',
+    'GMF': 'gmf',
+    'IMPUESTO NETO DE RENTA ANO ANTERIOR': 'impuesto_neto_anterior',
+    'SALDO A FAVOR SIN SOLICITUD DE DEVOLUCION O COMPENSACION': 'saldo_favor_anterior',
+    'RETENCIONES QUE LE PRACTICARON': 'retenciones',
+    'ANTICIPO DEL ANO ANTERIOR': 'anticipo_anterior',
+    'NUMERO DE ANOS QUE LLEVA DECLARANDO': 'num_anos_declarando',
+    'ANO GRAVABLE': 'ano_gravable',
+}
+
+COLUMNAS_IDENTIFICACION = ('nit', 'nombre', 'ano_gravable')
+
+
+# --- LECTURA ---
+
+def normalizar_concepto(texto):
+    """Normaliza un encabezado: mayúsculas, sin tildes ni espacios sobrantes."""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.upper().split())
+
+
+def clave_de_concepto(texto):
+    """Retorna la clave del motor para un encabezado, o None si no aplica."""
+    if texto is None:
+        return None
+    normalizado = normalizar_concepto(texto)
+    if normalizado in CONCEPTOS_PLANTILLA:
+        return CONCEPTOS_PLANTILLA[normalizado]
+    # También se aceptan directamente las claves del motor (salarios, afc, ...)
+    clave = str(texto).strip().lower()
+    if clave in motor.CONCEPTOS_ENTRADA or clave in COLUMNAS_IDENTIFICACION:
+        return clave
+    return None
+
+
+def _miles_bien_ubicados(entero, separador):
+    """"80.845.738": un primer grupo de 1 a 3 dígitos y los demás de 3."""
+    grupos = entero.split(separador)
+    return 1 <= len(grupos[0]) <= 3 and all(len(grupo) == 3 for grupo in grupos[1:])
+
+
+def convertir_valor(valor):
+    """
+    Convierte una celda a float; las celdas vacías valen None.
+
+    Los textos se normalizan como en `solicitar_valor`: se quitan "$" y
+    espacios, y "." o "," separan miles ("845.738" y "80.845.738" valen
+    845738 y 80845738). Solo se leen decimales cuando no pueden ser miles:
+    tras el último separador si aparecen los dos ("1.234,56", "1,234.56"),
+    o tras uno solo seguido de 1, 2 o más de 3 dígitos ("1234,5") o
+    precedido de 0 ("0.125"). Un texto ambiguo ("1234.567", "1.23.456")
+    se rechaza con ValueError.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        try:
+            numero = float(valor)
+        except OverflowError:       # entero más grande que cualquier float
+            numero = math.inf
+        if not math.isfinite(numero):
+            raise ValueError(f"{valor!r} no es un número finito")
+        return numero
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    try:
+        numero = float(texto)
+    except ValueError:
+        pass
+    else:
+        if '.' not in texto:        # con punto puede ser de miles: se revisa abajo
+            if not math.isfinite(numero):
+                raise ValueError(f"{texto!r} no es un número finito")
+            return numero
+    limpio = texto.replace('$', '').replace(' ', '').replace('\xa0', '')
+    signo = ''
+    if limpio[:1] in ('-', '+'):
+        signo, limpio = limpio[0], limpio[1:]
+    if ('.' not in limpio and ',' not in limpio) or ('e' in limpio.lower() and ',' not in limpio):
+        # Sin separadores o en notación científica ("1.5e6"): float() decide
+        try:
+            numero = float(signo + limpio)
+        except ValueError:
+            raise ValueError(f"{texto!r} no es un número") from None
+        if not math.isfinite(numero):
+            raise ValueError(f"{texto!r} no es un número finito")
+        return numero
+    if not (limpio.replace('.', '').replace(',', '').isdigit() and limpio[0].isdigit() and limpio[-1].isdigit()):
+        raise ValueError(f"{texto!r} no es un número")
+
+    ultimo = max(limpio.rfind('.'), limpio.rfind(','))
+    decimal = limpio[ultimo]
+    miles = ',' if decimal == '.' else '.'
+    entero, fraccion = limpio[:ultimo], limpio[ultimo + 1:]
+    if miles in limpio:
+        # Los dos separadores: el último es el decimal y aparece una sola vez
+        if decimal in entero or not _miles_bien_ubicados(entero, miles):
+            raise ValueError(f"{texto!r}: separadores de miles y decimales ambiguos")
+        return float(f"{signo}{entero.replace(miles, '')}.{fraccion}")
+    if decimal in entero:
+        # Un solo separador, repetido: miles
+        if not _miles_bien_ubicados(limpio, decimal):
+            raise ValueError(f"{texto!r}: separadores de miles mal ubicados")
+        return float(signo + limpio.replace(decimal, ''))
+    if len(fraccion) == 3 and entero.strip('0'):
+        if len(entero) > 3:
+            raise ValueError(f"{texto!r}: ambiguo, ¿separador de miles o decimal?")
+        return float(signo + entero + fraccion)
+    return float(f"{signo}{entero}.{fraccion}")
+
+
+def leer_filas_csv(ruta):
+    """Genera las filas de un CSV como listas de celdas."""
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        muestra = archivo.read(4096)
+        archivo.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.reader(archivo, dialecto)
+
+
+def leer_filas_xlsx(ruta):
+    """Genera las filas de la primera hoja de un XLSX (por flujo, con memoria acotada)."""
+    return lector_xlsx.leer_filas(ruta)
+
+
+def leer_filas(ruta):
+    """Genera las filas del archivo de entrada según su extensión."""
+    if lector_xlsx.es_xlsx(ruta):
+        return leer_filas_xlsx(ruta)
+    return leer_filas_csv(ruta)
+
+
+def _fila_vacia(fila):
+    return all(celda is None or str(celda).strip() == '' for celda in fila)
+
+
+def registros_desde_filas(filas):
+    """
+    Convierte filas crudas en registros {clave: valor}, detectando si el
+    archivo viene en formato tabla o concepto/valor.
+    """
+    filas = iter(filas)
+    primera = next((f for f in filas if not _fila_vacia(f)), None)
+    if primera is None:
+        return
+
+    reconocidos = sum(1 for celda in primera if clave_de_concepto(celda))
+    if reconocidos >= 2:
+        yield from _registros_tabla(primera, filas)
+    else:
+        yield from _registros_concepto_valor(primera, filas)
+
+
+def _registros_tabla(encabezados, filas):
+    """Formato tabla: un contribuyente por fila."""
+    mapa = [(i, clave_de_concepto(celda)) for i, celda in enumerate(encabezados)]
+    mapa = [(i, clave) for i, clave in mapa if clave]
+    for fila in filas:
+        if _fila_vacia(fila):
+            continue
+        yield {clave: fila[i] if i < len(fila) else None for i, clave in mapa}
+
+
+def _registros_concepto_valor(primera, filas):
+    """Formato concepto/valor: un contribuyente por columna (plantilla de Excel)."""
+    registros = []
+    for fila in [primera, *filas]:
+        clave = clave_de_concepto(fila[0]) if fila else None
+        if not clave:
+            continue
+        for j, valor in enumerate(fila[1:]):
+            while len(registros) <= j:
+                registros.append({})
+            registros[j][clave] = valor
+    for registro in registros:
+        if any(not _fila_vacia([v]) for v in registro.values()):
+            yield registro
+
+
+def agrupar_en_bloques(registros, tamano_bloque=TAMANO_BLOQUE_POR_DEFECTO):
+    """
+    Agrupa los registros en bloques de tamaño fijo. Cada bloque es
+    (numero_primer_registro, lista de registros) para poder reportar errores
+    con la posición del contribuyente dentro del archivo.
+    """
+    inicio = 1
+    bloque = []
+    for registro in registros:
+        bloque.append(registro)
+        if len(bloque) >= tamano_bloque:
+            yield inicio, bloque
+            inicio += len(bloque)
+            bloque = []
+    if bloque:
+        yield inicio, bloque
+
+
+def _ano_de_registro(registro, ano_por_defecto):
+    valor = convertir_valor(registro.get('ano_gravable'))
+    return ano_por_defecto if valor is None else int(valor)
+
+
+def _ano_liquidable(registro, ano_por_defecto, disponibles):
+    """Año gravable del registro, o None si no es un número o no está en `disponibles`."""
+    try:
+        ano = _ano_de_registro(registro, ano_por_defecto)
+    except ValueError:
+        return None
+    return ano if ano in disponibles else None
+
+
+def describir_no_numerico(numero, concepto, celda):
+    """Mensaje de una celda que no se pudo convertir (con el motivo de `convertir_valor`)."""
+    motivo = f"{celda!r}"
+    try:
+        convertir_valor(celda)
+    except ValueError as e:
+        motivo = str(e)
+    return f"Contribuyente {numero}: valor no numérico en '{concepto}': {motivo}"
+
+
+def rechazos_de_bloque(inicio, columnas, no_numericos):
+    """
+    Filas del bloque que no se pueden liquidar (celdas no numéricas o año
+    sin paquete de reglas), como lista de (posición, mensaje); una fila
+    con varias celdas no numéricas aparece una vez por celda.
+    """
+    rechazos = []
+    for posicion, concepto, celda in sorted(no_numericos, key=lambda error: error[0]):
+        rechazos.append((posicion, describir_no_numerico(inicio + posicion, concepto, celda)))
+    rechazadas = {posicion for posicion, _ in rechazos}
+    disponibles = set(anos_disponibles())
+    for posicion, ano in enumerate(columnas['ano_gravable']):
+        if ano not in disponibles and posicion not in rechazadas:
+            rechazos.append((posicion, f"Contribuyente {inicio + posicion}: año gravable {ano} sin paquete de reglas"))
+    return rechazos
+
+
+def _filas_rechazadas(inicio, columnas, no_numericos):
+    """
+    Posiciones de `rechazos_de_bloque`. Sin informe de validación, cada
+    una se reporta en stderr y la corrida sigue con las demás filas.
+    """
+    rechazos = rechazos_de_bloque(inicio, columnas, no_numericos)
+    for _, mensaje in rechazos:
+        print(mensaje + "; no se liquida", file=sys.stderr)
+    return {posicion for posicion, _ in rechazos}
+
+
+def columnas_de_bloque(bloque, ano_gravable=ANO_GRAVABLE_POR_DEFECTO, no_numericos=None):
+    """
+    Convierte un bloque de registros al formato columnar del motor.
+    Retorna (identificacion, columnas): identificacion es una lista de
+    (nit, nombre) y columnas un diccionario {concepto: lista de floats}
+    que incluye `ano_gravable` (el de cada registro, o el indicado).
+    Con la lista `no_numericos`, una celda no numérica no detiene la
+    corrida: se agrega (posición en el bloque, concepto, celda) a la lista
+    y el valor queda en NaN (el año gravable, en el indicado).
+    """
+    inicio, registros = bloque
+    identificacion = [(r.get('nit') or '', r.get('nombre') or '') for r in registros]
+    if no_numericos is None:
+        anos = [_ano_de_registro(r, ano_gravable) for r in registros]
+    else:
+        anos = []
+        for posicion, registro in enumerate(registros):
+            try:
+                anos.append(_ano_de_registro(registro, ano_gravable))
+            except ValueError:
+                no_numericos.append((posicion, 'ano_gravable', registro.get('ano_gravable')))
+                anos.append(ano_gravable)
+    columnas = {'ano_gravable': anos}
+    for concepto in motor.CONCEPTOS_ENTRADA:
+        por_defecto = motor.VALORES_POR_DEFECTO[concepto]
+        valores = []
+        for numero, registro in enumerate(registros, start=inicio):
+            try:
+                valor = convertir_valor(registro.get(concepto))
+            except ValueError:
+                if no_numericos is None:
+                    raise ValueError(describir_no_numerico(numero, concepto, registro.get(concepto))) from None
+                no_numericos.append((numero - inicio, concepto, registro.get(concepto)))
+                valor = float('nan')
+            valores.append(por_defecto if valor is None else valor)
+        columnas[concepto] = valores
+    return identificacion, columnas
+
+
+# --- LIQUIDACIÓN Y ESCRITURA ---
+
+def liquidar_bloque(bloque, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+    """
+    Liquida un bloque y retorna sus filas de salida (listas de celdas).
+    Con un informe de validación activo (validacion.py) solo se liquidan
+    y se retornan las filas válidas; sin él, las filas con celdas no
+    numéricas o sin paquete de reglas se reportan en stderr y se omiten.
+    """
+    marcar = perfilado.cronometro(len(bloque[1]))
+    informe = validacion.activo()
+    no_numericos = []
+    identificacion, columnas = columnas_de_bloque(bloque, ano_gravable, no_numericos)
+    if marcar:
+        marcar('lote.columnas')
+    numeros = bloque[0]
+    rechazadas = () if informe else _filas_rechazadas(bloque[0], columnas, no_numericos)
+    if informe or rechazadas:
+        columnas = {clave: np.asarray(valores, dtype=np.int64 if clave == 'ano_gravable' else np.float64)
+                    for clave, valores in columnas.items()}
+        if informe:
+            validas = informe.validar(bloque, identificacion, columnas, no_numericos)
+        else:
+            validas = np.ones(len(identificacion), dtype=bool)
+            validas[list(rechazadas)] = False
+        if not validas.all():
+            indices = np.flatnonzero(validas)
+            columnas = {clave: valores[indices] for clave, valores in columnas.items()}
+            identificacion = [identificacion[i] for i in indices.tolist()]
+            numeros = bloque[0] + indices
+        if marcar:
+            marcar('lote.validacion')
+        if not identificacion:
+            return []
+    resultados = motor.calcular_impuesto_renta_lote(columnas)
+    if marcar:
+        marcar('lote.motor')
+    traza = auditoria.activa()
+    if traza:
+        traza.agregar(numeros, [nit for nit, _ in identificacion], columnas, resultados)
+        if marcar:
+            marcar('lote.auditoria')
+    anos = columnas['ano_gravable']
+    filas = [[nit, nombre, ano, *celdas] for (nit, nombre), ano, celdas
+             in zip(identificacion, anos if isinstance(anos, list) else anos.tolist(),
+                    formatear_resultados(resultados))]
+    if marcar:
+        marcar('lote.formato')
+    return filas
+
+
+def formatear_resultados(resultados):
+    """Celdas de texto de COLUMNAS_RESULTADO de cada contribuyente (una tupla por fila)."""
+    columnas = []
+    for clave in motor.COLUMNAS_RESULTADO:
+        valores = resultados[clave].tolist()
+        if clave == 'es_saldo_favor':
+            columnas.append(['SI' if valor else 'NO' for valor in valores])
+        elif clave == 'base_gravable_uvt':
+            columnas.append([f"{valor:.2f}" for valor in valores])
+        else:
+            columnas.append([f"{valor:.0f}" for valor in valores])
+    return list(zip(*columnas))
+
+
+def liquidar_bloque_csv(bloque, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+    """
+    Liquida un bloque y retorna (texto CSV, filas, pid, segundos).
+    Es la unidad de trabajo de los procesos del modo paralelo.
+    """
+    inicio = time.perf_counter()
+    filas = liquidar_bloque(bloque, ano_gravable)
+    marcar = perfilado.cronometro(len(filas))
+    texto = io.StringIO()
+    csv.writer(texto).writerows(filas)
+    if marcar:
+        marcar('lote.csv')
+    return texto.getvalue(), len(filas), os.getpid(), time.perf_counter() - inicio
+
+
+def _liquidar_bloque_instrumentado(bloque, ano_gravable, perfilar=False, auditar=False, valores=False,
+                                   max_dependientes=None):
+    """
+    liquidar_bloque_csv en un proceso del pool con un perfil, una traza de
+    auditoría y/o un informe de validación (con `max_dependientes`)
+    propios. Agrega al final del resultado un diccionario {'etapas',
+    'auditoria', 'validacion'} para combinarlos en el proceso principal.
+    """
+    perfil = perfilado.activar() if perfilar else None
+    traza = auditoria.activar(auditoria.TrazaAuditoria(valores)) if auditar else None
+    informe = (validacion.activar(validacion.InformeValidacion(max_dependientes))
+               if max_dependientes is not None else None)
+    try:
+        resultado = liquidar_bloque_csv(bloque, ano_gravable)
+    finally:
+        perfilado.desactivar()
+        auditoria.desactivar()
+        validacion.desactivar()
+    return (*resultado, {'etapas': perfil.etapas if perfil else None,
+                         'auditoria': traza.bloques if traza else None,
+                         'validacion': informe.parcial() if informe else None})
+
+
+def liquidar_tramos_resultados(tramos, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+    """
+    Liquida una lista de tramos (numero_primer_registro, registros) y
+    retorna (celdas de resultado de cada contribuyente unidas por comas,
+    filas, pid, segundos). Es la unidad de trabajo del modo con caché: los
+    tramos son los contribuyentes de un bloque que no estaban en la caché.
+    Los que no se pueden liquidar (ver `_filas_rechazadas`) tienen None.
+    """
+    inicio = time.perf_counter()
+    columnas = {}
+    rechazadas = set()
+    for tramo in tramos:
+        no_numericos = []
+        desplazamiento = len(columnas.get('ano_gravable', ()))
+        _, parcial = columnas_de_bloque(tramo, ano_gravable, no_numericos)
+        rechazadas.update(desplazamiento + posicion
+                          for posicion in _filas_rechazadas(tramo[0], parcial, no_numericos))
+        for clave, valores in parcial.items():
+            columnas.setdefault(clave, []).extend(valores)
+    if rechazadas:
+        columnas = {clave: [valor for posicion, valor in enumerate(valores) if posicion not in rechazadas]
+                    for clave, valores in columnas.items()}
+    textos = []
+    if columnas and columnas['ano_gravable']:
+        textos = [','.join(celdas)
+                  for celdas in formatear_resultados(motor.calcular_impuesto_renta_lote(columnas))]
+    liquidados = len(textos)
+    for posicion in sorted(rechazadas):
+        textos.insert(posicion, None)
+    return textos, liquidados, os.getpid(), time.perf_counter() - inicio
+
+
+def encabezados_salida():
+    return [*COLUMNAS_IDENTIFICACION, *motor.COLUMNAS_RESULTADO]
+
+
+def liquidar_en_paralelo(bloques, procesos, ano_gravable, trabajo=liquidar_bloque_csv):
+    """
+    Reparte los bloques entre `procesos` procesos y entrega el resultado de
+    `trabajo(bloque, ano_gravable)` en el orden de entrada. Se mantienen a lo
+    sumo 2 bloques pendientes por proceso para que la memoria siga acotada
+    aunque la lectura sea más rápida que el cálculo.
+    """
+    max_pendientes = 2 * procesos
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        pendientes = deque()
+        for bloque in bloques:
+            pendientes.append(ejecutor.submit(trabajo, bloque, ano_gravable))
+            if len(pendientes) >= max_pendientes:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
+def liquidar_en_serie(bloques, ano_gravable, trabajo=liquidar_bloque_csv):
+    for bloque in bloques:
+        yield trabajo(bloque, ano_gravable)
+
+
+def procesar(filas, salida, tamano_bloque=TAMANO_BLOQUE_POR_DEFECTO, procesos=1,
+             ano_gravable=ANO_GRAVABLE_POR_DEFECTO, cache=None, historial=None):
+    """
+    Liquida todas las filas de entrada y escribe los resultados como CSV en
+    el flujo `salida`. Con `procesos` > 1 los bloques se liquidan en un pool
+    de procesos y la salida conserva el orden de entrada. Las filas sin
+    columna AÑO GRAVABLE se liquidan con las reglas de `ano_gravable`.
+    Retorna {pid: [contribuyentes, segundos]} con el trabajo de cada proceso.
+    Con un perfil (perfilado.py) o una traza de auditoría (auditoria.py)
+    activos se registran también los de los procesos del pool.
+    Con `cache` (CacheResultados) solo se liquidan los contribuyentes cuyas
+    entradas no están en la caché, y los nuevos resultados se guardan en ella.
+    Con `historial` (HistorialDeclaraciones) los conceptos del año anterior
+    vacíos se completan desde el historial y los resultados se guardan en él.
+    Con un informe de validación activo (validacion.py) las filas con
+    errores se reportan en el informe y no se liquidan.
+    """
+    perfil = perfilado.activo()
+    traza = auditoria.activa()
+    informe = validacion.activo()
+    csv.writer(salida).writerow(encabezados_salida())
+    bloques = agrupar_en_bloques(registros_desde_filas(filas), tamano_bloque)
+    bloques = perfilado.medir_iterador(bloques, 'lote.lectura', lambda bloque: len(bloque[1]))
+    if informe is not None:
+        bloques = informe.revisar_nits(bloques, ano_gravable)
+    if historial is not None:
+        bloques = _completar_con_historial(bloques, historial, ano_gravable)
+    if cache is not None:
+        return _procesar_con_cache(bloques, salida, cache, procesos, ano_gravable, historial)
+    if procesos > 1:
+        trabajo = liquidar_bloque_csv
+        if perfil or traza or informe:
+            trabajo = partial(_liquidar_bloque_instrumentado, perfilar=perfil is not None,
+                              auditar=traza is not None, valores=bool(traza and traza.valores),
+                              max_dependientes=informe.max_dependientes if informe else None)
+        liquidados = liquidar_en_paralelo(bloques, procesos, ano_gravable, trabajo)
+    else:
+        liquidados = liquidar_en_serie(bloques, ano_gravable)
+
+    estadisticas = {}
+    for texto, cantidad, pid, segundos, *extra in liquidados:
+        if perfil:
+            with perfil.medir('lote.escritura', cantidad):
+                salida.write(texto)
+        else:
+            salida.write(texto)
+        if historial is not None:
+            historial.registrar_csv(texto)
+        if extra:
+            if extra[0]['etapas']:
+                perfil.combinar(extra[0]['etapas'])
+            if extra[0]['auditoria']:
+                traza.combinar(extra[0]['auditoria'])
+            if extra[0]['validacion']:
+                informe.combinar(extra[0]['validacion'])
+        acumulado = estadisticas.setdefault(pid, [0, 0.0])
+        acumulado[0] += cantidad
+        acumulado[1] += segundos
+    return estadisticas
+
+
+def _completar_con_historial(bloques, historial, ano_gravable):
+    """Completa cada bloque con el historial antes de liquidarlo (en el proceso principal)."""
+    disponibles = set(anos_disponibles())
+    for inicio, registros in bloques:
+        marcar = perfilado.cronometro(len(registros))
+        historial.completar(registros, [_ano_liquidable(r, ano_gravable, disponibles) or ano_gravable
+                                        for r in registros])
+        if marcar:
+            marcar('historial.completar')
+        yield inicio, registros
+
+
+def _celda_csv(valor):
+    """Celda como la escribe csv.writer (dialecto excel, QUOTE_MINIMAL)."""
+    texto = str(valor)
+    if ',' in texto or '"' in texto or '\n' in texto or '\r' in texto:
+        return '"' + texto.replace('"', '""') + '"'
+    return texto
+
+
+def _procesar_con_cache(bloques, salida, cache, procesos, ano_gravable, historial=None):
+    """
+    procesar() con caché: el proceso principal calcula las claves y consulta
+    la caché; a los procesos de cálculo solo llegan los faltantes de cada
+    bloque, agrupados en tramos consecutivos para que los errores citen el
+    número correcto de contribuyente. Los resultados llegan en orden, así
+    que el contexto de cada bloque se guarda en una cola.
+    """
+    contextos = deque()
+
+    def faltantes():
+        disponibles = set(anos_disponibles())
+        for inicio, registros in bloques:
+            marcar = perfilado.cronometro(len(registros))
+            # Un año inválido no se busca en la caché: el cálculo lo reporta
+            anos = [_ano_liquidable(r, ano_gravable, disponibles) for r in registros]
+            claves = cache_resultados.claves_de_registros(
+                registros, [ano_gravable if ano is None else ano for ano in anos])
+            if marcar:
+                marcar('cache.claves')
+            encontrados = cache.buscar(claves)
+            if marcar:
+                marcar('cache.busqueda')
+            contextos.append((registros, anos, claves, encontrados))
+            tramos = []
+            for numero, registro, ano, clave in zip(range(inicio, inicio + len(registros)), registros, anos,
+                                                    claves):
+                if clave in encontrados and ano is not None:
+                    continue
+                if tramos and tramos[-1][0] + len(tramos[-1][1]) == numero:
+                    tramos[-1][1].append(registro)
+                else:
+                    tramos.append((numero, [registro]))
+            yield tramos
+
+    if procesos > 1:
+        liquidados = liquidar_en_paralelo(faltantes(), procesos, ano_gravable, liquidar_tramos_resultados)
+    else:
+        liquidados = liquidar_en_serie(faltantes(), ano_gravable, liquidar_tramos_resultados)
+
+    estadisticas = {}
+    for textos, cantidad, pid, segundos in liquidados:
+        registros, anos, claves, encontrados = contextos.popleft()
+        marcar = perfilado.cronometro(len(claves))
+        nuevos = iter(textos)
+        por_guardar = {}
+        lineas = []
+        for registro, ano, clave in zip(registros, anos, claves):
+            texto = encontrados.get(clave) if ano is not None else None
+            if texto is None:
+                texto = next(nuevos)
+                if texto is None:       # rechazado al liquidar (ya reportado)
+                    continue
+                por_guardar[clave] = texto
+            # Misma salida que csv.writer: las celdas de resultado nunca llevan comillas
+            lineas.append(f"{_celda_csv(registro.get('nit') or '')},{_celda_csv(registro.get('nombre') or '')},"
+                          f"{ano},{texto}\r\n")
+        if por_guardar:
+            cache.guardar(por_guardar.items())
+        if marcar:
+            marcar('cache.guardar')
+        texto = ''.join(lineas)
+        salida.write(texto)
+        if marcar:
+            marcar('lote.escritura')
+        if historial is not None:
+            historial.registrar_csv(texto)
+        acumulado = estadisticas.setdefault(pid, [0, 0.0])
+        acumulado[0] += cantidad
+        acumulado[1] += segundos
+    return estadisticas
+
+
+def imprimir_estadisticas(estadisticas, segundos_totales, destino=sys.stderr):
+    """Reporta el rendimiento de cada proceso y el total de la corrida."""
+    total = 0
+    for pid, (cantidad, segundos) in sorted(estadisticas.items()):
+        total += cantidad
+        ritmo = cantidad / segundos if segundos else 0.0
+        print(f"  Proceso {pid}: {cantidad} contribuyentes en {segundos:.2f} s "
+              f"({ritmo:,.0f}/s)", file=destino)
+    ritmo_total = total / segundos_totales if segundos_totales else 0.0
+    print(f"Contribuyentes liquidados: {total} en {segundos_totales:.2f} s "
+          f"({ritmo_total:,.0f}/s)", file=destino)
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        description="Liquidación por lotes del impuesto de renta (rentas de trabajo).")
+    parser.add_argument('entrada', help="Archivo CSV o XLSX con los conceptos de la plantilla")
+    parser.add_argument('-o', '--salida', help="Archivo CSV de resultados (por defecto, la salida estándar)")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE_POR_DEFECTO,
+                        help="Contribuyentes liquidados por bloque (por defecto %(default)s)")
+    parser.add_argument('-p', '--procesos', type=int, default=1,
+                        help="Procesos de cálculo en paralelo; 0 usa todos los núcleos "
+                             "(por defecto %(default)s)")
+    parser.add_argument('--ano', type=int, default=ANO_GRAVABLE_POR_DEFECTO,
+                        help="Año gravable para las filas sin columna AÑO GRAVABLE "
+                             "(por defecto %(default)s)")
+    parser.add_argument('--perfil-json', help="Guardar el tiempo por etapa en JSON (perfilado.py)")
+    parser.add_argument('--perfil-prometheus', help="Guardar el tiempo por etapa en formato de Prometheus")
+    parser.add_argument('--cprofile', help="Guardar un volcado de cProfile (.prof) del proceso principal")
+    parser.add_argument('--auditoria', help="Guardar la traza de límites y rangos aplicados (.npz, auditoria.py)")
+    parser.add_argument('--auditoria-valores', action='store_true',
+                        help="Incluir en la traza los valores intermedios de cada contribuyente")
+    parser.add_argument('--historial', help="Archivo SQLite de declaraciones pasadas: completa los conceptos "
+                                            "del año anterior vacíos y guarda esta corrida (historial.py)")
+    parser.add_argument('--cache', help="Archivo SQLite de caché de resultados: solo se liquidan "
+                                        "los contribuyentes con entradas nuevas (cache_resultados.py)")
+    parser.add_argument('--certificados', action='store_true',
+                        help="La entrada trae un certificado de ingresos y retenciones por fila: se "
+                             "agregan por NIT antes de liquidar (certificados.py)")
+    parser.add_argument('--validacion', help="Validar las filas y guardar el informe de errores (CSV, "
+                                             "validacion.py); las filas con errores no se liquidan")
+    parser.add_argument('--max-dependientes', type=int, default=validacion.MAX_DEPENDIENTES_POR_DEFECTO,
+                        help="Máximo de dependientes aceptado por la validación (por defecto %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    parser = construir_parser()
+    args = parser.parse_args(argv)
+    if args.cache and args.auditoria:
+        parser.error("--auditoria necesita liquidar todas las filas: no se puede usar con --cache")
+    if args.cache and args.validacion:
+        parser.error("--validacion necesita liquidar todas las filas: no se puede usar con --cache")
+    procesos = args.procesos or os.cpu_count() or 1
+    agregador = None
+    if args.certificados:
+        import certificados     # certificados importa este módulo: se carga aquí, no arriba
+        agregador = certificados.AgregadorCertificados(args.ano)
+        filas = certificados.filas_de_registros(certificados.leer_y_agregar([args.entrada], agregador))
+    else:
+        filas = leer_filas(args.entrada)
+    perfil = perfilado.activar() if args.perfil_json or args.perfil_prometheus else None
+    traza = auditoria.activar(auditoria.TrazaAuditoria(args.auditoria_valores)) if args.auditoria else None
+    informe = (validacion.activar(validacion.InformeValidacion(args.max_dependientes))
+               if args.validacion else None)
+    ejecutar = procesar
+    if args.cprofile:
+        def ejecutar(*argumentos):
+            return perfilado.perfilar_cprofile(procesar, *argumentos, ruta=args.cprofile)[0]
+
+    cache = cache_resultados.CacheResultados(args.cache) if args.cache else None
+    historial = historial_declaraciones.HistorialDeclaraciones(args.historial) if args.historial else None
+    inicio = time.perf_counter()
+    try:
+        if args.salida:
+            with open(args.salida, 'w', newline='', encoding='utf-8') as salida:
+                estadisticas = ejecutar(filas, salida, args.tamano_bloque, procesos, args.ano, cache, historial)
+        else:
+            estadisticas = ejecutar(filas, sys.stdout, args.tamano_bloque, procesos, args.ano, cache, historial)
+    finally:
+        if cache is not None:
+            cache.cerrar()
+        if historial is not None:
+            historial.cerrar()
+    imprimir_estadisticas(estadisticas, time.perf_counter() - inicio)
+    if agregador is not None:
+        certificados.imprimir_estadisticas(agregador)
+    if informe is not None:
+        validacion.desactivar()
+        validacion.imprimir_resumen(informe)
+        informe.guardar(args.validacion)
+    if historial is not None:
+        print(f"Historial: {historial.completados} contribuyentes con declaraciones anteriores; "
+              f"{historial.guardados} declaraciones guardadas", file=sys.stderr)
+    if cache is not None:
+        print(f"Caché: {cache.aciertos} de {cache.consultas} contribuyentes ya liquidados "
+              f"({cache.tasa_aciertos:.1%})", file=sys.stderr)
+
+    if traza:
+        auditoria.desactivar()
+        traza.guardar(args.auditoria)
+    if perfil:
+        perfilado.desactivar()
+        perfilado.imprimir_resumen(perfil)
+        if args.perfil_json:
+            with open(args.perfil_json, 'w', encoding='utf-8') as archivo:
+                archivo.write(perfil.a_json() + '\n')
+        if args.perfil_prometheus:
+            with open(args.perfil_prometheus, 'w', encoding='utf-8') as archivo:
+                archivo.write(perfil.a_prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+MOTOR VECTORIZADO DEL IMPUESTO DE RENTA - LIQUIDACIÓN POR LOTES
+Personas Naturales Residentes Fiscales - Colombia
+
+Versión por columnas de `calcular_impuesto_renta` (claude-5.py): recibe un
+arreglo por cada uno de los 19 conceptos de entrada y liquida toda la
+población a la vez (depuración Art. 336, tabla Art. 241 y anticipo Art. 807).
+Los resultados coinciden con la función escalar al peso.
+
+Las reglas (UVT, tablas y límites) salen de los paquetes por año gravable
+de `reglas_tributarias`; un mismo lote puede mezclar años con la columna
+opcional `ano_gravable`.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+import perfilado
+from reglas_tributarias import cargar_paquete, obtener_paquete
+
+# Conceptos numéricos de entrada (mismas claves que `capturar_datos`)
+CONCEPTOS_ENTRADA = (
+    'salarios',
+    'cesantias',
+    'prestaciones_sociales',
+    'otros_pagos_laborales',
+    'ingreso_mensual_promedio',
+    'incr_salud',
+    'incr_pensiones',
+    'pension_voluntaria',
+    'afc',
+    'num_dependientes',
+    'intereses_vivienda',
+    'medicina_prepagada',
+    'compras_factura_electronica',
+    'gmf',
+    'impuesto_neto_anterior',
+    'saldo_favor_anterior',
+    'retenciones',
+    'anticipo_anterior',
+    'num_anos_declarando',
+)
+
+# Claves de resultado en el orden en que las produce `calcular_impuesto_renta`
+COLUMNAS_RESULTADO = (
+    'ingresos_totales',
+    'incr_total',
+    'ingreso_neto',
+    'cesantias_exentas',
+    'deduccion_dependientes',
+    'deduccion_medicina',
+    'deduccion_intereses',
+    'deducciones_totales',
+    'base_renta_exenta_25',
+    'renta_exenta_25',
+    'pension_afc_limitada',
+    'rentas_exentas_totales',
+    'suma_rentas_deducciones',
+    'limite_maximo_depuracion',
+    'depuracion_final',
+    'beneficio_factura',
+    'beneficio_gmf',
+    'base_gravable',
+    'base_gravable_uvt',
+    'impuesto_neto',
+    'anticipo_metodo1',
+    'anticipo_metodo2',
+    'anticipo_definitivo',
+    'saldo_sin_anticipo',
+    'es_saldo_favor',
+    'valor_final',
+)
+
+# Versión de la lógica de liquidación. Subirla en cada cambio que altere algún
+# resultado (fórmulas, redondeos, orden de la depuración): forma parte de la
+# clave de cache_resultados, así las cachés anteriores dejan de usarse.
+VERSION_MOTOR = 1
+
+# Valor usado cuando una columna no viene en el lote (igual que `capturar_datos`)
+VALORES_POR_DEFECTO = {concepto: 0 for concepto in CONCEPTOS_ENTRADA}
+VALORES_POR_DEFECTO['num_anos_declarando'] = 1
+
+
+@lru_cache(maxsize=None)
+def _tablas(paquete):
+    """Arreglos de las tablas 241, 206 y 383 de un paquete (se crean una vez)."""
+    tablas = {
+        'limites_241': np.array(paquete.limites_241_uvt, dtype=np.float64),
+        'inicio_241': np.array(paquete.inicio_241_uvt, dtype=np.float64),
+        'tarifas_241': np.array(paquete.tarifas_241, dtype=np.float64),
+        'base_241': np.array(paquete.impuesto_base_241_uvt, dtype=np.float64),
+        'limites_cesantias': np.array(paquete.limites_cesantias_uvt, dtype=np.float64),
+        'porcentajes_cesantias': np.array(paquete.porcentajes_cesantias, dtype=np.float64),
+        'limites_383': np.array(paquete.limites_383_uvt, dtype=np.float64),
+        'inicio_383': np.array(paquete.inicio_383_uvt, dtype=np.float64),
+        'tarifas_383': np.array(paquete.tarifas_383, dtype=np.float64),
+        'base_383': np.array(paquete.impuesto_base_383_uvt, dtype=np.float64),
+    }
+    for arreglo in tablas.values():
+        arreglo.flags.writeable = False
+    return tablas
+
+
+def _columna(columnas, concepto, n):
+    """Obtiene una columna como arreglo float64 de longitud n."""
+    if concepto not in columnas:
+        return np.full(n, VALORES_POR_DEFECTO[concepto], dtype=np.float64)
+    return np.asarray(columnas[concepto], dtype=np.float64)
+
+
+def _numero_filas(columnas):
+    """Determina el tamaño del lote a partir de las columnas presentes."""
+    for concepto in CONCEPTOS_ENTRADA:
+        if concepto in columnas:
+            return len(columnas[concepto])
+    raise ValueError("El lote no contiene ninguna columna de entrada reconocida.")
+
+
+def calcular_cesantias_exentas_lote(cesantias, ingreso_promedio_mensual, reglas=None):
+    """
+    Cesantías exentas (Art. 206 numeral 4 E.T.) para un arreglo de contribuyentes.
+
+    El rango de la tabla se ubica con `searchsorted`; los límites son
+    inclusivos por arriba, igual que la escalera `if/elif` escalar.
+    """
+    paquete = obtener_paquete(reglas)
+    tablas = _tablas(paquete)
+    cesantias = np.asarray(cesantias, dtype=np.float64)
+    ingreso_promedio_mensual = np.asarray(ingreso_promedio_mensual, dtype=np.float64)
+
+    ingreso_uvt = ingreso_promedio_mensual / paquete.uvt
+    rango = np.searchsorted(tablas['limites_cesantias'], ingreso_uvt, side='left')
+    exentas = cesantias * tablas['porcentajes_cesantias'][rango]
+
+    # Sin ingreso promedio no hay exención
+    return np.where(ingreso_promedio_mensual == 0, 0.0, exentas)
+
+
+def aplicar_tabla_articulo_241_lote(base_gravable_uvt, reglas=None):
+    """
+    Aplica la tabla del artículo 241 del ET a un arreglo de bases en UVT.
+    Retorna el impuesto en pesos.
+    """
+    paquete = obtener_paquete(reglas)
+    tablas = _tablas(paquete)
+    base_gravable_uvt = np.asarray(base_gravable_uvt, dtype=np.float64)
+    rango = np.searchsorted(tablas['limites_241'], base_gravable_uvt, side='left')
+    impuesto_uvt = ((base_gravable_uvt - tablas['inicio_241'][rango]) * tablas['tarifas_241'][rango]
+                    + tablas['base_241'][rango])
+    return impuesto_uvt * paquete.uvt
+
+
+def aplicar_tabla_articulo_383_lote(base_mensual_uvt, reglas=None):
+    """
+    Aplica la tabla de retención del artículo 383 del ET a un arreglo de
+    bases mensuales en UVT. Retorna la retención en pesos.
+    """
+    paquete = obtener_paquete(reglas)
+    if not paquete.tarifas_383:
+        raise ValueError(f"El paquete {paquete.version} no trae la tabla del Art. 383 (retencion_383).")
+    tablas = _tablas(paquete)
+    base_mensual_uvt = np.asarray(base_mensual_uvt, dtype=np.float64)
+    rango = np.searchsorted(tablas['limites_383'], base_mensual_uvt, side='left')
+    retencion_uvt = ((base_mensual_uvt - tablas['inicio_383'][rango]) * tablas['tarifas_383'][rango]
+                     + tablas['base_383'][rango])
+    return retencion_uvt * paquete.uvt
+
+
+def calcular_anticipo_lote(impuesto_neto_actual, impuesto_neto_anterior,
+                           retenciones, num_anos_declarando, reglas=None):
+    """
+    Anticipo del año siguiente (Art. 807 ET) para un arreglo de contribuyentes.
+    Retorna (método 1, método 2, definitivo).
+    """
+    uno, dos, tres_o_mas = obtener_paquete(reglas).porcentajes_anticipo
+    porcentaje = np.where(num_anos_declarando == 1, uno,
+                          np.where(num_anos_declarando == 2, dos, tres_o_mas))
+
+    # MÉTODO 1
+    anticipo_metodo1 = np.maximum(impuesto_neto_actual * porcentaje - retenciones, 0.0)
+
+    # MÉTODO 2 (solo si hubo impuesto neto el año anterior)
+    promedio = (impuesto_neto_actual + impuesto_neto_anterior) / 2
+    anticipo_metodo2 = np.where(
+        impuesto_neto_anterior > 0,
+        np.maximum(promedio * porcentaje - retenciones, 0.0),
+        anticipo_metodo1,
+    )
+
+    anticipo_definitivo = np.minimum(anticipo_metodo1, anticipo_metodo2)
+    return anticipo_metodo1, anticipo_metodo2, anticipo_definitivo
+
+
+def calcular_impuesto_renta_lote(columnas, reglas=None):
+    """
+    Realiza el cálculo completo del impuesto de renta para un lote de
+    contribuyentes según el Estatuto Tributario Colombiano - Art. 336.
+
+    `columnas` es un diccionario {concepto: arreglo} con las claves de
+    CONCEPTOS_ENTRADA; las columnas ausentes toman VALORES_POR_DEFECTO.
+    `reglas` es el paquete (o año gravable) a aplicar. Si no se indica y el
+    lote trae la columna `ano_gravable`, cada fila se liquida con el paquete
+    de su año.
+    Retorna un diccionario {clave de resultado: arreglo} con las mismas
+    claves que `calcular_impuesto_renta`.
+    """
+    n = _numero_filas(columnas)
+    d = {concepto: _columna(columnas, concepto, n) for concepto in CONCEPTOS_ENTRADA}
+
+    if reglas is None and 'ano_gravable' in columnas:
+        anos = np.asarray(columnas['ano_gravable']).astype(np.int64)
+        unicos = np.unique(anos)
+        if len(unicos) > 1:
+            return _liquidar_por_ano(d, anos, unicos)
+        if len(unicos) == 1:
+            reglas = cargar_paquete(int(unicos[0]))
+
+    return _liquidar(d, obtener_paquete(reglas))
+
+
+def _liquidar_por_ano(d, anos, unicos):
+    """Liquida un lote con varios años gravables, un paquete por grupo."""
+    resultados = {clave: np.empty(len(anos), dtype=bool if clave == 'es_saldo_favor' else np.float64)
+                  for clave in COLUMNAS_RESULTADO}
+    for ano in unicos:
+        indices = np.flatnonzero(anos == ano)
+        parcial = _liquidar({concepto: valores[indices] for concepto, valores in d.items()},
+                            cargar_paquete(int(ano)))
+        for clave, valores in parcial.items():
+            resultados[clave][indices] = valores
+    return resultados
+
+
+def _liquidar(d, paquete):
+    """Depuración y liquidación de un lote con un único paquete de reglas."""
+    uvt = paquete.uvt
+    resultados = {}
+    marcar = perfilado.cronometro(len(d['salarios']))     # None sin perfilado activo
+
+    # 1. INGRESOS TOTALES
+    ingresos_totales = (d['salarios'] + d['cesantias'] +
+                        d['prestaciones_sociales'] + d['otros_pagos_laborales'])
+    resultados['ingresos_totales'] = ingresos_totales
+
+    # 2. INGRESOS NO CONSTITUTIVOS DE RENTA (INCR)
+    incr_total = d['incr_salud'] + d['incr_pensiones']
+    resultados['incr_total'] = incr_total
+
+    # 3. INGRESO NETO
+    ingreso_neto = ingresos_totales - incr_total
+    resultados['ingreso_neto'] = ingreso_neto
+    if marcar:
+        marcar('motor.ingresos')
+
+    # 4. CESANTÍAS EXENTAS (Art. 206 numeral 4)
+    cesantias_exentas = calcular_cesantias_exentas_lote(
+        d['cesantias'], d['ingreso_mensual_promedio'], paquete)
+    resultados['cesantias_exentas'] = cesantias_exentas
+    if marcar:
+        marcar('motor.cesantias')
+
+    # 5. DEDUCCIONES
+    deduccion_dependientes = np.minimum(
+        d['num_dependientes'] * (paquete.deduccion_por_dependiente_uvt * uvt),
+        paquete.limite_dependientes_uvt * uvt)
+    deduccion_medicina = np.minimum(d['medicina_prepagada'], paquete.limite_medicina_prepagada_uvt * uvt)
+    deduccion_intereses = np.minimum(d['intereses_vivienda'], paquete.limite_intereses_vivienda_uvt * uvt)
+
+    deducciones_totales = deduccion_dependientes + deduccion_medicina + deduccion_intereses
+    resultados['deduccion_dependientes'] = deduccion_dependientes
+    resultados['deduccion_medicina'] = deduccion_medicina
+    resultados['deduccion_intereses'] = deduccion_intereses
+    resultados['deducciones_totales'] = deducciones_totales
+    if marcar:
+        marcar('motor.deducciones')
+
+    # 6. RENTA EXENTA 25% (limitada a 790 UVT)
+    base_renta_exenta_25 = ingresos_totales - incr_total - cesantias_exentas - deducciones_totales
+    base_renta_exenta_25 = np.maximum(base_renta_exenta_25, 0.0)
+    renta_exenta_25 = np.minimum(base_renta_exenta_25 * paquete.porcentaje_renta_exenta_25,
+                                 paquete.limite_renta_exenta_25_uvt * uvt)
+    resultados['base_renta_exenta_25'] = base_renta_exenta_25
+    if marcar:
+        marcar('motor.renta_exenta_25')
+
+    # 7. OTRAS RENTAS EXENTAS
+    # Pensión voluntaria + AFC (máximo 30% ingreso total o 3,800 UVT)
+    total_pension_afc = d['pension_voluntaria'] + d['afc']
+    pension_afc_limitada = np.minimum(
+        np.minimum(total_pension_afc, ingresos_totales * paquete.porcentaje_pension_afc),
+        paquete.limite_pension_afc_uvt * uvt)
+
+    rentas_exentas_totales = cesantias_exentas + renta_exenta_25 + pension_afc_limitada
+    resultados['renta_exenta_25'] = renta_exenta_25
+    resultados['pension_afc_limitada'] = pension_afc_limitada
+    resultados['rentas_exentas_totales'] = rentas_exentas_totales
+    if marcar:
+        marcar('motor.pension_afc')
+
+    # 8. LÍMITE DEL 40% - ARTÍCULO 336
+    suma_rentas_deducciones = rentas_exentas_totales + deducciones_totales
+    limite_maximo_depuracion = np.minimum(ingreso_neto * paquete.porcentaje_limite_general,
+                                          paquete.limite_general_uvt * uvt)
+
+    depuracion_final = np.minimum(suma_rentas_deducciones, limite_maximo_depuracion)
+    resultados['suma_rentas_deducciones'] = suma_rentas_deducciones
+    resultados['limite_maximo_depuracion'] = limite_maximo_depuracion
+    resultados['depuracion_final'] = depuracion_final
+    if marcar:
+        marcar('motor.limite_336')
+
+    # 9. RENTA LÍQUIDA ANTES DE OTROS BENEFICIOS
+    renta_liquida = ingreso_neto - depuracion_final
+
+    # 10. BENEFICIO COMPRAS CON FACTURA ELECTRÓNICA (1% hasta 240 UVT)
+    beneficio_factura = np.minimum(d['compras_factura_electronica'] * paquete.porcentaje_factura_electronica,
+                                   paquete.limite_factura_electronica_uvt * uvt)
+    renta_liquida = renta_liquida - beneficio_factura
+    resultados['beneficio_factura'] = beneficio_factura
+
+    # 11. BENEFICIO GMF (50%)
+    beneficio_gmf = d['gmf'] * paquete.porcentaje_gmf
+    renta_liquida = renta_liquida - beneficio_gmf
+    resultados['beneficio_gmf'] = beneficio_gmf
+    if marcar:
+        marcar('motor.beneficios')
+
+    # 12. BASE GRAVABLE
+    base_gravable = np.maximum(renta_liquida, 0.0)
+    base_gravable_uvt = base_gravable / uvt
+    resultados['base_gravable'] = base_gravable
+    resultados['base_gravable_uvt'] = base_gravable_uvt
+    if marcar:
+        marcar('motor.base_gravable')
+
+    # 13. APLICAR TABLA ARTÍCULO 241
+    impuesto_neto = aplicar_tabla_articulo_241_lote(base_gravable_uvt, paquete)
+    resultados['impuesto_neto'] = impuesto_neto
+    if marcar:
+        marcar('motor.articulo_241')
+
+    # 14. CÁLCULO DEL ANTICIPO (Artículo 807)
+    anticipo_m1, anticipo_m2, anticipo_definitivo = calcular_anticipo_lote(
+        impuesto_neto,
+        d['impuesto_neto_anterior'],
+        d['retenciones'],
+        d['num_anos_declarando'],
+        paquete,
+    )
+    resultados['anticipo_metodo1'] = anticipo_m1
+    resultados['anticipo_metodo2'] = anticipo_m2
+    resultados['anticipo_definitivo'] = anticipo_definitivo
+    if marcar:
+        marcar('motor.anticipo')
+
+    # 15. LIQUIDACIÓN FINAL
+    saldo_sin_anticipo = (impuesto_neto - d['retenciones'] -
+                          d['saldo_favor_anterior'] - d['anticipo_anterior'])
+    liquidacion_final = saldo_sin_anticipo + anticipo_definitivo
+
+    resultados['saldo_sin_anticipo'] = saldo_sin_anticipo
+    resultados['es_saldo_favor'] = liquidacion_final < 0
+    resultados['valor_final'] = np.abs(liquidacion_final)
+    if marcar:
+        marcar('motor.liquidacion_final')
+
+    return resultados
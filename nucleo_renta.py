@@ -0,0 +1,276 @@
+"""
+NÚCLEO DE CÁLCULO DEL IMPUESTO DE RENTA
+Personas Naturales Residentes Fiscales - Colombia
+Basado en: Estatuto Tributario Colombiano - Ley 2277 de 2022 - Decreto 1625 de 2016
+
+Funciones puras de la liquidación (depuración Art. 336, cesantías Art. 206
+numeral 4, tabla Art. 241 y anticipo Art. 807), sin entrada/salida:
+importar este módulo no carga consola, tkinter ni HTML. La UVT, las
+tablas, los límites y los porcentajes vienen del paquete de reglas del año
+gravable (reglas_tributarias.py); `reglas` acepta lo mismo que
+`obtener_paquete` (None es el año por defecto). claude-5.py es la interfaz
+de consola sobre este núcleo.
+"""
+
+from bisect import bisect_left
+
+from reglas_tributarias import obtener_paquete
+
+
+def calcular_cesantias_exentas(cesantias, ingreso_promedio_mensual, reglas=None, tabla=None):
+    """
+    Calcula las cesantías exentas según Art. 206 numeral 4 del ET
+
+    Si se pasa `tabla` (tablas_consulta.crear_tabla_cesantias), el porcentaje
+    exento se toma de la tabla precalculada en lugar de recorrer los rangos.
+
+    El porcentaje exento depende del ingreso mensual promedio de los
+    últimos 6 meses en UVT; los rangos (inclusivos por arriba) son los del
+    paquete (2024: hasta 350 UVT 100%, ..., más de 650 UVT 0%).
+    """
+    # Si no hay cesantías, retornar 0
+    if cesantias == 0:
+        return 0
+    
+    # Si no hay ingreso promedio, no se pueden calcular cesantías exentas
+    if ingreso_promedio_mensual == 0:
+        return 0
+    
+    paquete = obtener_paquete(reglas)
+
+    # Calcular ingreso en UVT
+    ingreso_uvt = ingreso_promedio_mensual / paquete.uvt
+    
+    # Modo tabla precalculada
+    if tabla is not None:
+        return cesantias * tabla.consultar(ingreso_uvt)
+    
+    # Aplicar tabla del Art. 206 numeral 4
+    return cesantias * paquete.porcentajes_cesantias[bisect_left(paquete.limites_cesantias_uvt, ingreso_uvt)]
+
+
+def impuesto_241_uvt(base_gravable_uvt, reglas=None):
+    """Impuesto en UVT de la tabla del artículo 241 del ET (rangos inclusivos por arriba)."""
+    paquete = obtener_paquete(reglas)
+    rango = bisect_left(paquete.limites_241_uvt, base_gravable_uvt)
+    return ((base_gravable_uvt - paquete.inicio_241_uvt[rango]) * paquete.tarifas_241[rango]
+            + paquete.impuesto_base_241_uvt[rango])
+
+
+def aplicar_tabla_articulo_241(base_gravable_uvt, reglas=None):
+    """
+    Aplica la tabla del artículo 241 del ET para calcular el impuesto (en pesos)
+    """
+    paquete = obtener_paquete(reglas)
+    return impuesto_241_uvt(base_gravable_uvt, paquete) * paquete.uvt
+
+
+def calcular_anticipo(impuesto_neto_actual, impuesto_neto_anterior, 
+                     retenciones, num_anos_declarando, reglas=None):
+    """
+    Calcula el anticipo del año siguiente según Art. 807 del ET
+    Compara método 1 y método 2, retorna el menor
+    """
+    # Determinar porcentaje según años declarando
+    porcentaje = obtener_paquete(reglas).porcentaje_anticipo(num_anos_declarando)
+    
+    # MÉTODO 1
+    anticipo_metodo1 = (impuesto_neto_actual * porcentaje) - retenciones
+    anticipo_metodo1 = max(anticipo_metodo1, 0)
+    
+    # MÉTODO 2
+    if impuesto_neto_anterior > 0:
+        promedio = (impuesto_neto_actual + impuesto_neto_anterior) / 2
+        anticipo_metodo2 = (promedio * porcentaje) - retenciones
+        anticipo_metodo2 = max(anticipo_metodo2, 0)
+    else:
+        anticipo_metodo2 = anticipo_metodo1
+    
+    # Retornar el menor
+    anticipo_definitivo = min(anticipo_metodo1, anticipo_metodo2)
+    
+    return anticipo_metodo1, anticipo_metodo2, anticipo_definitivo
+
+
+def calcular_deduccion_dependientes(num_dependientes, reglas=None):
+    """Deducción por dependientes (32 UVT por dependiente, máximo 384 UVT en 2024)."""
+    paquete = obtener_paquete(reglas)
+    return min(num_dependientes * (paquete.deduccion_por_dependiente_uvt * paquete.uvt),
+               paquete.limite_dependientes_uvt * paquete.uvt)
+
+
+def calcular_deduccion_medicina(medicina_prepagada, reglas=None):
+    """Medicina prepagada (máximo 192 UVT)."""
+    paquete = obtener_paquete(reglas)
+    return min(medicina_prepagada, paquete.limite_medicina_prepagada_uvt * paquete.uvt)
+
+
+def calcular_deduccion_intereses(intereses_vivienda, reglas=None):
+    """Intereses de vivienda (máximo 1,200 UVT)."""
+    paquete = obtener_paquete(reglas)
+    return min(intereses_vivienda, paquete.limite_intereses_vivienda_uvt * paquete.uvt)
+
+
+def calcular_renta_exenta_25(base_renta_exenta_25, reglas=None):
+    """Renta exenta del 25% sobre la base ya depurada, limitada a 790 UVT."""
+    paquete = obtener_paquete(reglas)
+    renta_exenta_25_calculada = base_renta_exenta_25 * paquete.porcentaje_renta_exenta_25
+    return min(renta_exenta_25_calculada, paquete.limite_renta_exenta_25_uvt * paquete.uvt)
+
+
+def calcular_pension_afc_limitada(pension_voluntaria, afc, ingresos_totales, reglas=None):
+    """Pensión voluntaria + AFC (máximo 30% del ingreso total o 3,800 UVT)."""
+    paquete = obtener_paquete(reglas)
+    total_pension_afc = pension_voluntaria + afc
+    limite_30_porciento = ingresos_totales * paquete.porcentaje_pension_afc
+    return min(total_pension_afc, limite_30_porciento, paquete.limite_pension_afc_uvt * paquete.uvt)
+
+
+def calcular_limite_depuracion(ingreso_neto, reglas=None):
+    """Límite de rentas exentas y deducciones del Art. 336 (40% del ingreso neto o 1,340 UVT)."""
+    paquete = obtener_paquete(reglas)
+    limite_40_porciento = ingreso_neto * paquete.porcentaje_limite_general
+    return min(limite_40_porciento, paquete.limite_general_uvt * paquete.uvt)
+
+
+def calcular_beneficio_factura(compras_factura_electronica, reglas=None):
+    """Beneficio por compras con factura electrónica (1% hasta 240 UVT)."""
+    paquete = obtener_paquete(reglas)
+    return min(compras_factura_electronica * paquete.porcentaje_factura_electronica,
+               paquete.limite_factura_electronica_uvt * paquete.uvt)
+
+
+def calcular_beneficio_gmf(gmf, reglas=None):
+    """Beneficio por el gravamen a los movimientos financieros (50%)."""
+    return gmf * obtener_paquete(reglas).porcentaje_gmf
+
+
+def _ano_gravable(datos):
+    """Año gravable de `datos` si lo trae (cualquier objeto con datos['concepto'])."""
+    try:
+        return datos['ano_gravable']
+    except (KeyError, IndexError):
+        return None
+
+
+def calcular_impuesto_renta(datos, tabla_cesantias=None, reglas=None):
+    """
+    Realiza el cálculo completo del impuesto de renta
+    según el Estatuto Tributario Colombiano - Art. 336
+
+    `tabla_cesantias` activa opcionalmente la tabla precalculada del
+    Art. 206 numeral 4 (ver tablas_consulta.py). Sin `reglas` se usa el
+    paquete de `datos['ano_gravable']`, o el del año por defecto.
+    """
+    paquete = obtener_paquete(reglas if reglas is not None else _ano_gravable(datos))
+    uvt = paquete.uvt
+    
+    resultados = {}
+    
+    # 1. INGRESOS TOTALES
+    ingresos_totales = (datos['salarios'] + datos['cesantias'] + 
+                       datos['prestaciones_sociales'] + datos['otros_pagos_laborales'])
+    resultados['ingresos_totales'] = ingresos_totales
+    
+    # 2. INGRESOS NO CONSTITUTIVOS DE RENTA (INCR)
+    incr_total = datos['incr_salud'] + datos['incr_pensiones']
+    resultados['incr_total'] = incr_total
+    
+    # 3. INGRESO NETO
+    ingreso_neto = ingresos_totales - incr_total
+    resultados['ingreso_neto'] = ingreso_neto
+    
+    # 4. CESANTÍAS EXENTAS (Art. 206 numeral 4)
+    cesantias_exentas = calcular_cesantias_exentas(
+        datos['cesantias'], 
+        datos['ingreso_mensual_promedio'], 
+        paquete,
+        tabla_cesantias
+    )
+    resultados['cesantias_exentas'] = cesantias_exentas
+    
+    # 5. DEDUCCIONES
+    deduccion_dependientes = calcular_deduccion_dependientes(datos['num_dependientes'], paquete)
+    deduccion_medicina = calcular_deduccion_medicina(datos['medicina_prepagada'], paquete)
+    deduccion_intereses = calcular_deduccion_intereses(datos['intereses_vivienda'], paquete)
+    
+    deducciones_totales = deduccion_dependientes + deduccion_medicina + deduccion_intereses
+    resultados['deduccion_dependientes'] = deduccion_dependientes
+    resultados['deduccion_medicina'] = deduccion_medicina
+    resultados['deduccion_intereses'] = deduccion_intereses
+    resultados['deducciones_totales'] = deducciones_totales
+    
+    # 6. RENTA EXENTA 25%
+    # Fórmula: (Ingresos Totales - INCR - Cesantías Exentas - Deducciones) * 25%
+    # Limitada a 790 UVT
+    base_renta_exenta_25 = ingresos_totales - incr_total - cesantias_exentas - deducciones_totales
+    base_renta_exenta_25 = max(base_renta_exenta_25, 0)  # No puede ser negativa
+    renta_exenta_25 = calcular_renta_exenta_25(base_renta_exenta_25, paquete)
+    resultados['base_renta_exenta_25'] = base_renta_exenta_25
+    
+    # 7. OTRAS RENTAS EXENTAS (pensión voluntaria + AFC)
+    pension_afc_limitada = calcular_pension_afc_limitada(
+        datos['pension_voluntaria'], datos['afc'], ingresos_totales, paquete)
+    
+    rentas_exentas_totales = cesantias_exentas + renta_exenta_25 + pension_afc_limitada
+    resultados['renta_exenta_25'] = renta_exenta_25
+    resultados['pension_afc_limitada'] = pension_afc_limitada
+    resultados['rentas_exentas_totales'] = rentas_exentas_totales
+    
+    # 8. LÍMITE DEL 40% - ARTÍCULO 336
+    suma_rentas_deducciones = rentas_exentas_totales + deducciones_totales
+    limite_maximo_depuracion = calcular_limite_depuracion(ingreso_neto, paquete)
+    
+    depuracion_final = min(suma_rentas_deducciones, limite_maximo_depuracion)
+    resultados['suma_rentas_deducciones'] = suma_rentas_deducciones
+    resultados['limite_maximo_depuracion'] = limite_maximo_depuracion
+    resultados['depuracion_final'] = depuracion_final
+    
+    # 9. RENTA LÍQUIDA ANTES DE OTROS BENEFICIOS
+    renta_liquida = ingreso_neto - depuracion_final
+    
+    # 10. BENEFICIO COMPRAS CON FACTURA ELECTRÓNICA (1% hasta 240 UVT)
+    beneficio_factura = calcular_beneficio_factura(datos['compras_factura_electronica'], paquete)
+    renta_liquida -= beneficio_factura
+    resultados['beneficio_factura'] = beneficio_factura
+    
+    # 11. BENEFICIO GMF (50%)
+    beneficio_gmf = calcular_beneficio_gmf(datos['gmf'], paquete)
+    renta_liquida -= beneficio_gmf
+    resultados['beneficio_gmf'] = beneficio_gmf
+    
+    # 12. BASE GRAVABLE
+    base_gravable = max(renta_liquida, 0)
+    base_gravable_uvt = base_gravable / uvt
+    resultados['base_gravable'] = base_gravable
+    resultados['base_gravable_uvt'] = base_gravable_uvt
+    
+    # 13. APLICAR TABLA ARTÍCULO 241
+    impuesto_neto = aplicar_tabla_articulo_241(base_gravable_uvt, paquete)
+    resultados['impuesto_neto'] = impuesto_neto
+    
+    # 14. CÁLCULO DEL ANTICIPO (Artículo 807)
+    anticipo_m1, anticipo_m2, anticipo_definitivo = calcular_anticipo(
+        impuesto_neto,
+        datos['impuesto_neto_anterior'],
+        datos['retenciones'],
+        datos['num_anos_declarando'],
+        paquete
+    )
+    resultados['anticipo_metodo1'] = anticipo_m1
+    resultados['anticipo_metodo2'] = anticipo_m2
+    resultados['anticipo_definitivo'] = anticipo_definitivo
+    
+    # 15. LIQUIDACIÓN FINAL
+    # Fórmula correcta: Impuesto Neto - Retenciones - Saldo a Favor Anterior - Anticipo Año Anterior + Anticipo Año Siguiente
+    saldo_sin_anticipo = (impuesto_neto - datos['retenciones'] - 
+                          datos['saldo_favor_anterior'] - datos['anticipo_anterior'])
+    
+    # SUMAR el anticipo del año siguiente al saldo
+    liquidacion_final = saldo_sin_anticipo + anticipo_definitivo
+    
+    resultados['saldo_sin_anticipo'] = saldo_sin_anticipo
+    resultados['es_saldo_favor'] = liquidacion_final < 0
+    resultados['valor_final'] = abs(liquidacion_final)
+    
+    return resultados
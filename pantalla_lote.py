@@ -0,0 +1,347 @@
+"""
+PANTALLA DE LIQUIDACIÓN POR LOTES (Tkinter)
+Personas Naturales Residentes Fiscales - Colombia
+
+Ventana secundaria de V3.py para liquidar una hoja completa de empleados
+(CSV o XLSX con el formato de lote_renta.py):
+
+- La lectura y la liquidación corren en un hilo de trabajo, por bloques,
+  con el motor vectorizado. El hilo nunca toca los widgets: envía cada
+  bloque por una cola que la interfaz revisa con `after()`.
+- Barra de progreso y botón de cancelación (se detiene al terminar el
+  bloque en curso).
+- Las filas que no se pueden liquidar (celda no numérica o año sin
+  reglas) se omiten y se listan al terminar, como en lote_renta.
+- La grilla de resultados es virtual: el Treeview solo tiene las filas
+  visibles y al desplazarse se vuelven a llenar desde las columnas numpy,
+  así que la ventana responde igual con 100.000 filas.
+"""
+
+import os
+import queue
+import threading
+import time
+import tkinter as tk
+from bisect import bisect_right
+from tkinter import filedialog, messagebox, ttk
+
+import lector_xlsx
+import lote_renta
+import motor_vectorizado as motor
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO
+
+TAMANO_BLOQUE = 2000
+INTERVALO_SONDEO_MS = 50
+MAX_RECHAZOS_MOSTRADOS = 20
+
+# (clave, encabezado, ancho) de las columnas de la grilla
+COLUMNAS_GRILLA = (
+    ('nit', "NIT", 110),
+    ('nombre', "Nombre", 180),
+    ('ingresos_totales', "Ingresos totales", 120),
+    ('base_gravable', "Base gravable", 120),
+    ('impuesto_neto', "Impuesto neto", 110),
+    ('anticipo_definitivo', "Anticipo", 100),
+    ('valor_final', "Valor final", 110),
+    ('es_saldo_favor', "A favor", 60),
+)
+COLUMNAS_NUMERICAS = tuple(clave for clave, _, _ in COLUMNAS_GRILLA[2:])
+
+
+def contar_filas(ruta):
+    """Número aproximado de contribuyentes del archivo (None si no se conoce)."""
+    try:
+        if lector_xlsx.es_xlsx(ruta):
+            filas = (lector_xlsx.dimension(ruta) or (None,))[0]
+        else:
+            filas = 0
+            with open(ruta, 'rb') as archivo:
+                for trozo in iter(lambda: archivo.read(1 << 20), b''):
+                    filas += trozo.count(b'\n')
+    except Exception:
+        return None
+    return max((filas or 0) - 1, 1)
+
+
+class ResultadosLote:
+    """Resultados acumulados por bloques, con acceso por rango de filas."""
+
+    def __init__(self):
+        self.inicios = []       # primera fila de cada bloque
+        self.bloques = []       # (identificación, {clave: arreglo})
+        self.total = 0
+
+    def agregar(self, identificacion, columnas):
+        self.inicios.append(self.total)
+        self.bloques.append((identificacion, columnas))
+        self.total += len(identificacion)
+
+    def filas(self, desde, hasta):
+        """Genera los valores a mostrar de las filas desde..hasta-1."""
+        fila = desde
+        while fila < min(hasta, self.total):
+            indice = bisect_right(self.inicios, fila) - 1
+            identificacion, columnas = self.bloques[indice]
+            i = fila - self.inicios[indice]
+            nit, nombre = identificacion[i]
+            valores = [nit, nombre]
+            for clave in COLUMNAS_NUMERICAS:
+                valor = columnas[clave][i]
+                if clave == 'es_saldo_favor':
+                    valores.append('SI' if valor else 'NO')
+                else:
+                    valores.append(f"$ {valor:,.0f}".replace(",", "."))
+            yield valores
+            fila += 1
+
+
+def trabajador_lote(ruta, ano_gravable, cola, cancelar, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Hilo de trabajo: lee y liquida el archivo por bloques y publica en
+    `cola` mensajes ('bloque', identificación, columnas), ('rechazadas', n,
+    mensajes), ('fin', n, segundos), ('cancelado', n) o ('error', mensaje).
+    Como en lote_renta, una fila que no se puede liquidar (celda no numérica
+    o año sin reglas) se omite y se informa; el resto del archivo sigue.
+    """
+    inicio_reloj = time.perf_counter()
+    procesadas = 0
+    try:
+        registros = lote_renta.registros_desde_filas(lote_renta.leer_filas(ruta))
+        for bloque in lote_renta.agrupar_en_bloques(registros, tamano_bloque):
+            if cancelar.is_set():
+                cola.put(('cancelado', procesadas))
+                return
+            no_numericos = []
+            identificacion, columnas = lote_renta.columnas_de_bloque(bloque, ano_gravable, no_numericos)
+            rechazos = lote_renta.rechazos_de_bloque(bloque[0], columnas, no_numericos)
+            if rechazos:
+                rechazadas = {posicion for posicion, _ in rechazos}
+                cola.put(('rechazadas', len(rechazadas), [mensaje for _, mensaje in rechazos]))
+                validas = [i for i in range(len(identificacion)) if i not in rechazadas]
+                identificacion = [identificacion[i] for i in validas]
+                columnas = {clave: [valores[i] for i in validas] for clave, valores in columnas.items()}
+            if not identificacion:
+                continue
+            resultados = motor.calcular_impuesto_renta_lote(columnas)
+            cola.put(('bloque', identificacion, {clave: resultados[clave] for clave in COLUMNAS_NUMERICAS}))
+            procesadas += len(identificacion)
+    except Exception as e:
+        # Cualquier falla (incluido un .xlsx dañado, BadZipFile) debe llegar
+        # a la pantalla: sin el mensaje quedaría en "Liquidando..."
+        cola.put(('error', str(e) or type(e).__name__))
+        return
+    cola.put(('fin', procesadas, time.perf_counter() - inicio_reloj))
+
+
+class PantallaLote:
+    """Ventana de liquidación por lotes."""
+
+    def __init__(self, master, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+        self.ventana = tk.Toplevel(master)
+        self.ventana.title("Liquidación por Lote")
+        self.ventana.protocol("WM_DELETE_WINDOW", self.cerrar)
+        self.ano_gravable = ano_gravable
+
+        self.resultados = ResultadosLote()
+        self.rechazos = []
+        self.filas_rechazadas = 0
+        self.cola = queue.Queue()
+        self.cancelar_evento = threading.Event()
+        self.hilo = None
+        self.total_estimado = None
+        self.primera_visible = 0
+        self._sondeo = None
+
+        self.archivo = tk.StringVar(value="")
+        self.estado = tk.StringVar(value="Seleccione un archivo CSV o XLSX.")
+
+        self.create_widgets()
+
+    def create_widgets(self):
+        marco = ttk.Frame(self.ventana, padding="10 10 10 10")
+        marco.grid(row=0, column=0, sticky=(tk.N, tk.S, tk.E, tk.W))
+        self.ventana.columnconfigure(0, weight=1)
+        self.ventana.rowconfigure(0, weight=1)
+        marco.columnconfigure(0, weight=1)
+
+        # --- Archivo y controles ---
+        controles = ttk.Frame(marco)
+        controles.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        controles.columnconfigure(1, weight=1)
+        ttk.Button(controles, text="Abrir archivo...", command=self.seleccionar_archivo).grid(row=0, column=0, padx=5)
+        ttk.Label(controles, textvariable=self.archivo).grid(row=0, column=1, sticky=tk.W, padx=5)
+        self.boton_iniciar = ttk.Button(controles, text="Liquidar", command=self.iniciar, state=tk.DISABLED)
+        self.boton_iniciar.grid(row=0, column=2, padx=5)
+        self.boton_cancelar = ttk.Button(controles, text="Cancelar", command=self.cancelar, state=tk.DISABLED)
+        self.boton_cancelar.grid(row=0, column=3, padx=5)
+
+        # --- Progreso ---
+        self.progreso = ttk.Progressbar(marco, mode='determinate', maximum=100)
+        self.progreso.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+
+        # --- Grilla virtual ---
+        self.grilla = ttk.Treeview(marco, columns=[clave for clave, _, _ in COLUMNAS_GRILLA],
+                                   show='headings', height=20, selectmode='browse')
+        for clave, encabezado, ancho in COLUMNAS_GRILLA:
+            self.grilla.heading(clave, text=encabezado)
+            self.grilla.column(clave, width=ancho, anchor=tk.W if clave in ('nit', 'nombre') else tk.E)
+        self.grilla.grid(row=2, column=0, sticky=(tk.E, tk.W))
+
+        self.barra = ttk.Scrollbar(marco, orient=tk.VERTICAL, command=self.desplazar)
+        self.barra.grid(row=2, column=1, sticky=(tk.N, tk.S))
+
+        self.grilla.bind('<MouseWheel>', self._rueda)
+        self.grilla.bind('<Button-4>', lambda evento: self.desplazar('scroll', -3, 'units'))
+        self.grilla.bind('<Button-5>', lambda evento: self.desplazar('scroll', 3, 'units'))
+        for tecla, paso in (('<Up>', -1), ('<Down>', 1), ('<Prior>', -20), ('<Next>', 20)):
+            self.grilla.bind(tecla, lambda evento, paso=paso: self._tecla(paso))
+
+        ttk.Label(marco, textvariable=self.estado).grid(row=3, column=0, columnspan=2, sticky=tk.W, pady=5)
+
+    # --- Grilla virtual ---
+
+    def filas_visibles(self):
+        return max(int(self.grilla.cget('height')), 1)
+
+    def desplazar(self, accion, cantidad=None, unidad=None):
+        """Comando de la barra de desplazamiento ('moveto' o 'scroll')."""
+        visibles = self.filas_visibles()
+        if accion == 'moveto':
+            nueva = int(float(cantidad) * self.resultados.total)
+        else:
+            paso = visibles if unidad == 'pages' else 1
+            nueva = self.primera_visible + int(cantidad) * paso
+        self.primera_visible = max(0, min(nueva, self.resultados.total - visibles))
+        self.refrescar_grilla()
+        return 'break'
+
+    def _rueda(self, evento):
+        return self.desplazar('scroll', -3 if evento.delta > 0 else 3, 'units')
+
+    def _tecla(self, paso):
+        return self.desplazar('scroll', paso, 'units')
+
+    def refrescar_grilla(self):
+        """Llena las filas del Treeview con la ventana visible de resultados."""
+        visibles = self.filas_visibles()
+        filas = list(self.resultados.filas(self.primera_visible, self.primera_visible + visibles))
+        items = self.grilla.get_children()
+        for i, valores in enumerate(filas):
+            if i < len(items):
+                self.grilla.item(items[i], values=valores)
+            else:
+                self.grilla.insert('', tk.END, values=valores)
+        if len(items) > len(filas):
+            self.grilla.delete(*items[len(filas):])
+
+        total = self.resultados.total
+        if total:
+            self.barra.set(self.primera_visible / total, min((self.primera_visible + visibles) / total, 1.0))
+        else:
+            self.barra.set(0.0, 1.0)
+
+    # --- Trabajo en segundo plano ---
+
+    def seleccionar_archivo(self):
+        ruta = filedialog.askopenfilename(
+            parent=self.ventana,
+            filetypes=[("Hojas de cálculo", "*.csv *.xlsx *.xlsm"), ("Todos los archivos", "*.*")])
+        if ruta:
+            self.archivo.set(ruta)
+            self.boton_iniciar.config(state=tk.NORMAL)
+            self.estado.set(f"Archivo: {os.path.basename(ruta)}")
+
+    def iniciar(self):
+        ruta = self.archivo.get()
+        if not ruta or (self.hilo and self.hilo.is_alive()):
+            return
+        self.resultados = ResultadosLote()
+        self.rechazos = []
+        self.filas_rechazadas = 0
+        self.primera_visible = 0
+        self.refrescar_grilla()
+        self.cola = queue.Queue()
+        self.cancelar_evento = threading.Event()
+
+        self.total_estimado = contar_filas(ruta)
+        if self.total_estimado:
+            self.progreso.config(mode='determinate', value=0)
+        else:
+            self.progreso.config(mode='indeterminate')
+            self.progreso.start(20)
+
+        self.boton_iniciar.config(state=tk.DISABLED)
+        self.boton_cancelar.config(state=tk.NORMAL)
+        self.estado.set("Liquidando...")
+        self.hilo = threading.Thread(
+            target=trabajador_lote, args=(ruta, self.ano_gravable, self.cola, self.cancelar_evento),
+            daemon=True)
+        self.hilo.start()
+        self._sondeo = self.ventana.after(INTERVALO_SONDEO_MS, self.sondear_cola)
+
+    def cancelar(self):
+        self.cancelar_evento.set()
+        self.boton_cancelar.config(state=tk.DISABLED)
+        self.estado.set("Cancelando...")
+
+    def sondear_cola(self):
+        """Vacía la cola del hilo de trabajo y actualiza la interfaz."""
+        self._sondeo = None
+        terminado = completo = False
+        nuevas = False
+        try:
+            while True:
+                mensaje = self.cola.get_nowait()
+                tipo = mensaje[0]
+                if tipo == 'bloque':
+                    self.resultados.agregar(mensaje[1], mensaje[2])
+                    nuevas = True
+                elif tipo == 'rechazadas':
+                    self.filas_rechazadas += mensaje[1]
+                    self.rechazos.extend(mensaje[2])
+                elif tipo == 'fin':
+                    self.estado.set(f"{mensaje[1]:,} contribuyentes liquidados en {mensaje[2]:.1f} s.".replace(",", "."))
+                    terminado = completo = True
+                elif tipo == 'cancelado':
+                    self.estado.set(f"Cancelado: {mensaje[1]:,} contribuyentes liquidados.".replace(",", "."))
+                    terminado = True
+                elif tipo == 'error':
+                    self.estado.set("Error en el archivo.")
+                    messagebox.showerror("Error de Lote", mensaje[1], parent=self.ventana)
+                    terminado = True
+        except queue.Empty:
+            pass
+
+        if nuevas:
+            if self.total_estimado:
+                self.progreso.config(value=min(100.0, 100.0 * self.resultados.total / self.total_estimado))
+            if not terminado:
+                self.estado.set(f"Liquidando... {self.resultados.total:,} filas".replace(",", "."))
+            self.refrescar_grilla()
+
+        if terminado and self.rechazos:
+            self.estado.set(self.estado.get() + f" {self.filas_rechazadas:,} filas no se liquidaron.".replace(",", "."))
+            self.mostrar_rechazos()
+
+        if terminado:
+            self.progreso.stop()
+            self.progreso.config(mode='determinate')
+            if completo:
+                self.progreso.config(value=100)
+            self.boton_iniciar.config(state=tk.NORMAL)
+            self.boton_cancelar.config(state=tk.DISABLED)
+        else:
+            self._sondeo = self.ventana.after(INTERVALO_SONDEO_MS, self.sondear_cola)
+
+    def mostrar_rechazos(self):
+        """Lista las filas que no se liquidaron (las primeras MAX_RECHAZOS_MOSTRADOS)."""
+        lineas = self.rechazos[:MAX_RECHAZOS_MOSTRADOS]
+        if len(self.rechazos) > MAX_RECHAZOS_MOSTRADOS:
+            lineas.append(f"... y {len(self.rechazos) - MAX_RECHAZOS_MOSTRADOS:,} más.".replace(",", "."))
+        messagebox.showwarning("Filas no liquidadas", "\n".join(lineas), parent=self.ventana)
+
+    def cerrar(self):
+        self.cancelar_evento.set()
+        if self._sondeo is not None:
+            self.ventana.after_cancel(self._sondeo)
+        self.ventana.destroy()
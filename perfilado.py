@@ -0,0 +1,235 @@
+"""
+PERFILADO POR ETAPAS DE LA LIQUIDACIÓN
+Personas Naturales Residentes Fiscales - Colombia
+
+Ganchos opcionales que registran, por etapa, el tiempo de reloj, el número
+de llamadas y las filas procesadas:
+
+- lote.lectura / lote.columnas / lote.motor / lote.formato / lote.csv /
+  lote.escritura   (lote_renta.py; lote.motor incluye los pasos motor.*)
+- lote.validacion_nit / lote.validacion   (lote_renta.py --validacion)
+- knime.columnas / knime.motor / knime.tabla   (knime_nodo.py)
+- retencion.columnas / retencion.motor / retencion.acumulado /
+  retencion.formato / retencion.escritura   (retencion_mensual.py)
+- motor.ingresos ... motor.liquidacion_final   (pasos 1-15 del motor vectorizado)
+- nucleo.*   (funciones de nucleo_renta.py, con `instrumentar`)
+
+Con el perfilado desactivado (por defecto) los ganchos no miden nada: el
+motor solo consulta una vez por bloque si hay un perfil activo.
+
+El resumen se exporta en JSON o en el formato de texto de Prometheus, y
+`perfilar_cprofile` guarda un volcado de cProfile (.prof) que leen
+snakeviz, flameprof o gprof2dot para armar el flame graph.
+
+Desde la línea de comandos:
+    python lote_renta.py entrada.csv -o resultados.csv --perfil-json perfil.json
+    python lote_renta.py entrada.csv -p 4 --perfil-prometheus perfil.prom --cprofile lote.prof
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Funciones de nucleo_renta que se pueden instrumentar. calcular_impuesto_renta
+# incluye el tiempo de las otras tres.
+FUNCIONES_NUCLEO = ('calcular_cesantias_exentas', 'aplicar_tabla_articulo_241',
+                    'calcular_anticipo', 'calcular_impuesto_renta')
+
+_activo = None
+
+
+class Perfil:
+    """Tiempo, llamadas y filas acumulados por etapa."""
+
+    def __init__(self):
+        self.etapas = {}        # etapa -> [llamadas, filas, segundos]
+
+    def registrar(self, etapa, segundos, filas=0):
+        acumulado = self.etapas.get(etapa)
+        if acumulado is None:
+            self.etapas[etapa] = [1, filas, segundos]
+        else:
+            acumulado[0] += 1
+            acumulado[1] += filas
+            acumulado[2] += segundos
+
+    @contextmanager
+    def medir(self, etapa, filas=0):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio, filas)
+
+    def combinar(self, etapas):
+        """Suma las etapas de otro perfil (p. ej. el de un proceso del pool)."""
+        for etapa, (llamadas, filas, segundos) in etapas.items():
+            acumulado = self.etapas.setdefault(etapa, [0, 0, 0.0])
+            acumulado[0] += llamadas
+            acumulado[1] += filas
+            acumulado[2] += segundos
+
+    def resumen(self):
+        """{etapa: {'llamadas', 'filas', 'segundos', 'us_por_fila'}} ordenado por etapa."""
+        return {
+            etapa: {
+                'llamadas': llamadas,
+                'filas': filas,
+                'segundos': round(segundos, 6),
+                'us_por_fila': round(segundos / filas * 1e6, 3) if filas else None,
+            }
+            for etapa, (llamadas, filas, segundos) in sorted(self.etapas.items())
+        }
+
+    def a_json(self):
+        return json.dumps({'etapas': self.resumen()}, indent=2, ensure_ascii=False)
+
+    def a_prometheus(self, prefijo='liquidacion'):
+        """Texto de exposición de Prometheus: contadores por etapa."""
+        metricas = (
+            ('etapa_segundos_total', 'Tiempo de reloj acumulado por etapa.', 2),
+            ('etapa_llamadas_total', 'Veces que se ejecutó cada etapa.', 0),
+            ('etapa_filas_total', 'Contribuyentes procesados por etapa.', 1),
+        )
+        lineas = []
+        for nombre, ayuda, posicion in metricas:
+            lineas.append(f"# HELP {prefijo}_{nombre} {ayuda}")
+            lineas.append(f"# TYPE {prefijo}_{nombre} counter")
+            for etapa, valores in sorted(self.etapas.items()):
+                lineas.append(f'{prefijo}_{nombre}{{etapa="{etapa}"}} {valores[posicion]}')
+        return '\n'.join(lineas) + '\n'
+
+
+# --- PERFIL ACTIVO ---
+
+def activar(perfil=None):
+    """Activa el perfilado en este proceso y retorna el perfil que acumula."""
+    global _activo
+    _activo = perfil if perfil is not None else Perfil()
+    return _activo
+
+
+def desactivar():
+    """Desactiva el perfilado y retorna el perfil que estaba activo (o None)."""
+    global _activo
+    perfil, _activo = _activo, None
+    return perfil
+
+
+def activo():
+    return _activo
+
+
+@contextmanager
+def perfilando(perfil=None):
+    anterior = _activo
+    perfil = activar(perfil)
+    try:
+        yield perfil
+    finally:
+        if anterior is not None:
+            activar(anterior)
+        else:
+            desactivar()
+
+
+def cronometro(filas):
+    """
+    Con un perfil activo, retorna `marcar(etapa)`, que registra el tiempo
+    transcurrido desde la marca anterior (o desde la creación) para `filas`
+    contribuyentes. Sin perfil activo retorna None, y el llamador omite las
+    marcas con `if marcar: ...`.
+    """
+    perfil = _activo
+    if perfil is None:
+        return None
+    anterior = time.perf_counter()
+
+    def marcar(etapa):
+        nonlocal anterior
+        ahora = time.perf_counter()
+        perfil.registrar(etapa, ahora - anterior, filas)
+        anterior = ahora
+
+    return marcar
+
+
+def medir_iterador(iterable, etapa, contar=len):
+    """
+    Itera `iterable` registrando el tiempo de cada `next` en `etapa` (filas
+    = contar(elemento)). Sin perfil activo retorna el iterable sin cambios.
+    """
+    perfil = _activo
+    if perfil is None:
+        return iterable
+    return _iterar_medido(iter(iterable), perfil, etapa, contar)
+
+
+def _iterar_medido(iterador, perfil, etapa, contar):
+    while True:
+        inicio = time.perf_counter()
+        try:
+            elemento = next(iterador)
+        except StopIteration:
+            return
+        perfil.registrar(etapa, time.perf_counter() - inicio, contar(elemento))
+        yield elemento
+
+
+@contextmanager
+def instrumentar(modulo, funciones=FUNCIONES_NUCLEO, prefijo='nucleo'):
+    """
+    Reemplaza mientras dura el bloque las `funciones` de `modulo` por
+    versiones que registran su tiempo en el perfil activo como
+    '<prefijo>.<función>' (una fila por llamada). Las llamadas internas del
+    módulo pasan por las versiones medidas porque se buscan por nombre.
+    """
+    originales = {nombre: getattr(modulo, nombre) for nombre in funciones}
+
+    def medida(nombre, funcion):
+        etapa = f"{prefijo}.{nombre}"
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            perfil = _activo
+            if perfil is None:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                perfil.registrar(etapa, time.perf_counter() - inicio, 1)
+        return envoltura
+
+    for nombre, funcion in originales.items():
+        setattr(modulo, nombre, medida(nombre, funcion))
+    try:
+        yield
+    finally:
+        for nombre, funcion in originales.items():
+            setattr(modulo, nombre, funcion)
+
+
+def perfilar_cprofile(funcion, *args, ruta=None, **kwargs):
+    """
+    Ejecuta `funcion(*args, **kwargs)` bajo cProfile y, si se indica `ruta`,
+    guarda el volcado (.prof). Retorna (resultado, pstats.Stats).
+    """
+    import cProfile
+    import pstats
+
+    perfilador = cProfile.Profile()
+    resultado = perfilador.runcall(funcion, *args, **kwargs)
+    if ruta:
+        perfilador.dump_stats(ruta)
+    return resultado, pstats.Stats(perfilador)
+
+
+def imprimir_resumen(perfil, destino=sys.stderr):
+    print("etapa\tllamadas\tfilas\tsegundos\tus/fila", file=destino)
+    for etapa, valores in perfil.resumen().items():
+        por_fila = '-' if valores['us_por_fila'] is None else f"{valores['us_por_fila']:.3f}"
+        print(f"{etapa}\t{valores['llamadas']}\t{valores['filas']}\t"
+              f"{valores['segundos']:.4f}\t{por_fila}", file=destino)
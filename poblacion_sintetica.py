@@ -0,0 +1,102 @@
+"""
+GENERADOR DETERMINÍSTICO DE POBLACIONES SINTÉTICAS
+Personas Naturales Residentes Fiscales - Colombia
+
+Genera contribuyentes de rentas de trabajo con mezclas realistas para
+pruebas de rendimiento y simulaciones: asalariados, altos ingresos (por
+encima de 31.000 UVT), personas con cesantías y con dependientes. La misma
+semilla produce siempre la misma población.
+"""
+
+import numpy as np
+
+import motor_vectorizado as motor
+from reglas_tributarias import obtener_paquete
+
+# Participación de cada segmento en la población
+MEZCLA_POR_DEFECTO = {
+    'asalariado': 0.80,
+    'ingreso_medio_alto': 0.15,
+    'alto_ingreso': 0.05,
+}
+
+# Salario mensual (mediana y dispersión lognormal) por segmento, en UVT
+SALARIO_MENSUAL_UVT = {
+    'asalariado': (60, 0.45),
+    'ingreso_medio_alto': (300, 0.35),
+    'alto_ingreso': (3300, 0.40),   # ~40.000 UVT al año: por encima de 31.000 UVT
+}
+
+PROBABILIDAD_CESANTIAS = 0.70
+PROBABILIDAD_DEPENDIENTES = 0.40
+
+
+def generar_poblacion(n, semilla=2024, mezcla=None, reglas=None):
+    """
+    Genera `n` contribuyentes como columnas numpy (claves de CONCEPTOS_ENTRADA
+    más `segmento`, `nit` y `nombre`), listas para el motor vectorizado.
+    """
+    rng = np.random.default_rng(semilla)
+    uvt = obtener_paquete(reglas).uvt
+    mezcla = mezcla or MEZCLA_POR_DEFECTO
+    nombres_segmento = list(mezcla)
+    probabilidades = np.array([mezcla[s] for s in nombres_segmento], dtype=np.float64)
+    segmento = rng.choice(len(nombres_segmento), size=n, p=probabilidades / probabilidades.sum())
+
+    mediana = np.array([SALARIO_MENSUAL_UVT[s][0] for s in nombres_segmento])[segmento] * uvt
+    dispersion = np.array([SALARIO_MENSUAL_UVT[s][1] for s in nombres_segmento])[segmento]
+    salario_mensual = np.round(mediana * np.exp(rng.normal(0.0, 1.0, n) * dispersion), -3)
+
+    tiene_cesantias = rng.random(n) < PROBABILIDAD_CESANTIAS
+    tiene_dependientes = rng.random(n) < PROBABILIDAD_DEPENDIENTES
+
+    columnas = {}
+    columnas['salarios'] = salario_mensual * 12
+    columnas['cesantias'] = np.where(tiene_cesantias, salario_mensual, 0.0)
+    columnas['prestaciones_sociales'] = np.round(salario_mensual * rng.uniform(0.5, 1.2, n), -3)
+    columnas['otros_pagos_laborales'] = np.where(rng.random(n) < 0.2,
+                                                 np.round(salario_mensual * rng.uniform(0, 3, n), -3), 0.0)
+    columnas['ingreso_mensual_promedio'] = np.where(
+        tiene_cesantias, np.round(salario_mensual * rng.uniform(0.95, 1.10, n), -3), 0.0)
+    columnas['incr_salud'] = np.round(columnas['salarios'] * 0.04)
+    columnas['incr_pensiones'] = np.round(columnas['salarios'] * 0.04)
+    columnas['pension_voluntaria'] = np.where(rng.random(n) < 0.15,
+                                              np.round(columnas['salarios'] * rng.uniform(0, 0.3, n), -3), 0.0)
+    columnas['afc'] = np.where(rng.random(n) < 0.10,
+                               np.round(columnas['salarios'] * rng.uniform(0, 0.2, n), -3), 0.0)
+    columnas['num_dependientes'] = np.where(tiene_dependientes, rng.integers(1, 5, n), 0).astype(np.float64)
+    columnas['intereses_vivienda'] = np.where(rng.random(n) < 0.15,
+                                              np.round(rng.uniform(2, 1300, n) * uvt, -3), 0.0)
+    columnas['medicina_prepagada'] = np.where(rng.random(n) < 0.25,
+                                              np.round(rng.uniform(20, 250, n) * uvt, -3), 0.0)
+    columnas['compras_factura_electronica'] = np.round(columnas['salarios'] * rng.uniform(0, 0.6, n), -3)
+    columnas['gmf'] = np.round(columnas['salarios'] * 0.004 * rng.uniform(0.3, 1.0, n))
+    columnas['num_anos_declarando'] = rng.integers(1, 11, n).astype(np.float64)
+
+    # Historia y retenciones aproximadas a partir del impuesto del año
+    resultados = motor.calcular_impuesto_renta_lote(columnas, reglas)
+    impuesto = resultados['impuesto_neto']
+    columnas['retenciones'] = np.round(impuesto * rng.uniform(0.6, 1.1, n), -3)
+    columnas['impuesto_neto_anterior'] = np.where(
+        columnas['num_anos_declarando'] > 1, np.round(impuesto * rng.uniform(0.7, 1.1, n), -3), 0.0)
+    columnas['anticipo_anterior'] = np.where(
+        columnas['num_anos_declarando'] > 1, np.round(impuesto * rng.uniform(0, 0.3, n), -3), 0.0)
+    columnas['saldo_favor_anterior'] = np.where(rng.random(n) < 0.1,
+                                                np.round(rng.uniform(0, 30, n) * uvt, -3), 0.0)
+
+    columnas['segmento'] = np.array(nombres_segmento)[segmento]
+    columnas['nit'] = np.char.add('9', np.char.zfill(np.arange(n).astype(str), 9))
+    columnas['nombre'] = np.char.add('CONTRIBUYENTE ', np.arange(1, n + 1).astype(str))
+    return columnas
+
+
+def generar_declaraciones(n, semilla=2024, mezcla=None, reglas=None):
+    """Genera la misma población como lista de diccionarios `datos`."""
+    columnas = generar_poblacion(n, semilla, mezcla, reglas)
+    listas = {clave: columnas[clave].tolist()
+              for clave in ('nombre', 'nit', *motor.CONCEPTOS_ENTRADA)}
+    declaraciones = [dict(zip(listas, fila)) for fila in zip(*listas.values())]
+    for datos in declaraciones:
+        datos['num_dependientes'] = int(datos['num_dependientes'])
+        datos['num_anos_declarando'] = int(datos['num_anos_declarando'])
+    return declaraciones
@@ -0,0 +1,196 @@
+"""
+REGISTROS COMPACTOS DE DECLARACIONES Y LIQUIDACIONES
+Personas Naturales Residentes Fiscales - Colombia
+
+Alternativas de poca memoria al diccionario `datos` de `capturar_datos`
+(21 claves) y al diccionario `resultados` de `calcular_impuesto_renta`:
+
+- Declaracion / Liquidacion: un registro con __slots__ por contribuyente.
+  Declaracion admite `datos['salarios']`, así que se puede pasar tal cual a
+  `calcular_impuesto_renta`.
+- TablaDeclaraciones / TablaLiquidaciones: estructura de arreglos, una
+  columna `array('d')` (8 bytes por valor) por concepto. Es el formato que
+  consume y produce el motor vectorizado sin conversiones.
+
+Todas las clases convierten desde y hacia la forma de diccionario.
+"""
+
+from array import array
+
+import numpy as np
+
+import motor_vectorizado as motor
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO
+
+CAMPOS_IDENTIFICACION = ('nombre', 'nit')
+CAMPOS_DECLARACION = (*CAMPOS_IDENTIFICACION, *motor.CONCEPTOS_ENTRADA, 'ano_gravable')
+CONCEPTOS_ENTEROS = ('num_dependientes', 'num_anos_declarando')
+
+
+class Declaracion:
+    """Datos de entrada de un contribuyente (mismas claves que `capturar_datos`)."""
+
+    __slots__ = CAMPOS_DECLARACION
+
+    def __init__(self, **valores):
+        for campo in CAMPOS_DECLARACION:
+            setattr(self, campo, valores.pop(campo, _valor_por_defecto(campo)))
+        if valores:
+            raise TypeError(f"Campos desconocidos: {', '.join(sorted(valores))}")
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """Crea la declaración desde el diccionario `datos` (ignora claves extra)."""
+        return cls(**{campo: datos[campo] for campo in CAMPOS_DECLARACION if campo in datos})
+
+    def a_dict(self):
+        return {campo: getattr(self, campo) for campo in CAMPOS_DECLARACION}
+
+    def __getitem__(self, campo):
+        # Compatibilidad con el código que usa datos['concepto']
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def __repr__(self):
+        return f"Declaracion(nit={self.nit!r}, nombre={self.nombre!r})"
+
+
+class Liquidacion:
+    """Resultados de un contribuyente (mismas claves que `calcular_impuesto_renta`)."""
+
+    __slots__ = motor.COLUMNAS_RESULTADO
+
+    def __init__(self, **valores):
+        for clave in motor.COLUMNAS_RESULTADO:
+            setattr(self, clave, valores[clave])
+
+    @classmethod
+    def desde_dict(cls, resultados):
+        return cls(**{clave: resultados[clave] for clave in motor.COLUMNAS_RESULTADO})
+
+    def a_dict(self):
+        return {clave: getattr(self, clave) for clave in motor.COLUMNAS_RESULTADO}
+
+    def __getitem__(self, clave):
+        try:
+            return getattr(self, clave)
+        except AttributeError:
+            raise KeyError(clave) from None
+
+    def __repr__(self):
+        tipo = 'saldo a favor' if self.es_saldo_favor else 'saldo a pagar'
+        return f"Liquidacion(impuesto_neto={self.impuesto_neto:.0f}, {tipo}={self.valor_final:.0f})"
+
+
+def _valor_por_defecto(campo):
+    if campo in CAMPOS_IDENTIFICACION:
+        return ''
+    if campo == 'ano_gravable':
+        return None
+    return motor.VALORES_POR_DEFECTO[campo]
+
+
+class TablaDeclaraciones:
+    """
+    Declaraciones en estructura de arreglos: una columna `array('d')` por
+    concepto y listas para nombre y NIT.
+    """
+
+    __slots__ = ('nombres', 'nits', 'columnas', 'anos')
+
+    def __init__(self):
+        self.nombres = []
+        self.nits = []
+        self.columnas = {concepto: array('d') for concepto in motor.CONCEPTOS_ENTRADA}
+        self.anos = array('i')
+
+    @classmethod
+    def desde_registros(cls, registros, ano_gravable=None):
+        """Crea la tabla desde diccionarios o Declaraciones."""
+        tabla = cls()
+        for registro in registros:
+            tabla.agregar(registro, ano_gravable)
+        return tabla
+
+    def agregar(self, registro, ano_gravable=None):
+        """Agrega un diccionario `datos` o una Declaracion."""
+        if isinstance(registro, dict):
+            obtener = registro.get
+        else:
+            obtener = lambda campo, defecto=None: getattr(registro, campo, defecto)  # noqa: E731
+        self.nombres.append(obtener('nombre', '') or '')
+        self.nits.append(obtener('nit', '') or '')
+        for concepto, columna in self.columnas.items():
+            valor = obtener(concepto)
+            columna.append(motor.VALORES_POR_DEFECTO[concepto] if valor is None else valor)
+        ano = obtener('ano_gravable') or ano_gravable
+        self.anos.append(int(ano) if ano else 0)
+
+    def __len__(self):
+        return len(self.nits)
+
+    def __getitem__(self, i):
+        valores = {concepto: columna[i] for concepto, columna in self.columnas.items()}
+        for campo in CONCEPTOS_ENTEROS:
+            valores[campo] = int(valores[campo])
+        return Declaracion(nombre=self.nombres[i], nit=self.nits[i],
+                           ano_gravable=self.anos[i] or None, **valores)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def columnas_motor(self):
+        """
+        Columnas para `calcular_impuesto_renta_lote`. Los arreglos de numpy
+        se crean sobre los mismos buffers, sin copiar.
+        """
+        if not len(self):
+            return {concepto: np.empty(0) for concepto in self.columnas}
+        columnas = {concepto: np.frombuffer(columna, dtype=np.float64)
+                    for concepto, columna in self.columnas.items()}
+        anos = np.frombuffer(self.anos, dtype=np.int32)
+        if anos.any():
+            # Las filas sin año se liquidan con el año por defecto
+            columnas['ano_gravable'] = np.where(anos == 0, ANO_GRAVABLE_POR_DEFECTO, anos)
+        return columnas
+
+    def bytes_aproximados(self):
+        """Memoria de las columnas numéricas (sin contar nombres y NIT)."""
+        return sum(c.itemsize * len(c) for c in self.columnas.values()) + self.anos.itemsize * len(self.anos)
+
+
+class TablaLiquidaciones:
+    """Resultados del motor vectorizado en estructura de arreglos."""
+
+    __slots__ = ('nits', 'columnas')
+
+    def __init__(self, columnas, nits=None):
+        self.columnas = columnas
+        self.nits = nits
+
+    def __len__(self):
+        return len(self.columnas['valor_final'])
+
+    def __getitem__(self, i):
+        return Liquidacion(**{clave: columna[i].item() for clave, columna in self.columnas.items()})
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def a_dicts(self):
+        """Lista de diccionarios con la forma de `calcular_impuesto_renta`."""
+        listas = {clave: columna.tolist() for clave, columna in self.columnas.items()}
+        return [dict(zip(listas, fila)) for fila in zip(*listas.values())]
+
+
+def liquidar_tabla(tabla, reglas=None):
+    """Liquida una TablaDeclaraciones y retorna una TablaLiquidaciones."""
+    columnas = motor.calcular_impuesto_renta_lote(tabla.columnas_motor(), reglas)
+    return TablaLiquidaciones(columnas, tabla.nits)
+
+
+def liquidar_declaraciones(declaraciones, reglas=None):
+    """Liquida una secuencia de Declaraciones y retorna una lista de Liquidaciones."""
+    return list(liquidar_tabla(TablaDeclaraciones.desde_registros(declaraciones), reglas))
@@ -0,0 +1,208 @@
+"""
+PAQUETES DE REGLAS TRIBUTARIAS POR AÑO GRAVABLE
+Personas Naturales Residentes Fiscales - Colombia
+
+Cada año gravable (o modificación) se describe en un archivo JSON dentro de
+la carpeta `reglas/`: UVT, tabla del Art. 241, tabla de cesantías del
+Art. 206 numeral 4, límites en UVT del Art. 336, porcentajes del Art. 807
+y, para la retención mensual, la tabla del Art. 383 y la deducción por
+dependientes del Art. 387.
+
+Al cargarse, un paquete se compila una sola vez a tuplas con el impuesto
+acumulado al inicio de cada rango y queda en caché. Los paquetes son
+inmutables: varios hilos o procesos pueden liquidar años distintos a la vez
+sin tocar variables globales.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+CARPETA_REGLAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reglas')
+ANO_GRAVABLE_POR_DEFECTO = 2024
+
+
+@dataclass(frozen=True, eq=False)
+class PaqueteReglas:
+    """Reglas de un año gravable, compiladas y listas para el motor."""
+
+    ano_gravable: int
+    version: str
+    uvt: int
+
+    # Tabla Art. 241 (en UVT): límite superior de cada rango (sin el último,
+    # que es abierto), inicio, tarifa marginal e impuesto acumulado al inicio.
+    limites_241_uvt: Tuple[float, ...]
+    inicio_241_uvt: Tuple[float, ...]
+    tarifas_241: Tuple[float, ...]
+    impuesto_base_241_uvt: Tuple[float, ...]
+
+    # Tabla Art. 206 numeral 4: límite superior del ingreso mensual promedio
+    # (en UVT) y porcentaje exento de cada rango.
+    limites_cesantias_uvt: Tuple[float, ...]
+    porcentajes_cesantias: Tuple[float, ...]
+
+    # Límites en UVT
+    limite_renta_exenta_25_uvt: float
+    limite_general_uvt: float
+    limite_dependientes_uvt: float
+    deduccion_por_dependiente_uvt: float
+    limite_medicina_prepagada_uvt: float
+    limite_intereses_vivienda_uvt: float
+    limite_pension_afc_uvt: float
+    limite_factura_electronica_uvt: float
+
+    # Porcentajes
+    porcentaje_limite_general: float
+    porcentaje_renta_exenta_25: float
+    porcentaje_pension_afc: float
+    porcentaje_factura_electronica: float
+    porcentaje_gmf: float
+
+    # Art. 807: porcentaje para 1 año, 2 años y 3 o más años declarando
+    porcentajes_anticipo: Tuple[float, float, float]
+
+    # Tabla Art. 383 (retención mensual, en UVT), con la misma forma que la
+    # 241. El impuesto al inicio de cada rango es el publicado en la tabla
+    # (no coincide con el acumulado redondeado). Vacía si el paquete no trae
+    # `retencion_383`.
+    limites_383_uvt: Tuple[float, ...] = ()
+    inicio_383_uvt: Tuple[float, ...] = ()
+    tarifas_383: Tuple[float, ...] = ()
+    impuesto_base_383_uvt: Tuple[float, ...] = ()
+
+    # Art. 387: deducción mensual por dependientes (porcentaje del ingreso
+    # bruto del mes, hasta un límite mensual en UVT)
+    porcentaje_dependientes_387: float = 0.0
+    limite_dependientes_387_uvt: float = 0.0
+
+    def porcentaje_anticipo(self, num_anos_declarando):
+        """Porcentaje del Art. 807 según los años que lleva declarando."""
+        if num_anos_declarando == 1:
+            return self.porcentajes_anticipo[0]
+        elif num_anos_declarando == 2:
+            return self.porcentajes_anticipo[1]
+        return self.porcentajes_anticipo[2]
+
+
+def _impuesto_acumulado(inicio, tarifas):
+    """
+    Impuesto acumulado (en UVT) al inicio de cada rango de la tabla 241.
+    Igual que la tabla publicada, cada valor se redondea a UVT enteras.
+    """
+    acumulado = [0.0]
+    for i in range(1, len(inicio)):
+        tramo = (inicio[i] - inicio[i - 1]) * tarifas[i - 1]
+        acumulado.append(float(round(acumulado[-1] + tramo)))
+    return tuple(acumulado)
+
+
+def _rangos(tabla, nombre):
+    """(límites, inicio, tarifas) de una tabla de rangos consecutivos en UVT."""
+    inicio = tuple(float(rango['desde_uvt']) for rango in tabla)
+    tarifas = tuple(float(rango['tarifa']) for rango in tabla)
+    limites = tuple(float(rango['hasta_uvt']) for rango in tabla[:-1])
+    if tabla[-1]['hasta_uvt'] is not None:
+        raise ValueError(f"El último rango de la tabla {nombre} debe ser abierto (hasta_uvt: null).")
+    if limites != inicio[1:]:
+        raise ValueError(f"Los rangos de la tabla {nombre} deben ser consecutivos.")
+    return limites, inicio, tarifas
+
+
+def _retencion_383(definicion):
+    """Campos de retención mensual del paquete (vacíos si el JSON no los trae)."""
+    retencion = definicion.get('retencion_383')
+    if retencion is None:
+        return {}
+    tabla = retencion['tabla']
+    limites, inicio, tarifas = _rangos(tabla, '383')
+    dependientes = retencion['dependientes_387']
+    return dict(
+        limites_383_uvt=limites,
+        inicio_383_uvt=inicio,
+        tarifas_383=tarifas,
+        impuesto_base_383_uvt=tuple(float(rango['impuesto_base_uvt']) for rango in tabla),
+        porcentaje_dependientes_387=float(dependientes['porcentaje']),
+        limite_dependientes_387_uvt=float(dependientes['limite_mensual_uvt']),
+    )
+
+
+def compilar_paquete(definicion):
+    """Compila la definición (diccionario leído del JSON) a un PaqueteReglas."""
+    limites, inicio, tarifas = _rangos(definicion['tabla_241'], '241')
+
+    cesantias = definicion['cesantias_206_4']
+    if cesantias[-1]['hasta_uvt'] is not None:
+        raise ValueError("El último rango de cesantías debe ser abierto (hasta_uvt: null).")
+
+    limites_uvt = definicion['limites_uvt']
+    porcentajes = definicion['porcentajes']
+    anticipo = tuple(float(p) for p in definicion['anticipo_807'])
+    if len(anticipo) != 3:
+        raise ValueError("anticipo_807 debe tener 3 porcentajes (1, 2 y 3+ años).")
+
+    return PaqueteReglas(
+        ano_gravable=int(definicion['ano_gravable']),
+        version=str(definicion.get('version', definicion['ano_gravable'])),
+        uvt=int(definicion['uvt']),
+        limites_241_uvt=limites,
+        inicio_241_uvt=inicio,
+        tarifas_241=tarifas,
+        impuesto_base_241_uvt=_impuesto_acumulado(inicio, tarifas),
+        limites_cesantias_uvt=tuple(float(r['hasta_uvt']) for r in cesantias[:-1]),
+        porcentajes_cesantias=tuple(float(r['porcentaje_exento']) for r in cesantias),
+        limite_renta_exenta_25_uvt=limites_uvt['renta_exenta_25'],
+        limite_general_uvt=limites_uvt['general_336'],
+        limite_dependientes_uvt=limites_uvt['dependientes'],
+        deduccion_por_dependiente_uvt=limites_uvt['por_dependiente'],
+        limite_medicina_prepagada_uvt=limites_uvt['medicina_prepagada'],
+        limite_intereses_vivienda_uvt=limites_uvt['intereses_vivienda'],
+        limite_pension_afc_uvt=limites_uvt['pension_afc'],
+        limite_factura_electronica_uvt=limites_uvt['factura_electronica'],
+        porcentaje_limite_general=float(porcentajes['limite_general_336']),
+        porcentaje_renta_exenta_25=float(porcentajes['renta_exenta_25']),
+        porcentaje_pension_afc=float(porcentajes['pension_afc']),
+        porcentaje_factura_electronica=float(porcentajes['factura_electronica']),
+        porcentaje_gmf=float(porcentajes['gmf']),
+        porcentajes_anticipo=anticipo,
+        **_retencion_383(definicion),
+    )
+
+
+@lru_cache(maxsize=None)
+def cargar_paquete_desde_archivo(ruta):
+    """Carga y compila un paquete desde un archivo JSON (una sola vez por ruta)."""
+    with open(ruta, encoding='utf-8') as archivo:
+        return compilar_paquete(json.load(archivo))
+
+
+@lru_cache(maxsize=None)
+def cargar_paquete(ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+    """Retorna el paquete compilado del año gravable indicado (en caché: sin tocar disco de nuevo)."""
+    ruta = os.path.join(CARPETA_REGLAS, f"{int(ano_gravable)}.json")
+    if not os.path.exists(ruta):
+        raise ValueError(f"No hay paquete de reglas para el año gravable {ano_gravable} "
+                         f"(disponibles: {', '.join(map(str, anos_disponibles()))}).")
+    return cargar_paquete_desde_archivo(ruta)
+
+
+def obtener_paquete(reglas=None):
+    """
+    Normaliza el argumento `reglas` que aceptan los motores: None (año por
+    defecto), un año gravable, la ruta de un JSON o un PaqueteReglas.
+    """
+    if reglas is None:
+        return cargar_paquete(ANO_GRAVABLE_POR_DEFECTO)
+    if isinstance(reglas, PaqueteReglas):
+        return reglas
+    if isinstance(reglas, str) and reglas.endswith('.json'):
+        return cargar_paquete_desde_archivo(os.path.abspath(reglas))
+    return cargar_paquete(reglas)
+
+
+def anos_disponibles():
+    """Años gravables con paquete en la carpeta `reglas/`."""
+    return sorted(int(nombre[:-5]) for nombre in os.listdir(CARPETA_REGLAS)
+                  if nombre.endswith('.json') and nombre[:-5].isdigit())
@@ -0,0 +1,351 @@
+"""
+REPORTES HTML POR CONTRIBUYENTE - GENERACIÓN MASIVA
+Personas Naturales Residentes Fiscales - Colombia
+
+Genera el resumen de liquidación de cada empleado de una hoja (mismo
+formato de entrada que lote_renta.py) con el estilo del reporte de
+CODYGOPY.txt:
+
+- La plantilla se compila una sola vez (textos fijos y campos separados);
+  cada reporte solo formatea los valores y une las partes.
+- Los bloques se liquidan con el motor vectorizado y se renderizan en un
+  pool de procesos, con a lo sumo 2 bloques pendientes por proceso.
+- Los reportes se escriben a medida que llegan, sin guardarlos todos en
+  memoria: un .zip con un HTML por contribuyente (y una hoja de estilos
+  compartida) o un único HTML paginado con índice. La salida se escribe
+  en un archivo temporal que solo reemplaza al destino al terminar.
+- Como en lote_renta.py, las filas con celdas no numéricas o año sin
+  reglas se reportan en stderr y no tienen reporte.
+
+Uso:
+    python reportes_html.py empleados.xlsx -o reportes.zip -p 0
+    python reportes_html.py empleados.csv -o reportes.html
+"""
+
+import argparse
+import contextlib
+import html
+import os
+import shutil
+import string
+import sys
+import tempfile
+import time
+import zipfile
+
+import lote_renta
+import motor_vectorizado as motor
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO, cargar_paquete
+
+TAMANO_BLOQUE_POR_DEFECTO = 1000
+
+# Estilos de presentación (sobríos: blanco y azul claro), de CODYGOPY.txt
+ESTILO_CSS = """
+body { font-family: 'Inter', sans-serif; background-color: #F8F9FA; color: #343A40; }
+.container { max-width: 900px; margin: 40px auto; padding: 20px; background-color: #FFFFFF; border: 1px solid #DEE2E6; border-radius: 12px; box-shadow: 0 6px 12px rgba(0, 0, 0, 0.15); }
+h1 { text-align: center; color: #007BFF; border-bottom: 3px solid #007BFF; padding-bottom: 15px; margin-bottom: 30px; font-weight: 700; }
+h2 { color: #0056b3; font-size: 1.25rem; border-left: 5px solid #85BDE0; background-color: #E9F6FF; padding: 10px 15px; margin-top: 25px; border-radius: 4px; }
+pre { background-color: #F8F9FA; border: 1px solid #DEE2E6; padding: 15px; border-radius: 6px; overflow-x: auto; color: #343A40; font-size: 0.9rem; white-space: pre-wrap; word-wrap: break-word; }
+.result-box { padding: 20px; border-radius: 10px; text-align: center; font-size: 1.6rem; font-weight: bold; margin-top: 30px; box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1); }
+.result-pago { background-color: #F8D7DA; border: 2px solid #F5C6CB; color: #721C24; }
+.result-favor { background-color: #D4EDDA; border: 2px solid #C3E6CB; color: #155724; }
+.uvt-info { font-style: italic; font-size: 0.9rem; color: #6c757d; margin-bottom: 10px; }
+.indice a { text-decoration: none; }
+@media print { .container { page-break-after: always; box-shadow: none; } nav { display: none; } }
+"""
+
+# Cuerpo del reporte de un contribuyente. `:pesos` formatea como moneda;
+# los demás formatos son los de format().
+CUERPO_HTML = """<div class="container" id="{ancla}">
+<h1>IMPUESTO DE RENTA AÑO GRAVABLE {ano_gravable}</h1>
+<p class="uvt-info">Vigencia {ano_gravable} - UVT: {uvt:pesos}</p>
+
+<h2>Datos del Contribuyente</h2>
+<p><strong>Nombres y Apellidos:</strong> {nombre}</p>
+<p><strong>Identificación (C.C./NIT):</strong> {nit}</p>
+
+<h2>Depuración de la Renta (Art. 336 E.T.)</h2>
+<pre>
+Ingresos Totales:                    {ingresos_totales:pesos}
+(-) INCR Total:                      {incr_total:pesos}
+Ingreso Neto:                        {ingreso_neto:pesos}
+
+(-) Cesantías Exentas Art. 206:      {cesantias_exentas:pesos}
+(-) Deducciones:                     {deducciones_totales:pesos}
+    (Dependientes:                   {deduccion_dependientes:pesos})
+    (Medicina Prepagada:             {deduccion_medicina:pesos})
+    (Intereses Vivienda:             {deduccion_intereses:pesos})
+
+Base para Renta Exenta 25%:          {base_renta_exenta_25:pesos}
+(-) Renta Exenta 25%:                {renta_exenta_25:pesos}
+(-) Pensión Vol. + AFC:              {pension_afc_limitada:pesos}
+Total Rentas Exentas:                {rentas_exentas_totales:pesos}
+
+Límite 40% Art. 336:                 {limite_maximo_depuracion:pesos}
+Depuración Aplicada:                 {depuracion_final:pesos}
+(-) Beneficio Factura Elect. (1%):   {beneficio_factura:pesos}
+(-) Beneficio GMF (50%):             {beneficio_gmf:pesos}
+
+BASE GRAVABLE:                       {base_gravable:pesos}
+BASE GRAVABLE (UVT):                 {base_gravable_uvt:,.2f} UVT
+</pre>
+
+<h2>Liquidación del Impuesto y Anticipo</h2>
+<pre>
+Impuesto Neto (Art. 241):            {impuesto_neto:pesos}
+(-) Retenciones:                     {retenciones:pesos}
+(-) Saldo a Favor Anterior:          {saldo_favor_anterior:pesos}
+(-) Anticipo Año Anterior:           {anticipo_anterior:pesos}
+Subtotal:                            {saldo_sin_anticipo:pesos}
+
+Anticipo Método 1:                   {anticipo_metodo1:pesos}
+Anticipo Método 2:                   {anticipo_metodo2:pesos}
+(+) Anticipo Año Siguiente (menor):  {anticipo_definitivo:pesos}
+</pre>
+
+<div class="result-box {clase_resultado}">
+<strong>{texto_resultado} {valor_final:pesos}</strong>
+</div>
+
+<p class="uvt-info" style="margin-top: 20px;">*Nota: El anticipo se calculó con el menor entre los métodos 1 y 2 del Art. 807 E.T.</p>
+</div>
+"""
+
+
+def formatear_pesos(valor):
+    """Formatea valores en pesos colombianos: $ 1.234.567"""
+    return f"$ {valor:,.0f}".replace(",", ".")
+
+
+class PlantillaCompilada:
+    """
+    Plantilla con la sintaxis de str.format analizada una sola vez:
+    `literales` son los textos fijos y `campos` los pares (nombre,
+    formateador) que van entre ellos.
+    """
+
+    __slots__ = ('literales', 'campos')
+
+    def __init__(self, texto):
+        literales, campos = [], []
+        pendiente = ''
+        for literal, campo, formato, _ in string.Formatter().parse(texto):
+            pendiente += literal
+            if campo is None:
+                continue
+            literales.append(pendiente)
+            pendiente = ''
+            campos.append((campo, self._formateador(formato)))
+        literales.append(pendiente)
+        self.literales = tuple(literales)
+        self.campos = tuple(campos)
+
+    @staticmethod
+    def _formateador(formato):
+        if formato == 'pesos':
+            return formatear_pesos
+        if formato:
+            return lambda valor: format(valor, formato)
+        return str
+
+    def renderizar(self, valores):
+        literales = self.literales
+        partes = [literales[0]]
+        for (campo, formatear), literal in zip(self.campos, literales[1:]):
+            partes.append(formatear(valores[campo]))
+            partes.append(literal)
+        return ''.join(partes)
+
+
+# Se compila al importar: una vez por proceso
+PLANTILLA_CUERPO = PlantillaCompilada(CUERPO_HTML)
+
+ENCABEZADO_DOCUMENTO = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{titulo}</title>
+{estilo}
+</head>
+<body>
+"""
+PIE_DOCUMENTO = "</body>\n</html>\n"
+
+
+def _encabezado(titulo, estilo):
+    return ENCABEZADO_DOCUMENTO.format(titulo=html.escape(titulo), estilo=estilo)
+
+
+# --- RENDERIZADO (unidad de trabajo de los procesos) ---
+
+def _ancla(numero):
+    """Id HTML del reporte del contribuyente `numero` (1 = primero del archivo)."""
+    return f"c{numero}"
+
+
+def renderizar_bloque(bloque, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+    """
+    Liquida y renderiza un bloque. Retorna ([(número, nit, nombre, cuerpo
+    HTML)], contribuyentes, pid, segundos); `número` es la posición del
+    contribuyente en el archivo. Las filas que no se pueden liquidar se
+    reportan en stderr y se omiten.
+    """
+    inicio = time.perf_counter()
+    no_numericos = []
+    identificacion, columnas = lote_renta.columnas_de_bloque(bloque, ano_gravable, no_numericos)
+    numeros = range(bloque[0], bloque[0] + len(identificacion))
+    rechazos = lote_renta.rechazos_de_bloque(bloque[0], columnas, no_numericos)
+    if rechazos:
+        for _, mensaje in rechazos:
+            print(mensaje + "; no se genera el reporte", file=sys.stderr)
+        rechazadas = {posicion for posicion, _ in rechazos}
+        validas = [i for i in range(len(identificacion)) if i not in rechazadas]
+        identificacion = [identificacion[i] for i in validas]
+        numeros = [numeros[i] for i in validas]
+        columnas = {clave: [valores[i] for i in validas] for clave, valores in columnas.items()}
+        if not identificacion:
+            return [], 0, os.getpid(), time.perf_counter() - inicio
+    resultados = motor.calcular_impuesto_renta_lote(columnas)
+
+    listas = {clave: valores.tolist() for clave, valores in resultados.items()}
+    for concepto in ('retenciones', 'saldo_favor_anterior', 'anticipo_anterior', 'ano_gravable'):
+        listas[concepto] = columnas[concepto]
+    claves = list(listas)
+
+    documentos = []
+    for i, (numero, (nit, nombre)) in enumerate(zip(numeros, identificacion)):
+        valores = {clave: listas[clave][i] for clave in claves}
+        valores['ano_gravable'] = int(valores['ano_gravable'])
+        valores['uvt'] = cargar_paquete(valores['ano_gravable']).uvt
+        valores['nit'] = html.escape(str(nit))
+        valores['nombre'] = html.escape(str(nombre))
+        valores['ancla'] = _ancla(numero)
+        if valores['es_saldo_favor']:
+            valores['clase_resultado'], valores['texto_resultado'] = 'result-favor', 'SALDO A FAVOR:'
+        else:
+            valores['clase_resultado'], valores['texto_resultado'] = 'result-pago', 'VALOR A PAGAR:'
+        documentos.append((numero, str(nit), str(nombre), PLANTILLA_CUERPO.renderizar(valores)))
+    return documentos, len(documentos), os.getpid(), time.perf_counter() - inicio
+
+
+def generar_reportes(filas, tamano_bloque=TAMANO_BLOQUE_POR_DEFECTO, procesos=1,
+                     ano_gravable=ANO_GRAVABLE_POR_DEFECTO, estadisticas=None):
+    """
+    Genera (número, nit, nombre, cuerpo HTML) por contribuyente, en el
+    orden de entrada. Si se pasa `estadisticas` (dict), acumula {pid: [n, segundos]}.
+    """
+    bloques = lote_renta.agrupar_en_bloques(lote_renta.registros_desde_filas(filas), tamano_bloque)
+    if procesos > 1:
+        renderizados = lote_renta.liquidar_en_paralelo(bloques, procesos, ano_gravable, renderizar_bloque)
+    else:
+        renderizados = lote_renta.liquidar_en_serie(bloques, ano_gravable, renderizar_bloque)
+    for documentos, cantidad, pid, segundos in renderizados:
+        if estadisticas is not None:
+            acumulado = estadisticas.setdefault(pid, [0, 0.0])
+            acumulado[0] += cantidad
+            acumulado[1] += segundos
+        yield from documentos
+
+
+# --- SALIDAS ---
+
+def _nombre_archivo(numero, nit):
+    seguro = ''.join(c for c in nit if c.isalnum() or c in '-_') or 'sin_nit'
+    return f"{numero:06d}_{seguro}.html"
+
+
+@contextlib.contextmanager
+def abrir_para_reemplazar(ruta, modo='wb', **opciones):
+    """
+    Abre `ruta`.parcial para escribir y, si el bloque termina sin error, la
+    renombra a `ruta`; si falla, se borra. Un destino existente no queda a
+    medio escribir.
+    """
+    ruta = os.fspath(ruta)
+    temporal = ruta + '.parcial'
+    try:
+        with open(temporal, modo, **opciones) as archivo:
+            yield archivo
+        os.replace(temporal, ruta)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporal)
+        raise
+
+
+def escribir_zip(reportes, destino, nivel_compresion=6):
+    """
+    Escribe cada reporte como un HTML dentro de un .zip (ruta o archivo
+    binario), con una hoja de estilos compartida. Retorna la cantidad.
+    Una ruta se escribe con `abrir_para_reemplazar`.
+    """
+    if isinstance(destino, (str, os.PathLike)):
+        with abrir_para_reemplazar(destino) as archivo:
+            return escribir_zip(reportes, archivo, nivel_compresion)
+    encabezado = _encabezado("Reporte de Renta", '<link rel="stylesheet" href="estilo.css">')
+    cantidad = 0
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED, compresslevel=nivel_compresion) as archivo:
+        archivo.writestr('estilo.css', ESTILO_CSS)
+        for numero, nit, nombre, cuerpo in reportes:
+            archivo.writestr(_nombre_archivo(numero, nit), encabezado + cuerpo + PIE_DOCUMENTO)
+            cantidad += 1
+    return cantidad
+
+
+def escribir_html_paginado(reportes, salida):
+    """
+    Escribe todos los reportes en un solo HTML (un contribuyente por página
+    al imprimir) con un índice al final. Las entradas del índice se guardan
+    en un archivo temporal mientras se escriben los reportes.
+    Retorna la cantidad.
+    """
+    salida.write(_encabezado("Reportes de Renta", f"<style>{ESTILO_CSS}</style>"))
+    salida.write('<nav class="container"><a href="#indice">Ir al índice</a></nav>\n')
+    cantidad = 0
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as indice:
+        for numero, nit, nombre, cuerpo in reportes:
+            salida.write(cuerpo)
+            indice.write(f'<li><a href="#{_ancla(numero)}">{html.escape(nit)} - {html.escape(nombre)}</a></li>\n')
+            cantidad += 1
+        salida.write('<div class="container indice" id="indice">\n<h2>Índice</h2>\n<ol>\n')
+        indice.seek(0)
+        shutil.copyfileobj(indice, salida)
+        salida.write('</ol>\n</div>\n')
+    salida.write(PIE_DOCUMENTO)
+    return cantidad
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(description="Reportes HTML de liquidación por contribuyente.")
+    parser.add_argument('entrada', help="Archivo CSV o XLSX con los conceptos de la plantilla")
+    parser.add_argument('-o', '--salida', required=True,
+                        help="reportes.zip (un HTML por contribuyente) o reportes.html (paginado con índice)")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE_POR_DEFECTO,
+                        help="Contribuyentes por bloque (por defecto %(default)s)")
+    parser.add_argument('-p', '--procesos', type=int, default=1,
+                        help="Procesos de renderizado en paralelo; 0 usa todos los núcleos "
+                             "(por defecto %(default)s)")
+    parser.add_argument('--ano', type=int, default=ANO_GRAVABLE_POR_DEFECTO,
+                        help="Año gravable para las filas sin columna AÑO GRAVABLE "
+                             "(por defecto %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    procesos = args.procesos or os.cpu_count() or 1
+    estadisticas = {}
+    inicio = time.perf_counter()
+    reportes = generar_reportes(lote_renta.leer_filas(args.entrada), args.tamano_bloque,
+                                procesos, args.ano, estadisticas)
+    if args.salida.lower().endswith('.zip'):
+        escribir_zip(reportes, args.salida)
+    else:
+        with abrir_para_reemplazar(args.salida, 'w', encoding='utf-8') as salida:
+            escribir_html_paginado(reportes, salida)
+    lote_renta.imprimir_estadisticas(estadisticas, time.perf_counter() - inicio, sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
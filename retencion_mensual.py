@@ -0,0 +1,549 @@
+"""
+RETENCIÓN EN LA FUENTE MENSUAL POR RENTAS DE TRABAJO (ART. 383, PROCEDIMIENTO 1)
+Personas Naturales Residentes Fiscales - Colombia
+
+Calcula la retención de cada empleado en cada mes de nómina con los
+mismos paquetes de reglas del año gravable y la misma depuración que la
+liquidación anual, llevada al mes:
+
+1. Ingresos laborales del mes menos INCR (aportes obligatorios a salud y
+   pensiones).
+2. Cesantías exentas del Art. 206 numeral 4 según el ingreso mensual
+   promedio.
+3. Deducciones: dependientes según el Art. 387 (10% del ingreso bruto del
+   mes, hasta 32 UVT, si tiene dependientes), medicina prepagada e
+   intereses de vivienda hasta el límite anual del paquete dividido en 12.
+4. Renta exenta del 25% (790 UVT / 12) y pensión voluntaria + AFC (30% del
+   ingreso, 3.800 UVT / 12).
+5. Límite del 40% del Art. 336 (1.340 UVT / 12).
+6. Base mensual en UVT -> tabla del Art. 383 (ubicada con `searchsorted`).
+
+La nómina (CSV o XLSX) trae un empleado por fila con los conceptos de
+lote_renta pagados en el mes, más la columna MES (1 a 12) o el mes de la
+corrida (--mes). Se lee y se calcula por bloques de filas, con memoria
+acotada, y se escribe una fila de retención por empleado y mes.
+
+Conciliación de fin de año: los conceptos del mes y la retención
+practicada se acumulan por (NIT, año gravable, mes) en un archivo .npz
+que cada corrida mensual actualiza (--acumulado); volver a correr un mes
+reemplaza lo acumulado de ese mes. Con --conciliacion se liquida el año
+de cada empleado con el motor anual (retenciones = la retención
+acumulada; ingreso mensual promedio = promedio de los salarios de los
+últimos 6 meses trabajados, como en certificados.py) y se compara el
+impuesto neto con lo retenido.
+
+Uso:
+    python retencion_mensual.py nomina_2024_01.csv -o retencion_01.csv --acumulado retenciones_2024.npz
+    python retencion_mensual.py nomina_2024_12.csv -o retencion_12.csv --acumulado retenciones_2024.npz \\
+        --conciliacion conciliacion_2024.csv
+    python retencion_mensual.py nomina_2024_*.csv -o retenciones.csv --conciliacion conciliacion_2024.csv
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+
+import motor_vectorizado as motor
+import perfilado
+from historial import normalizar_nit
+from lote_renta import (TAMANO_BLOQUE_POR_DEFECTO, agrupar_en_bloques, clave_de_concepto,
+                        convertir_valor, leer_filas, normalizar_concepto)
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO, cargar_paquete, obtener_paquete
+
+MESES = 12
+
+# Conceptos de la nómina del mes (los demás del motor son de la declaración anual)
+CONCEPTOS_NOMINA = (
+    'salarios',
+    'cesantias',
+    'prestaciones_sociales',
+    'otros_pagos_laborales',
+    'ingreso_mensual_promedio',
+    'incr_salud',
+    'incr_pensiones',
+    'pension_voluntaria',
+    'afc',
+    'num_dependientes',
+    'intereses_vivienda',
+    'medicina_prepagada',
+)
+
+# Encabezados propios de la nómina (además de los de lote_renta)
+ENCABEZADOS_NOMINA = {
+    'MES': 'mes',
+    'MES DE PAGO': 'mes',
+    'PERIODO DE NOMINA': 'mes',
+    'SALARIO': 'salarios',
+    'SALARIO DEL MES': 'salarios',
+}
+
+COLUMNAS_RETENCION = (
+    'ingresos_totales',
+    'incr_total',
+    'ingreso_neto',
+    'cesantias_exentas',
+    'deduccion_dependientes',
+    'deduccion_medicina',
+    'deduccion_intereses',
+    'deducciones_totales',
+    'renta_exenta_25',
+    'pension_afc_limitada',
+    'rentas_exentas_totales',
+    'limite_maximo_depuracion',
+    'depuracion_final',
+    'base_retencion',
+    'base_retencion_uvt',
+    'retencion',
+)
+
+COLUMNAS_CONCILIACION = ('nit', 'nombre', 'ano_gravable', 'meses', 'ingresos_totales', 'base_gravable',
+                         'impuesto_neto', 'retencion_acumulada', 'diferencia')
+
+
+@lru_cache(maxsize=1024)
+def clave_de_columna(texto):
+    """Clave de un encabezado de nómina, o None si no aplica."""
+    if texto is None:
+        return None
+    clave = ENCABEZADOS_NOMINA.get(normalizar_concepto(texto))
+    if clave:
+        return clave
+    return clave_de_concepto(texto)
+
+
+# --- LECTURA ---
+
+def leer_nomina(ruta):
+    """Genera las filas de una nómina (CSV o XLSX con encabezados) como registros {clave: celda}."""
+    filas = iter(leer_filas(ruta))
+    encabezados = next(filas, None)
+    if encabezados is None:
+        return
+    mapa = [(i, clave_de_columna(celda)) for i, celda in enumerate(encabezados)]
+    mapa = [(i, clave) for i, clave in mapa if clave]
+    for fila in filas:
+        if all(celda is None or str(celda).strip() == '' for celda in fila):
+            continue
+        yield {clave: fila[i] if i < len(fila) else None for i, clave in mapa}
+
+
+def _entero(registro, campo, por_defecto, numero):
+    try:
+        valor = convertir_valor(registro.get(campo))
+    except ValueError:
+        raise ValueError(f"Fila {numero}: valor no numérico en '{campo}': {registro.get(campo)!r}") from None
+    if valor is None:
+        if por_defecto is None:
+            raise ValueError(f"Fila {numero}: sin '{campo}' (use la columna MES o --mes)")
+        return por_defecto
+    return int(valor)
+
+
+def columnas_de_bloque(bloque, ano_gravable=ANO_GRAVABLE_POR_DEFECTO, mes=None):
+    """
+    Convierte un bloque de filas de nómina al formato columnar. Retorna
+    (identificacion, columnas): identificacion es una lista de (nit,
+    nombre) y columnas un diccionario {concepto: arreglo} con
+    CONCEPTOS_NOMINA, `ano_gravable` y `mes` (los de cada fila, o los
+    indicados).
+    """
+    inicio, registros = bloque
+    identificacion = [(r.get('nit') or '', r.get('nombre') or '') for r in registros]
+    anos, meses = [], []
+    for numero, registro in enumerate(registros, start=inicio):
+        anos.append(_entero(registro, 'ano_gravable', ano_gravable, numero))
+        meses.append(_entero(registro, 'mes', mes, numero))
+    columnas = {'ano_gravable': np.array(anos, dtype=np.int64), 'mes': np.array(meses, dtype=np.int64)}
+    fuera = np.flatnonzero((columnas['mes'] < 1) | (columnas['mes'] > MESES))
+    if len(fuera):
+        raise ValueError(f"Fila {inicio + fuera[0]}: mes fuera de rango: {columnas['mes'][fuera[0]]}")
+    for concepto in CONCEPTOS_NOMINA:
+        valores = []
+        for numero, registro in enumerate(registros, start=inicio):
+            try:
+                valor = convertir_valor(registro.get(concepto))
+            except ValueError:
+                raise ValueError(f"Fila {numero}: valor no numérico en "
+                                 f"'{concepto}': {registro.get(concepto)!r}") from None
+            valores.append(0.0 if valor is None else valor)
+        columnas[concepto] = np.array(valores, dtype=np.float64)
+    return identificacion, columnas
+
+
+# --- CÁLCULO ---
+
+def calcular_retencion_lote(columnas, reglas=None):
+    """
+    Retención mensual (Art. 383, procedimiento 1) de un lote de empleados.
+
+    `columnas` es un diccionario {concepto: arreglo} con los valores del
+    mes de CONCEPTOS_NOMINA (los ausentes valen 0). Igual que en
+    `calcular_impuesto_renta_lote`, sin `reglas` y con la columna
+    `ano_gravable` cada fila usa el paquete de su año.
+    Retorna un diccionario {clave de COLUMNAS_RETENCION: arreglo}.
+    """
+    n = next((len(columnas[concepto]) for concepto in CONCEPTOS_NOMINA if concepto in columnas), None)
+    if n is None:
+        raise ValueError("El lote no contiene ninguna columna de nómina reconocida.")
+    d = {concepto: (np.asarray(columnas[concepto], dtype=np.float64) if concepto in columnas
+                    else np.zeros(n)) for concepto in CONCEPTOS_NOMINA}
+
+    if reglas is None and 'ano_gravable' in columnas:
+        anos = np.asarray(columnas['ano_gravable']).astype(np.int64)
+        unicos = np.unique(anos)
+        if len(unicos) > 1:
+            resultados = {clave: np.empty(n) for clave in COLUMNAS_RETENCION}
+            for ano in unicos:
+                indices = np.flatnonzero(anos == ano)
+                parcial = _retener({concepto: valores[indices] for concepto, valores in d.items()},
+                                   cargar_paquete(int(ano)))
+                for clave, valores in parcial.items():
+                    resultados[clave][indices] = valores
+            return resultados
+        if len(unicos) == 1:
+            reglas = cargar_paquete(int(unicos[0]))
+
+    return _retener(d, obtener_paquete(reglas))
+
+
+def _retener(d, paquete):
+    """Depuración mensual y tabla del Art. 383 con un único paquete de reglas."""
+    uvt = paquete.uvt
+    uvt_mes = uvt / MESES           # los límites anuales del paquete, llevados al mes
+    resultados = {}
+
+    ingresos_totales = (d['salarios'] + d['cesantias'] +
+                        d['prestaciones_sociales'] + d['otros_pagos_laborales'])
+    incr_total = d['incr_salud'] + d['incr_pensiones']
+    ingreso_neto = ingresos_totales - incr_total
+    resultados['ingresos_totales'] = ingresos_totales
+    resultados['incr_total'] = incr_total
+    resultados['ingreso_neto'] = ingreso_neto
+
+    cesantias_exentas = motor.calcular_cesantias_exentas_lote(
+        d['cesantias'], d['ingreso_mensual_promedio'], paquete)
+    resultados['cesantias_exentas'] = cesantias_exentas
+
+    # Art. 387: una sola deducción por dependientes, sin importar cuántos
+    deduccion_dependientes = np.where(
+        d['num_dependientes'] > 0,
+        np.minimum(ingresos_totales * paquete.porcentaje_dependientes_387,
+                   paquete.limite_dependientes_387_uvt * uvt),
+        0.0)
+    deduccion_medicina = np.minimum(d['medicina_prepagada'], paquete.limite_medicina_prepagada_uvt * uvt_mes)
+    deduccion_intereses = np.minimum(d['intereses_vivienda'], paquete.limite_intereses_vivienda_uvt * uvt_mes)
+    deducciones_totales = deduccion_dependientes + deduccion_medicina + deduccion_intereses
+    resultados['deduccion_dependientes'] = deduccion_dependientes
+    resultados['deduccion_medicina'] = deduccion_medicina
+    resultados['deduccion_intereses'] = deduccion_intereses
+    resultados['deducciones_totales'] = deducciones_totales
+
+    base_renta_exenta_25 = np.maximum(ingresos_totales - incr_total - cesantias_exentas - deducciones_totales, 0.0)
+    renta_exenta_25 = np.minimum(base_renta_exenta_25 * paquete.porcentaje_renta_exenta_25,
+                                 paquete.limite_renta_exenta_25_uvt * uvt_mes)
+    pension_afc_limitada = np.minimum(
+        np.minimum(d['pension_voluntaria'] + d['afc'], ingresos_totales * paquete.porcentaje_pension_afc),
+        paquete.limite_pension_afc_uvt * uvt_mes)
+    rentas_exentas_totales = cesantias_exentas + renta_exenta_25 + pension_afc_limitada
+    resultados['renta_exenta_25'] = renta_exenta_25
+    resultados['pension_afc_limitada'] = pension_afc_limitada
+    resultados['rentas_exentas_totales'] = rentas_exentas_totales
+
+    limite_maximo_depuracion = np.minimum(ingreso_neto * paquete.porcentaje_limite_general,
+                                          paquete.limite_general_uvt * uvt_mes)
+    depuracion_final = np.minimum(rentas_exentas_totales + deducciones_totales, limite_maximo_depuracion)
+    resultados['limite_maximo_depuracion'] = limite_maximo_depuracion
+    resultados['depuracion_final'] = depuracion_final
+
+    base_retencion = np.maximum(ingreso_neto - depuracion_final, 0.0)
+    base_retencion_uvt = base_retencion / uvt
+    resultados['base_retencion'] = base_retencion
+    resultados['base_retencion_uvt'] = base_retencion_uvt
+    resultados['retencion'] = motor.aplicar_tabla_articulo_383_lote(base_retencion_uvt, paquete)
+    return resultados
+
+
+def formatear_resultados(resultados):
+    """Celdas de texto de COLUMNAS_RETENCION de cada empleado (una tupla por fila)."""
+    columnas = []
+    for clave in COLUMNAS_RETENCION:
+        valores = resultados[clave].tolist()
+        formato = "{:.2f}" if clave == 'base_retencion_uvt' else "{:.0f}"
+        columnas.append([formato.format(valor) for valor in valores])
+    return list(zip(*columnas))
+
+
+# --- CONCILIACIÓN DE FIN DE AÑO ---
+
+MESES_PROMEDIO = 6
+
+# Conceptos del mes que se suman en el año (más la retención)
+_SUMADOS = tuple(concepto for concepto in CONCEPTOS_NOMINA
+                 if concepto not in ('ingreso_mensual_promedio', 'num_dependientes'))
+_CAMPOS = (*_SUMADOS, 'retencion')
+_POSICION = {campo: i for i, campo in enumerate(_CAMPOS)}
+
+
+def promedio_ultimos_meses_lote(salarios, meses=MESES_PROMEDIO):
+    """
+    Ingreso mensual promedio (Art. 206 numeral 4) de cada fila de
+    `salarios` (una columna por mes del año): promedio de los salarios de
+    los últimos `meses` meses trabajados (con salario), o 0 si no hay.
+    """
+    trabajados = salarios > 0
+    desde_el_final = np.cumsum(trabajados[:, ::-1], axis=1)[:, ::-1]
+    ultimos = trabajados & (desde_el_final <= meses)
+    cuantos = np.count_nonzero(ultimos, axis=1)
+    suma = np.where(ultimos, salarios, 0.0).sum(axis=1)
+    return np.divide(suma, cuantos, out=np.zeros(len(suma)), where=cuantos > 0)
+
+
+class ConciliacionAnual:
+    """
+    Conceptos del mes y retención practicada, acumulados por (NIT, año
+    gravable, mes). Las filas de un mes se suman dentro de una misma
+    corrida; un mes que ya venía del acumulado cargado se reemplaza.
+    """
+
+    def __init__(self):
+        self.indice = {}            # (nit, ano) -> posición
+        self.nombres = []
+        self.sumas = np.zeros((0, MESES, len(_CAMPOS)))
+        self.dependientes = np.zeros((0, MESES))        # máximo del mes
+        self.presentes = np.zeros((0, MESES), dtype=bool)
+        self._en_corrida = np.zeros((0, MESES), dtype=bool)
+        self.filas = 0
+        self.sin_nit = 0
+        self.meses_reemplazados = 0
+        # Totales de la última conciliación
+        self.impuesto_neto = 0.0
+        self.retenido = 0.0
+        self.con_saldo_a_cargo = 0
+
+    def __len__(self):
+        return len(self.indice)
+
+    def _posiciones(self, identificacion, anos):
+        posiciones = np.empty(len(identificacion), dtype=np.int64)
+        indice, nombres = self.indice, self.nombres
+        for i, ((nit, nombre), ano) in enumerate(zip(identificacion, anos)):
+            nit = normalizar_nit(nit)
+            if not nit:
+                posiciones[i] = -1
+                continue
+            posicion = indice.get((nit, ano))
+            if posicion is None:
+                posicion = indice[(nit, ano)] = len(nombres)
+                nombres.append(nombre)
+            posiciones[i] = posicion
+        if len(nombres) > len(self.sumas):
+            self._crecer(max(len(nombres), 2 * len(self.sumas)))
+        return posiciones
+
+    def _crecer(self, capacidad):
+        extra = capacidad - len(self.sumas)
+        self.sumas = np.concatenate([self.sumas, np.zeros((extra, MESES, len(_CAMPOS)))])
+        self.dependientes = np.concatenate([self.dependientes, np.zeros((extra, MESES))])
+        self.presentes = np.concatenate([self.presentes, np.zeros((extra, MESES), dtype=bool)])
+        self._en_corrida = np.concatenate([self._en_corrida, np.zeros((extra, MESES), dtype=bool)])
+
+    def agregar(self, identificacion, columnas, resultados):
+        """Acumula un bloque calculado (salida de columnas_de_bloque y calcular_retencion_lote)."""
+        posiciones = self._posiciones(identificacion, columnas['ano_gravable'].tolist())
+        con_nit = posiciones >= 0
+        self.filas += len(posiciones)
+        self.sin_nit += int(np.count_nonzero(~con_nit))
+        celdas = (posiciones[con_nit], columnas['mes'][con_nit] - 1)
+
+        # Primera vez que esta corrida toca el mes: lo que venía acumulado se descarta
+        nuevas = ~self._en_corrida[celdas]
+        if nuevas.any():
+            reemplazo = (celdas[0][nuevas], celdas[1][nuevas])
+            ya_acumulados = np.ravel_multi_index(reemplazo, self.presentes.shape)[self.presentes[reemplazo]]
+            self.meses_reemplazados += len(np.unique(ya_acumulados))
+            self.sumas[reemplazo] = 0.0
+            self.dependientes[reemplazo] = 0.0
+            self._en_corrida[reemplazo] = True
+
+        valores = np.empty((len(celdas[0]), len(_CAMPOS)))
+        for concepto in _SUMADOS:
+            valores[:, _POSICION[concepto]] = columnas[concepto][con_nit]
+        valores[:, _POSICION['retencion']] = resultados['retencion'][con_nit]
+        np.add.at(self.sumas, celdas, valores)
+        np.maximum.at(self.dependientes, celdas, columnas['num_dependientes'][con_nit])
+        self.presentes[celdas] = True
+
+    def columnas_anuales(self):
+        """
+        (claves, columnas) del año de cada empleado para el motor anual:
+        claves es la lista de (nit, ano) y columnas {concepto: arreglo} con
+        `retenciones` = retención acumulada.
+        """
+        n = len(self.indice)
+        sumas = self.sumas[:n].sum(axis=1)
+        columnas = {concepto: sumas[:, _POSICION[concepto]] for concepto in _SUMADOS}
+        columnas['ingreso_mensual_promedio'] = promedio_ultimos_meses_lote(
+            self.sumas[:n, :, _POSICION['salarios']])
+        columnas['num_dependientes'] = self.dependientes[:n].max(axis=1)
+        columnas['retenciones'] = sumas[:, _POSICION['retencion']]
+        claves = list(self.indice)
+        columnas['ano_gravable'] = np.array([ano for _, ano in claves], dtype=np.int64)
+        return claves, columnas
+
+    def conciliar(self, reglas=None):
+        """Genera una fila de COLUMNAS_CONCILIACION por empleado (impuesto neto anual frente a lo retenido)."""
+        claves, columnas = self.columnas_anuales()
+        if not claves:
+            return
+        anual = motor.calcular_impuesto_renta_lote(columnas, reglas)
+        meses = np.count_nonzero(self.presentes[:len(claves)], axis=1).tolist()
+        diferencia = anual['impuesto_neto'] - columnas['retenciones']
+        self.impuesto_neto = float(anual['impuesto_neto'].sum())
+        self.retenido = float(columnas['retenciones'].sum())
+        self.con_saldo_a_cargo = int(np.count_nonzero(diferencia >= 0.5))
+        for (nit, ano), nombre, *valores in zip(
+                claves, self.nombres, meses, anual['ingresos_totales'].tolist(), anual['base_gravable'].tolist(),
+                anual['impuesto_neto'].tolist(), columnas['retenciones'].tolist(), diferencia.tolist()):
+            yield [nit, nombre, ano, *(f"{valor:.0f}" for valor in valores)]
+
+    def guardar(self, ruta):
+        """Guarda el acumulado en un archivo .npz (se retoma con `cargar`)."""
+        n = len(self.indice)
+        np.savez_compressed(ruta, nit=np.array([nit for nit, _ in self.indice], dtype=str),
+                            ano=np.array([ano for _, ano in self.indice], dtype=np.int64),
+                            nombre=np.array(self.nombres, dtype=str), campos=np.array(_CAMPOS),
+                            sumas=self.sumas[:n], dependientes=self.dependientes[:n],
+                            presentes=self.presentes[:n])
+
+    @classmethod
+    def cargar(cls, ruta):
+        conciliacion = cls()
+        with np.load(ruta) as archivo:
+            if tuple(archivo['campos'].tolist()) != _CAMPOS:
+                raise ValueError(f"{ruta}: el acumulado no tiene los campos de esta versión")
+            conciliacion.indice = {(nit, ano): i for i, (nit, ano) in
+                                   enumerate(zip(archivo['nit'].tolist(), archivo['ano'].tolist()))}
+            conciliacion.nombres = archivo['nombre'].tolist()
+            conciliacion.sumas = archivo['sumas']
+            conciliacion.dependientes = archivo['dependientes']
+            conciliacion.presentes = archivo['presentes']
+        conciliacion._en_corrida = np.zeros(conciliacion.presentes.shape, dtype=bool)
+        return conciliacion
+
+
+# --- CORRIDA ---
+
+def calcular_bloque(bloque, ano_gravable=ANO_GRAVABLE_POR_DEFECTO, mes=None, conciliacion=None):
+    """Calcula la retención de un bloque y retorna sus filas de salida (listas de celdas)."""
+    marcar = perfilado.cronometro(len(bloque[1]))
+    identificacion, columnas = columnas_de_bloque(bloque, ano_gravable, mes)
+    if marcar:
+        marcar('retencion.columnas')
+    resultados = calcular_retencion_lote(columnas)
+    if marcar:
+        marcar('retencion.motor')
+    if conciliacion is not None:
+        conciliacion.agregar(identificacion, columnas, resultados)
+        if marcar:
+            marcar('retencion.acumulado')
+    filas = [[nit, nombre, ano, mes_fila, *celdas] for (nit, nombre), ano, mes_fila, celdas
+             in zip(identificacion, columnas['ano_gravable'].tolist(), columnas['mes'].tolist(),
+                    formatear_resultados(resultados))]
+    if marcar:
+        marcar('retencion.formato')
+    return filas
+
+
+def encabezados_salida():
+    return ['nit', 'nombre', 'ano_gravable', 'mes', *COLUMNAS_RETENCION]
+
+
+def procesar(registros, salida, tamano_bloque=TAMANO_BLOQUE_POR_DEFECTO, ano_gravable=ANO_GRAVABLE_POR_DEFECTO,
+             mes=None, conciliacion=None):
+    """Calcula por bloques las retenciones de `registros` y las escribe en `salida`. Retorna las filas."""
+    escritor = csv.writer(salida)
+    escritor.writerow(encabezados_salida())
+    total = 0
+    for bloque in agrupar_en_bloques(registros, tamano_bloque):
+        filas = calcular_bloque(bloque, ano_gravable, mes, conciliacion)
+        marcar = perfilado.cronometro(len(filas))
+        texto = io.StringIO()
+        csv.writer(texto).writerows(filas)
+        salida.write(texto.getvalue())
+        if marcar:
+            marcar('retencion.escritura')
+        total += len(filas)
+    return total
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        description="Retención en la fuente mensual por rentas de trabajo (Art. 383, procedimiento 1).")
+    parser.add_argument('entradas', nargs='+', help="Nóminas CSV o XLSX (una fila por empleado y mes)")
+    parser.add_argument('-o', '--salida', help="Archivo CSV de retenciones (por defecto, la salida estándar)")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE_POR_DEFECTO,
+                        help="Filas calculadas por bloque (por defecto %(default)s)")
+    parser.add_argument('--ano', type=int, default=ANO_GRAVABLE_POR_DEFECTO,
+                        help="Año gravable de las filas sin columna AÑO GRAVABLE (por defecto %(default)s)")
+    parser.add_argument('--mes', type=int, choices=range(1, MESES + 1), metavar='MES',
+                        help="Mes de las filas sin columna MES")
+    parser.add_argument('--acumulado', help="Archivo .npz con lo acumulado en el año: se carga si existe "
+                                            "y se guarda con esta corrida")
+    parser.add_argument('--conciliacion', help="Guardar la conciliación anual (CSV): impuesto neto del año "
+                                               "frente a la retención acumulada")
+    parser.add_argument('--perfil-json', help="Guardar el tiempo por etapa en JSON (perfilado.py)")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    perfil = perfilado.activar() if args.perfil_json else None
+    conciliacion = None
+    if args.acumulado or args.conciliacion:
+        if args.acumulado and os.path.exists(args.acumulado):
+            conciliacion = ConciliacionAnual.cargar(args.acumulado)
+        else:
+            conciliacion = ConciliacionAnual()
+
+    def registros():
+        for ruta in args.entradas:
+            yield from leer_nomina(ruta)
+
+    inicio = time.perf_counter()
+    if args.salida:
+        with open(args.salida, 'w', newline='', encoding='utf-8') as salida:
+            total = procesar(registros(), salida, args.tamano_bloque, args.ano, args.mes, conciliacion)
+    else:
+        total = procesar(registros(), sys.stdout, args.tamano_bloque, args.ano, args.mes, conciliacion)
+    segundos = time.perf_counter() - inicio
+    print(f"Retenciones calculadas: {total} en {segundos:.2f} s ({total / segundos if segundos else 0:,.0f}/s)",
+          file=sys.stderr)
+
+    if conciliacion is not None:
+        print(f"Acumulado: {len(conciliacion)} empleados ({conciliacion.sin_nit} filas sin NIT, omitidas; "
+              f"{conciliacion.meses_reemplazados} meses ya acumulados, reemplazados)", file=sys.stderr)
+        if args.acumulado:
+            conciliacion.guardar(args.acumulado)
+        if args.conciliacion:
+            with open(args.conciliacion, 'w', newline='', encoding='utf-8') as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(COLUMNAS_CONCILIACION)
+                escritor.writerows(conciliacion.conciliar())
+            print(f"Conciliación: impuesto neto ${conciliacion.impuesto_neto:,.0f}; retenido "
+                  f"${conciliacion.retenido:,.0f}; {conciliacion.con_saldo_a_cargo} empleados con "
+                  f"impuesto mayor que lo retenido", file=sys.stderr)
+    if perfil:
+        perfilado.desactivar()
+        perfilado.imprimir_resumen(perfil)
+        with open(args.perfil_json, 'w', encoding='utf-8') as archivo:
+            archivo.write(perfil.a_json() + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""
+SERVICIO HTTP DE LIQUIDACIÓN - IMPUESTO DE RENTA
+Personas Naturales Residentes Fiscales - Colombia
+
+Servidor asyncio (solo biblioteca estándar) que mantiene cargados los
+paquetes de reglas y expone el motor de liquidación:
+
+- POST /liquidar   Un contribuyente en JSON (claves de `capturar_datos`).
+                   Responde el diccionario de `calcular_impuesto_renta`.
+- POST /lote       Contribuyentes en NDJSON (una línea JSON por persona).
+                   Los resultados se devuelven en NDJSON por partes
+                   (Transfer-Encoding: chunked) a medida que cada bloque se
+                   liquida en el pool de procesos; una línea inválida
+                   responde {"error", "linea"} en su lugar.
+- GET  /metricas   Solicitudes y latencias p50/p99 por ruta.
+- GET  /salud      Verificación simple.
+
+Las conexiones HTTP/1.1 se mantienen abiertas (keep-alive) y el tamaño de
+encabezados y cuerpos está limitado.
+
+Uso:
+    python servicio_http.py --puerto 8080 --procesos 4
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import lote_renta
+import motor_vectorizado as motor
+import nucleo_renta
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO, anos_disponibles, cargar_paquete
+
+MAX_BYTES_ENCABEZADOS = 16 * 1024
+MAX_BYTES_LIQUIDAR = 64 * 1024
+MAX_BYTES_LOTE = 512 * 1024 * 1024
+TAMANO_BLOQUE_LOTE = 2000
+SEGUNDOS_INACTIVIDAD = 30
+MUESTRAS_LATENCIA = 10000
+
+MENSAJES_ESTADO = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+}
+
+
+class RespuestaInterrumpida(Exception):
+    """Error después de enviar los encabezados: solo queda cerrar la conexión."""
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje, cerrar=False):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+        self.cerrar = cerrar
+
+
+# --- TRABAJO EN LOS PROCESOS ---
+
+def _contexto_procesos():
+    """
+    forkserver donde existe: un proceso del pool creado con fork en medio de
+    una solicitud heredaría los sockets abiertos y los clientes no verían
+    el cierre de la conexión.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context()
+
+
+def _iniciar_proceso():
+    """Precarga los paquetes de reglas en cada proceso del pool."""
+    for ano in anos_disponibles():
+        cargar_paquete(ano)
+
+
+def _rechazar_no_finito(constante):
+    raise ValueError(f"{constante} no es un número finito")
+
+
+def _cargar_json(texto):
+    """json.loads que rechaza NaN, Infinity y -Infinity (no son JSON estándar)."""
+    return json.loads(texto, parse_constant=_rechazar_no_finito)
+
+
+def _volcar_json(valor):
+    return json.dumps(valor, ensure_ascii=False, allow_nan=False)
+
+
+def _registros_ndjson(lineas):
+    """Registros de las líneas y {posición: mensaje} de las que no son un objeto JSON."""
+    registros, errores = [], {}
+    for posicion, linea in enumerate(lineas):
+        try:
+            registro = _cargar_json(linea)
+        except ValueError as e:
+            registro, errores[posicion] = {}, f"JSON inválido: {e}"
+        else:
+            if not isinstance(registro, dict):
+                registro, errores[posicion] = {}, "se esperaba un objeto JSON"
+        registros.append(registro)
+    return registros, errores
+
+
+def liquidar_lineas_ndjson(inicio, lineas):
+    """
+    Liquida un bloque de líneas NDJSON y retorna las líneas de resultado
+    (bytes), en el orden de entrada. Una línea inválida (JSON mal formado,
+    valor no numérico o año sin reglas) produce solo su línea de error
+    ({"error", "linea"}); las demás se liquidan.
+    """
+    registros, errores = _registros_ndjson(lineas)
+    no_numericos = []
+    identificacion, columnas = lote_renta.columnas_de_bloque((inicio, registros), no_numericos=no_numericos)
+    for posicion, concepto, celda in no_numericos:
+        errores.setdefault(posicion, f"valor no numérico en '{concepto}': {celda!r}")
+    disponibles = set(anos_disponibles())
+    for posicion, ano in enumerate(columnas['ano_gravable']):
+        if ano not in disponibles:
+            errores.setdefault(posicion, f"año gravable {ano} sin paquete de reglas")
+
+    validas = [posicion for posicion in range(len(lineas)) if posicion not in errores]
+    salida = {}
+    if validas:
+        resultados = motor.calcular_impuesto_renta_lote(
+            {clave: [valores[i] for i in validas] for clave, valores in columnas.items()})
+        salida = {clave: resultados[clave].tolist() for clave in motor.COLUMNAS_RESULTADO}
+    fila_de = {posicion: i for i, posicion in enumerate(validas)}
+
+    partes = []
+    for posicion in range(len(lineas)):
+        if posicion not in errores:
+            i = fila_de[posicion]
+            nit, nombre = identificacion[posicion]
+            fila = {'nit': nit, 'nombre': nombre, 'ano_gravable': columnas['ano_gravable'][posicion]}
+            for clave in motor.COLUMNAS_RESULTADO:
+                fila[clave] = salida[clave][i]
+            try:
+                partes.append(_volcar_json(fila))
+                continue
+            except ValueError as e:
+                errores[posicion] = f"resultado no representable en JSON: {e}"
+        partes.append(_volcar_json({'error': errores[posicion], 'linea': inicio + posicion}))
+    partes.append('')
+    return '\n'.join(partes).encode('utf-8')
+
+
+# --- SERVIDOR ---
+
+class ServicioLiquidacion:
+    """Servidor HTTP/1.1 mínimo sobre asyncio con un pool de procesos."""
+
+    def __init__(self, procesos=None, max_bytes_lote=MAX_BYTES_LOTE,
+                 tamano_bloque=TAMANO_BLOQUE_LOTE):
+        self.procesos = procesos or os.cpu_count() or 1
+        self.max_bytes_lote = max_bytes_lote
+        self.tamano_bloque = tamano_bloque
+        self.pool = None
+        self.latencias = {}
+        self.solicitudes = {}
+        self.rutas = {
+            ('POST', '/liquidar'): self._liquidar,
+            ('POST', '/lote'): self._lote,
+            ('GET', '/metricas'): self._metricas,
+            ('GET', '/salud'): self._salud,
+        }
+        _iniciar_proceso()
+
+    async def iniciar(self, host='127.0.0.1', puerto=8080):
+        self.pool = self._nuevo_pool()
+        return await asyncio.start_server(self._atender_conexion, host, puerto,
+                                          limit=MAX_BYTES_LIQUIDAR)
+
+    def _nuevo_pool(self):
+        return ProcessPoolExecutor(max_workers=self.procesos, mp_context=_contexto_procesos(),
+                                   initializer=_iniciar_proceso)
+
+    def cerrar(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    # --- Protocolo ---
+
+    async def _atender_conexion(self, reader, writer):
+        try:
+            while True:
+                try:
+                    linea = await asyncio.wait_for(reader.readline(), SEGUNDOS_INACTIVIDAD)
+                except asyncio.TimeoutError:
+                    break
+                if not linea:
+                    break
+                inicio = time.perf_counter()
+                ruta = '?'
+                mantener = False
+                try:
+                    metodo, ruta, version = self._leer_linea_solicitud(linea)
+                    encabezados = await self._leer_encabezados(reader)
+                    mantener = self._mantener_conexion(version, encabezados)
+                    manejador = self.rutas.get((metodo, ruta))
+                    if manejador is None:
+                        estado = 405 if any(r == ruta for _, r in self.rutas) else 404
+                        # El cuerpo no se lee: la conexión no puede reutilizarse
+                        con_cuerpo = ('content-length' in encabezados
+                                      or 'transfer-encoding' in encabezados)
+                        mensaje = f"{metodo} {ruta} no disponible"
+                        ruta = '?'  # no se abren series de métricas por rutas desconocidas
+                        raise ErrorHTTP(estado, mensaje, cerrar=con_cuerpo)
+                    await manejador(reader, writer, encabezados, mantener)
+                except ErrorHTTP as e:
+                    mantener = mantener and not e.cerrar
+                    self._responder_json(writer, e.estado, {'error': e.mensaje}, mantener)
+                await writer.drain()
+                self._registrar_latencia(ruta, time.perf_counter() - inicio)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, RespuestaInterrumpida):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _leer_linea_solicitud(linea):
+        try:
+            metodo, objetivo, version = linea.decode('latin-1').split()
+        except ValueError:
+            raise ErrorHTTP(400, "Línea de solicitud inválida", cerrar=True)
+        return metodo.upper(), objetivo.split('?', 1)[0], version.upper()
+
+    @staticmethod
+    async def _leer_encabezados(reader):
+        encabezados = {}
+        total = 0
+        while True:
+            try:
+                linea = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                raise ErrorHTTP(431, "Encabezado demasiado largo", cerrar=True)
+            total += len(linea)
+            if total > MAX_BYTES_ENCABEZADOS:
+                raise ErrorHTTP(431, "Encabezados demasiado largos", cerrar=True)
+            if linea in (b'\r\n', b'\n', b''):
+                return encabezados
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            encabezados[nombre.strip().lower()] = valor.strip()
+
+    @staticmethod
+    def _mantener_conexion(version, encabezados):
+        conexion = encabezados.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            return conexion != 'close'
+        return conexion == 'keep-alive'
+
+    @staticmethod
+    def _longitud_cuerpo(encabezados, maximo):
+        if encabezados.get('transfer-encoding', '').lower() == 'chunked':
+            return None
+        if 'content-length' not in encabezados:
+            raise ErrorHTTP(411, "Falta Content-Length", cerrar=True)
+        try:
+            longitud = int(encabezados['content-length'])
+        except ValueError:
+            raise ErrorHTTP(400, "Content-Length inválido", cerrar=True)
+        if longitud > maximo:
+            raise ErrorHTTP(413, f"El cuerpo supera el límite de {maximo} bytes", cerrar=True)
+        return longitud
+
+    async def _partes_cuerpo(self, reader, encabezados, maximo):
+        """Genera el cuerpo por partes, con Content-Length o chunked."""
+        longitud = self._longitud_cuerpo(encabezados, maximo)
+        if longitud is not None:
+            restante = longitud
+            while restante:
+                parte = await reader.read(min(restante, 65536))
+                if not parte:
+                    raise asyncio.IncompleteReadError(b'', restante)
+                restante -= len(parte)
+                yield parte
+            return
+        total = 0
+        while True:
+            linea_tamano = await reader.readline()
+            try:
+                tamano = int(linea_tamano.split(b';', 1)[0], 16)
+            except ValueError:
+                raise ErrorHTTP(400, "Bloque chunked inválido", cerrar=True)
+            if tamano == 0:
+                await self._leer_encabezados(reader)  # trailers
+                return
+            total += tamano
+            if total > maximo:
+                raise ErrorHTTP(413, f"El cuerpo supera el límite de {maximo} bytes", cerrar=True)
+            parte = await reader.readexactly(tamano)
+            await reader.readexactly(2)
+            yield parte
+
+    async def _lineas_cuerpo(self, reader, encabezados, maximo):
+        pendiente = b''
+        async for parte in self._partes_cuerpo(reader, encabezados, maximo):
+            pendiente += parte
+            *lineas, pendiente = pendiente.split(b'\n')
+            for linea in lineas:
+                if linea.strip():
+                    yield linea
+        if pendiente.strip():
+            yield pendiente
+
+    @staticmethod
+    def _encabezados_respuesta(estado, tipo, mantener, extra=()):
+        lineas = [f"HTTP/1.1 {estado} {MENSAJES_ESTADO.get(estado, '')}",
+                  f"Content-Type: {tipo}",
+                  f"Connection: {'keep-alive' if mantener else 'close'}",
+                  *extra]
+        return ('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1')
+
+    def _responder_json(self, writer, estado, cuerpo, mantener):
+        datos = _volcar_json(cuerpo).encode('utf-8')
+        writer.write(self._encabezados_respuesta(
+            estado, 'application/json; charset=utf-8', mantener,
+            [f"Content-Length: {len(datos)}"]))
+        writer.write(datos)
+
+    # --- Rutas ---
+
+    async def _liquidar(self, reader, writer, encabezados, mantener):
+        cuerpo = b''.join([p async for p in self._partes_cuerpo(reader, encabezados, MAX_BYTES_LIQUIDAR)])
+        try:
+            datos = _cargar_json(cuerpo)
+            if not isinstance(datos, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            resultado = self._liquidar_uno(datos)
+            # _responder_json vuelca antes de escribir: un valor no finito aún responde 400
+            self._responder_json(writer, 200, resultado, mantener)
+        except (ValueError, TypeError, KeyError) as e:
+            raise ErrorHTTP(400, f"Datos inválidos: {e}")
+
+    def _liquidar_uno(self, datos):
+        """
+        Liquida en el propio ciclo de eventos (toma microsegundos): con la
+        núcleo escalar (nucleo_renta) para el año por defecto, o con el motor
+        vectorizado y el paquete del año si se indica otro.
+        """
+        ano = int(datos.get('ano_gravable') or ANO_GRAVABLE_POR_DEFECTO)
+        entrada = {}
+        for concepto in motor.CONCEPTOS_ENTRADA:
+            valor = lote_renta.convertir_valor(datos.get(concepto))
+            entrada[concepto] = motor.VALORES_POR_DEFECTO[concepto] if valor is None else valor
+        if ano == ANO_GRAVABLE_POR_DEFECTO:
+            resultado = nucleo_renta.calcular_impuesto_renta(entrada)
+        else:
+            lote = motor.calcular_impuesto_renta_lote({k: [v] for k, v in entrada.items()}, ano)
+            resultado = {clave: valores[0].item() for clave, valores in lote.items()}
+        return {'nit': datos.get('nit', ''), 'ano_gravable': ano, **resultado}
+
+    def _reemplazar_pool(self):
+        """Cambia un pool roto (un proceso murió) por uno nuevo para las siguientes solicitudes."""
+        roto, self.pool = self.pool, self._nuevo_pool()
+        roto.shutdown(wait=False, cancel_futures=True)
+
+    async def _lote(self, reader, writer, encabezados, mantener):
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        # 411/413 con su estado real, antes de comprometer el 200
+        self._longitud_cuerpo(encabezados, self.max_bytes_lote)
+        writer.write(self._encabezados_respuesta(
+            200, 'application/x-ndjson; charset=utf-8', mantener,
+            ['Transfer-Encoding: chunked']))
+
+        def pool_roto():
+            if self.pool is pool:
+                self._reemplazar_pool()
+            return ErrorHTTP(500, "Un proceso de liquidación terminó inesperadamente")
+
+        def liquidar(inicio, bloque):
+            try:
+                return loop.run_in_executor(pool, liquidar_lineas_ndjson, inicio, bloque)
+            except BrokenProcessPool:
+                raise pool_roto() from None
+            except RuntimeError as e:       # pool cerrado
+                raise ErrorHTTP(500, f"Error al liquidar el bloque: {e}") from None
+
+        async def enviar(futuro):
+            try:
+                datos = await futuro
+            except BrokenProcessPool:
+                raise pool_roto() from None
+            except Exception as e:
+                raise ErrorHTTP(500, f"Error al liquidar el bloque: {e}")
+            if datos:
+                writer.write(f"{len(datos):X}\r\n".encode('ascii') + datos + b'\r\n')
+                await writer.drain()
+
+        pendientes = deque()
+        bloque = []
+        inicio = 1
+        try:
+            async for linea in self._lineas_cuerpo(reader, encabezados, self.max_bytes_lote):
+                bloque.append(linea)
+                if len(bloque) >= self.tamano_bloque:
+                    pendientes.append(liquidar(inicio, bloque))
+                    inicio += len(bloque)
+                    bloque = []
+                    if len(pendientes) >= 2 * self.procesos:
+                        await enviar(pendientes.popleft())
+            if bloque:
+                pendientes.append(liquidar(inicio, bloque))
+            while pendientes:
+                await enviar(pendientes.popleft())
+        except ErrorHTTP as e:
+            for futuro in pendientes:
+                if not futuro.cancel():     # ya terminó: se recoge su excepción
+                    futuro.exception()
+            # Los encabezados ya salieron: se informa el error como última línea
+            error = (_volcar_json({'error': e.mensaje}) + '\n').encode('utf-8')
+            writer.write(f"{len(error):X}\r\n".encode('ascii') + error + b'\r\n0\r\n\r\n')
+            await writer.drain()
+            raise RespuestaInterrumpida(e.mensaje) from e
+        writer.write(b'0\r\n\r\n')
+
+    async def _metricas(self, reader, writer, encabezados, mantener):
+        self._responder_json(writer, 200, self.metricas(), mantener)
+
+    async def _salud(self, reader, writer, encabezados, mantener):
+        self._responder_json(writer, 200, {'estado': 'ok', 'anos': anos_disponibles()}, mantener)
+
+    # --- Métricas ---
+
+    def _registrar_latencia(self, ruta, segundos):
+        self.solicitudes[ruta] = self.solicitudes.get(ruta, 0) + 1
+        self.latencias.setdefault(ruta, deque(maxlen=MUESTRAS_LATENCIA)).append(segundos * 1000)
+
+    def metricas(self):
+        """Solicitudes atendidas y percentiles de latencia (ms) por ruta."""
+        resumen = {}
+        for ruta, muestras in self.latencias.items():
+            ordenadas = sorted(muestras)
+            resumen[ruta] = {
+                'solicitudes': self.solicitudes[ruta],
+                'p50_ms': round(_percentil(ordenadas, 50), 3),
+                'p99_ms': round(_percentil(ordenadas, 99), 3),
+            }
+        return resumen
+
+
+def _percentil(ordenadas, p):
+    if not ordenadas:
+        return 0.0
+    indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+    return ordenadas[indice]
+
+
+async def servir(host, puerto, procesos):
+    servicio = ServicioLiquidacion(procesos)
+    servidor = await servicio.iniciar(host, puerto)
+    print(f"Servicio de liquidación en http://{host}:{puerto} ({servicio.procesos} procesos)")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servicio.cerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de liquidación del impuesto de renta.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8080)
+    parser.add_argument('-p', '--procesos', type=int, default=0,
+                        help="Procesos para el endpoint /lote; 0 usa todos los núcleos")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.host, args.puerto, args.procesos or None))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
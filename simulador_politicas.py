@@ -0,0 +1,375 @@
+"""
+SIMULADOR DE CAMBIOS DE POLÍTICA SOBRE UNA POBLACIÓN
+Personas Naturales Residentes Fiscales - Colombia
+
+Responde "¿qué pasa con el impuesto de la población si cambia un límite o
+una tarifa?": liquida una población (real o de poblacion_sintetica.py) con
+el paquete de reglas base y con cada escenario, y compara el impuesto neto
+de renta de cada contribuyente:
+
+- recaudo total y su diferencia contra la base
+- ganadores y perdedores (impuesto menor o mayor que en la base), en
+  total y por decil de ingresos totales
+- tasa efectiva (impuesto neto / ingresos totales): agregada, por decil y
+  percentiles entre los contribuyentes con ingresos
+
+Un escenario es un conjunto de cambios sobre los campos de PaqueteReglas:
+
+    {"limite_336_1500": {"limite_general_uvt": 1500},
+     "exenta_25_sin_tope": {"limite_renta_exenta_25_uvt": 1e9},
+     "tarifa_33_a_35": {"tarifas_241": {"3": 0.35}}}
+
+En los campos de tabla (tarifas_241, inicio_241_uvt, ...) un diccionario
+{índice: valor} cambia solo esos rangos; el impuesto acumulado de la tabla
+241 se recalcula.
+
+Con la columna `ano_gravable` y sin reglas base explícitas, cada
+contribuyente se liquida con el paquete de su año y los cambios de cada
+escenario se aplican sobre ese paquete, como en calcular_impuesto_renta_lote.
+
+La población se recorre por tramos de filas. En cada tramo, la base y
+todos los escenarios se liquidan con el motor vectorizado sobre los mismos
+arreglos de entrada, y solo se acumulan sumas por decil y un histograma de
+tasas efectivas. La memoria no depende del número de escenarios, y
+ninguna declaración se liquida fila a fila.
+
+Uso:
+    python simulador_politicas.py --sinteticos 5000000 --escenarios escenarios.json
+    python simulador_politicas.py entrada.csv --escenarios escenarios.json -o informe.json
+"""
+
+import argparse
+import dataclasses
+import json
+import sys
+import time
+
+import numpy as np
+
+import lector_xlsx
+import motor_vectorizado as motor
+from reglas_tributarias import (ANO_GRAVABLE_POR_DEFECTO, PaqueteReglas, _impuesto_acumulado, cargar_paquete,
+                                 obtener_paquete)
+
+# Tramos pequeños: los arreglos intermedios del motor caben en la caché del procesador
+TAMANO_TRAMO_POR_DEFECTO = 50000
+NOMBRE_BASE = 'base'
+DECILES = 10
+# Cambios de impuesto menores a medio peso se consideran iguales
+TOLERANCIA_PESOS = 0.5
+# Histograma de tasas efectivas: intervalos de 0,05 puntos entre 0% y 100%
+BORDES_TASA = np.linspace(0.0, 1.0, 2001)
+PERCENTILES_TASA = (10, 25, 50, 75, 90, 99)
+
+
+def aplicar_cambios(paquete, cambios, nombre=None):
+    """
+    Paquete igual a `paquete` con los `cambios` ({campo: valor}). En los
+    campos que son tuplas, un diccionario {índice: valor} cambia solo esos
+    elementos. La versión del paquete nuevo lleva el nombre del escenario.
+    """
+    campos = {campo.name for campo in dataclasses.fields(paquete)}
+    nuevos = {}
+    for campo, valor in cambios.items():
+        if campo not in campos or campo in ('ano_gravable', 'version', 'impuesto_base_241_uvt'):
+            raise ValueError(f"Campo de reglas desconocido o no modificable: '{campo}'")
+        actual = getattr(paquete, campo)
+        if isinstance(actual, tuple):
+            if isinstance(valor, dict):
+                elementos = list(actual)
+                for indice, elemento in valor.items():
+                    indice = int(indice)
+                    if not 0 <= indice < len(elementos):
+                        raise ValueError(f"'{campo}' no tiene el índice {indice} "
+                                         f"(tiene {len(elementos)} elementos)")
+                    elementos[indice] = float(elemento)
+                valor = elementos
+            valor = tuple(float(elemento) for elemento in valor)
+            if len(valor) != len(actual):
+                raise ValueError(f"'{campo}' debe tener {len(actual)} elementos")
+        else:
+            valor = int(valor) if campo == 'uvt' else float(valor)
+        nuevos[campo] = valor
+
+    if 'inicio_241_uvt' in nuevos and 'limites_241_uvt' not in nuevos:
+        nuevos['limites_241_uvt'] = nuevos['inicio_241_uvt'][1:]
+    if 'inicio_241_uvt' in nuevos or 'tarifas_241' in nuevos:
+        nuevos['impuesto_base_241_uvt'] = _impuesto_acumulado(
+            nuevos.get('inicio_241_uvt', paquete.inicio_241_uvt), nuevos.get('tarifas_241', paquete.tarifas_241))
+    nuevos['version'] = f"{paquete.version}+{nombre}" if nombre else f"{paquete.version}+simulacion"
+    return dataclasses.replace(paquete, **nuevos)
+
+
+def cargar_escenarios(ruta):
+    """Escenarios de un JSON: {nombre: {campo: valor}} o [{"nombre": ..., "cambios": {...}}]."""
+    with open(ruta, encoding='utf-8') as archivo:
+        definicion = json.load(archivo)
+    if isinstance(definicion, list):
+        return {escenario['nombre']: escenario['cambios'] for escenario in definicion}
+    return definicion
+
+
+def _ingresos_totales(columnas, n):
+    total = np.zeros(n)
+    for concepto in ('salarios', 'cesantias', 'prestaciones_sociales', 'otros_pagos_laborales'):
+        if concepto in columnas:
+            total += np.asarray(columnas[concepto], dtype=np.float64)
+    return total
+
+
+class _Acumulado:
+    """Sumas por decil de un escenario."""
+
+    def __init__(self):
+        self.recaudo = np.zeros(DECILES)
+        self.diferencia = np.zeros(DECILES)
+        self.ganadores = np.zeros(DECILES, dtype=np.int64)
+        self.perdedores = np.zeros(DECILES, dtype=np.int64)
+        self.con_impuesto = np.zeros(DECILES, dtype=np.int64)
+        self.histograma_tasa = np.zeros(len(BORDES_TASA) - 1, dtype=np.int64)
+
+    def agregar(self, decil, impuesto, base, tasa):
+        self.recaudo += np.bincount(decil, weights=impuesto, minlength=DECILES)
+        diferencia = impuesto - base
+        self.diferencia += np.bincount(decil, weights=diferencia, minlength=DECILES)
+        self.ganadores += np.bincount(decil[diferencia < -TOLERANCIA_PESOS], minlength=DECILES)
+        self.perdedores += np.bincount(decil[diferencia > TOLERANCIA_PESOS], minlength=DECILES)
+        self.con_impuesto += np.bincount(decil[impuesto > 0], minlength=DECILES)
+        # Intervalos uniformes: el índice sale de la tasa sin buscar en los bordes
+        intervalos = len(BORDES_TASA) - 1
+        indice = np.clip((tasa * intervalos).astype(np.int64), 0, intervalos - 1)
+        self.histograma_tasa += np.bincount(indice, minlength=intervalos)
+
+
+def _paquetes_escenarios(base, escenarios):
+    """{nombre: PaqueteReglas} de la base y de cada escenario aplicado sobre `base`."""
+    paquetes = {NOMBRE_BASE: base}
+    for nombre, cambios in escenarios.items():
+        if nombre == NOMBRE_BASE:
+            raise ValueError(f"'{NOMBRE_BASE}' es el nombre reservado de las reglas sin cambios")
+        paquetes[nombre] = cambios if isinstance(cambios, PaqueteReglas) else aplicar_cambios(base, cambios, nombre)
+    return paquetes
+
+
+def simular(columnas, escenarios, reglas=None, tamano_tramo=TAMANO_TRAMO_POR_DEFECTO):
+    """
+    Compara la base (`reglas`) con cada escenario ({nombre: cambios} o
+    {nombre: PaqueteReglas}) sobre la población `columnas` ({concepto:
+    arreglo}, como en calcular_impuesto_renta_lote). Con la columna
+    `ano_gravable` y sin `reglas`, la base de cada fila es el paquete de su
+    año y los cambios se aplican sobre él (un escenario PaqueteReglas se
+    usa tal cual en todas las filas). Retorna el informe (ver `informe`).
+    """
+    n = next((len(columnas[concepto]) for concepto in motor.CONCEPTOS_ENTRADA if concepto in columnas), 0)
+    anos = None
+    if reglas is None and 'ano_gravable' in columnas:
+        anos = np.asarray(columnas['ano_gravable']).astype(np.int64)
+        unicos = np.unique(anos)
+        if len(unicos) <= 1:
+            reglas = int(unicos[0]) if len(unicos) else None
+            anos = None
+    if anos is None:
+        paquetes_ano = {None: _paquetes_escenarios(obtener_paquete(reglas), escenarios)}
+    else:
+        paquetes_ano = {int(ano): _paquetes_escenarios(cargar_paquete(int(ano)), escenarios) for ano in unicos}
+    paquetes = {nombre: [paquetes_escenario[nombre] for paquetes_escenario in paquetes_ano.values()]
+                for nombre in next(iter(paquetes_ano.values()))}
+
+    ingresos = _ingresos_totales(columnas, n)
+    bordes_decil = np.quantile(ingresos, np.arange(1, DECILES) / DECILES) if n else np.zeros(DECILES - 1)
+    ingresos_decil = np.zeros(DECILES)
+    contribuyentes_decil = np.zeros(DECILES, dtype=np.int64)
+    acumulados = {nombre: _Acumulado() for nombre in paquetes}
+
+    for inicio in range(0, n, tamano_tramo):
+        tramo = {concepto: np.asarray(valores)[inicio:inicio + tamano_tramo]
+                 for concepto, valores in columnas.items() if concepto in motor.CONCEPTOS_ENTRADA}
+        partes = [(paquetes_ano[None], None, tramo)] if anos is None else _partes_por_ano(
+            tramo, anos[inicio:inicio + tamano_tramo], paquetes_ano)
+        ingreso = ingresos[inicio:inicio + tamano_tramo]
+        decil = np.searchsorted(bordes_decil, ingreso, side='right')
+        ingresos_decil += np.bincount(decil, weights=ingreso, minlength=DECILES)
+        contribuyentes_decil += np.bincount(decil, minlength=DECILES)
+        con_ingreso = ingreso > 0
+        divisor = np.where(con_ingreso, ingreso, 1.0)
+
+        impuesto_base = None
+        for nombre in paquetes:
+            impuesto = _impuesto_neto(partes, nombre, len(ingreso))
+            if impuesto_base is None:
+                impuesto_base = impuesto
+            acumulados[nombre].agregar(decil, impuesto, impuesto_base, (impuesto / divisor)[con_ingreso])
+
+    return informe(acumulados, bordes_decil, ingresos_decil, contribuyentes_decil, paquetes)
+
+
+def _partes_por_ano(tramo, anos, paquetes_ano):
+    """[(paquetes del año, índices en el tramo, columnas)] de cada año gravable del tramo."""
+    unicos = np.unique(anos)
+    if len(unicos) == 1:
+        return [(paquetes_ano[int(unicos[0])], None, tramo)]
+    partes = []
+    for ano in unicos:
+        indices = np.flatnonzero(anos == ano)
+        partes.append((paquetes_ano[int(ano)], indices, {c: v[indices] for c, v in tramo.items()}))
+    return partes
+
+
+def _impuesto_neto(partes, nombre, n):
+    """Impuesto neto del tramo con el paquete `nombre` de cada parte."""
+    if len(partes) == 1:
+        paquetes, _, columnas = partes[0]
+        return motor.calcular_impuesto_renta_lote(columnas, paquetes[nombre])['impuesto_neto']
+    impuesto = np.empty(n)
+    for paquetes, indices, columnas in partes:
+        impuesto[indices] = motor.calcular_impuesto_renta_lote(columnas, paquetes[nombre])['impuesto_neto']
+    return impuesto
+
+
+def _percentiles(histograma):
+    total = histograma.sum()
+    if not total:
+        return {f"p{p}": None for p in PERCENTILES_TASA}
+    acumulado = np.cumsum(histograma)
+    centros = (BORDES_TASA[:-1] + BORDES_TASA[1:]) / 2
+    return {f"p{p}": round(float(centros[np.searchsorted(acumulado, total * p / 100)]), 4)
+            for p in PERCENTILES_TASA}
+
+
+def _versiones(paquetes):
+    if isinstance(paquetes, PaqueteReglas):
+        return paquetes.version
+    return ', '.join(dict.fromkeys(paquete.version for paquete in paquetes))
+
+
+def informe(acumulados, bordes_decil, ingresos_decil, contribuyentes_decil, paquetes):
+    """
+    {'poblacion', 'escenarios': {nombre: {...}}}. Por escenario: versión de
+    reglas (las de cada año, separadas por comas, si `paquetes[nombre]` es
+    una lista), recaudo, diferencia y variación contra la base, ganadores,
+    perdedores, contribuyentes con impuesto, tasa efectiva agregada,
+    percentiles de la tasa efectiva (aproximados a 0,05 puntos) y el mismo
+    detalle por decil de ingresos totales.
+    """
+    ingresos_total = float(ingresos_decil.sum())
+    recaudo_base = float(acumulados[NOMBRE_BASE].recaudo.sum())
+    desde = np.concatenate(([0.0], bordes_decil))
+    hasta = np.concatenate((bordes_decil, [np.inf]))
+    escenarios = {}
+    for nombre, acumulado in acumulados.items():
+        recaudo = float(acumulado.recaudo.sum())
+        diferencia = float(acumulado.diferencia.sum())
+        escenarios[nombre] = {
+            'version_reglas': _versiones(paquetes[nombre]),
+            'recaudo': round(recaudo),
+            'diferencia_recaudo': round(diferencia),
+            'variacion_recaudo': diferencia / recaudo_base if recaudo_base else None,
+            'ganadores': int(acumulado.ganadores.sum()),
+            'perdedores': int(acumulado.perdedores.sum()),
+            'contribuyentes_con_impuesto': int(acumulado.con_impuesto.sum()),
+            'tasa_efectiva': recaudo / ingresos_total if ingresos_total else None,
+            'percentiles_tasa_efectiva': _percentiles(acumulado.histograma_tasa),
+            'deciles': [
+                {
+                    'decil': i + 1,
+                    'ingreso_desde': float(desde[i]),
+                    'ingreso_hasta': None if np.isinf(hasta[i]) else float(hasta[i]),
+                    'contribuyentes': int(contribuyentes_decil[i]),
+                    'recaudo': round(float(acumulado.recaudo[i])),
+                    'diferencia_recaudo': round(float(acumulado.diferencia[i])),
+                    'ganadores': int(acumulado.ganadores[i]),
+                    'perdedores': int(acumulado.perdedores[i]),
+                    'tasa_efectiva': (float(acumulado.recaudo[i] / ingresos_decil[i])
+                                      if ingresos_decil[i] else None),
+                }
+                for i in range(DECILES)
+            ],
+        }
+    return {'poblacion': int(contribuyentes_decil.sum()), 'escenarios': escenarios}
+
+
+def cargar_poblacion(ruta, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+    """
+    Columnas float64 de un archivo de entrada de lote_renta (CSV o XLSX),
+    más `ano_gravable` (int64; `ano_gravable` en las filas sin año).
+    """
+    import lote_renta
+
+    partes = {concepto: [] for concepto in ('ano_gravable', *motor.CONCEPTOS_ENTRADA)}
+    if lector_xlsx.es_xlsx(ruta):
+        bloques = (columnas for _, _, columnas in lector_xlsx.leer_bloques(ruta, ano_gravable=ano_gravable))
+    else:
+        registros = lote_renta.registros_desde_filas(lote_renta.leer_filas(ruta))
+        bloques = (lote_renta.columnas_de_bloque(bloque, ano_gravable)[1]
+                   for bloque in lote_renta.agrupar_en_bloques(registros))
+    for columnas in bloques:
+        partes['ano_gravable'].append(np.asarray(columnas['ano_gravable'], dtype=np.int64))
+        for concepto in motor.CONCEPTOS_ENTRADA:
+            partes[concepto].append(np.asarray(columnas[concepto], dtype=np.float64))
+    return {concepto: np.concatenate(valores) if valores
+            else np.zeros(0, dtype=np.int64 if concepto == 'ano_gravable' else np.float64)
+            for concepto, valores in partes.items()}
+
+
+def _porcentaje(valor):
+    return '-' if valor is None else f"{valor:.2%}"
+
+
+def imprimir_informe(resultado, destino=sys.stdout):
+    print(f"Población: {resultado['poblacion']} contribuyentes", file=destino)
+    print("escenario\trecaudo\tdiferencia\tvariación\tganadores\tperdedores\ttasa efectiva\tp50\tp90",
+          file=destino)
+    for nombre, escenario in resultado['escenarios'].items():
+        variacion = escenario['variacion_recaudo']
+        tasa = escenario['tasa_efectiva']
+        percentiles = escenario['percentiles_tasa_efectiva']
+        print(f"{nombre}\t{escenario['recaudo']:,}\t{escenario['diferencia_recaudo']:+,}\t"
+              f"{'-' if variacion is None else f'{variacion:+.2%}'}\t{escenario['ganadores']}\t"
+              f"{escenario['perdedores']}\t{_porcentaje(tasa)}\t"
+              f"{_porcentaje(percentiles['p50'])}\t{_porcentaje(percentiles['p90'])}", file=destino)
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        description="Impacto en el recaudo de cambios en límites y tarifas sobre una población.")
+    parser.add_argument('entrada', nargs='?', help="Archivo CSV o XLSX de contribuyentes (como lote_renta)")
+    parser.add_argument('--sinteticos', type=int, help="Usar una población sintética de este tamaño")
+    parser.add_argument('--semilla', type=int, default=2024, help="Semilla de la población sintética")
+    parser.add_argument('--escenarios', required=True, help="JSON con los escenarios")
+    parser.add_argument('--ano', type=int, default=ANO_GRAVABLE_POR_DEFECTO,
+                        help="Año gravable de las reglas base de la población sintética y de las filas "
+                             "sin AÑO GRAVABLE (por defecto %(default)s)")
+    parser.add_argument('--tamano-tramo', type=int, default=TAMANO_TRAMO_POR_DEFECTO,
+                        help="Contribuyentes liquidados por tramo (por defecto %(default)s)")
+    parser.add_argument('-o', '--salida', help="Guardar el informe completo en JSON")
+    return parser
+
+
+def main(argv=None):
+    parser = construir_parser()
+    args = parser.parse_args(argv)
+    if (args.entrada is None) == (args.sinteticos is None):
+        parser.error("indique un archivo de entrada o --sinteticos N")
+    if args.sinteticos is not None:
+        from poblacion_sintetica import generar_poblacion
+        columnas = generar_poblacion(args.sinteticos, args.semilla, reglas=args.ano)
+        reglas = args.ano
+    else:
+        # Cada fila con las reglas de su año gravable
+        columnas = cargar_poblacion(args.entrada, args.ano)
+        reglas = None
+    escenarios = cargar_escenarios(args.escenarios)
+
+    inicio = time.perf_counter()
+    resultado = simular(columnas, escenarios, reglas, args.tamano_tramo)
+    segundos = time.perf_counter() - inicio
+    imprimir_informe(resultado)
+    print(f"{len(escenarios)} escenarios y la base sobre {resultado['poblacion']} contribuyentes "
+          f"en {segundos:.2f} s", file=sys.stderr)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
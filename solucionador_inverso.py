@@ -0,0 +1,326 @@
+"""
+SOLUCIONADOR INVERSO: SALARIO O DEDUCCIÓN PARA UNA META
+Personas Naturales Residentes Fiscales - Colombia
+
+Responde la pregunta al revés de `calcular_impuesto_renta`: ¿qué salario
+bruto (o qué valor de una deducción o renta exenta) da este ingreso neto,
+este impuesto o este saldo?
+
+Con todas las demás entradas fijas, el impuesto es una función lineal por
+tramos de cualquiera de las VARIABLES: la depuración solo suma, multiplica
+por porcentajes y topa con mínimos y máximos (renta exenta del 25%,
+pensión/AFC, límite del Art. 336, base en cero), la tabla del Art. 241 es
+lineal dentro de cada rango y el anticipo es un máximo/mínimo de
+funciones lineales del impuesto. El solucionador recorre esos tramos desde
+`minimo` hacia arriba: en cada punto calcula el valor del objetivo, su
+pendiente y la distancia al próximo quiebre (el próximo tope que se activa
+o rango que cambia), y si la meta cae dentro del tramo la despeja
+exactamente; si no, salta al quiebre. No hay búsqueda iterativa: cada
+paso es un tramo, y todas las metas de un lote avanzan juntas en arreglos.
+
+Objetivos:
+- 'impuesto'  impuesto neto de renta
+- 'neto'      ingresos totales - INCR - impuesto neto
+- 'saldo'     saldo a pagar (positivo) o a favor (negativo), con anticipo
+
+Con `vinculados` otros conceptos se mueven con la variable, por ejemplo
+los aportes obligatorios del trabajador al negociar un salario:
+
+    resolver(datos, 'neto', 120_000_000, vinculados=APORTES_TRABAJADOR)
+
+El resultado se verifica liquidando la solución con el motor vectorizado.
+Como en calcular_impuesto_renta_lote, sin `reglas` y con la columna
+`ano_gravable` cada fila se resuelve con el paquete de su año.
+"""
+
+import math
+
+import numpy as np
+
+import motor_vectorizado as motor
+from reglas_tributarias import cargar_paquete, obtener_paquete
+
+OBJETIVOS = ('impuesto', 'neto', 'saldo')
+
+# Conceptos que se pueden despejar: el impuesto es lineal por tramos en cada uno
+VARIABLES = ('salarios', 'cesantias', 'prestaciones_sociales', 'otros_pagos_laborales', 'incr_salud',
+             'incr_pensiones', 'pension_voluntaria', 'afc', 'intereses_vivienda', 'medicina_prepagada',
+             'compras_factura_electronica', 'gmf', 'retenciones', 'saldo_favor_anterior', 'anticipo_anterior')
+
+# Aportes obligatorios a salud y pensión a cargo del trabajador (4% + 4% del salario)
+APORTES_TRABAJADOR = {'incr_salud': 0.04, 'incr_pensiones': 0.04}
+
+# Tramos recorridos como máximo por meta (la liquidación tiene unas decenas de quiebres)
+MAX_TRAMOS = 200
+
+
+class _Tramo:
+    """Valor y pendiente (respecto a la variable) de cada fila, más la distancia al próximo quiebre."""
+
+    def __init__(self, n):
+        self.distancia = np.full(n, np.inf)
+
+    def quiebre(self, distancia):
+        self.distancia = np.minimum(self.distancia, np.where(distancia > 0, distancia, np.inf))
+
+    def minimo(self, a, b):
+        """min(a, b) con a y b como (valor, pendiente); hacia adelante gana la de menor pendiente si empatan."""
+        (va, pa), (vb, pb) = a, b
+        usa_a = (va < vb) | ((va == vb) & (pa <= pb))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.quiebre(np.where(usa_a, (vb - va) / (pa - pb), (va - vb) / (pb - pa)))
+        return np.where(usa_a, va, vb), np.where(usa_a, pa, pb)
+
+    def maximo(self, a, b):
+        (va, pa), (vb, pb) = a, b
+        menos_a, menos_b = self.minimo((-va, -pa), (-vb, -pb))
+        return -menos_a, -menos_b
+
+
+def _constante(valor):
+    return valor, 0.0
+
+
+def _sumar(*terminos):
+    return sum(t[0] for t in terminos), sum(t[1] for t in terminos)
+
+
+def _escalar(termino, factor):
+    return termino[0] * factor, termino[1] * factor
+
+
+def _evaluar(d, p, paquete, objetivo):
+    """
+    Objetivo, pendiente y distancia al próximo quiebre en los puntos `d`
+    ({concepto: arreglo}) con pendientes `p` ({concepto: pendiente}). Los
+    pasos siguen a `motor_vectorizado._liquidar`.
+    """
+    n = len(d['salarios'])
+    uvt = paquete.uvt
+    tramo = _Tramo(n)
+
+    def x(concepto):
+        return d[concepto], p.get(concepto, 0.0)
+
+    # 1-3. Ingresos, INCR e ingreso neto
+    ingresos = _sumar(x('salarios'), x('cesantias'), x('prestaciones_sociales'), x('otros_pagos_laborales'))
+    incr = _sumar(x('incr_salud'), x('incr_pensiones'))
+    ingreso_neto = _sumar(ingresos, _escalar(incr, -1))
+
+    # 4. Cesantías exentas: el porcentaje depende del ingreso mensual promedio, que no es variable
+    rango_cesantias = np.searchsorted(paquete.limites_cesantias_uvt, d['ingreso_mensual_promedio'] / uvt,
+                                      side='left')
+    porcentaje = np.where(d['ingreso_mensual_promedio'] == 0, 0.0,
+                          np.asarray(paquete.porcentajes_cesantias)[rango_cesantias])
+    cesantias_exentas = _escalar(x('cesantias'), porcentaje)
+
+    # 5. Deducciones
+    dependientes = _constante(np.minimum(d['num_dependientes'] * (paquete.deduccion_por_dependiente_uvt * uvt),
+                                         paquete.limite_dependientes_uvt * uvt))
+    medicina = tramo.minimo(x('medicina_prepagada'), _constante(paquete.limite_medicina_prepagada_uvt * uvt))
+    intereses = tramo.minimo(x('intereses_vivienda'), _constante(paquete.limite_intereses_vivienda_uvt * uvt))
+    deducciones = _sumar(dependientes, medicina, intereses)
+
+    # 6-7. Rentas exentas
+    base_25 = tramo.maximo(_sumar(ingreso_neto, _escalar(cesantias_exentas, -1), _escalar(deducciones, -1)),
+                           _constante(0.0))
+    renta_exenta_25 = tramo.minimo(_escalar(base_25, paquete.porcentaje_renta_exenta_25),
+                                   _constante(paquete.limite_renta_exenta_25_uvt * uvt))
+    pension_afc = tramo.minimo(
+        tramo.minimo(_sumar(x('pension_voluntaria'), x('afc')), _escalar(ingresos, paquete.porcentaje_pension_afc)),
+        _constante(paquete.limite_pension_afc_uvt * uvt))
+    exentas = _sumar(cesantias_exentas, renta_exenta_25, pension_afc)
+
+    # 8. Límite del Art. 336
+    limite = tramo.minimo(_escalar(ingreso_neto, paquete.porcentaje_limite_general),
+                          _constante(paquete.limite_general_uvt * uvt))
+    depuracion = tramo.minimo(_sumar(exentas, deducciones), limite)
+
+    # 9-12. Beneficios y base gravable
+    factura = tramo.minimo(_escalar(x('compras_factura_electronica'), paquete.porcentaje_factura_electronica),
+                           _constante(paquete.limite_factura_electronica_uvt * uvt))
+    gmf = _escalar(x('gmf'), paquete.porcentaje_gmf)
+    base = tramo.maximo(_sumar(ingreso_neto, _escalar(depuracion, -1), _escalar(factura, -1), _escalar(gmf, -1)),
+                        _constante(0.0))
+
+    # 13. Tabla del Art. 241: el rango es el de la base un poco más adelante
+    base_uvt, pendiente_uvt = base[0] / uvt, base[1] / uvt
+    limites = np.asarray(paquete.limites_241_uvt)
+    inicio = np.asarray(paquete.inicio_241_uvt)
+    rango = np.where(pendiente_uvt > 0, np.searchsorted(limites, base_uvt, side='right'),
+                     np.searchsorted(limites, base_uvt, side='left'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hacia_arriba = (np.append(limites, np.inf)[rango] - base_uvt) / pendiente_uvt
+        hacia_abajo = (base_uvt - inicio[rango]) / -pendiente_uvt
+    tramo.quiebre(np.where(pendiente_uvt > 0, hacia_arriba, np.where(pendiente_uvt < 0, hacia_abajo, np.inf)))
+    tarifa = np.asarray(paquete.tarifas_241)[rango]
+    impuesto = (((base_uvt - inicio[rango]) * tarifa + np.asarray(paquete.impuesto_base_241_uvt)[rango]) * uvt,
+                base[1] * tarifa)
+
+    if objetivo == 'impuesto':
+        resultado = impuesto
+    elif objetivo == 'neto':
+        resultado = _sumar(ingreso_neto, _escalar(impuesto, -1))
+    else:
+        # 14-15. Anticipo y liquidación final
+        uno, dos, tres_o_mas = paquete.porcentajes_anticipo
+        porcentaje = np.where(d['num_anos_declarando'] == 1, uno,
+                              np.where(d['num_anos_declarando'] == 2, dos, tres_o_mas))
+        retenciones = x('retenciones')
+        metodo1 = tramo.maximo(_sumar(_escalar(impuesto, porcentaje), _escalar(retenciones, -1)), _constante(0.0))
+        promedio = _escalar(_sumar(impuesto, x('impuesto_neto_anterior')), 0.5)
+        metodo2 = tramo.maximo(_sumar(_escalar(promedio, porcentaje), _escalar(retenciones, -1)), _constante(0.0))
+        con_anterior = d['impuesto_neto_anterior'] > 0
+        metodo2 = np.where(con_anterior, metodo2[0], metodo1[0]), np.where(con_anterior, metodo2[1], metodo1[1])
+        anticipo = tramo.minimo(metodo1, metodo2)
+        resultado = _sumar(impuesto, _escalar(retenciones, -1), _escalar(x('saldo_favor_anterior'), -1),
+                           _escalar(x('anticipo_anterior'), -1), anticipo)
+
+    valor, pendiente = resultado
+    return (np.broadcast_to(valor, (n,)), np.broadcast_to(pendiente, (n,)), tramo.distancia)
+
+
+def _valor_objetivo(resultados, objetivo):
+    if objetivo == 'impuesto':
+        return resultados['impuesto_neto']
+    if objetivo == 'neto':
+        return resultados['ingreso_neto'] - resultados['impuesto_neto']
+    return np.where(resultados['es_saldo_favor'], -resultados['valor_final'], resultados['valor_final'])
+
+
+def resolver_lote(columnas, objetivo, metas, variable='salarios', vinculados=None, minimo=0.0, reglas=None):
+    """
+    Menor valor de `variable` (>= `minimo`) con el que `objetivo` alcanza
+    cada una de las `metas`, con las demás entradas de `columnas` fijas
+    (una fila por meta, o una sola fila para todas). Cada concepto de
+    `vinculados` ({concepto: factor}) vale lo que traiga `columnas` más
+    factor * variable. Sin `reglas` y con la columna `ano_gravable`, cada
+    fila se resuelve con el paquete de su año.
+
+    Retorna {'valor': arreglo (NaN si la meta no se alcanza), 'resuelto',
+    'logrado': objetivo recalculado con el motor en la solución, 'tramos':
+    tramos recorridos}. Si la meta cae en un salto del impuesto (el
+    impuesto acumulado de la tabla 241 está redondeado a UVT enteras) el
+    valor es el punto del salto.
+    """
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo desconocido: {objetivo} (use {', '.join(OBJETIVOS)})")
+    vinculados = dict(vinculados or {})
+    for concepto in (variable, *vinculados):
+        if concepto not in VARIABLES:
+            raise ValueError(f"No se puede despejar ni vincular '{concepto}' (use {', '.join(VARIABLES)})")
+    if variable in vinculados:
+        raise ValueError(f"'{variable}' no puede estar vinculada a sí misma")
+
+    metas = np.atleast_1d(np.asarray(metas, dtype=np.float64))
+    fijos = {concepto: np.atleast_1d(np.asarray(columnas.get(concepto, motor.VALORES_POR_DEFECTO[concepto]),
+                                                 dtype=np.float64))
+             for concepto in motor.CONCEPTOS_ENTRADA}
+    anos = None
+    if reglas is None and 'ano_gravable' in columnas:
+        anos = np.atleast_1d(np.asarray(columnas['ano_gravable'])).astype(np.int64)
+    por_fila = [metas, *fijos.values(), *([] if anos is None else [anos])]
+    n = max(len(valores) for valores in por_fila)
+    if any(len(valores) not in (1, n) for valores in por_fila):
+        raise ValueError("Las metas y las columnas deben tener una fila o el mismo número de filas")
+    metas = np.broadcast_to(metas, (n,)).copy()
+    fijos = {concepto: np.broadcast_to(valores, (n,)).copy() for concepto, valores in fijos.items()}
+    fijos[variable] = np.zeros(n)
+    pendientes = {variable: 1.0, **vinculados}
+
+    if anos is not None:
+        anos = np.broadcast_to(anos, (n,))
+        unicos = np.unique(anos)
+        if len(unicos) > 1:
+            return _resolver_por_ano(fijos, metas, pendientes, minimo, objetivo, anos, unicos)
+        if len(unicos) == 1:
+            reglas = cargar_paquete(int(unicos[0]))
+    return _resolver(fijos, metas, pendientes, minimo, objetivo, obtener_paquete(reglas))
+
+
+def _resolver_por_ano(fijos, metas, pendientes, minimo, objetivo, anos, unicos):
+    """Resuelve un lote con varios años gravables, un paquete por grupo."""
+    n = len(metas)
+    resultado = {'valor': np.empty(n), 'resuelto': np.empty(n, dtype=bool), 'logrado': np.empty(n),
+                 'tramos': np.empty(n, dtype=np.int64)}
+    for ano in unicos:
+        indices = np.flatnonzero(anos == ano)
+        parcial = _resolver({concepto: valores[indices] for concepto, valores in fijos.items()}, metas[indices],
+                            pendientes, minimo, objetivo, cargar_paquete(int(ano)))
+        for clave, valores in parcial.items():
+            resultado[clave][indices] = valores
+    return resultado
+
+
+def _resolver(fijos, metas, pendientes, minimo, objetivo, paquete):
+    """Recorrido por tramos de un lote con un único paquete de reglas (ver resolver_lote)."""
+    n = len(metas)
+
+    def puntos(indices, valor):
+        d = {concepto: valores[indices] for concepto, valores in fijos.items()}
+        for concepto, factor in pendientes.items():
+            d[concepto] = d[concepto] + factor * valor
+        return d
+
+    solucion = np.full(n, np.nan)
+    tramos = np.zeros(n, dtype=np.int64)
+    activos = np.arange(n)
+    valor = np.full(n, float(minimo))
+    signo_inicial = None
+    for _ in range(MAX_TRAMOS):
+        if not len(activos):
+            break
+        tramos[activos] += 1
+        actual, pendiente, distancia = _evaluar(puntos(activos, valor), pendientes, paquete, objetivo)
+        faltante = metas[activos] - actual
+        signo = np.sign(faltante)
+        if signo_inicial is None:
+            signo_inicial = signo
+        # La meta ya se alcanzó (o se pasó en un salto) en el inicio del tramo
+        alcanzada = (signo == 0) | (signo != signo_inicial)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            paso = np.where(pendiente != 0, faltante / pendiente, np.inf)
+        en_tramo = ~alcanzada & np.isfinite(paso) & (paso >= 0) & (paso <= distancia)
+        solucion[activos[alcanzada]] = valor[alcanzada]
+        solucion[activos[en_tramo]] = valor[en_tramo] + paso[en_tramo]
+        # Las demás saltan al próximo quiebre; sin quiebre adelante la meta no se alcanza
+        sigue = ~alcanzada & ~en_tramo & np.isfinite(distancia)
+        siguiente = valor + distancia
+        # Un quiebre a menos de un ulp: avanzar al siguiente número representable
+        siguiente = np.where(siguiente > valor, siguiente, np.nextafter(valor, np.inf))
+        activos, valor, signo_inicial = activos[sigue], siguiente[sigue], signo_inicial[sigue]
+
+    resuelto = ~np.isnan(solucion)
+    verificacion = puntos(np.arange(n), np.where(resuelto, solucion, minimo))
+    logrado = _valor_objetivo(motor.calcular_impuesto_renta_lote(verificacion, paquete), objetivo)
+    return {
+        'valor': solucion,
+        'resuelto': resuelto,
+        'logrado': np.where(resuelto, logrado, np.nan),
+        'tramos': tramos,
+    }
+
+
+def resolver(datos, objetivo, meta, variable='salarios', vinculados=None, minimo=0.0, reglas=None):
+    """
+    Un contribuyente y una meta (ver resolver_lote). Sin `reglas` se usa
+    el paquete de `datos['ano_gravable']`, si lo trae. Retorna {'valor',
+    'resuelto', 'logrado', 'tramos'} y, si se resolvió, `datos` con la
+    solución en 'datos'.
+    """
+    columnas = {concepto: np.array([float(datos.get(concepto, motor.VALORES_POR_DEFECTO[concepto]))])
+                for concepto in motor.CONCEPTOS_ENTRADA}
+    if reglas is None and datos.get('ano_gravable') is not None:
+        reglas = int(datos['ano_gravable'])
+    resultado = {clave: valores[0].item()
+                 for clave, valores in resolver_lote(columnas, objetivo, [meta], variable, vinculados,
+                                                     minimo, reglas).items()}
+    if resultado['resuelto']:
+        solucion = dict(datos)
+        solucion[variable] = resultado['valor']
+        for concepto, factor in (vinculados or {}).items():
+            solucion[concepto] = datos.get(concepto, 0) + factor * resultado['valor']
+        resultado['datos'] = solucion
+    else:
+        resultado['valor'] = math.nan
+    return resultado
@@ -0,0 +1,118 @@
+"""
+TABLAS DE CONSULTA PRECALCULADAS
+Personas Naturales Residentes Fiscales - Colombia
+
+Modo opcional para la ruta escalar (interfaz Tkinter y liquidación fila a
+fila): una función que en la práctica solo depende de una clave entera se
+precalcula para todas las claves entre 0 y un techo y se guarda en un
+`array('d')` compacto. Cada consulta es un acceso por índice; por encima
+del techo (o por debajo de 0) se usa la fórmula original.
+
+- Art. 241 en V3.py: `calcular_impuesto_241` redondea la base al entero
+  inferior de UVT, así que la clave es floor(base en UVT).
+- Art. 206 numeral 4 (cesantías): los límites de la tabla son UVT enteras
+  inclusivas por arriba, así que el porcentaje exento de x es el mismo
+  que el de ceil(x).
+"""
+
+import math
+from array import array
+from bisect import bisect_left
+
+from reglas_tributarias import obtener_paquete
+
+TECHO_IMPUESTO_241_UVT = 40000
+TECHO_CESANTIAS_UVT = 700
+
+
+class TablaConsulta:
+    """
+    Valores precalculados de `funcion` para las claves enteras 0..techo.
+
+    `clave` convierte el argumento a su clave entera (math.floor o
+    math.ceil); la función debe dar el mismo resultado para todos los
+    argumentos con la misma clave. `consultar` es una clausura con todo
+    ligado como variables locales, para que la consulta cueste un índice.
+    """
+
+    __slots__ = ('funcion', 'clave', 'techo', 'valores', 'consultar', '_aciertos', '_fallos')
+
+    def __init__(self, funcion, techo, clave=math.floor):
+        self.funcion = funcion
+        self.clave = clave
+        self.techo = int(techo)
+        self.valores = array('d', (funcion(k) for k in range(self.techo + 1)))
+        self._aciertos = [0]
+        self._fallos = [0]
+        self.consultar = self._crear_consulta()
+
+    def _crear_consulta(self):
+        funcion, clave, valores = self.funcion, self.clave, self.valores
+        aciertos, fallos = self._aciertos, self._fallos
+
+        def consultar(valor):
+            k = clave(valor)
+            if k >= 0:
+                try:
+                    resultado = valores[k]
+                except IndexError:
+                    pass
+                else:
+                    aciertos[0] += 1
+                    return resultado
+            fallos[0] += 1
+            return funcion(valor)
+
+        return consultar
+
+    def __call__(self, valor):
+        return self.consultar(valor)
+
+    @property
+    def aciertos(self):
+        return self._aciertos[0]
+
+    @property
+    def fallos(self):
+        return self._fallos[0]
+
+    def estadisticas(self):
+        """Contadores de aciertos y fallos de la tabla."""
+        consultas = self.aciertos + self.fallos
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            'techo': self.techo,
+            'bytes': self.valores.itemsize * len(self.valores),
+        }
+
+    def reiniciar_contadores(self):
+        self._aciertos[0] = 0
+        self._fallos[0] = 0
+
+
+def crear_tabla_impuesto_241(funcion_241, techo=TECHO_IMPUESTO_241_UVT):
+    """
+    Tabla del impuesto (en UVT) para bases enteras de UVT.
+    `funcion_241` es la fórmula que redondea la base al entero inferior,
+    p. ej. `CalculadoraRenta.calcular_impuesto_241_formula` de V3.py.
+    """
+    return TablaConsulta(funcion_241, techo, clave=math.floor)
+
+
+def crear_tabla_cesantias(reglas=None, techo=TECHO_CESANTIAS_UVT):
+    """
+    Tabla del porcentaje de cesantías exento (Art. 206 numeral 4) según el
+    ingreso mensual promedio en UVT, con los rangos del paquete de reglas.
+    """
+    paquete = obtener_paquete(reglas)
+    limites = paquete.limites_cesantias_uvt
+    porcentajes = paquete.porcentajes_cesantias
+    if any(limite != int(limite) for limite in limites):
+        raise ValueError("La tabla de cesantías requiere límites en UVT enteras.")
+
+    def porcentaje_exento(ingreso_uvt):
+        return porcentajes[bisect_left(limites, ingreso_uvt)]
+
+    return TablaConsulta(porcentaje_exento, techo, clave=math.ceil)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import aritmetica_entera
+import motor_vectorizado as motor
+import poblacion_sintetica
+
+CLAVES_PESOS = [clave for clave in motor.COLUMNAS_RESULTADO if clave != 'base_gravable_uvt']
+
+
+@pytest.mark.parametrize('formulario', [False, True])
+def test_enteros_coincide_con_decimal(formulario):
+    n = 400
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla=31)
+    enteros = aritmetica_entera.calcular_impuesto_renta_enteros(columnas, formulario=formulario)
+    for i in range(n):
+        datos = {concepto: columnas[concepto][i].item() for concepto in motor.CONCEPTOS_ENTRADA}
+        decimal = aritmetica_entera.liquidar_decimal(datos, formulario=formulario)
+        for clave in CLAVES_PESOS:
+            assert decimal[clave] == enteros[clave][i], (i, clave)
+
+
+def test_enteros_se_aparta_del_float_solo_por_redondeo():
+    columnas = poblacion_sintetica.generar_poblacion(400, semilla=31)
+    enteros = aritmetica_entera.calcular_impuesto_renta_enteros(columnas)
+    flotante = motor.calcular_impuesto_renta_lote(columnas)
+    assert enteros['impuesto_neto'].dtype == np.int64
+    # Un redondeo al peso por producto: la diferencia es de pesos, no de miles
+    assert np.abs(enteros['impuesto_neto'] - flotante['impuesto_neto']).max() <= 2
+
+
+def test_formulario_aproxima_casillas_a_miles():
+    columnas = poblacion_sintetica.generar_poblacion(200, semilla=5)
+    enteros = aritmetica_entera.calcular_impuesto_renta_enteros(columnas, formulario=True)
+    for clave, multiplo in aritmetica_entera.REDONDEO_CASILLAS.items():
+        assert not np.any(enteros[clave] % multiplo), clave
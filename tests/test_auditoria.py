@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import auditoria
+import motor_vectorizado as motor
+from reglas_tributarias import anos_disponibles, cargar_paquete
+
+ANOS = sorted(anos_disponibles())
+
+
+def _datos(**valores):
+    return dict(motor.VALORES_POR_DEFECTO, **valores)
+
+
+def _lote(casos, anos):
+    columnas = {concepto: np.array([datos[concepto] for datos in casos], dtype=np.float64)
+                for concepto in motor.CONCEPTOS_ENTRADA}
+    columnas['ano_gravable'] = np.array(anos)
+    return columnas, motor.calcular_impuesto_renta_lote(columnas)
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_tope_de_dependientes(ano):
+    paquete = cargar_paquete(ano)
+    maximo = int(paquete.limite_dependientes_uvt // paquete.deduccion_por_dependiente_uvt)
+    sin_tope = auditoria.auditar(_datos(salarios=120_000_000.0, num_dependientes=maximo), ano)
+    con_tope = auditoria.auditar(_datos(salarios=120_000_000.0, num_dependientes=maximo + 1), ano)
+    assert 'dependientes' not in sin_tope['limites']
+    assert 'dependientes' in con_tope['limites']
+    tope = paquete.limite_dependientes_uvt * paquete.uvt
+    assert con_tope['valores']['deduccion_dependientes'] == pytest.approx(tope)
+    assert f"{paquete.limite_dependientes_uvt:g} UVT" in con_tope['limites']['dependientes']
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_tope_de_la_renta_exenta_25(ano):
+    paquete = cargar_paquete(ano)
+    tope = paquete.limite_renta_exenta_25_uvt * paquete.uvt
+    for salarios in np.linspace(20e6, 400e6, 39):
+        explicacion = auditoria.auditar(_datos(salarios=salarios), ano)
+        valores = explicacion['valores']
+        sin_tope = valores['base_renta_exenta_25'] * paquete.porcentaje_renta_exenta_25
+        assert ('renta_exenta_25' in explicacion['limites']) == (sin_tope > tope), salarios
+        assert valores['renta_exenta_25'] == pytest.approx(min(sin_tope, tope)), salarios
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_limite_del_336_por_porcentaje_y_por_uvt(ano):
+    paquete = cargar_paquete(ano)
+    deducciones = dict(num_dependientes=20, medicina_prepagada=30_000_000.0, intereses_vivienda=90_000_000.0)
+
+    # Ingreso bajo: topa el 40% del ingreso neto, que queda por debajo de 1.340 UVT
+    porcentaje = auditoria.auditar(_datos(salarios=80_000_000.0, **deducciones), ano)
+    assert 'limite_336_porcentaje' in porcentaje['limites']
+    assert 'limite_336_uvt' not in porcentaje['limites']
+    valores = porcentaje['valores']
+    assert valores['depuracion_final'] == pytest.approx(valores['ingreso_neto'] * paquete.porcentaje_limite_general)
+
+    # Ingreso alto: topan las 1.340 UVT
+    uvt = auditoria.auditar(_datos(salarios=900_000_000.0, **deducciones), ano)
+    assert 'limite_336_uvt' in uvt['limites']
+    assert 'limite_336_porcentaje' not in uvt['limites']
+    assert uvt['valores']['depuracion_final'] == pytest.approx(paquete.limite_general_uvt * paquete.uvt)
+
+    # Sin deducciones no topa ninguno de los dos
+    libre = auditoria.auditar(_datos(salarios=80_000_000.0), ano)
+    assert not {'limite_336_porcentaje', 'limite_336_uvt'} & set(libre['limites'])
+
+
+def test_codigos_del_lote_usan_el_paquete_de_cada_ano():
+    # 13 dependientes topan en todos los años; 790 UVT del 25% dependen de la UVT del año
+    casos = [_datos(salarios=salarios, num_dependientes=13)
+             for salarios in (60e6, 150e6, 900e6) for _ in ANOS]
+    anos = [ano for _ in range(3) for ano in ANOS]
+    columnas, resultados = _lote(casos, anos)
+    codigos = auditoria.codigos_lote(columnas, resultados)
+    for i, (datos, ano) in enumerate(zip(casos, anos)):
+        individual = auditoria.auditar(datos, ano)
+        assert auditoria.nombres_limites(codigos['limites'][i]) == list(individual['limites'])
+        assert codigos['metodo_anticipo'][i] == individual['metodo_anticipo']
+        assert cargar_paquete(ano).inicio_241_uvt[codigos['rango_241'][i]] == individual['rango_241']['desde_uvt']
+    assert all(codigos['limites'] & auditoria.BITS['dependientes'])
+
+
+def test_traza_guardada_se_explica_igual(tmp_path):
+    casos = [_datos(salarios=salarios, num_dependientes=dependientes, ingreso_mensual_promedio=salarios / 12,
+                    cesantias=salarios / 12)
+             for salarios, dependientes in ((50e6, 0), (200e6, 14), (700e6, 3))]
+    columnas, resultados = _lote(casos, [2024, 2025, 2023])
+    traza = auditoria.TrazaAuditoria(valores=True)
+    traza.agregar(np.array([2, 5, 9]), ['1', '2', '3'], columnas, resultados)
+    ruta = tmp_path / 'traza.npz'
+    traza.guardar(ruta)
+    cargada = auditoria.cargar(ruta)
+    assert cargada['fila'].tolist() == [2, 5, 9]
+    for i, (datos, ano) in enumerate(zip(casos, [2024, 2025, 2023])):
+        explicacion = auditoria.explicar(cargada, i)
+        individual = auditoria.auditar(dict(datos, nit=str(i + 1)), ano)
+        assert explicacion['ano_gravable'] == ano
+        for clave in ('limites', 'rango_241', 'porcentaje_cesantias_exento', 'metodo_anticipo', 'nit'):
+            assert explicacion[clave] == individual[clave], clave
+        assert explicacion['valores'] == pytest.approx(individual['valores'])
+
+
+def test_auditando_restaura_la_traza_anterior():
+    assert auditoria.activa() is None
+    with auditoria.auditando() as traza:
+        assert auditoria.activa() is traza
+    assert auditoria.activa() is None
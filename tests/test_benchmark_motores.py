@@ -0,0 +1,27 @@
+import pytest
+
+import benchmark_motores
+
+
+def _reporte(n, decl_s, semilla=2024):
+    return {'n': n, 'semilla': semilla,
+            'resultados': {'motor/lote': {'filas': n, 'declaraciones_por_segundo': decl_s}}}
+
+
+def test_comparar_detecta_regresion_con_la_misma_poblacion():
+    assert benchmark_motores.comparar(_reporte(1000, 90.0), _reporte(1000, 100.0), 0.05)
+    assert not benchmark_motores.comparar(_reporte(1000, 98.0), _reporte(1000, 100.0), 0.05)
+
+
+@pytest.mark.parametrize('base', [_reporte(200000, 100.0), _reporte(1000, 100.0, semilla=1)])
+def test_comparar_rechaza_otra_poblacion(base):
+    with pytest.raises(ValueError, match='línea base'):
+        benchmark_motores.comparar(_reporte(1000, 100.0), base)
+
+
+def test_main_rechaza_otra_poblacion_antes_de_medir(tmp_path, monkeypatch):
+    ruta = tmp_path / 'base.json'
+    ruta.write_text('{"n": 200000, "semilla": 2024, "resultados": {}}')
+    monkeypatch.setattr(benchmark_motores, 'ejecutar', pytest.fail)
+    with pytest.raises(SystemExit):
+        benchmark_motores.main(['-n', '1000', '--comparar', str(ruta)])
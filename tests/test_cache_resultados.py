@@ -0,0 +1,23 @@
+import cache_resultados
+import motor_vectorizado as motor
+
+
+def test_clave_cambia_con_la_version_del_motor(monkeypatch):
+    registros = [{'salarios': '80.845.738', 'gmf': '0'}, {'salarios': '1000'}]
+    antes = cache_resultados.claves_de_registros(registros, [2024, 2024])
+    assert cache_resultados.claves_de_registros(registros, [2024, 2024]) == antes
+    monkeypatch.setattr(motor, 'VERSION_MOTOR', motor.VERSION_MOTOR + 1)
+    despues = cache_resultados.claves_de_registros(registros, [2024, 2024])
+    assert not set(antes) & set(despues)
+
+
+def test_clave_cambia_con_el_ano(tmp_path):
+    registros = [{'salarios': '80845738'}] * 2
+    claves = cache_resultados.claves_de_registros(registros, [2023, 2024])
+    assert claves[0] != claves[1]
+    cache = cache_resultados.CacheResultados(str(tmp_path / 'cache.sqlite'))
+    try:
+        cache.guardar([(claves[1], 'resultado')])
+        assert cache.buscar(claves) == {claves[1]: 'resultado'}
+    finally:
+        cache.cerrar()
@@ -0,0 +1,102 @@
+import pytest
+
+import certificados
+import motor_vectorizado as motor
+
+
+def _agregar(lista, **opciones):
+    agregador = certificados.AgregadorCertificados(2024, **opciones)
+    return {registro['nit']: registro for registro in agregador.agregar(iter(lista))}
+
+
+def _certificado(nit, desde, hasta, salarios, **otros):
+    return {'nit': nit, 'periodo_desde': desde, 'periodo_hasta': hasta, 'salarios': salarios, **otros}
+
+
+def test_promedio_de_quien_trabajo_de_enero_a_junio():
+    registro, = _agregar([_certificado('1', '2024-01-01', '2024-06-30', 30000000,
+                                       cesantias=2500000)]).values()
+    assert registro['ingreso_mensual_promedio'] == pytest.approx(5000000)
+
+    resultado = motor.calcular_impuesto_renta_lote(
+        {clave: [valor] for clave, valor in certificados.datos_de_registro(registro).items()
+         if clave in motor.CONCEPTOS_ENTRADA})
+    assert resultado['cesantias_exentas'][0] > 0
+
+
+def test_promedio_de_quien_entro_en_octubre():
+    registro, = _agregar([_certificado('1', '2024-10-01', '2024-12-31', 12000000)]).values()
+    assert registro['ingreso_mensual_promedio'] == pytest.approx(4000000)
+
+
+def test_promedio_con_mes_parcial():
+    # 1 de enero a 15 de junio: 5,5 meses trabajados
+    registro, = _agregar([_certificado('1', '2024-01-01', '2024-06-15', 11000000)]).values()
+    assert registro['ingreso_mensual_promedio'] == pytest.approx(2000000)
+
+
+def test_varios_empleadores_sucesivos_toma_los_ultimos_seis_meses():
+    registros = _agregar([
+        _certificado('1', '2024-01-01', '2024-06-30', 36000000, retenciones=100),
+        _certificado('1', '2024-07-01', '2024-12-31', 18000000, retenciones=50),
+    ])
+    registro = registros['1']
+    assert registro['num_certificados'] == 2
+    assert registro['salarios'] == 54000000
+    assert registro['retenciones'] == 150
+    assert registro['ingreso_mensual_promedio'] == pytest.approx(3000000)
+
+
+def test_varios_empleadores_simultaneos_suman_en_el_mes():
+    registro, = _agregar([
+        _certificado('1', None, None, 24000000),
+        _certificado('1', '2024-10-01', '2024-12-31', 3000000),
+    ]).values()
+    # Año completo repartido por días: 184 de 366 días caen de julio a diciembre
+    assert registro['ingreso_mensual_promedio'] == pytest.approx((24000000 * 184 / 366 + 3000000) / 6)
+
+
+def test_promedio_certificado_cuenta_por_los_meses_que_cubre():
+    registro, = _agregar([
+        _certificado('1', '2024-01-01', '2024-09-30', 27000000, ingreso_mensual_promedio=3500000),
+    ]).values()
+    assert registro['ingreso_mensual_promedio'] == pytest.approx(3500000)
+
+
+def test_agregacion_con_volcados_a_disco_es_igual(tmp_path):
+    lista = [_certificado(str(i % 7), f'2024-{1 + i % 12:02d}-01', '2024-12-31', 1000000 * (i + 1))
+             for i in range(40)]
+    en_memoria = _agregar(lista)
+    con_volcados = _agregar(lista, max_en_memoria=2, directorio=str(tmp_path))
+    assert con_volcados.keys() == en_memoria.keys()
+    for nit, registro in en_memoria.items():
+        assert con_volcados[nit]['salarios'] == registro['salarios']
+        assert con_volcados[nit]['ingreso_mensual_promedio'] == pytest.approx(registro['ingreso_mensual_promedio'])
+
+
+def _comparar_con_memoria(lista, **opciones):
+    en_memoria = _agregar(lista)
+    agregador = certificados.AgregadorCertificados(2024, **opciones)
+    con_volcados = {registro['nit']: registro for registro in agregador.agregar(iter(lista))}
+    assert agregador.volcados
+    assert con_volcados == en_memoria
+
+
+@pytest.mark.parametrize('max_en_memoria', [7, 50])
+def test_particiones_que_no_caben_se_reparten_de_nuevo(tmp_path, max_en_memoria):
+    # 500 NIT con pocos por tabla: varias particiones necesitan más de un nivel
+    lista = [_certificado(str(900000 + i % 500), f'2024-{1 + i % 12:02d}-01', '2024-12-31', 1000 * (i + 1),
+                          retenciones=i)
+             for i in range(1500)]
+    _comparar_con_memoria(lista, max_en_memoria=max_en_memoria, directorio=str(tmp_path))
+
+
+def test_agrega_en_memoria_pasado_el_ultimo_nivel(tmp_path, monkeypatch):
+    monkeypatch.setattr(certificados, 'MAX_NIVELES', 1)
+    lista = [_certificado(str(i % 300), None, None, 1000 * (i + 1)) for i in range(900)]
+    _comparar_con_memoria(lista, max_en_memoria=3, directorio=str(tmp_path))
+
+
+def test_periodo_invertido():
+    with pytest.raises(ValueError, match='Certificado 1'):
+        _agregar([_certificado('1', '2024-06-30', '2024-01-01', 1)])
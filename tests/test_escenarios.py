@@ -0,0 +1,61 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import escenarios
+import motor_vectorizado as motor
+from reglas_tributarias import anos_disponibles
+
+ANOS = sorted(anos_disponibles())
+
+
+def _contribuyentes():
+    for salarios, pension, medicina in itertools.product([45e6, 90e6, 180e6, 400e6, 900e6], [0.0, 12e6], [0.0, 6e6]):
+        yield dict(motor.VALORES_POR_DEFECTO, salarios=salarios, pension_voluntaria=pension,
+                   medicina_prepagada=medicina, incr_salud=0.04 * salarios, incr_pensiones=0.04 * salarios)
+
+
+def _impuestos(datos, aportes, ano):
+    """Impuesto con cada aporte adicional (en AFC), por fuerza bruta con barrido."""
+    return escenarios.barrido(datos, {'afc': datos['afc'] + np.asarray(aportes)}, ano)['impuesto_neto']
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_aporte_optimo_coincide_con_la_fuerza_bruta(ano):
+    for datos in _contribuyentes():
+        optimo = escenarios.aporte_optimo(datos, reglas=ano)
+        aportes = np.linspace(0, 0.5 * datos['salarios'], 2001)
+        paso = aportes[1]
+        impuestos = _impuestos(datos, aportes, ano)
+
+        # Ningún aporte de la malla paga menos impuesto que el óptimo...
+        assert impuestos.min() == pytest.approx(optimo['impuesto_optimo'], abs=1e-6)
+        assert _impuestos(datos, [optimo['aporte_optimo']], ano)[0] == pytest.approx(optimo['impuesto_optimo'])
+        # ...y el primero que lo alcanza está a menos de un paso por encima
+        primero = aportes[np.argmax(impuestos <= optimo['impuesto_optimo'] + 1e-6)]
+        assert optimo['aporte_optimo'] <= primero < optimo['aporte_optimo'] + paso
+        assert optimo['ahorro'] == pytest.approx(impuestos[0] - optimo['impuesto_optimo'])
+
+
+@pytest.mark.parametrize('tasa_minima', [0.19, 0.28, 0.33])
+def test_tasa_minima_contra_la_fuerza_bruta(tasa_minima):
+    for datos in _contribuyentes():
+        aporte = escenarios.aporte_optimo(datos, tasa_minima, 2024)['aporte_optimo']
+        delta = 0.01 * datos['salarios']
+        antes, en, despues = _impuestos(datos, [max(aporte - delta, 0.0), aporte, aporte + delta], 2024)
+        # Después del óptimo cada peso ahorra menos que la tasa mínima; antes, al menos esa tasa
+        assert (en - despues) / delta < tasa_minima
+        if aporte >= delta:
+            assert (antes - en) / delta >= tasa_minima - 1e-9
+
+
+def test_lote_coincide_con_el_individual():
+    casos = list(_contribuyentes())
+    columnas = {concepto: np.array([datos[concepto] for datos in casos], dtype=np.float64)
+                for concepto in motor.CONCEPTOS_ENTRADA}
+    lote = escenarios.aporte_optimo_lote(columnas)
+    for i, datos in enumerate(casos):
+        individual = escenarios.aporte_optimo(datos)
+        for clave, valores in lote.items():
+            assert valores[i] == pytest.approx(individual[clave])
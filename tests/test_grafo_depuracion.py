@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import grafo_depuracion
+import motor_vectorizado as motor
+import nucleo_renta
+import poblacion_sintetica
+from reglas_tributarias import anos_disponibles, cargar_paquete
+
+ANOS = sorted(anos_disponibles())
+
+
+def _casos(n, semilla, ano):
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla=semilla, reglas=ano)
+    listas = {concepto: columnas[concepto].tolist() for concepto in motor.CONCEPTOS_ENTRADA}
+    return [{concepto: listas[concepto][i] for concepto in motor.CONCEPTOS_ENTRADA} for i in range(n)]
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_grafo_coincide_con_la_liquidacion_completa(ano):
+    for datos in _casos(300, ano, ano):
+        assert grafo_depuracion.liquidar(datos, ano) == nucleo_renta.calcular_impuesto_renta(datos, reglas=ano)
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_bordes_de_las_tablas(ano):
+    paquete = cargar_paquete(ano)
+    base = dict(motor.VALORES_POR_DEFECTO, salarios=60_000_000.0, cesantias=6_000_000.0)
+    for limite in paquete.limites_cesantias_uvt:
+        datos = dict(base, ingreso_mensual_promedio=limite * paquete.uvt)
+        assert grafo_depuracion.liquidar(datos, ano) == nucleo_renta.calcular_impuesto_renta(datos, reglas=ano)
+    for limite in paquete.limites_241_uvt:
+        datos = dict(motor.VALORES_POR_DEFECTO, gmf=0.0, salarios=limite * paquete.uvt)
+        assert grafo_depuracion.liquidar(datos, ano) == nucleo_renta.calcular_impuesto_renta(datos, reglas=ano)
+
+
+def test_recalculo_incremental_coincide_con_la_liquidacion_completa():
+    azar = random.Random(7)
+    otros = _casos(200, 11, 2024)
+    datos = dict(otros[0])
+    caso = grafo_depuracion.CasoDepuracion(datos)
+    assert caso.resultados() == nucleo_renta.calcular_impuesto_renta(datos)
+    for otro in otros[1:]:
+        cambios = {concepto: otro[concepto]
+                   for concepto in azar.sample(motor.CONCEPTOS_ENTRADA, azar.randint(1, 3))}
+        datos.update(cambios)
+        caso.actualizar(cambios)
+        assert caso.resultados() == nucleo_renta.calcular_impuesto_renta(datos)
+
+
+def test_solo_se_evaluan_los_pasos_afectados():
+    datos = _casos(1, 3, 2024)[0]
+    caso = grafo_depuracion.CasoDepuracion(datos)
+    caso.resultados()
+    completas = caso.evaluaciones
+    assert completas == len(grafo_depuracion.DEPURACION.pasos)
+
+    caso.actualizar(saldo_favor_anterior=datos['saldo_favor_anterior'] + 1_000_000)
+    assert caso.pendientes == {'saldo_sin_anticipo'}
+    caso.resultados()
+    assert caso.evaluaciones - completas <= 4
+    datos['saldo_favor_anterior'] += 1_000_000
+    assert caso.resultados() == nucleo_renta.calcular_impuesto_renta(datos)
+
+
+def test_cambiar_reglas_recalcula_con_el_paquete_nuevo():
+    datos = _casos(1, 5, 2024)[0]
+    caso = grafo_depuracion.CasoDepuracion(datos, 2024)
+    caso.resultados()
+    for ano in ANOS:
+        caso.cambiar_reglas(ano)
+        assert caso.resultados() == nucleo_renta.calcular_impuesto_renta(datos, reglas=ano)
@@ -0,0 +1,133 @@
+import csv
+
+import pytest
+
+import historial
+import lote_renta
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    with historial.HistorialDeclaraciones(str(tmp_path / 'historial.sqlite')) as almacen:
+        almacen.guardar([
+            ('900123456', 2021, 1_000_000.0, 0.0, 300_000.0),
+            ('900123456', 2022, 2_000_000.0, 0.0, 600_000.0),
+            ('900123456', 2023, 3_000_000.0, 150_000.0, 900_000.0),
+            ('800', 2020, 500_000.0, 0.0, 100_000.0),
+            ('', 2023, 9.0, 9.0, 9.0),
+        ])
+        yield almacen
+
+
+def _vacios(**valores):
+    return dict({concepto: '' for concepto in historial.CONCEPTOS_HISTORIAL}, **valores)
+
+
+def test_completar_con_el_ano_anterior(almacen):
+    registros = [
+        _vacios(nit='900.123.456'),                         # 2023 en el historial
+        _vacios(nit='800'),                                 # sin 2023, con un año previo
+        _vacios(nit='900123456', impuesto_neto_anterior='5000', anticipo_anterior=None),
+        _vacios(nit=''),                                    # sin NIT: no se consulta
+        _vacios(nit='111'),                                 # NIT desconocido
+        dict(nit='900123456', impuesto_neto_anterior=1, saldo_favor_anterior=2, anticipo_anterior=3,
+             num_anos_declarando=4),                        # completo: no se consulta
+        _vacios(nit='900123456'),                           # año 2022: toma 2021
+    ]
+    anos = [2024] * 6 + [2022]
+    assert almacen.completar(registros, anos) == 4
+    assert almacen.completados == 4
+
+    assert registros[0] == dict(nit='900.123.456', impuesto_neto_anterior=3_000_000.0,
+                                saldo_favor_anterior=150_000.0, anticipo_anterior=900_000.0,
+                                num_anos_declarando=4)
+    assert registros[1] == _vacios(nit='800', num_anos_declarando=2)
+    assert registros[2] == dict(nit='900123456', impuesto_neto_anterior='5000', saldo_favor_anterior=150_000.0,
+                                anticipo_anterior=900_000.0, num_anos_declarando=4)
+    assert registros[3] == _vacios(nit='')
+    assert registros[4] == _vacios(nit='111', num_anos_declarando=1)
+    assert registros[5] == dict(nit='900123456', impuesto_neto_anterior=1, saldo_favor_anterior=2,
+                                anticipo_anterior=3, num_anos_declarando=4)
+    assert registros[6] == dict(nit='900123456', impuesto_neto_anterior=1_000_000.0, saldo_favor_anterior=0.0,
+                                anticipo_anterior=300_000.0, num_anos_declarando=2)
+
+
+def test_completar_sin_nada_que_consultar(almacen):
+    assert almacen.completar([], []) == 0
+    assert almacen.completar([_vacios(nit=None)], [2024]) == 0
+
+
+def test_guardar_reemplaza_el_mismo_ano(almacen):
+    almacen.guardar([('900123456', 2023, 7.0, 8.0, 9.0)])
+    assert almacen.declaraciones('900.123.456') == [
+        {'ano_gravable': 2021, 'impuesto_neto': 1_000_000.0, 'saldo_favor': 0.0, 'anticipo_siguiente': 300_000.0},
+        {'ano_gravable': 2022, 'impuesto_neto': 2_000_000.0, 'saldo_favor': 0.0, 'anticipo_siguiente': 600_000.0},
+        {'ano_gravable': 2023, 'impuesto_neto': 7.0, 'saldo_favor': 8.0, 'anticipo_siguiente': 9.0},
+    ]
+    assert almacen.declaraciones('') == []
+
+
+def _fila_salida(**valores):
+    fila = dict.fromkeys(historial._COLUMNAS_SALIDA, '0')
+    fila.update(valores)
+    return [fila[columna] for columna in historial._COLUMNAS_SALIDA]
+
+
+def test_filas_de_resultados():
+    filas = [
+        list(historial._COLUMNAS_SALIDA),
+        _fila_salida(nit='900.123.456', nombre='Ana', ano_gravable='2024', impuesto_neto='1500',
+                     anticipo_definitivo='300', es_saldo_favor='NO', valor_final='1800'),
+        _fila_salida(nit='', nombre='Sin NIT', ano_gravable='2024', impuesto_neto='10'),
+        _fila_salida(nit='800', nombre='Luis', ano_gravable='2023', impuesto_neto='0',
+                     anticipo_definitivo='0', es_saldo_favor='SI', valor_final='250'),
+    ]
+    assert list(historial.filas_de_resultados(filas)) == [
+        ('900123456', 2024, 1500.0, 0.0, 300.0),
+        ('800', 2023, 0.0, 250.0, 0.0),
+    ]
+
+
+@pytest.mark.parametrize('nits, esperados', [
+    (['900123456', '', '800'], ['900123456', '', '800']),
+    (['900.123.456-7', ' 800 ', 'a\nb'], ['9001234567', '800', 'ab']),
+    ([900123456, 800], ['900123456', '800']),
+    ([900123456.0, None, '1.000'], ['900123456', '', '1000']),
+])
+def test_normalizar_nits(nits, esperados):
+    assert historial.normalizar_nits(nits) == esperados
+    assert [historial.normalizar_nit(nit) for nit in nits] == esperados
+
+
+def _liquidar(tmp_path, nombre, texto, *opciones):
+    entrada = tmp_path / f'{nombre}.csv'
+    entrada.write_text(texto, encoding='utf-8')
+    salida = tmp_path / f'{nombre}_resultados.csv'
+    lote_renta.main([str(entrada), '-o', str(salida), *opciones])
+    with open(salida, newline='', encoding='utf-8') as archivo:
+        return list(csv.DictReader(archivo))
+
+
+def test_corridas_consecutivas_con_historial(tmp_path):
+    ruta = str(tmp_path / 'historial.sqlite')
+    anterior = _liquidar(tmp_path, '2023', 'NIT,NOMBRE,SALARIOS,RETENCIONES,ANO GRAVABLE\n'
+                                           '900.123.456,Ana,400000000,0,2023\n'
+                                           '800,Luis,90000000,50000000,2023\n',
+                         '--historial', ruta)
+    actual = _liquidar(tmp_path, '2024', 'NIT,NOMBRE,SALARIOS,ANO GRAVABLE\n'
+                                         '900123456,Ana,420000000,2024\n'
+                                         '800,Luis,95000000,2024\n',
+                       '--historial', ruta)
+
+    # Lo mismo, escribiendo a mano los conceptos del año anterior
+    filas = ['nit,nombre,salarios,ano_gravable,impuesto_neto_anterior,saldo_favor_anterior,anticipo_anterior,'
+             'num_anos_declarando']
+    for fila, salarios in zip(anterior, (420000000, 95000000)):
+        saldo = fila['valor_final'] if fila['es_saldo_favor'] == 'SI' else '0'
+        filas.append(f"{fila['nit']},{fila['nombre']},{salarios},2024,{fila['impuesto_neto']},{saldo},"
+                     f"{fila['anticipo_definitivo']},2")
+    manual = _liquidar(tmp_path, 'manual', '\n'.join(filas) + '\n')
+    assert actual == [dict(fila, nit=nit) for fila, nit in zip(manual, ('900123456', '800'))]
+
+    with historial.HistorialDeclaraciones(ruta) as almacen:
+        assert [d['ano_gravable'] for d in almacen.declaraciones('900123456')] == [2023, 2024]
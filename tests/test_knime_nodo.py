@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+import knime_nodo
+import motor_vectorizado as motor
+import poblacion_sintetica
+
+
+def _poblacion(n=40):
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla=23)
+    columnas['ano_gravable'] = np.array([(2023, 2024, 2025)[i % 3] for i in range(n)])
+    return columnas
+
+
+def _comparar(salida, esperado):
+    for clave in motor.COLUMNAS_RESULTADO:
+        np.testing.assert_allclose(np.asarray(salida[clave], dtype=np.float64),
+                                   np.asarray(esperado[clave], dtype=np.float64), rtol=1e-12, err_msg=clave)
+
+
+def test_dict_de_arreglos_coincide_con_el_motor():
+    columnas = _poblacion()
+    tabla = {'NIT': np.arange(40), **columnas}
+    salida = knime_nodo.liquidar_tabla(tabla)
+    assert list(salida) == ['NIT', *columnas, *motor.COLUMNAS_RESULTADO]
+    assert salida['NIT'] is tabla['NIT']
+    _comparar(salida, motor.calcular_impuesto_renta_lote(columnas))
+
+
+def test_encabezados_de_plantilla_y_texto():
+    tabla = {
+        'Nombres y apellido del contribuyente': ['Ana', 'Luis', 'Eva'],
+        'SALARIOS': ['$ 80.845.738', 95_000_000, None],
+        'Número de dependientes del empleado': np.array([0, 2, 1]),
+        'AÑO GRAVABLE': [2023, None, 2025],
+        'impuesto_neto': ['se reemplaza'] * 3,
+    }
+    salida = knime_nodo.liquidar_tabla(tabla, ano_gravable=2024)
+    assert list(salida)[:4] == list(tabla)[:4]
+    columnas = {'salarios': np.array([80_845_738.0, 95_000_000.0, 0.0]),
+                'num_dependientes': np.array([0.0, 2.0, 1.0]), 'ano_gravable': np.array([2023, 2024, 2025])}
+    _comparar(salida, motor.calcular_impuesto_renta_lote(columnas))
+
+    solo = knime_nodo.liquidar_tabla(tabla, ano_gravable=2024, solo_resultados=True)
+    assert list(solo) == list(motor.COLUMNAS_RESULTADO)
+
+
+def test_columnas_de_tabla_sin_conceptos():
+    columnas = knime_nodo.columnas_de_tabla({'NIT': ['1', '2']}, ano_gravable=2023)
+    assert columnas['salarios'].tolist() == [0.0, 0.0]
+    assert columnas['ano_gravable'].tolist() == [2023, 2023]
+    assert knime_nodo.columnas_de_tabla({})['ano_gravable'].tolist() == []
+
+
+def test_errores_de_la_tabla():
+    with pytest.raises(ValueError, match=r"Contribuyente 2: valor no numérico en 'salarios': '1\.23\.456'"):
+        knime_nodo.liquidar_tabla({'SALARIOS': ['1.000', '1.23.456']})
+    with pytest.raises(ValueError, match="repite el concepto 'salarios'"):
+        knime_nodo.liquidar_tabla({'SALARIOS': [1.0], 'salarios': [2.0]})
+    with pytest.raises(TypeError, match='list'):
+        knime_nodo.liquidar_tabla([[1.0]])
+
+
+def test_liquidar_lotes():
+    columnas = _poblacion(30)
+
+    class LoteKnime:
+        def __init__(self, tabla):
+            self.tabla = tabla
+
+        def to_pyarrow(self):
+            return self.tabla
+
+    lotes = [{c: v[:10] for c, v in columnas.items()}, LoteKnime({c: v[10:] for c, v in columnas.items()})]
+    salidas = list(knime_nodo.liquidar_lotes(lotes, solo_resultados=True))
+    unidas = {clave: np.concatenate([salida[clave] for salida in salidas]) for clave in motor.COLUMNAS_RESULTADO}
+    _comparar(unidas, motor.calcular_impuesto_renta_lote(columnas))
+
+
+# --- ARROW ---
+
+def test_tabla_arrow_coincide_con_el_motor():
+    pa = pytest.importorskip('pyarrow')
+    columnas = _poblacion()
+    arreglos = {clave: pa.array(valores) for clave, valores in columnas.items()}
+    arreglos['num_dependientes'] = pa.array(columnas['num_dependientes'].astype(np.int64))
+    arreglos['gmf'] = pa.array([None if i % 4 == 0 else valor for i, valor in enumerate(columnas['gmf'].tolist())])
+    arreglos['salarios'] = pa.chunked_array([pa.array(columnas['salarios'][:15]),
+                                              pa.array(columnas['salarios'][15:])])
+    arreglos['afc'] = pa.array([f"$ {valor:,.0f}".replace(',', '.') for valor in columnas['afc']])
+    tabla = pa.table(arreglos)
+
+    salida = knime_nodo.liquidar_tabla(tabla)
+    assert isinstance(salida, pa.Table)
+    assert salida.schema.names == [*columnas, *motor.COLUMNAS_RESULTADO]
+    esperado = dict(columnas, gmf=np.where(np.arange(40) % 4 == 0, 0.0, columnas['gmf']),
+                    afc=np.round(columnas['afc']))
+    _comparar({clave: salida.column(clave).to_numpy() for clave in motor.COLUMNAS_RESULTADO},
+              motor.calcular_impuesto_renta_lote(esperado))
+
+
+def test_record_batch_y_archivos(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pytest.importorskip('pyarrow.parquet')
+    columnas = _poblacion(12)
+    lote = pa.RecordBatch.from_pydict(columnas)
+    salida = knime_nodo.liquidar_tabla(lote, solo_resultados=True)
+    assert isinstance(salida, pa.RecordBatch)
+    assert salida.schema.names == list(motor.COLUMNAS_RESULTADO)
+
+    entrada = tmp_path / 'entrada.parquet'
+    knime_nodo.escribir_tabla(pa.table(columnas), str(entrada))
+    knime_nodo.main([str(entrada), str(tmp_path / 'salida.arrow')])
+    leida = knime_nodo.leer_tabla(str(tmp_path / 'salida.arrow'))
+    _comparar({clave: leida.column(clave).to_numpy() for clave in motor.COLUMNAS_RESULTADO},
+              motor.calcular_impuesto_renta_lote(columnas))
+
+
+def test_dataframe_de_pandas():
+    pd = pytest.importorskip('pandas')
+    columnas = _poblacion(20)
+    tabla = pd.DataFrame({'NIT': [str(i) for i in range(20)], **columnas})
+    salida = knime_nodo.liquidar_tabla(tabla)
+    assert isinstance(salida, pd.DataFrame)
+    assert list(salida.columns) == ['NIT', *columnas, *motor.COLUMNAS_RESULTADO]
+    _comparar({clave: salida[clave].to_numpy() for clave in motor.COLUMNAS_RESULTADO},
+              motor.calcular_impuesto_renta_lote(columnas))
@@ -0,0 +1,174 @@
+import zipfile
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import lector_xlsx
+
+openpyxl = pytest.importorskip('openpyxl')
+
+ESPACIO = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+
+def _libro(ruta, hoja=None, cadenas=None):
+    """Libro de openpyxl con el XML de la hoja (y de las cadenas compartidas) reemplazado."""
+    base = ruta.with_name('base_' + ruta.name)
+    libro = openpyxl.Workbook()
+    libro.active['A1'] = 'x'
+    libro.save(base)
+    with zipfile.ZipFile(base) as origen, zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED) as destino:
+        for info in origen.infolist():
+            datos = origen.read(info.filename)
+            if info.filename == 'xl/worksheets/sheet1.xml' and hoja is not None:
+                datos = hoja.encode('utf-8')
+            if cadenas is not None:
+                if info.filename == '[Content_Types].xml' and b'sharedStrings' not in datos:
+                    datos = datos.replace(b'</Types>', (
+                        b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                        b'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>'))
+                if info.filename == 'xl/_rels/workbook.xml.rels' and b'sharedStrings' not in datos:
+                    datos = datos.replace(b'</Relationships>', (
+                        b'<Relationship Id="rIdCadenas" Type="http://schemas.openxmlformats.org/'
+                        b'officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+                        b'</Relationships>'))
+                if info.filename == 'xl/sharedStrings.xml':
+                    continue
+            destino.writestr(info, datos)
+        if cadenas is not None:
+            destino.writestr('xl/sharedStrings.xml', cadenas.encode('utf-8'))
+    return ruta
+
+
+def _filas_openpyxl(ruta, hoja=0):
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        return [tuple(fila) for fila in libro.worksheets[hoja].iter_rows(values_only=True)]
+    finally:
+        libro.close()
+
+
+def _comparar(ruta, hoja=0):
+    esperado = _filas_openpyxl(ruta, hoja)
+    obtenido = list(lector_xlsx.leer_filas(ruta, hoja))
+    assert obtenido == esperado
+    for fila_esperada, fila_obtenida in zip(esperado, obtenido):
+        assert [type(celda) for celda in fila_obtenida] == [type(celda) for celda in fila_esperada]
+    return obtenido
+
+
+def test_xml_con_sangria_y_saltos_de_linea(tmp_path):
+    hoja = f"""<?xml version="1.0" encoding="UTF-8"?>
+<worksheet xmlns="{ESPACIO}">
+  <dimension ref="A1:B2"/>
+  <sheetData>
+    <row r="1">
+      <c r="A1" t="s">
+        <v>0</v>
+      </c>
+      <c r="B1" t="s">
+        <v>1</v>
+      </c>
+    </row>
+    <row r="2">
+      <c r="A2">
+        <v>100000000</v>
+      </c>
+      <c r="B2" t="n">
+        <v>500000</v>
+      </c>
+    </row>
+  </sheetData>
+</worksheet>
+"""
+    cadenas = f"""<?xml version="1.0" encoding="UTF-8"?>
+<sst xmlns="{ESPACIO}" count="2" uniqueCount="2">
+  <si>
+    <t>SALARIOS</t>
+  </si>
+  <si>
+    <t>GMF</t>
+  </si>
+</sst>
+"""
+    ruta = _libro(tmp_path / 'sangria.xlsx', hoja, cadenas)
+    assert _comparar(ruta) == [('SALARIOS', 'GMF'), (100000000, 500000)]
+
+
+def test_atributos_con_comilla_simple_y_prefijo(tmp_path):
+    hoja = (f"<?xml version='1.0' encoding='UTF-8'?><x:worksheet xmlns:x='{ESPACIO}'>"
+            "<x:dimension ref='A1:E3'/><x:sheetData>"
+            "<x:row r='1'><x:c r='A1' t='inlineStr'><x:is><x:t>SALARIOS</x:t></x:is></x:c>"
+            "<x:c r='B1' t='inlineStr'><x:is><x:r><x:t xml:space='preserve'>a &amp; </x:t></x:r>"
+            "<x:r><x:t>b</x:t></x:r></x:is></x:c></x:row>"
+            "<x:row r='3'><x:c r='A3' t='str'><x:f>B1</x:f><x:v>SAL &lt;</x:v></x:c>"
+            "<x:c t='e' r='B3'><x:v>#N/A</x:v></x:c><x:c r='C3' t='b'><x:v>0</x:v></x:c>"
+            "<x:c s='0' r='D3'><x:v>1.5E3</x:v></x:c><x:c r='E3'><x:v/></x:c></x:row>"
+            "</x:sheetData></x:worksheet>")
+    ruta = _libro(tmp_path / 'comillas.xlsx', hoja)
+    filas = _comparar(ruta)
+    assert filas[2] == ('SAL <', '#N/A', False, 1500.0, None)
+
+
+def test_cadenas_con_tramos_y_guia_fonetica(tmp_path):
+    hoja = (f'<worksheet xmlns="{ESPACIO}"><sheetData><row r="1">'
+            '<c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row></sheetData></worksheet>')
+    cadenas = (f'<sst xmlns="{ESPACIO}"><si><r><t>Pé</t></r><r><rPr><b/></rPr><t>rez</t></r></si>'
+               '<si><t>山田</t><rPh sb="0" eb="2"><t>ヤマダ</t></rPh></si></sst>')
+    ruta = _libro(tmp_path / 'tramos.xlsx', hoja, cadenas)
+    assert _comparar(ruta) == [('Pérez', '山田')]
+
+
+@pytest.mark.parametrize('epoca', [None, 'mac'])
+def test_tipos_como_openpyxl(tmp_path, epoca):
+    libro = openpyxl.Workbook()
+    if epoca:
+        libro.epoch = openpyxl.utils.datetime.CALENDAR_MAC_1904
+    hoja = libro.active
+    hoja.append(['SALARIOS', 'Fecha', 'hora', 'bool', 'texto & <x>', None, 'ñandú'])
+    hoja.append([1.5, datetime(2024, 3, 1, 12, 30), time(8, 15), True, 'a&b "c"', 3, 10 ** 15])
+    hoja['C5'] = date(1900, 2, 1)
+    hoja['A6'] = '=1+2'
+    hoja['D8'] = timedelta(hours=30)
+    hoja['D8'].number_format = '[h]:mm:ss'
+    hoja['E9'], hoja['F9'], hoja['G9'] = 1e-7, -4, ' espacios  '
+    libro.create_sheet('Segunda')['B2'] = 'hola'
+    ruta = tmp_path / 'tipos.xlsx'
+    libro.save(ruta)
+    _comparar(ruta)
+    _comparar(ruta, 1)
+    assert list(lector_xlsx.leer_filas(ruta, 'Segunda')) == [(None, None), (None, 'hola')]
+
+
+def test_cadenas_compartidas_en_disco(tmp_path):
+    textos = [f'Nombre {i} & Cía' for i in range(50)]
+    cadenas = f'<sst xmlns="{ESPACIO}">' + ''.join(
+        f'<si><t>{t.replace("&", "&amp;")}</t></si>' for t in textos) + '</sst>'
+    ruta = _libro(tmp_path / 'disco.xlsx', None, cadenas)
+    with zipfile.ZipFile(ruta) as libro:
+        tabla = lector_xlsx.CadenasCompartidas(libro, max_en_memoria=10)
+        try:
+            assert tabla.en_disco == 40
+            assert [tabla[i] for i in range(len(tabla))] == textos
+            with pytest.raises(IndexError):
+                tabla[50]
+        finally:
+            tabla.cerrar()
+
+
+def test_leer_bloques_mapea_encabezados(tmp_path):
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.append(['NUMERO DE IDENTIFICACION TRIBUTARIA', 'SALARIOS', 'INCR PENSIONES', 'GMF', 'OTRA'])
+    hoja.append(['900', 100000000, 4000000, None, 'x'])
+    hoja.append([])
+    hoja.append(['901', '80845738', 0, 120000, 'y'])
+    ruta = tmp_path / 'bloques.xlsx'
+    libro.save(ruta)
+
+    (inicio, identificacion, columnas), = lector_xlsx.leer_bloques(ruta, ano_gravable=2024)
+    assert inicio == 1
+    assert [nit for nit, _ in identificacion] == ['900', '901']
+    assert columnas['salarios'].tolist() == [100000000.0, 80845738.0]
+    assert columnas['incr_pensiones'].tolist() == [4000000.0, 0.0]
+    assert columnas['gmf'].tolist() == [0.0, 120000.0]
+    assert columnas['ano_gravable'].tolist() == [2024, 2024]
@@ -0,0 +1,59 @@
+import csv
+
+import pytest
+
+import lote_renta
+
+
+@pytest.mark.parametrize('celda, esperado', [
+    ('845.738', 845738),
+    ('80.845.738', 80845738),
+    ('$ 80.845.738', 80845738),
+    ('80,845,738', 80845738),
+    ('-1.000', -1000),
+    ('1.234,56', 1234.56),
+    ('1,234.56', 1234.56),
+    ('1234,5', 1234.5),
+    ('0.125', 0.125),
+    ('80845738', 80845738),
+    ('1.5e6', 1500000),
+    (' ', None),
+    (None, None),
+    (12.5, 12.5),
+])
+def test_convertir_valor(celda, esperado):
+    assert lote_renta.convertir_valor(celda) == esperado
+
+
+@pytest.mark.parametrize('celda', ['1.23.456', '1.234.56', '1234.567', '1,2.3', '1.234,567,8', 'abc', 'nan', '.5'])
+def test_convertir_valor_rechaza_textos_ambiguos(celda):
+    with pytest.raises(ValueError, match=repr(celda).replace('.', r'\.')):
+        lote_renta.convertir_valor(celda)
+
+
+@pytest.mark.parametrize('celda', [float('nan'), float('inf'), -float('inf'), 10 ** 400])
+def test_convertir_valor_rechaza_numeros_no_finitos(celda):
+    with pytest.raises(ValueError, match='finito'):
+        lote_renta.convertir_valor(celda)
+
+
+@pytest.mark.parametrize('opciones', [[], ['--procesos', '2'], ['--cache', 'cache.sqlite']])
+def test_celdas_invalidas_se_reportan_por_fila(tmp_path, capfd, opciones):
+    entrada = tmp_path / 'entrada.csv'
+    entrada.write_text('NIT,NOMBRE,SALARIOS,GMF,ANO GRAVABLE\n'
+                       '1,Ana,845.738,0,\n'
+                       '2,Luis,1.23.456,0,\n'
+                       '3,Eva,80.845.738,abc,\n'
+                       '4,Leo,90000000,0,1990\n'
+                       '5,Sol,"95.000.000,50",0,2024\n', encoding='utf-8')
+    salida = tmp_path / 'salida.csv'
+    opciones = [str(tmp_path / opcion) if opcion.endswith('.sqlite') else opcion for opcion in opciones]
+    lote_renta.main([str(entrada), '-o', str(salida), *opciones])
+
+    with open(salida, newline='', encoding='utf-8') as archivo:
+        filas = list(csv.DictReader(archivo))
+    assert [(f['nit'], f['ingresos_totales']) for f in filas] == [('1', '845738'), ('5', '95000000')]
+    errores = capfd.readouterr().err
+    assert "Contribuyente 2: valor no numérico en 'salarios': '1.23.456'" in errores
+    assert "Contribuyente 3: valor no numérico en 'gmf'" in errores
+    assert "Contribuyente 4: año gravable 1990 sin paquete de reglas" in errores
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import motor_vectorizado as motor
+import nucleo_renta
+import poblacion_sintetica
+from reglas_tributarias import anos_disponibles
+
+
+def _filas(columnas, n):
+    return [{concepto: columnas[concepto][i] for concepto in motor.CONCEPTOS_ENTRADA} for i in range(n)]
+
+
+@pytest.mark.parametrize('semilla', [1, 2024])
+def test_lote_coincide_con_escalar(semilla):
+    n = 500
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla=semilla)
+    lote = motor.calcular_impuesto_renta_lote(columnas)
+    for i, datos in enumerate(_filas(columnas, n)):
+        escalar = nucleo_renta.calcular_impuesto_renta(datos)
+        for clave in motor.COLUMNAS_RESULTADO:
+            assert escalar[clave] == pytest.approx(lote[clave][i], rel=1e-12, abs=1e-6), (i, clave)
+
+
+def test_lote_con_varios_anos_gravables():
+    n = 300
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla=7)
+    anos = sorted(anos_disponibles())
+    columnas['ano_gravable'] = np.resize(anos, n)
+    lote = motor.calcular_impuesto_renta_lote(columnas)
+    for i, datos in enumerate(_filas(columnas, n)):
+        escalar = nucleo_renta.calcular_impuesto_renta(datos, reglas=int(columnas['ano_gravable'][i]))
+        assert escalar['impuesto_neto'] == pytest.approx(lote['impuesto_neto'][i], abs=1e-6)
+        assert escalar['valor_final'] == pytest.approx(lote['valor_final'][i], abs=1e-6)
+
+
+def test_columnas_ausentes_toman_valores_por_defecto():
+    lote = motor.calcular_impuesto_renta_lote({'salarios': np.array([120_000_000.0])})
+    datos = dict(motor.VALORES_POR_DEFECTO, salarios=120_000_000.0)
+    assert lote['impuesto_neto'][0] == pytest.approx(nucleo_renta.calcular_impuesto_renta(datos)['impuesto_neto'])
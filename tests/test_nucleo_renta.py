@@ -0,0 +1,84 @@
+import dataclasses
+
+import pytest
+
+import benchmark_motores
+import motor_vectorizado as motor
+import nucleo_renta
+import poblacion_sintetica
+import registros
+from reglas_tributarias import anos_disponibles, cargar_paquete
+
+ANOS = sorted(anos_disponibles())
+
+
+def _filas(columnas, n):
+    return [{concepto: columnas[concepto][i] for concepto in motor.CONCEPTOS_ENTRADA} for i in range(n)]
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_escalar_usa_el_paquete_del_ano_gravable(ano):
+    n = 200
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla=ano, reglas=ano)
+    lote = motor.calcular_impuesto_renta_lote(columnas, ano)
+    for i, datos in enumerate(_filas(columnas, n)):
+        por_reglas = nucleo_renta.calcular_impuesto_renta(datos, reglas=ano)
+        por_datos = nucleo_renta.calcular_impuesto_renta({**datos, 'ano_gravable': ano})
+        assert por_datos == por_reglas
+        for clave in ('base_gravable_uvt', 'impuesto_neto', 'anticipo_definitivo', 'valor_final'):
+            assert por_reglas[clave] == pytest.approx(lote[clave][i], rel=1e-9, abs=1e-6), (ano, i, clave)
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_tabla_241_del_paquete(ano):
+    paquete = cargar_paquete(ano)
+    assert nucleo_renta.impuesto_241_uvt(paquete.limites_241_uvt[0], ano) == 0
+    for k, limite in enumerate(paquete.limites_241_uvt):
+        # Cada rango arranca donde termina el anterior (impuestos base redondeados a la UVT)
+        assert nucleo_renta.impuesto_241_uvt(limite, paquete) == pytest.approx(
+            paquete.impuesto_base_241_uvt[k + 1], abs=1)
+    assert nucleo_renta.aplicar_tabla_articulo_241(5000, ano) == pytest.approx(
+        nucleo_renta.impuesto_241_uvt(5000, ano) * paquete.uvt)
+
+
+@pytest.mark.parametrize('script', ['V1.py', 'V3.py'])
+def test_calculadoras_tk_toman_el_paquete(script):
+    modulo = benchmark_motores.cargar_script(script, script[:-3])
+    calculadora = modulo.CalculadoraRenta.__new__(modulo.CalculadoraRenta)
+    calculadora.tabla_241 = None
+    for ano in ANOS:
+        calculadora.reglas = cargar_paquete(ano)
+        assert calculadora.calcular_impuesto_241(5000) == nucleo_renta.impuesto_241_uvt(5000, ano)
+
+
+def test_codygopy_liquida_con_el_paquete():
+    espacio = benchmark_motores.cargar_codygopy()
+    for ano in ANOS:
+        paquete = cargar_paquete(ano)
+        assert espacio['calcular_impuesto_241'](5000, paquete) == nucleo_renta.impuesto_241_uvt(5000, ano)
+        assert espacio['calcular_cesantias_exentas'](380 * paquete.uvt, 1_000_000, paquete) == \
+            nucleo_renta.calcular_cesantias_exentas(1_000_000, 380 * paquete.uvt, ano)
+
+
+def test_acepta_registros_sin_get():
+    datos = dict(motor.VALORES_POR_DEFECTO, salarios=150_000_000.0, num_dependientes=2)
+    declaracion = registros.Declaracion(ano_gravable=2023, **datos)
+    assert nucleo_renta.calcular_impuesto_renta(declaracion) == nucleo_renta.calcular_impuesto_renta(datos, reglas=2023)
+    sin_ano = registros.Declaracion(**datos)
+    assert nucleo_renta.calcular_impuesto_renta(sin_ano) == nucleo_renta.calcular_impuesto_renta(datos)
+
+
+@pytest.mark.parametrize('dependientes', [0, 1, 3, 14])
+def test_codygopy_deduce_dependientes_como_el_nucleo(dependientes):
+    # Sin campos de retención (Art. 387) la deducción anual no cambia
+    paquete = dataclasses.replace(cargar_paquete(2024), porcentaje_dependientes_387=0.0)
+    espacio = benchmark_motores.cargar_codygopy()
+    lineas = []
+    espacio['print'] = lambda *args, **kwargs: lineas.append(' '.join(map(str, args)))
+    respuestas = ['Ana', '1', '150000000', '0', '0', '0', '0', '0', str(dependientes)] + ['0'] * 11 + ['1']
+    espacio['input'] = lambda prompt='': respuestas.pop(0)
+    espacio['calculadora_renta_laboral_final'](paquete)
+    linea, = [linea for linea in lineas if 'Deducción Dependientes' in linea]
+    esperado = nucleo_renta.calcular_impuesto_renta(
+        dict(motor.VALORES_POR_DEFECTO, salarios=150_000_000, num_dependientes=dependientes), reglas=paquete)
+    assert linea.endswith(espacio['formatear_pesos'](esperado['deduccion_dependientes']))
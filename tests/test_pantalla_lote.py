@@ -0,0 +1,44 @@
+import queue
+import threading
+
+import pantalla_lote
+
+
+def _mensajes(ruta):
+    cola = queue.Queue()
+    pantalla_lote.trabajador_lote(str(ruta), 2024, cola, threading.Event())
+    return [cola.get_nowait() for _ in range(cola.qsize())]
+
+
+def test_xlsx_danado_publica_el_error(tmp_path):
+    ruta = tmp_path / 'danado.xlsx'
+    ruta.write_bytes(b'esto no es un zip')
+    mensajes = _mensajes(ruta)
+    assert len(mensajes) == 1
+    assert mensajes[0][0] == 'error'
+    assert mensajes[0][1]
+
+
+def test_csv_valido_termina(tmp_path):
+    ruta = tmp_path / 'lote.csv'
+    ruta.write_text('NIT,NOMBRE,SALARIOS\n1,Ana,100000000\n2,Luis,50000000\n', encoding='utf-8')
+    mensajes = _mensajes(ruta)
+    assert [m[0] for m in mensajes] == ['bloque', 'fin']
+    assert mensajes[-1][1] == 2
+
+
+def test_filas_invalidas_se_omiten_y_se_informan(tmp_path):
+    ruta = tmp_path / 'lote.csv'
+    ruta.write_text('NIT,NOMBRE,SALARIOS,GMF,ANO GRAVABLE\n'
+                    '1,Ana,100000000,0,\n'
+                    '2,Luis,1.23.456,abc,\n'
+                    '3,Eva,50000000,0,1990\n'
+                    '4,Leo,80000000,0,\n', encoding='utf-8')
+    mensajes = _mensajes(ruta)
+    assert [m[0] for m in mensajes] == ['rechazadas', 'bloque', 'fin']
+    _, filas, rechazos = mensajes[0]
+    assert filas == 2
+    assert len(rechazos) == 3
+    assert "'salarios'" in rechazos[0] and "'gmf'" in rechazos[1] and '1990' in rechazos[2]
+    assert [nit for nit, _ in mensajes[1][1]] == ['1', '4']
+    assert mensajes[-1][1] == 2
@@ -0,0 +1,106 @@
+import io
+import itertools
+
+import pytest
+
+import lote_renta
+import motor_vectorizado as motor
+import nucleo_renta
+import perfilado
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """perf_counter que avanza 1, 2, 3, ... segundos en cada lectura."""
+    tiempos = itertools.accumulate(itertools.count(1))
+    monkeypatch.setattr(perfilado.time, 'perf_counter', lambda: float(next(tiempos)))
+
+
+def test_cronometro_sin_perfil_activo():
+    assert perfilado.activo() is None
+    assert perfilado.cronometro(10) is None
+    iterable = [1, 2]
+    assert perfilado.medir_iterador(iterable, 'x') is iterable
+
+
+def test_cronometro_registra_el_tiempo_desde_la_marca_anterior(reloj):
+    with perfilado.perfilando() as perfil:
+        marcar = perfilado.cronometro(5)        # lectura 1
+        marcar('a')                             # 3: 2 segundos
+        marcar('b')                             # 6: 3 segundos
+        marcar('a')                             # 10: 4 segundos
+    assert perfilado.activo() is None
+    assert perfil.etapas == {'a': [2, 10, 6.0], 'b': [1, 5, 3.0]}
+    assert perfil.resumen()['a'] == {'llamadas': 2, 'filas': 10, 'segundos': 6.0, 'us_por_fila': 600000.0}
+
+
+def test_perfilando_restaura_el_perfil_anterior():
+    externo = perfilado.activar()
+    try:
+        with perfilado.perfilando() as interno:
+            assert perfilado.activo() is interno
+        assert perfilado.activo() is externo
+    finally:
+        perfilado.desactivar()
+
+
+def test_medir_y_medir_iterador(reloj):
+    perfil = perfilado.Perfil()
+    with perfil.medir('bloque', 3):
+        pass
+    with pytest.raises(ValueError):
+        with perfil.medir('bloque', 2):
+            raise ValueError
+    with perfilado.perfilando(perfil):
+        assert list(perfilado.medir_iterador([[1, 2], [3]], 'lectura')) == [[1, 2], [3]]
+    assert perfil.etapas['bloque'][:2] == [2, 5]
+    assert perfil.etapas['lectura'][:2] == [2, 3]
+    assert perfil.resumen()['lectura']['us_por_fila'] is not None
+
+
+def test_combinar_suma_los_parciales():
+    parcial_1, parcial_2 = perfilado.Perfil(), perfilado.Perfil()
+    parcial_1.registrar('motor', 0.5, 100)
+    parcial_1.registrar('csv', 0.25, 100)
+    parcial_2.registrar('motor', 1.5, 40)
+    total = perfilado.Perfil()
+    total.registrar('escritura', 0.125, 140)
+    total.combinar(parcial_1.etapas)
+    total.combinar(parcial_2.etapas)
+    assert total.etapas == {'motor': [2, 140, 2.0], 'csv': [1, 100, 0.25], 'escritura': [1, 140, 0.125]}
+    prometheus = total.a_prometheus()
+    assert 'liquidacion_etapa_filas_total{etapa="motor"} 140' in prometheus
+    assert 'liquidacion_etapa_llamadas_total{etapa="csv"} 1' in prometheus
+
+
+def _filas(n):
+    yield ['NIT', 'NOMBRE', 'SALARIOS', 'CESANTIAS', 'INGRESO MENSUAL PROMEDIO']
+    for i in range(n):
+        yield [str(i), f"Persona {i}", str(40_000_000 + 1_000_000 * i), '3000000', '4000000']
+
+
+def _etapas_de_procesar(procesos):
+    with perfilado.perfilando() as perfil:
+        lote_renta.procesar(_filas(250), io.StringIO(), tamano_bloque=60, procesos=procesos)
+    return {etapa: (llamadas, filas) for etapa, (llamadas, filas, _) in perfil.etapas.items()}
+
+
+def test_perfil_del_pool_se_combina_con_el_del_proceso_principal():
+    serie = _etapas_de_procesar(1)
+    paralelo = _etapas_de_procesar(2)
+    assert paralelo == serie
+    assert serie['lote.motor'] == (5, 250)
+    assert serie['lote.escritura'] == (5, 250)
+    assert any(etapa.startswith('motor.') for etapa in serie)
+
+
+def test_instrumentar_nucleo():
+    datos = dict(motor.VALORES_POR_DEFECTO, salarios=90_000_000.0, cesantias=5_000_000.0,
+                 ingreso_mensual_promedio=7_000_000.0)
+    original = nucleo_renta.calcular_anticipo
+    with perfilado.perfilando() as perfil, perfilado.instrumentar(nucleo_renta):
+        for _ in range(3):
+            nucleo_renta.calcular_impuesto_renta(datos)
+    assert nucleo_renta.calcular_anticipo is original
+    assert {etapa: valores[:2] for etapa, valores in perfil.etapas.items()} == {
+        f"nucleo.{nombre}": [3, 3] for nombre in perfilado.FUNCIONES_NUCLEO}
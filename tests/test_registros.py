@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import motor_vectorizado as motor
+import nucleo_renta
+import poblacion_sintetica
+import registros
+
+
+def _declaraciones(n=60):
+    """Población sintética con años mezclados (2023, 2025 y sin año)."""
+    datos = poblacion_sintetica.generar_declaraciones(n, semilla=17)
+    for i, fila in enumerate(datos):
+        fila['ano_gravable'] = (2023, 2025, None)[i % 3]
+    return datos
+
+
+def test_declaracion_ida_y_vuelta():
+    for datos in _declaraciones():
+        declaracion = registros.Declaracion.desde_dict({**datos, 'extra': 1})
+        assert declaracion.a_dict() == datos
+        assert registros.Declaracion.desde_dict(declaracion.a_dict()).a_dict() == datos
+        assert declaracion['salarios'] == datos['salarios']
+
+
+def test_declaracion_valores_por_defecto_y_errores():
+    declaracion = registros.Declaracion(salarios=1.0)
+    assert declaracion.nit == '' and declaracion.ano_gravable is None
+    assert declaracion['num_anos_declarando'] == motor.VALORES_POR_DEFECTO['num_anos_declarando']
+    with pytest.raises(KeyError):
+        declaracion['desconocido']
+    with pytest.raises(TypeError, match='desconocido'):
+        registros.Declaracion(desconocido=1)
+
+
+def test_liquidacion_ida_y_vuelta():
+    resultados = nucleo_renta.calcular_impuesto_renta(_declaraciones(1)[0])
+    liquidacion = registros.Liquidacion.desde_dict({**resultados, 'extra': 1})
+    assert liquidacion.a_dict() == resultados
+    assert liquidacion['impuesto_neto'] == resultados['impuesto_neto']
+    with pytest.raises(KeyError):
+        liquidacion['desconocido']
+
+
+@pytest.mark.parametrize('como', ['dict', 'declaracion'])
+def test_tabla_ida_y_vuelta(como):
+    datos = _declaraciones()
+    fuente = datos if como == 'dict' else [registros.Declaracion.desde_dict(d) for d in datos]
+    tabla = registros.TablaDeclaraciones.desde_registros(fuente)
+    assert len(tabla) == len(datos)
+    assert [declaracion.a_dict() for declaracion in tabla] == datos
+    assert tabla.bytes_aproximados() == len(datos) * (8 * len(motor.CONCEPTOS_ENTRADA) + 4)
+
+
+def test_columnas_motor_sin_copiar():
+    tabla = registros.TablaDeclaraciones.desde_registros(_declaraciones())
+    columnas = tabla.columnas_motor()
+    assert np.shares_memory(columnas['salarios'], np.frombuffer(tabla.columnas['salarios']))
+    assert set(columnas['ano_gravable'].tolist()) == {2023, 2024, 2025}
+    vacia = registros.TablaDeclaraciones().columnas_motor()
+    assert all(len(columna) == 0 for columna in vacia.values())
+
+
+def test_ambos_motores_liquidan_los_registros():
+    declaraciones = [registros.Declaracion.desde_dict(d) for d in _declaraciones()]
+    vectorizadas = registros.liquidar_declaraciones(declaraciones)
+    tabla = registros.liquidar_tabla(registros.TablaDeclaraciones.desde_registros(declaraciones))
+    assert [liquidacion.a_dict() for liquidacion in tabla] == tabla.a_dicts()
+    assert tabla.nits == [declaracion.nit for declaracion in declaraciones]
+
+    for declaracion, liquidacion in zip(declaraciones, vectorizadas):
+        escalar = nucleo_renta.calcular_impuesto_renta(declaracion)
+        for clave, valor in liquidacion.a_dict().items():
+            assert valor == pytest.approx(escalar[clave], rel=1e-9, abs=1e-6), (declaracion, clave)
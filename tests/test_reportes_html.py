@@ -0,0 +1,68 @@
+import io
+import re
+import zipfile
+
+import pytest
+
+import reportes_html
+
+FILAS = [
+    ['NIT', 'NOMBRE', 'SALARIOS', 'GMF', 'ANO GRAVABLE'],
+    ['1', 'Ana', '100000000', '0', ''],
+    ['2', 'Luis', '1.23.456', '0', ''],
+    ['3', 'Eva', '50000000', '0', '1990'],
+    ['4', 'Leo <b>', '80000000', '0', '2023'],
+]
+
+
+def test_filas_invalidas_se_reportan_y_no_tienen_reporte(capsys):
+    reportes = list(reportes_html.generar_reportes(FILAS, tamano_bloque=3))
+    assert [(numero, nit) for numero, nit, _, _ in reportes] == [(1, '1'), (4, '4')]
+    errores = capsys.readouterr().err.splitlines()
+    assert len(errores) == 2
+    assert errores[0].startswith("Contribuyente 2:") and "'salarios'" in errores[0]
+    assert errores[1].startswith("Contribuyente 3:") and '1990' in errores[1]
+
+    _, _, nombre, cuerpo = reportes[1]
+    assert nombre == 'Leo <b>'
+    assert 'Leo &lt;b&gt;' in cuerpo
+    assert 'AÑO GRAVABLE 2023' in cuerpo
+    assert 'id="c4"' in cuerpo
+
+
+def test_bloque_sin_filas_validas():
+    documentos, cantidad, _, _ = reportes_html.renderizar_bloque((1, [{'nit': '1', 'salarios': 'abc'}]))
+    assert documentos == [] and cantidad == 0
+
+
+def test_zip_con_un_html_por_contribuyente(tmp_path):
+    destino = tmp_path / 'reportes.zip'
+    cantidad = reportes_html.escribir_zip(reportes_html.generar_reportes(FILAS), destino)
+    assert cantidad == 2
+    with zipfile.ZipFile(destino) as archivo:
+        assert archivo.namelist() == ['estilo.css', '000001_1.html', '000004_4.html']
+        assert 'c1' in archivo.read('000001_1.html').decode('utf-8')
+    assert [ruta.name for ruta in tmp_path.iterdir()] == ['reportes.zip']
+
+
+def test_zip_fallido_no_reemplaza_el_destino(tmp_path):
+    destino = tmp_path / 'reportes.zip'
+    destino.write_bytes(b'anterior')
+
+    def reportes():
+        yield from reportes_html.generar_reportes(FILAS[:2])
+        raise RuntimeError("falla a mitad de la corrida")
+
+    with pytest.raises(RuntimeError):
+        reportes_html.escribir_zip(reportes(), destino)
+    assert destino.read_bytes() == b'anterior'
+    assert [ruta.name for ruta in tmp_path.iterdir()] == ['reportes.zip']
+
+
+def test_indice_del_html_paginado_apunta_a_cada_reporte():
+    salida = io.StringIO()
+    assert reportes_html.escribir_html_paginado(reportes_html.generar_reportes(FILAS), salida) == 2
+    texto = salida.getvalue()
+    anclas = re.findall(r'<div class="container" id="(c\d+)">', texto)
+    enlaces = re.findall(r'<li><a href="#(c\d+)">', texto)
+    assert anclas == enlaces == ['c1', 'c4']
@@ -0,0 +1,75 @@
+import csv
+
+import numpy as np
+import pytest
+
+import retencion_mensual
+
+
+def _nomina(ruta, filas):
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['NIT', 'NOMBRE', 'MES', 'SALARIOS', 'CESANTIAS'])
+        escritor.writerows(filas)
+    return str(ruta)
+
+
+def _conciliacion(ruta):
+    with open(ruta, newline='', encoding='utf-8') as archivo:
+        return {fila['nit']: fila for fila in csv.DictReader(archivo)}
+
+
+def _correr(tmp_path, mes, filas, acumulado):
+    ruta = _nomina(tmp_path / f'nomina_{mes:02d}.csv', filas)
+    retencion_mensual.main([ruta, '-o', str(tmp_path / f'retencion_{mes:02d}.csv'),
+                            '--acumulado', str(acumulado), '--conciliacion', str(tmp_path / 'conciliacion.csv')])
+    return _conciliacion(tmp_path / 'conciliacion.csv')
+
+
+def test_volver_a_correr_un_mes_reemplaza_lo_acumulado(tmp_path):
+    acumulado = tmp_path / 'acumulado.npz'
+    _correr(tmp_path, 1, [['1', 'Ana', 1, 20000000, 0]], acumulado)
+    una_vez = _correr(tmp_path, 2, [['1', 'Ana', 2, 20000000, 0]], acumulado)
+    repetido = _correr(tmp_path, 2, [['1', 'Ana', 2, 20000000, 0]], acumulado)
+
+    assert repetido == una_vez
+    assert repetido['1']['meses'] == '2'
+    assert repetido['1']['ingresos_totales'] == '40000000'
+
+    corregido = _correr(tmp_path, 2, [['1', 'Ana', 2, 25000000, 0]], acumulado)
+    assert corregido['1']['ingresos_totales'] == '45000000'
+    assert float(corregido['1']['retencion_acumulada']) > float(una_vez['1']['retencion_acumulada'])
+
+
+def test_filas_del_mismo_mes_en_una_corrida_se_suman():
+    conciliacion = retencion_mensual.ConciliacionAnual()
+    for salario in (3000000, 1000000):
+        retencion_mensual.calcular_bloque((1, [{'nit': '1', 'salarios': salario}]), 2024, 3, conciliacion)
+    claves, columnas = conciliacion.columnas_anuales()
+    assert claves == [('1', 2024)]
+    assert columnas['salarios'].tolist() == [4000000]
+    assert conciliacion.meses_reemplazados == 0
+
+
+@pytest.mark.parametrize('meses, esperado', [
+    ({1: 5e6, 2: 5e6, 3: 5e6}, 5e6),                                  # año parcial: enero a marzo
+    ({10: 4e6, 11: 4e6, 12: 4e6}, 4e6),                               # ingresó en octubre
+    ({mes: 1e6 * mes for mes in range(1, 13)}, 9.5e6),                # julio a diciembre
+    ({1: 1e6, 2: 2e6, 3: 3e6, 4: 4e6, 5: 5e6, 6: 6e6, 7: 7e6}, 4.5e6),  # retiro en julio
+    ({}, 0.0),
+])
+def test_promedio_de_los_ultimos_seis_meses_trabajados(meses, esperado):
+    salarios = np.zeros((1, retencion_mensual.MESES))
+    for mes, salario in meses.items():
+        salarios[0, mes - 1] = salario
+    assert retencion_mensual.promedio_ultimos_meses_lote(salarios).tolist() == [esperado]
+
+
+def test_conciliacion_de_medio_ano_usa_los_meses_trabajados(tmp_path):
+    acumulado = tmp_path / 'acumulado.npz'
+    for mes in range(1, 7):
+        conciliado = _correr(tmp_path, mes, [['1', 'Ana', mes, 6000000, 6000000 if mes == 6 else 0]], acumulado)
+    conciliacion = retencion_mensual.ConciliacionAnual.cargar(acumulado)
+    _, columnas = conciliacion.columnas_anuales()
+    assert columnas['ingreso_mensual_promedio'].tolist() == [6000000]
+    assert conciliado['1']['meses'] == '6'
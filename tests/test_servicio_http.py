@@ -0,0 +1,164 @@
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import servicio_http
+
+
+def _lineas(salida):
+    return [json.loads(l) for l in salida.decode('utf-8').splitlines()]
+
+
+def test_lote_reporta_solo_las_lineas_invalidas():
+    lineas = [
+        b'{"nit": "1", "salarios": 100000000}',
+        b'{"nit": "2", "salarios": ',
+        b'[1, 2]',
+        b'{"nit": "4", "salarios": "mucho"}',
+        b'{"nit": "5", "ano_gravable": 1990}',
+        b'{"nit": "6", "salarios": 80000000}',
+    ]
+    filas = _lineas(servicio_http.liquidar_lineas_ndjson(10, lineas))
+
+    assert len(filas) == 6
+    assert [f.get('nit') for f in filas] == ['1', None, None, None, None, '6']
+    assert [f.get('linea') for f in filas] == [None, 11, 12, 13, 14, None]
+    assert 'objeto JSON' in filas[2]['error']
+    assert 'salarios' in filas[3]['error']
+    assert filas[0]['impuesto_neto'] > filas[5]['impuesto_neto'] > 0
+
+
+def test_lote_valido_coincide_con_liquidarlo_linea_por_linea():
+    lineas = [json.dumps({'nit': str(i), 'salarios': 40000000 + i * 9000000}).encode()
+              for i in range(5)]
+    juntas = _lineas(servicio_http.liquidar_lineas_ndjson(0, lineas))
+    sueltas = [_lineas(servicio_http.liquidar_lineas_ndjson(i, [l]))[0] for i, l in enumerate(lineas)]
+    assert juntas == sueltas
+
+
+async def _enviar_crudo(solicitud, servicio=None):
+    servicio = servicio or servicio_http.ServicioLiquidacion(procesos=1)
+    servidor = await servicio.iniciar('127.0.0.1', 0)
+    try:
+        puerto = servidor.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', puerto)
+        writer.write(solicitud)
+        respuesta = await reader.read()
+        writer.close()
+    finally:
+        servidor.close()
+        await servidor.wait_closed()
+        servicio.cerrar()
+    encabezado, _, contenido = respuesta.partition(b'\r\n\r\n')
+    return int(encabezado.split()[1]), encabezado, contenido
+
+
+async def _solicitar(cuerpo):
+    estado, _, contenido = await _enviar_crudo(
+        b'POST /liquidar HTTP/1.1\r\nHost: x\r\nConnection: close\r\n'
+        b'Content-Length: %d\r\n\r\n' % len(cuerpo) + cuerpo)
+    return estado, json.loads(contenido)
+
+
+def _sin_chunked(contenido):
+    """Cuerpo de una respuesta chunked; falla si no termina con el bloque de tamaño 0."""
+    partes = []
+    while True:
+        tamano, _, contenido = contenido.partition(b'\r\n')
+        tamano = int(tamano, 16)
+        if tamano == 0:
+            assert contenido == b'\r\n'
+            return b''.join(partes)
+        partes.append(contenido[:tamano])
+        assert contenido[tamano:tamano + 2] == b'\r\n'
+        contenido = contenido[tamano + 2:]
+
+
+def _solicitud_lote(cuerpo, encabezados=None):
+    if encabezados is None:
+        encabezados = b'Content-Length: %d\r\n' % len(cuerpo)
+    return b'POST /lote HTTP/1.1\r\nHost: x\r\nConnection: close\r\n' + encabezados + b'\r\n' + cuerpo
+
+
+def test_liquidar_rechaza_json_que_no_es_objeto():
+    estado, cuerpo = asyncio.run(_solicitar(b'[1, 2]'))
+    assert estado == 400
+    assert 'objeto JSON' in cuerpo['error']
+
+
+def test_liquidar_un_contribuyente():
+    estado, cuerpo = asyncio.run(_solicitar(b'{"salarios": 100000000}'))
+    assert estado == 200
+    assert cuerpo['impuesto_neto'] > 0
+
+
+@pytest.mark.parametrize('constante', [b'NaN', b'Infinity', b'-Infinity'])
+def test_liquidar_rechaza_numeros_no_finitos(constante):
+    estado, cuerpo = asyncio.run(_solicitar(b'{"salarios": %s}' % constante))
+    assert estado == 400
+    assert 'finito' in cuerpo['error']
+
+
+def test_lote_rechaza_numeros_no_finitos_por_linea():
+    lineas = [b'{"nit": "1", "salarios": NaN}', b'{"nit": NaN}', b'{"nit": "3", "salarios": 50000000}']
+    filas = _lineas(servicio_http.liquidar_lineas_ndjson(1, lineas))
+    assert [f.get('linea') for f in filas] == [1, 2, None]
+    assert 'finito' in filas[0]['error']
+    assert filas[2]['nit'] == '3'
+
+
+def test_lote_sin_longitud_responde_411():
+    estado, encabezado, contenido = asyncio.run(_enviar_crudo(_solicitud_lote(b'', b'')))
+    assert estado == 411
+    assert b'chunked' not in encabezado.lower()
+    assert 'Content-Length' in json.loads(contenido)['error']
+
+
+def test_lote_demasiado_grande_responde_413():
+    servicio = servicio_http.ServicioLiquidacion(procesos=1, max_bytes_lote=10)
+    solicitud = _solicitud_lote(b'', b'Content-Length: 11\r\n')
+    estado, _, contenido = asyncio.run(_enviar_crudo(solicitud, servicio))
+    assert estado == 413
+    assert 'límite' in json.loads(contenido)['error']
+
+
+def test_lote_por_partes():
+    cuerpo = b'\n'.join(json.dumps({'nit': str(i), 'salarios': 60000000}).encode() for i in range(5))
+    servicio = servicio_http.ServicioLiquidacion(procesos=1, tamano_bloque=2)
+    estado, _, contenido = asyncio.run(_enviar_crudo(_solicitud_lote(cuerpo), servicio))
+    assert estado == 200
+    assert [f['nit'] for f in _lineas(_sin_chunked(contenido))] == ['0', '1', '2', '3', '4']
+
+
+@pytest.mark.parametrize('excepcion', [RuntimeError('falla'), BrokenProcessPool('murió')])
+def test_lote_cierra_la_respuesta_si_falla_el_pool(monkeypatch, excepcion):
+    # Hilos en lugar de procesos para poder reemplazar la función que liquida
+    def fallar(inicio, lineas):
+        if inicio > 2:
+            raise excepcion
+        return servicio_http_liquidar(inicio, lineas)
+
+    servicio_http_liquidar = servicio_http.liquidar_lineas_ndjson
+    monkeypatch.setattr(servicio_http, 'liquidar_lineas_ndjson', fallar)
+    servicio = servicio_http.ServicioLiquidacion(procesos=1, tamano_bloque=2)
+    iniciar = servicio.iniciar
+
+    async def iniciar_con_hilos(*args):
+        servidor = await iniciar(*args)
+        servicio.pool.shutdown()
+        servicio.pool = ThreadPoolExecutor(max_workers=1)
+        return servidor
+
+    servicio.iniciar = iniciar_con_hilos
+    cuerpo = b'\n'.join(json.dumps({'nit': str(i), 'salarios': 60000000}).encode() for i in range(5))
+    estado, _, contenido = asyncio.run(_enviar_crudo(_solicitud_lote(cuerpo), servicio))
+
+    assert estado == 200
+    filas = _lineas(_sin_chunked(contenido))
+    assert [f.get('nit') for f in filas] == ['0', '1', None]
+    assert list(filas[-1]) == ['error']
+    if isinstance(excepcion, BrokenProcessPool):
+        assert isinstance(servicio.pool, ProcessPoolExecutor)
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pytest
+
+import motor_vectorizado as motor
+import poblacion_sintetica
+import simulador_politicas
+from reglas_tributarias import anos_disponibles, cargar_paquete
+
+ANOS = sorted(anos_disponibles())
+ESCENARIOS = {'limite_336_1500': {'limite_general_uvt': 1500}, 'tarifa_33_a_35': {'tarifas_241': {'3': 0.35}}}
+
+
+def _poblacion(n=600):
+    columnas = poblacion_sintetica.generar_poblacion(n, semilla=31)
+    columnas['ano_gravable'] = np.array(ANOS)[np.arange(n) % len(ANOS)]
+    return columnas
+
+
+def _recaudo(columnas, paquete_de_ano):
+    """Recaudo liquidando cada año por separado con el paquete que indique `paquete_de_ano`."""
+    total = 0.0
+    for ano in np.unique(columnas['ano_gravable']):
+        filas = columnas['ano_gravable'] == ano
+        parcial = {concepto: columnas[concepto][filas] for concepto in motor.CONCEPTOS_ENTRADA}
+        total += motor.calcular_impuesto_renta_lote(parcial, paquete_de_ano(int(ano)))['impuesto_neto'].sum()
+    return total
+
+
+@pytest.mark.parametrize('tamano_tramo', [50, 100_000])
+def test_cada_fila_con_el_paquete_de_su_ano(tamano_tramo):
+    columnas = _poblacion()
+    resultado = simulador_politicas.simular(columnas, ESCENARIOS, tamano_tramo=tamano_tramo)
+    escenarios = resultado['escenarios']
+    assert escenarios['base']['recaudo'] == round(_recaudo(columnas, cargar_paquete))
+    assert escenarios['base']['recaudo'] == round(motor.calcular_impuesto_renta_lote(columnas)['impuesto_neto'].sum())
+    for nombre, cambios in ESCENARIOS.items():
+        esperado = _recaudo(columnas, lambda ano: simulador_politicas.aplicar_cambios(cargar_paquete(ano), cambios))
+        assert escenarios[nombre]['recaudo'] == round(esperado)
+        assert escenarios[nombre]['version_reglas'].count(f"+{nombre}") == len(ANOS)
+    assert escenarios['base']['version_reglas'] == ', '.join(cargar_paquete(ano).version for ano in ANOS)
+
+
+def test_reglas_explicitas_y_un_solo_ano():
+    columnas = _poblacion(200)
+    sin_ano = {concepto: valores for concepto, valores in columnas.items() if concepto != 'ano_gravable'}
+    explicitas = simulador_politicas.simular(columnas, ESCENARIOS, reglas=2023)
+    assert explicitas == simulador_politicas.simular(sin_ano, ESCENARIOS, reglas=2023)
+
+    un_ano = dict(columnas, ano_gravable=np.full(200, 2025))
+    assert simulador_politicas.simular(un_ano, ESCENARIOS) == simulador_politicas.simular(sin_ano, ESCENARIOS, 2025)
+
+
+def test_escenario_paquete_se_usa_en_todas_las_filas():
+    columnas = _poblacion(150)
+    paquete = cargar_paquete(2025)
+    resultado = simulador_politicas.simular(columnas, {'reglas_2025': paquete})
+    assert resultado['escenarios']['reglas_2025']['recaudo'] == round(_recaudo(columnas, lambda ano: paquete))
+    assert resultado['escenarios']['reglas_2025']['version_reglas'] == paquete.version
+
+
+def test_aplicar_cambios():
+    paquete = cargar_paquete(2024)
+    nuevo = simulador_politicas.aplicar_cambios(paquete, {'tarifas_241': {'3': 0.35}, 'uvt': 50000.7}, 'x')
+    assert nuevo.tarifas_241[3] == 0.35 and nuevo.tarifas_241[:3] == paquete.tarifas_241[:3]
+    assert nuevo.impuesto_base_241_uvt[4] > paquete.impuesto_base_241_uvt[4]
+    assert nuevo.uvt == 50000 and nuevo.version == f"{paquete.version}+x"
+    with pytest.raises(ValueError, match='no modificable'):
+        simulador_politicas.aplicar_cambios(paquete, {'ano_gravable': 2030})
+    with pytest.raises(ValueError, match='índice 99'):
+        simulador_politicas.aplicar_cambios(paquete, {'tarifas_241': {99: 0.5}})
+    with pytest.raises(ValueError, match="reservado"):
+        simulador_politicas.simular(_poblacion(10), {'base': {}})
+
+
+def test_main_con_archivo_usa_el_ano_de_cada_fila(tmp_path):
+    entrada = tmp_path / 'entrada.csv'
+    entrada.write_text('NIT,NOMBRE,SALARIOS,ANO GRAVABLE\n'
+                       '1,Ana,300000000,2023\n'
+                       '2,Luis,300000000,\n'
+                       '3,Eva,300000000,2025\n', encoding='utf-8')
+    escenarios = tmp_path / 'escenarios.json'
+    escenarios.write_text(json.dumps(ESCENARIOS), encoding='utf-8')
+    informe = tmp_path / 'informe.json'
+    simulador_politicas.main([str(entrada), '--escenarios', str(escenarios), '--ano', '2024', '-o', str(informe)])
+
+    columnas = simulador_politicas.cargar_poblacion(str(entrada), 2024)
+    assert columnas['ano_gravable'].tolist() == [2023, 2024, 2025]
+    with open(informe, encoding='utf-8') as archivo:
+        resultado = json.load(archivo)
+    assert resultado['poblacion'] == 3
+    assert resultado['escenarios']['base']['recaudo'] == round(_recaudo(columnas, cargar_paquete))
+    assert resultado['escenarios']['limite_336_1500']['version_reglas'].count('+limite_336_1500') == 3
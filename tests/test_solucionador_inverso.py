@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import motor_vectorizado as motor
+import poblacion_sintetica
+import solucionador_inverso
+
+
+@pytest.mark.parametrize('objetivo', solucionador_inverso.OBJETIVOS)
+def test_ida_y_vuelta_alcanza_la_meta(objetivo):
+    columnas = poblacion_sintetica.generar_poblacion(300, semilla=11)
+    metas = solucionador_inverso._valor_objetivo(motor.calcular_impuesto_renta_lote(columnas), objetivo)
+    resultado = solucionador_inverso.resolver_lote(columnas, objetivo, metas)
+    assert resultado['resuelto'].all()
+    np.testing.assert_allclose(resultado['logrado'], metas, atol=1e-3)
+    assert (resultado['tramos'] <= solucionador_inverso.MAX_TRAMOS).all()
+
+
+def test_recupera_el_salario_donde_el_impuesto_crece():
+    columnas = poblacion_sintetica.generar_poblacion(300, semilla=11)
+    lote = motor.calcular_impuesto_renta_lote(columnas)
+    resultado = solucionador_inverso.resolver_lote(columnas, 'impuesto', lote['impuesto_neto'])
+    gravados = lote['impuesto_neto'] > 0
+    assert gravados.any()
+    np.testing.assert_allclose(resultado['valor'][gravados], columnas['salarios'][gravados], atol=1e-3)
+
+
+def test_resolver_con_aportes_vinculados():
+    datos = dict(motor.VALORES_POR_DEFECTO)
+    resultado = solucionador_inverso.resolver(datos, 'neto', 120_000_000,
+                                              vinculados=solucionador_inverso.APORTES_TRABAJADOR)
+    assert resultado['resuelto']
+    solucion = resultado['datos']
+    assert solucion['incr_salud'] == pytest.approx(0.04 * solucion['salarios'])
+    liquidado = motor.calcular_impuesto_renta_lote({c: np.array([float(v)]) for c, v in solucion.items()
+                                                    if c in motor.CONCEPTOS_ENTRADA})
+    assert liquidado['ingreso_neto'][0] - liquidado['impuesto_neto'][0] == pytest.approx(120_000_000, abs=1e-3)
+
+
+def test_meta_inalcanzable_queda_sin_resolver():
+    datos = dict(motor.VALORES_POR_DEFECTO, salarios=50_000_000.0)
+    resultado = solucionador_inverso.resolver(datos, 'impuesto', 1e6, variable='gmf')
+    assert not resultado['resuelto']
+    assert np.isnan(resultado['valor'])
+
+
+@pytest.mark.parametrize('objetivo', solucionador_inverso.OBJETIVOS)
+def test_cada_fila_con_el_paquete_de_su_ano(objetivo):
+    columnas = poblacion_sintetica.generar_poblacion(300, semilla=13)
+    columnas['ano_gravable'] = np.array([(2023, 2024, 2025)[i % 3] for i in range(300)])
+    metas = solucionador_inverso._valor_objetivo(motor.calcular_impuesto_renta_lote(columnas), objetivo)
+    resultado = solucionador_inverso.resolver_lote(columnas, objetivo, metas)
+    assert resultado['resuelto'].all()
+    np.testing.assert_allclose(resultado['logrado'], metas, atol=1e-3)
+    for ano in (2023, 2024, 2025):
+        filas = columnas['ano_gravable'] == ano
+        parcial = solucionador_inverso.resolver_lote({c: v[filas] for c, v in columnas.items() if c != 'ano_gravable'},
+                                                     objetivo, metas[filas], reglas=ano)
+        for clave, valores in parcial.items():
+            np.testing.assert_array_equal(resultado[clave][filas], valores)
+
+    # Con reglas explícitas la columna de año se ignora; un solo año en la columna equivale a indicarlo
+    explicito = solucionador_inverso.resolver_lote(columnas, objetivo, metas, reglas=2024)
+    sin_ano = {c: v for c, v in columnas.items() if c != 'ano_gravable'}
+    np.testing.assert_array_equal(explicito['valor'], solucionador_inverso.resolver_lote(
+        sin_ano, objetivo, metas, reglas=2024)['valor'])
+    un_ano = solucionador_inverso.resolver_lote(dict(sin_ano, ano_gravable=[2023]), objetivo, metas)
+    np.testing.assert_array_equal(un_ano['valor'], solucionador_inverso.resolver_lote(
+        sin_ano, objetivo, metas, reglas=2023)['valor'])
+
+
+def test_resolver_usa_el_ano_de_los_datos():
+    datos = dict(motor.VALORES_POR_DEFECTO, salarios=150_000_000.0, ano_gravable=2023)
+    impuesto_2023 = motor.calcular_impuesto_renta_lote({'salarios': np.array([150e6])}, 2023)['impuesto_neto'][0]
+    resultado = solucionador_inverso.resolver(datos, 'impuesto', impuesto_2023)
+    assert resultado['valor'] == pytest.approx(150_000_000.0, abs=1e-3)
+    assert solucionador_inverso.resolver(datos, 'impuesto', impuesto_2023, reglas=2025)['valor'] != \
+        pytest.approx(150_000_000.0, abs=1)
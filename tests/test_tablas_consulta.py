@@ -0,0 +1,88 @@
+import dataclasses
+import math
+from bisect import bisect_left
+
+import pytest
+
+import benchmark_motores
+import nucleo_renta
+import tablas_consulta
+from reglas_tributarias import anos_disponibles, cargar_paquete
+
+ANOS = sorted(anos_disponibles())
+
+
+def _alrededor(limites, techo):
+    """Cada límite, los enteros vecinos y valores apenas por encima y por debajo."""
+    for limite in limites:
+        for valor in (limite - 1, limite - 0.5, limite - 1e-9, limite, limite + 1e-9, limite + 0.5, limite + 1):
+            if 0 <= valor <= techo:
+                yield valor
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_impuesto_241_en_los_bordes_de_los_rangos(ano):
+    paquete = cargar_paquete(ano)
+    modulo = benchmark_motores.cargar_script('V3.py', 'V3')
+    calculadora = modulo.CalculadoraRenta.__new__(modulo.CalculadoraRenta)
+    calculadora.reglas = paquete
+    tabla = tablas_consulta.crear_tabla_impuesto_241(calculadora.calcular_impuesto_241_formula)
+    for base in _alrededor(paquete.limites_241_uvt, tabla.techo):
+        assert tabla.consultar(base) == nucleo_renta.impuesto_241_uvt(math.floor(base), paquete), base
+    assert tabla.fallos == 0
+
+
+@pytest.mark.parametrize('ano', ANOS)
+def test_cesantias_en_los_bordes_de_los_rangos(ano):
+    paquete = cargar_paquete(ano)
+    tabla = tablas_consulta.crear_tabla_cesantias(ano)
+    for ingreso_uvt in _alrededor(paquete.limites_cesantias_uvt, tabla.techo):
+        esperado = paquete.porcentajes_cesantias[bisect_left(paquete.limites_cesantias_uvt, ingreso_uvt)]
+        assert tabla.consultar(ingreso_uvt) == esperado, ingreso_uvt
+        ingreso = ingreso_uvt * paquete.uvt
+        assert nucleo_renta.calcular_cesantias_exentas(10_000_000, ingreso, ano, tabla) == \
+            nucleo_renta.calcular_cesantias_exentas(10_000_000, ingreso, ano)
+    assert tabla.fallos == 0
+
+
+def test_por_fuera_de_la_tabla_usa_la_formula():
+    llamadas = []
+
+    def cuadrado(x):
+        llamadas.append(x)
+        return float(math.floor(x) ** 2)
+
+    tabla = tablas_consulta.TablaConsulta(cuadrado, 10)
+    assert len(llamadas) == 11
+    del llamadas[:]
+    assert tabla(10.9) == 100.0
+    assert llamadas == []
+    assert tabla(11) == 121.0
+    assert tabla(-0.5) == 1.0
+    assert llamadas == [11, -0.5]
+
+
+def test_cesantias_por_encima_del_techo():
+    paquete = cargar_paquete(2024)
+    tabla = tablas_consulta.crear_tabla_cesantias(2024, techo=100)
+    assert tabla.consultar(5000.3) == paquete.porcentajes_cesantias[-1]
+    assert tabla.consultar(150.5) == paquete.porcentajes_cesantias[bisect_left(paquete.limites_cesantias_uvt, 150.5)]
+    assert (tabla.aciertos, tabla.fallos) == (0, 2)
+
+
+def test_contadores_de_aciertos_y_fallos():
+    tabla = tablas_consulta.TablaConsulta(float, 100)
+    for valor in (0, 5.5, 100, 100.2, 101, -3, 7):
+        tabla.consultar(valor)
+    estadisticas = tabla.estadisticas()
+    assert estadisticas == {'aciertos': 5, 'fallos': 2, 'tasa_aciertos': 5 / 7, 'techo': 100, 'bytes': 101 * 8}
+    tabla.reiniciar_contadores()
+    assert (tabla.aciertos, tabla.fallos) == (0, 0)
+    assert tabla.estadisticas()['tasa_aciertos'] == 0.0
+
+
+def test_cesantias_requiere_limites_enteros():
+    paquete = cargar_paquete(2024)
+    limites = (paquete.limites_cesantias_uvt[0] + 0.5, *paquete.limites_cesantias_uvt[1:])
+    with pytest.raises(ValueError, match='enteras'):
+        tablas_consulta.crear_tabla_cesantias(dataclasses.replace(paquete, limites_cesantias_uvt=limites))
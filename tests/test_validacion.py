@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+
+import validacion
+from historial import normalizar_nit
+
+
+def _bloques(registros, tamano):
+    return [(inicio, registros[inicio:inicio + tamano]) for inicio in range(0, len(registros), tamano)]
+
+
+def _referencia(registros, ano_gravable=2024):
+    """Regla de revisar_nits fila a fila: vale la primera fila de cada (NIT, año)."""
+    vistos, errores = set(), []
+    for numero, registro in enumerate(registros):
+        nit = normalizar_nit(registro.get('nit'))
+        if not nit:
+            errores.append((numero, '', 'nit_vacio', ''))
+            continue
+        ano = validacion._ano(registro.get('ano_gravable'), ano_gravable)
+        if (nit, ano) in vistos:
+            errores.append((numero, nit, 'nit_duplicado', f"ano_gravable = {ano}"))
+        vistos.add((nit, ano))
+    return errores
+
+
+def test_revisar_nits_coincide_con_la_revision_fila_a_fila():
+    azar = random.Random(3)
+    registros = []
+    for _ in range(5000):
+        numero = azar.randrange(3000)
+        nit = azar.choice([str(numero), f"{numero:,}".replace(',', '.') + '-7', numero, float(numero), '', None, ' '])
+        registros.append({'nit': nit, 'ano_gravable': azar.choice(['2024', '2023', '', 2025.0, 'abc'])})
+    informe = validacion.InformeValidacion()
+    salida = list(informe.revisar_nits(iter(_bloques(registros, 700)), 2024))
+    esperados = _referencia(registros)
+    assert informe.errores == esperados
+    assert sum(len(bloque) for _, bloque in salida) == len(registros)
+    assert [i for i, r in enumerate(registros) if validacion.RECHAZO in r] == [e[0] for e in esperados]
+
+
+def test_bloques_sin_repetidos_no_marcan_filas():
+    registros = [{'nit': str(900_000 + i), 'ano_gravable': '2024'} for i in range(2000)]
+    informe = validacion.InformeValidacion()
+    list(informe.revisar_nits(iter(_bloques(registros, 500))))
+    assert informe.errores == []
+    assert not any(validacion.RECHAZO in r for r in registros)
+
+
+def test_validar_excluye_filas_rechazadas_por_nit():
+    registros = [{'nit': '1'}, {'nit': '1'}, {'nit': '2'}]
+    informe = validacion.InformeValidacion()
+    (bloque,) = informe.revisar_nits(iter([(0, registros)]))
+    columnas = {concepto: np.zeros(3) for concepto in validacion.motor.CONCEPTOS_ENTRADA}
+    columnas['num_anos_declarando'] = np.ones(3)
+    columnas['ano_gravable'] = np.full(3, 2024)
+    validas = informe.validar(bloque, [('1', ''), ('1', ''), ('2', '')], columnas)
+    assert validas.tolist() == [True, False, True]
+    assert informe.rechazadas == 1
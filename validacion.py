@@ -0,0 +1,247 @@
+"""
+VALIDACIÓN POR LOTES DE LOS DATOS DE ENTRADA
+Personas Naturales Residentes Fiscales - Colombia
+
+Las validaciones de `CalculadoraRenta.calcular` (V3.py), que rechazan un
+contribuyente con un mensaje de error, llevadas a columnas completas: cada
+regla se evalúa sobre todo el bloque con una comparación de numpy y solo
+las filas que fallan se convierten en líneas del informe. Las filas
+válidas siguen a la liquidación y las rechazadas no aparecen en la salida.
+
+Reglas (código del informe):
+- no_numerico          celda que no es un número
+- negativo             monto negativo
+- incr_mayor_ingresos  INCR (salud + pensiones) mayor que los ingresos laborales
+- dependientes         número de dependientes no entero o fuera de 0..máximo
+- anos_declarando      años declarando no entero o menor que 1
+- ano_sin_reglas       año gravable sin paquete en `reglas/`
+- nit_vacio            fila sin NIT
+- nit_duplicado        NIT repetido en el mismo año gravable (vale la primera fila)
+
+Las reglas del NIT se revisan en el proceso principal, con un conjunto de
+(NIT, año) de todo el archivo, y marcan el registro. Las demás se evalúan
+donde se liquida el bloque, sobre las mismas columnas que recibe el
+motor, sin convertir de nuevo las celdas.
+
+Como la auditoría, el informe se activa por proceso:
+    python lote_renta.py entrada.csv -o resultados.csv --validacion errores.csv
+"""
+
+import csv
+import operator
+import sys
+from collections import Counter
+from itertools import repeat
+
+import numpy as np
+
+import motor_vectorizado as motor
+import perfilado
+from historial import normalizar_nits
+from reglas_tributarias import ANO_GRAVABLE_POR_DEFECTO, anos_disponibles
+
+# Art. 336 num. 3 (Ley 2277): hasta cuatro dependientes
+MAX_DEPENDIENTES_POR_DEFECTO = 4
+
+REGLAS = {
+    'no_numerico': "Valor no numérico",
+    'negativo': "Monto negativo",
+    'incr_mayor_ingresos': "Los aportes obligatorios (INCR) superan los ingresos laborales",
+    'dependientes': "Número de dependientes no entero o fuera de rango",
+    'anos_declarando': "Años declarando no entero o menor que 1",
+    'ano_sin_reglas': "Año gravable sin paquete de reglas",
+    'nit_vacio': "Fila sin NIT",
+    'nit_duplicado': "NIT repetido en el mismo año gravable",
+}
+
+# Conceptos que son montos en pesos (los demás son conteos)
+CONCEPTOS_MONTO = tuple(concepto for concepto in motor.CONCEPTOS_ENTRADA
+                        if concepto not in ('num_dependientes', 'num_anos_declarando'))
+
+COLUMNAS_INFORME = ('fila', 'nit', 'regla', 'detalle')
+
+# Clave con la que el proceso principal marca un registro rechazado por su NIT
+RECHAZO = '_rechazo'
+
+_activo = None
+
+
+def _ano(celda, ano_por_defecto):
+    """Año gravable de una celda para la llave de duplicados (el error de formato lo reporta el bloque)."""
+    try:
+        return int(float(celda))
+    except (TypeError, ValueError):
+        return ano_por_defecto
+
+
+def _nits_rechazados(nits, nuevos, posiciones, ano, del_ano):
+    """
+    (posición, nit, regla, detalle) de los NIT vacíos o repetidos de un
+    grupo del mismo año (`nuevos` es el conjunto de `nits`), y agrega los
+    demás a `del_ano`. Vale la primera fila de cada NIT que no estaba en
+    `del_ano`.
+    """
+    n = len(nits)
+    # Primera posición de cada NIT: recorriendo al revés, la primera escribe de última
+    primera = dict(zip(reversed(nits), range(n - 1, -1, -1)))
+    rechazado = np.fromiter(map(primera.__getitem__, nits), dtype=np.int64, count=n) != np.arange(n)
+    ya_vistos = del_ano.intersection(nuevos)
+    if ya_vistos:
+        rechazado |= np.fromiter(map(ya_vistos.__contains__, nits), dtype=bool, count=n)
+    vacio = np.fromiter(map(operator.not_, nits), dtype=bool, count=n) if '' in nuevos else np.zeros(n, dtype=bool)
+    del_ano |= nuevos
+    del_ano.discard('')
+    rechazos = []
+    for j in np.flatnonzero(vacio | rechazado).tolist():
+        i = j if posiciones is None else int(posiciones[j])
+        if vacio[j]:
+            rechazos.append((i, '', 'nit_vacio', ''))
+        else:
+            rechazos.append((i, nits[j], 'nit_duplicado', f"ano_gravable = {ano}"))
+    return rechazos
+
+
+class InformeValidacion:
+    """Errores por fila de una corrida y filas rechazadas."""
+
+    def __init__(self, max_dependientes=MAX_DEPENDIENTES_POR_DEFECTO):
+        self.max_dependientes = max_dependientes
+        self.errores = []           # (fila, nit, regla, detalle)
+        self.filas = 0
+        self.rechazadas = 0
+        self._vistos = {}
+        self._anos_con_reglas = np.array(sorted(anos_disponibles()), dtype=np.int64)
+
+    def revisar_nits(self, bloques, ano_gravable=ANO_GRAVABLE_POR_DEFECTO):
+        """
+        Marca (con RECHAZO) los registros sin NIT o con un (NIT, año) ya
+        visto en el archivo. Es una etapa del proceso principal: recibe y
+        entrega los bloques de `agrupar_en_bloques`.
+        """
+        vistos = self._vistos           # ano -> conjunto de NIT
+        for inicio, registros in bloques:
+            marcar = perfilado.cronometro(len(registros))
+            nits = normalizar_nits(list(map(dict.get, registros, repeat('nit'))))
+            ano_de_celda = {celda: _ano(celda, ano_gravable)
+                            for celda in set(map(dict.get, registros, repeat('ano_gravable')))}
+            anos_bloque = set(ano_de_celda.values())
+            if len(anos_bloque) == 1:
+                grupos = [(anos_bloque.pop(), None)]        # None: todo el bloque
+            else:
+                celdas_ano = list(map(dict.get, registros, repeat('ano_gravable')))
+                anos = np.fromiter(map(ano_de_celda.__getitem__, celdas_ano), dtype=np.int64, count=len(celdas_ano))
+                grupos = [(ano, np.flatnonzero(anos == ano)) for ano in sorted(anos_bloque)]
+            rechazos = []
+            for ano, posiciones in grupos:
+                del_ano = vistos.setdefault(ano, set())
+                del_grupo = nits if posiciones is None else [nits[i] for i in posiciones.tolist()]
+                nuevos = set(del_grupo)
+                # Caso común: NIT presentes, sin repetidos en el bloque ni en bloques anteriores
+                if len(nuevos) == len(del_grupo) and '' not in nuevos and del_ano.isdisjoint(nuevos):
+                    del_ano |= nuevos
+                    continue
+                rechazos.extend(_nits_rechazados(del_grupo, nuevos, posiciones, ano, del_ano))
+            if rechazos:
+                rechazos.sort(key=lambda rechazo: rechazo[0])
+                for i, nit, regla, detalle in rechazos:
+                    registros[i][RECHAZO] = regla
+                    self.errores.append((inicio + i, nit, regla, detalle))
+            if marcar:
+                marcar('lote.validacion_nit')
+            yield inicio, registros
+
+    def validar(self, bloque, identificacion, columnas, no_numericos=()):
+        """
+        Evalúa las reglas sobre las columnas de un bloque ({concepto:
+        arreglo float64}, con `ano_gravable`) y registra los errores.
+        `no_numericos` son las (posición, concepto, celda) que no se
+        pudieron convertir. Retorna la máscara de filas válidas.
+        """
+        inicio, registros = bloque
+        n = len(registros)
+        errores = [(i, 'no_numerico', f"{concepto} = {celda!r}") for i, concepto, celda in no_numericos]
+
+        def fallan(mascara, regla, detalle):
+            for i in np.flatnonzero(mascara).tolist():
+                errores.append((i, regla, detalle(i)))
+
+        for concepto in CONCEPTOS_MONTO:
+            valores = columnas[concepto]
+            fallan(valores < 0, 'negativo', lambda i: f"{concepto} = {valores[i]:.0f}")
+
+        ingresos = (columnas['salarios'] + columnas['cesantias'] +
+                    columnas['prestaciones_sociales'] + columnas['otros_pagos_laborales'])
+        incr = columnas['incr_salud'] + columnas['incr_pensiones']
+        fallan(incr > ingresos, 'incr_mayor_ingresos',
+               lambda i: f"incr = {incr[i]:.0f} > ingresos = {ingresos[i]:.0f}")
+
+        # NaN (celda no numérica) ya quedó reportado como no_numerico
+        dependientes = columnas['num_dependientes']
+        fallan((dependientes < 0) | (dependientes > self.max_dependientes) |
+               (np.floor(dependientes) < dependientes), 'dependientes',
+               lambda i: f"num_dependientes = {dependientes[i]:g} (0 a {self.max_dependientes})")
+
+        anos_declarando = columnas['num_anos_declarando']
+        fallan((anos_declarando < 1) | (np.floor(anos_declarando) < anos_declarando), 'anos_declarando',
+               lambda i: f"num_anos_declarando = {anos_declarando[i]:g}")
+
+        anos = np.asarray(columnas['ano_gravable'])
+        fallan(~np.isin(anos, self._anos_con_reglas), 'ano_sin_reglas', lambda i: f"ano_gravable = {anos[i]}")
+
+        # Las filas marcadas por revisar_nits ya están en el informe
+        validas = ~np.fromiter(map(dict.__contains__, registros, repeat(RECHAZO)), dtype=bool, count=n)
+        if errores:
+            errores.sort(key=lambda error: error[0])
+            validas[[i for i, _, _ in errores]] = False
+            self.errores.extend((inicio + i, identificacion[i][0], regla, detalle)
+                                for i, regla, detalle in errores)
+        self.filas += n
+        self.rechazadas += n - int(np.count_nonzero(validas))
+        return validas
+
+    def parcial(self):
+        """Estado de un proceso del pool, para `combinar` en el proceso principal."""
+        return {'errores': self.errores, 'filas': self.filas, 'rechazadas': self.rechazadas}
+
+    def combinar(self, parcial):
+        self.errores.extend(parcial['errores'])
+        self.filas += parcial['filas']
+        self.rechazadas += parcial['rechazadas']
+
+    def conteo(self):
+        """{regla: errores} en el orden de REGLAS."""
+        por_regla = Counter(regla for _, _, regla, _ in self.errores)
+        return {regla: por_regla[regla] for regla in REGLAS if por_regla[regla]}
+
+    def guardar(self, ruta):
+        """Escribe el informe (COLUMNAS_INFORME), ordenado por fila."""
+        self.errores.sort(key=lambda error: error[0])
+        with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(COLUMNAS_INFORME)
+            escritor.writerows(self.errores)
+
+
+def imprimir_resumen(informe, destino=sys.stderr):
+    detalle = ', '.join(f"{regla} {cantidad}" for regla, cantidad in informe.conteo().items())
+    print(f"Validación: {informe.rechazadas} de {informe.filas} contribuyentes rechazados"
+          + (f" ({detalle})" if detalle else ""), file=destino)
+
+
+# --- INFORME ACTIVO ---
+
+def activar(informe=None):
+    """Activa el informe en este proceso y retorna el informe que acumula."""
+    global _activo
+    _activo = informe if informe is not None else InformeValidacion()
+    return _activo
+
+
+def desactivar():
+    global _activo
+    informe, _activo = _activo, None
+    return informe
+
+
+def activo():
+    return _activo